@@ -0,0 +1,6 @@
+USE quantitative_trading;
+
+-- 回测历史键集分页索引：按用户、生成时间倒序翻页
+CREATE INDEX idx_user_generate_time ON BacktestReport(user_id, report_generate_time, report_id);
+
+SELECT '回测历史分页索引已创建。';
@@ -0,0 +1,13 @@
+USE quantitative_trading;
+
+-- 回测报告列式数据表：资金曲线、日期偏移与交易记录以二进制负载存储，按 report_id 关联 BacktestReport
+CREATE TABLE IF NOT EXISTS BacktestReportData (
+    report_id VARCHAR(50) NOT NULL,
+    payload LONGBLOB NOT NULL COMMENT '列式二进制负载（report_storage 编码）',
+    create_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (report_id),
+    CONSTRAINT fk_report_data_report FOREIGN KEY (report_id) REFERENCES BacktestReport(report_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='回测报告列式数据表';
+
+SELECT 'BacktestReportData 表已创建。';
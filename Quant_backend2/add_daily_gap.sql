@@ -0,0 +1,20 @@
+USE tushare_cache;
+
+-- 缺口登记表：记录 Tushare 明确没有数据的 (表, 股票, 交易日)，主要是停牌日，之后的缺口检测视为已齐全
+CREATE TABLE IF NOT EXISTS daily_gap (
+    table_name VARCHAR(20) NOT NULL,
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date VARCHAR(8) NOT NULL,
+
+    PRIMARY KEY (table_name, ts_code, trade_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Tushare日线缓存缺口登记表';
+
+-- daily / daily_basic 按 (ts_code, trade_date) 原地写入（INSERT ... ON DUPLICATE KEY UPDATE），依赖该唯一键；
+-- 以下查询返回行时说明已有重复记录，需先清理重复行再执行 ALTER
+SELECT ts_code, trade_date, COUNT(*) AS copies FROM daily GROUP BY ts_code, trade_date HAVING COUNT(*) > 1 LIMIT 10;
+SELECT ts_code, trade_date, COUNT(*) AS copies FROM daily_basic GROUP BY ts_code, trade_date HAVING COUNT(*) > 1 LIMIT 10;
+
+ALTER TABLE daily ADD UNIQUE KEY uk_daily_code_date (ts_code, trade_date);
+ALTER TABLE daily_basic ADD UNIQUE KEY uk_daily_basic_code_date (ts_code, trade_date);
+
+SELECT '缺口登记表与日线唯一键已创建。';
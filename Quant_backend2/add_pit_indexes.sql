@@ -0,0 +1,7 @@
+USE quantitative_trading;
+
+-- 财务报表时点查询索引：按 (股票, 公告日期) 读取“截至某日已公告的最新报告期”
+CREATE INDEX idx_stock_announcement ON BalanceSheet(stock_code, announcement_date);
+CREATE INDEX idx_stock_announcement ON IncomeStatement(stock_code, announcement_date);
+
+SELECT '财务报表时点查询索引已创建。';
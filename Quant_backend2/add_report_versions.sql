@@ -0,0 +1,8 @@
+USE quantitative_trading;
+
+-- 财务报表按版本保存：同一报告期的原始版本与更正/修订版本以各自的公告日期区分，
+-- 时点查询在修订公告之前返回原始数值
+ALTER TABLE BalanceSheet DROP PRIMARY KEY, ADD PRIMARY KEY (stock_code, report_period, announcement_date);
+ALTER TABLE IncomeStatement DROP PRIMARY KEY, ADD PRIMARY KEY (stock_code, report_period, announcement_date);
+
+SELECT '财务报表主键已改为 (股票, 报告期, 公告日期)。';
@@ -0,0 +1,6 @@
+USE quantitative_trading;
+
+-- 信号扫描查询索引：按交易日（可选策略）列出当日触发信号的股票
+CREATE INDEX idx_trade_date_strategy ON TradingSignal(trade_date, strategy_id);
+
+SELECT '交易信号查询索引已创建。';
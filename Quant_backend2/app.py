@@ -336,10 +336,23 @@ def filter_stocks(current_user_id):
             LEFT JOIN LatestStockPrice lsp ON sb.stock_code = lsp.stock_code
             LEFT JOIN StockValuation sv ON sb.stock_code = sv.stock_code 
                 AND sv.trade_date = (SELECT MAX(trade_date) FROM StockValuation WHERE stock_code = sb.stock_code)
-            LEFT JOIN BalanceSheet bs ON sb.stock_code = bs.stock_code 
-                AND bs.report_period = (SELECT MAX(report_period) FROM BalanceSheet WHERE stock_code = sb.stock_code)
-            LEFT JOIN IncomeStatement is_data ON sb.stock_code = is_data.stock_code 
-                AND is_data.report_period = (SELECT MAX(report_period) FROM IncomeStatement WHERE stock_code = sb.stock_code)
+            -- 财务报表按版本保存，一次扫描取每只股票最新报告期的最新版本
+            LEFT JOIN (
+                SELECT * FROM (
+                    SELECT b.*, ROW_NUMBER() OVER (
+                        PARTITION BY b.stock_code ORDER BY b.report_period DESC, b.announcement_date DESC
+                    ) AS version_rank
+                    FROM BalanceSheet b
+                ) ranked_bs WHERE version_rank = 1
+            ) bs ON sb.stock_code = bs.stock_code
+            LEFT JOIN (
+                SELECT * FROM (
+                    SELECT i.*, ROW_NUMBER() OVER (
+                        PARTITION BY i.stock_code ORDER BY i.report_period DESC, i.announcement_date DESC
+                    ) AS version_rank
+                    FROM IncomeStatement i
+                ) ranked_is WHERE version_rank = 1
+            ) is_data ON sb.stock_code = is_data.stock_code
             WHERE 1=1
         """
         
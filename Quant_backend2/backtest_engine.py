@@ -8,10 +8,19 @@
 import pandas as pd
 import numpy as np
 import logging
+import base64
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 import pymysql
 from strategy_engine import StrategyEngine, BaseStrategy
+from report_storage import encode_backtest_payload, new_report_id, save_report_payloads
+from downsample import build_tiers
+from performance_metrics import compute_single_metrics
+from benchmark import compute_benchmark_analytics, get_benchmark_provider
+from trading_calendar import get_trading_calendar
+from stage_timer import timed_stage
+from risk_rules import apply_risk_rules
+from kernels import simulate_cash
 
 # 配置日志
 logging.basicConfig(
@@ -29,6 +38,19 @@ DB_DEFAULTS = {
     "charset": "utf8mb4",
 }
 
+# 批量保存回测报告时每条 INSERT 的行数（每行带一份列式负载）
+REPORT_INSERT_BATCH = 100
+
+REPORT_INSERT_SQL = """
+INSERT INTO BacktestReport (
+    report_id, strategy_id, user_id, backtest_type, stock_code,
+    start_date, end_date, initial_fund, final_fund, total_return,
+    annual_return, max_drawdown, sharpe_ratio, win_rate,
+    profit_loss_ratio, trade_count, report_status, equity_curve_data, trade_records,
+    strategy_params
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
 
 class BacktestResult:
     """回测结果类"""
@@ -45,7 +67,10 @@ class BacktestResult:
         self.trade_count = 0
         self.trades = []
         self.equity_curve = []
+        self.dates = []  # 与equity_curve逐点对应的日期（YYYY-MM-DD）
         self.daily_returns = []
+        self.metrics = {}  # 完整的绩效指标（含索提诺、卡玛、换手率等）
+        self.benchmark = {}  # 相对基准的分析结果（指定基准时）
         
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
@@ -61,7 +86,10 @@ class BacktestResult:
             'trade_count': self.trade_count,
             'trades': self.trades,
             'equity_curve': self.equity_curve,
-            'daily_returns': self.daily_returns
+            'dates': self.dates,
+            'daily_returns': self.daily_returns,
+            'metrics': self.metrics,
+            'benchmark': self.benchmark
         }
 
 
@@ -100,170 +128,108 @@ class BacktestEngine:
     
     def calculate_performance_metrics(self, equity_curve: List[float], 
                                     daily_returns: List[float], 
-                                    initial_capital: float) -> Dict[str, float]:
-        """计算性能指标"""
+                                    initial_capital: float,
+                                    position_values: Optional[List[float]] = None,
+                                    trade_returns: Optional[List[float]] = None) -> Dict[str, float]:
+        """
+        计算性能指标（委托 performance_metrics 模块的向量化实现）
+        
+        Args:
+            equity_curve: 资金曲线
+            daily_returns: 日收益率
+            initial_capital: 初始资金
+            position_values: 与资金曲线逐点对应的持仓市值（可选，用于换手率与仓位暴露）
+            trade_returns: 逐笔平仓收益率（可选）
+        """
         if not equity_curve or not daily_returns:
             return {}
-        
-        equity_series = pd.Series(equity_curve).astype(float)
-        returns_series = pd.Series(daily_returns).astype(float)
-
-        # 清理异常值
-        returns_series = returns_series.replace([np.inf, -np.inf], np.nan).dropna()
-        if returns_series.empty:
-            return {
-                'total_return': 0.0,
-                'annual_return': 0.0,
-                'max_drawdown': 0.0,
-                'sharpe_ratio': 0.0,
-                'win_rate': 0.0,
-                'profit_loss_ratio': 0.0,
-            }
-        
-        # 总收益率
-        total_return = (equity_series.iloc[-1] - initial_capital) / initial_capital
-        
-        # 年化收益率
-        trading_days = len(equity_curve)
-        years = trading_days / 252  # 假设一年252个交易日
-        annual_return = (1 + total_return) ** (1 / years) - 1 if years > 0 else 0
-        
-        # 最大回撤
-        peak = equity_series.expanding().max()
-        drawdown = (equity_series - peak) / peak
-        max_drawdown = abs(drawdown.min())
-        
-        # 夏普比率
-        risk_free_rate = 0.03  # 假设无风险利率3%
-        excess_returns = returns_series - risk_free_rate / 252
-        std = excess_returns.std()
-        if std is None or np.isnan(std) or std < 1e-8:
-            sharpe_ratio = 0.0
-        else:
-            sharpe_ratio = excess_returns.mean() / std * np.sqrt(252)
-        
-        # 胜率
-        positive_returns = returns_series[returns_series > 0]
-        win_rate = len(positive_returns) / len(returns_series) if len(returns_series) > 0 else 0
-        
-        # 盈亏比
-        avg_win = positive_returns.mean() if len(positive_returns) > 0 else 0
-        negative_returns = returns_series[returns_series < 0]
-        avg_loss = abs(negative_returns.mean()) if len(negative_returns) > 0 else 0
-        profit_loss_ratio = avg_win / avg_loss if avg_loss > 0 else 0
-        
-        return {
-            'total_return': total_return,
-            'annual_return': annual_return,
-            'max_drawdown': max_drawdown,
-            'sharpe_ratio': sharpe_ratio,
-            'win_rate': win_rate,
-            'profit_loss_ratio': profit_loss_ratio
-        }
+        return compute_single_metrics(
+            equity_curve,
+            returns=daily_returns,
+            initial_capital=initial_capital,
+            position_values=position_values,
+            trade_returns=trade_returns,
+        )
+    
+    def label_equity_dates(self, trade_dates: List[Any]) -> List[str]:
+        """
+        生成与资金曲线逐点对应的日期：资金曲线首点为初始资金，
+        标注为首个交易日的前一交易日（日历不可用时取首个交易日），其后为各交易日
+        """
+        if not trade_dates:
+            return []
+        days = pd.to_datetime(pd.Series(trade_dates)).dt.strftime('%Y-%m-%d').tolist()
+        previous = get_trading_calendar(self.db_password).previous(days[0])
+        first = str(previous) if previous is not None else days[0]
+        return [first] + days
     
     def simulate_trading(self, signals: pd.DataFrame, initial_capital: float = 100000.0,
-                        commission_rate: float = 0.001) -> BacktestResult:
-        """模拟交易过程"""
-        result = BacktestResult()
-        result.initial_capital = initial_capital
+                        commission_rate: float = 0.001, risk_rules: Dict[str, float] = None) -> BacktestResult:
+        """
+        模拟交易过程
         
-        # 初始化
-        capital = initial_capital
-        position = 0  # 持仓数量
-        entry_price = 0.0
-        trades = []
-        equity_curve = [initial_capital]
-        daily_returns = [0.0]
+        Args:
+            signals: 策略信号
+            initial_capital: 初始资金
+            commission_rate: 手续费率
+            risk_rules: 风控离场规则（risk_rules.parse_risk_rules 的结果），卖出记录带 exit_reason
+        """
+        result = BacktestResult()
+        # 止损/止盈/移动止损/最长持仓在模拟前一次性写回信号（按实际能成交的买入确定持仓）
+        signals = apply_risk_rules(signals, risk_rules, initial_capital, commission_rate)
         
-        for i, row in signals.iterrows():
-            current_price = row['close_price']
-            signal = row['signal']
-            
-            # 计算当前市值
-            current_value = capital + position * current_price
-            equity_curve.append(current_value)
-            
-            # 计算日收益率
-            if i > 0:
-                daily_return = (current_value - equity_curve[-2]) / equity_curve[-2]
-                daily_returns.append(daily_return)
-            
-            # 处理交易信号
-            if signal == 1 and position == 0:  # 买入信号且无持仓
-                # 计算可买入数量
-                available_capital = capital * 0.95  # 保留5%现金
-                shares_to_buy = int(available_capital / current_price)
-                
-                if shares_to_buy > 0:
-                    # 计算手续费
-                    commission = shares_to_buy * current_price * commission_rate
-                    total_cost = shares_to_buy * current_price + commission
-                    
-                    if total_cost <= capital:
-                        position = shares_to_buy
-                        capital -= total_cost
-                        entry_price = current_price
-                        
-                        trades.append({
-                            'date': row['trade_date'],
-                            'action': 'buy',
-                            'price': current_price,
-                            'shares': shares_to_buy,
-                            'commission': commission,
-                            'capital_after': capital
-                        })
-            
-            elif signal == -1 and position > 0:  # 卖出信号且有持仓
-                # 卖出所有持仓
-                proceeds = position * current_price
-                commission = proceeds * commission_rate
-                net_proceeds = proceeds - commission
-                
-                capital += net_proceeds
-                
-                # 记录交易
-                trade_return = (current_price - entry_price) / entry_price
-                trades.append({
-                    'date': row['trade_date'],
-                    'action': 'sell',
-                    'price': current_price,
-                    'shares': position,
-                    'commission': commission,
-                    'trade_return': trade_return,
-                    'capital_after': capital
-                })
-                
-                position = 0
-                entry_price = 0.0
+        # 资金与持仓记账（安装 numba 时为 JIT 编译内核）
+        trade_dates = signals['trade_date'].tolist()
+        ledger = simulate_cash(
+            signals['close_price'].to_numpy(dtype=np.float64),
+            signals['signal'].to_numpy(),
+            signals.index.to_numpy() > 0,  # 与逐行实现一致：按行标签判断是否记录日收益率
+            initial_capital,
+            commission_rate,
+        )
+        capital = ledger['final_capital']
+        equity_curve = ledger['equity'].tolist()
+        position_values = ledger['position_values'].tolist()
+        daily_returns = ledger['daily_returns'].tolist()
         
-        # 最后一天如果还有持仓，按收盘价卖出
-        if position > 0:
-            final_price = signals.iloc[-1]['close_price']
-            proceeds = position * final_price
-            commission = proceeds * commission_rate
-            net_proceeds = proceeds - commission
-            capital += net_proceeds
-            
-            trade_return = (final_price - entry_price) / entry_price
-            trades.append({
-                'date': signals.iloc[-1]['trade_date'],
-                'action': 'sell',
-                'price': final_price,
-                'shares': position,
+        # 交易记录
+        exit_reasons = signals['exit_reason'].to_numpy()
+        sell_signal = signals['signal'].to_numpy() == -1
+        trades = []
+        for index, action, price, shares, commission, trade_return, capital_after in zip(
+                ledger['trade_index'].tolist(), ledger['trade_action'].tolist(), ledger['trade_price'].tolist(),
+                ledger['trade_shares'].tolist(), ledger['trade_commission'].tolist(),
+                ledger['trade_return'].tolist(), ledger['trade_capital'].tolist()):
+            trade = {
+                'date': trade_dates[index],
+                'action': 'buy' if action == 1 else 'sell',
+                'price': price,
+                'shares': shares,
                 'commission': commission,
-                'trade_return': trade_return,
-                'capital_after': capital
-            })
+            }
+            if action == -1:
+                trade['trade_return'] = trade_return
+            trade['capital_after'] = capital_after
+            if action == -1:
+                # 没有卖出信号的卖出只能是最后一天的强制平仓
+                trade['exit_reason'] = (exit_reasons[index] or 'signal') if sell_signal[index] else 'end_of_data'
+            trades.append(trade)
         
         # 计算最终结果
         result.final_capital = capital
         result.trades = trades
         result.equity_curve = equity_curve
+        with timed_stage('calendar'):
+            result.dates = self.label_equity_dates(trade_dates)
         result.daily_returns = daily_returns
         result.trade_count = len(trades)  # 统计所有交易次数，包括买入和卖出
         
         # 计算性能指标
-        metrics = self.calculate_performance_metrics(equity_curve, daily_returns, initial_capital)
+        trade_returns = [t['trade_return'] for t in trades if 'trade_return' in t]
+        with timed_stage('metrics'):
+            metrics = self.calculate_performance_metrics(equity_curve, daily_returns, initial_capital,
+                                                         position_values, trade_returns)
+        result.metrics = metrics
         result.total_return = metrics.get('total_return', 0)
         result.annual_return = metrics.get('annual_return', 0)
         result.max_drawdown = metrics.get('max_drawdown', 0)
@@ -273,7 +239,27 @@ class BacktestEngine:
         
         return result
     
-    def run_backtest(self, stock_code: str, start_date: str, end_date: str, strategy_type: str, initial_capital: float = 100000.0, commission_rate: float = 0.001, strategy_params=None):
+    def apply_benchmark(self, result: BacktestResult, benchmark: str) -> BacktestResult:
+        """
+        计算相对基准指数的阿尔法、贝塔、跟踪误差、信息比率与超额资金曲线，写入 result.benchmark。
+        基准行情不可用时只记录警告，不影响回测结果。
+        
+        Args:
+            result: 回测结果（需带有 dates）
+            benchmark: 基准指数代码，如 000300.SH
+        """
+        if not benchmark or not result.equity_curve or len(result.dates) != len(result.equity_curve):
+            return result
+        try:
+            with timed_stage('benchmark'):
+                closes = get_benchmark_provider().get_closes(benchmark, result.dates[0], result.dates[-1])
+                analytics = compute_benchmark_analytics(result.equity_curve, result.dates, closes)
+            result.benchmark = {'ts_code': benchmark, **analytics}
+        except Exception as e:
+            self.logger.warning(f"计算基准 {benchmark} 相对指标失败: {e}")
+        return result
+    
+    def run_backtest(self, stock_code: str, start_date: str, end_date: str, strategy_type: str, initial_capital: float = 100000.0, commission_rate: float = 0.001, strategy_params=None, benchmark: str = None, risk_rules: Dict[str, float] = None):
         try:
             self.logger.info(f"开始回测: {stock_code} {strategy_type} {start_date} 到 {end_date}")
             
@@ -298,7 +284,10 @@ class BacktestEngine:
                 raise ValueError("未生成任何交易信号")
             
             # 模拟交易
-            result = self.simulate_trading(signals, initial_capital, commission_rate)
+            with timed_stage('simulate'):
+                result = self.simulate_trading(signals, initial_capital, commission_rate, risk_rules)
+            if benchmark:
+                self.apply_benchmark(result, benchmark)
             
             self.logger.info(f"回测完成: 总收益率 {result.total_return:.2%}, "
                            f"年化收益率 {result.annual_return:.2%}, "
@@ -311,61 +300,82 @@ class BacktestEngine:
             self.logger.error(f"回测失败: {e}")
             raise
     
-    def save_backtest_result(self, result: BacktestResult, strategy_id: str, 
-                           user_id: str, stock_code: str, start_date: str, 
-                           end_date: str, backtest_type: str = 'STOCK',
-                           strategy_params: dict = None) -> str:
-        """保存回测结果到数据库"""
+    @staticmethod
+    def _benchmark_summary(result: BacktestResult) -> Optional[Dict[str, Any]]:
+        """随报告保存的基准标量指标（不含曲线）"""
+        benchmark = getattr(result, 'benchmark', None)
+        if not benchmark:
+            return None
+        return {'benchmark': {k: v for k, v in benchmark.items() if not isinstance(v, list)}}
+    
+    def build_report_row(self, result: BacktestResult, strategy_id: str, user_id: str, stock_code: str,
+                         start_date: str, end_date: str, backtest_type: str = 'STOCK',
+                         strategy_params: dict = None) -> Tuple[tuple, bytes]:
+        """
+        生成一条 BacktestReport 记录（字段顺序同 REPORT_INSERT_SQL）与其列式负载
+
+        Returns:
+            (记录, 负载)，记录第一个字段为新的报告ID
+        """
+        import json
+        # 资金曲线和交易记录以列式二进制负载写入BacktestReportData，
+        # BacktestReport中的旧JSON字段写入NULL（表示数据在负载中，而不是“没有交易”），只有旧报告才有这两列的数据
+        equity_curve = getattr(result, 'equity_curve', None) or []
+        with timed_stage('encode_payload'):
+            payload = encode_backtest_payload(
+                equity_curve,
+                dates=getattr(result, 'dates', None),
+                trades=getattr(result, 'trades', None) or [],
+                extra=self._benchmark_summary(result),
+                tiers=build_tiers(equity_curve),
+            )
+        
+        # 将策略参数转换为JSON格式
+        strategy_params_json = json.dumps(strategy_params) if strategy_params else json.dumps({})
+        row = (
+            new_report_id(), strategy_id, user_id, backtest_type, stock_code,
+            start_date, end_date, result.initial_capital, result.final_capital,
+            result.total_return, result.annual_return, result.max_drawdown,
+            result.sharpe_ratio, result.win_rate, result.profit_loss_ratio,
+            result.trade_count, 'completed', None, None,
+            strategy_params_json
+        )
+        return row, payload
+    
+    def save_backtest_results(self, reports: List[Dict[str, Any]]) -> List[str]:
+        """
+        在一个事务中批量保存多份回测结果（参数扫描、组合回测等），任一失败整体回滚
+        
+        Args:
+            reports: 每项为 save_backtest_result 的关键字参数（result、strategy_id、user_id、stock_code 等）
+        
+        Returns:
+            与输入顺序一致的报告ID列表
+        """
+        if not reports:
+            return []
         try:
-            self.connect_database()
-            
-            # 生成报告ID
-            report_id = f"RPT_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{stock_code}"
-            
-            # 将equity_curve和trades数据转换为JSON格式
-            import json
-            equity_curve_json = json.dumps(result.equity_curve) if hasattr(result, 'equity_curve') and result.equity_curve else json.dumps([])
-            
-            # 处理trades数据，确保日期格式正确
-            formatted_trades = []
-            if hasattr(result, 'trades') and result.trades:
-                for trade in result.trades:
-                    formatted_trade = trade.copy()
-                    # 确保日期可序列化
-                    if 'date' in formatted_trade and hasattr(formatted_trade['date'], 'strftime'):
-                        formatted_trade['date'] = formatted_trade['date'].strftime('%Y-%m-%d')
-                    formatted_trades.append(formatted_trade)
-            trades_json = json.dumps(formatted_trades)
-            
-            # 将策略参数转换为JSON格式
-            strategy_params_json = json.dumps(strategy_params) if strategy_params else json.dumps({})
-            
-            # 插入回测报告
-            cursor = self.connection.cursor()
-            insert_sql = """
-            INSERT INTO BacktestReport (
-                report_id, strategy_id, user_id, backtest_type, stock_code,
-                start_date, end_date, initial_fund, final_fund, total_return,
-                annual_return, max_drawdown, sharpe_ratio, win_rate,
-                profit_loss_ratio, trade_count, report_status, equity_curve_data, trade_records,
-                strategy_params
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_sql, (
-                report_id, strategy_id, user_id, backtest_type, stock_code,
-                start_date, end_date, result.initial_capital, result.final_capital,
-                result.total_return, result.annual_return, result.max_drawdown,
-                result.sharpe_ratio, result.win_rate, result.profit_loss_ratio,
-                result.trade_count, 'completed', equity_curve_json, trades_json,
-                strategy_params_json
-            ))
+            rows, payloads = [], []
+            for report in reports:
+                row, payload = self.build_report_row(**report)
+                rows.append(row)
+                payloads.append((row[0], payload))
             
-            self.connection.commit()
-            cursor.close()
+            self.connect_database()
+            with timed_stage('insert_report'):
+                with self.connection.cursor() as cursor:
+                    # 负载较大，按批写入以免单条语句超过 max_allowed_packet
+                    for i in range(0, len(rows), REPORT_INSERT_BATCH):
+                        cursor.executemany(REPORT_INSERT_SQL, rows[i:i + REPORT_INSERT_BATCH])
+                        save_report_payloads(cursor, payloads[i:i + REPORT_INSERT_BATCH])
+                self.connection.commit()
             
-            self.logger.info(f"回测结果已保存: {report_id}")
-            return report_id
+            report_ids = [row[0] for row in rows]
+            if len(report_ids) == 1:
+                self.logger.info(f"回测结果已保存: {report_ids[0]}")
+            else:
+                self.logger.info(f"已批量保存 {len(report_ids)} 份回测结果")
+            return report_ids
             
         except Exception as e:
             self.logger.error(f"保存回测结果失败: {e}")
@@ -375,6 +385,17 @@ class BacktestEngine:
         finally:
             self.close_database()
     
+    def save_backtest_result(self, result: BacktestResult, strategy_id: str, 
+                           user_id: str, stock_code: str, start_date: str, 
+                           end_date: str, backtest_type: str = 'STOCK',
+                           strategy_params: dict = None) -> str:
+        """保存回测结果到数据库"""
+        return self.save_backtest_results([{
+            'result': result, 'strategy_id': strategy_id, 'user_id': user_id, 'stock_code': stock_code,
+            'start_date': start_date, 'end_date': end_date, 'backtest_type': backtest_type,
+            'strategy_params': strategy_params,
+        }])[0]
+    
     def get_backtest_results(self, user_id: str = None, strategy_id: str = None,
                            limit: int = 100) -> List[Dict[str, Any]]:
         """获取回测结果列表"""
@@ -412,6 +433,71 @@ class BacktestEngine:
         finally:
             self.close_database()
     
+    @staticmethod
+    def encode_history_cursor(generate_time, report_id: str) -> str:
+        """将分页位置 (生成时间, 报告ID) 编码为不透明游标"""
+        if hasattr(generate_time, 'strftime'):
+            generate_time = generate_time.strftime('%Y-%m-%d %H:%M:%S')
+        raw = f"{generate_time}|{report_id}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> Tuple[str, str]:
+        """解码分页游标，格式错误时抛出ValueError"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            generate_time, report_id = raw.split('|', 1)
+            datetime.strptime(generate_time, '%Y-%m-%d %H:%M:%S')
+            return generate_time, report_id
+        except Exception:
+            raise ValueError("无效的分页游标")
+    
+    def get_backtest_history(self, user_id: str, limit: int = 20,
+                             cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        获取用户的回测历史（含策略名称），按生成时间倒序，基于游标的键集分页
+        
+        Args:
+            user_id: 用户ID
+            limit: 每页条数
+            cursor: 上一页返回的游标，为None时从最新记录开始
+        
+        Returns:
+            (记录列表, 下一页游标)，没有更多记录时游标为None
+        """
+        query = """
+        SELECT r.report_id, r.strategy_id, s.strategy_name, r.stock_code,
+               r.start_date, r.end_date, r.total_return, r.max_drawdown,
+               r.sharpe_ratio, r.report_generate_time
+        FROM BacktestReport r
+        LEFT JOIN Strategy s ON s.strategy_id = r.strategy_id
+        WHERE r.user_id = %s
+        """
+        params = [user_id]
+        if cursor:
+            generate_time, report_id = self.decode_history_cursor(cursor)
+            query += """ AND (r.report_generate_time < %s
+                           OR (r.report_generate_time = %s AND r.report_id < %s))"""
+            params.extend([generate_time, generate_time, report_id])
+        # 多取一条用于判断是否还有下一页
+        query += " ORDER BY r.report_generate_time DESC, r.report_id DESC LIMIT %s"
+        params.append(limit + 1)
+        
+        try:
+            self.connect_database()
+            with self.connection.cursor(pymysql.cursors.DictCursor) as db_cursor:
+                db_cursor.execute(query, params)
+                rows = db_cursor.fetchall()
+        finally:
+            self.close_database()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self.encode_history_cursor(last['report_generate_time'], last['report_id'])
+        return list(rows), next_cursor
+    
     def compare_strategies(self, stock_code: str, start_date: str, end_date: str,
                          strategies: List[Dict[str, Any]], 
                          initial_capital: float = 100000.0) -> Dict[str, BacktestResult]:
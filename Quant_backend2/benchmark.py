@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基准指数模块
+- BenchmarkProvider：通过 TushareCacheClient.index_daily 读取指数收盘价（index_basic 提供可选基准列表），按指数代码在进程内做 LRU 缓存，
+  请求区间落在已缓存区间内时直接切片，不再访问数据库；缓存只覆盖到实际返回的最后一根K线，
+  请求晚于该日期时在 BENCHMARK_REFRESH_SECONDS 之后重新读取，新发布的指数行情能进入缓存
+- compute_benchmark_analytics：把基准收盘价对齐到回测资金曲线日期，计算阿尔法、贝塔、跟踪误差、信息比率与超额资金曲线
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from performance_metrics import RISK_FREE_RATE, benchmark_metrics
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BENCHMARK = "000300.SH"
+# 进程内最多缓存的指数数量
+BENCHMARK_CACHE_SIZE = 16
+# 首次加载时向前后多取的天数，后续相近区间的回测可直接命中缓存
+BENCHMARK_PREFETCH_DAYS = 365
+# 请求结束日晚于缓存中最后一根K线时，距上次读取超过该秒数则重新读取（当日指数行情可能尚未发布）
+BENCHMARK_REFRESH_SECONDS = 600
+
+
+class BenchmarkProvider:
+    """基准指数收盘价的 LRU 缓存"""
+
+    def __init__(self, client=None, config_path: str = "config.json", maxsize: int = BENCHMARK_CACHE_SIZE,
+                 refresh_seconds: float = BENCHMARK_REFRESH_SECONDS):
+        """
+        Args:
+            client: 提供 index_daily / index_basic 的对象，默认在首次使用时创建 TushareCacheClient
+            config_path: 默认客户端使用的 Tushare 配置
+            maxsize: 最多缓存的指数数量
+            refresh_seconds: 请求超出最后一根K线时重新读取的最短间隔
+        """
+        self._client = client
+        self.config_path = config_path
+        self.maxsize = maxsize
+        self.refresh_seconds = refresh_seconds
+        self.cache = OrderedDict()  # ts_code -> (开始, 最后一根K线日期, pd.Series, 读取时刻)
+        self.indices = None  # index_basic 的缓存
+        self.lock = threading.Lock()
+        self.logger = logger
+
+    @property
+    def client(self):
+        # 延迟导入，未安装 tushare 时不影响其他功能
+        if self._client is None:
+            from tushare_init import TushareCacheClient
+            self._client = TushareCacheClient(self.config_path)
+        return self._client
+
+    def list_benchmarks(self) -> List[Dict[str, Any]]:
+        """可选的基准指数列表（来自本地 index_basic，只读取一次）"""
+        if self.indices is None:
+            df = self.client.index_basic()
+            self.indices = df[["ts_code", "name", "market"]].fillna("").to_dict("records")
+        return self.indices
+
+    def get_closes(self, ts_code: str, start_date, end_date) -> pd.Series:
+        """
+        获取指数在区间内的收盘价序列（DatetimeIndex）
+
+        Args:
+            ts_code: 指数代码，如 000300.SH
+            start_date: 开始日期
+            end_date: 结束日期
+        """
+        start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+        with self.lock:
+            entry = self.cache.get(ts_code)
+            # 结束日晚于最后一根K线时，只在刚读取过的一段时间内视为命中
+            if entry and entry[0] <= start and (
+                    end <= entry[1] or time.monotonic() - entry[3] < self.refresh_seconds):
+                self.cache.move_to_end(ts_code)
+                return entry[2].loc[start:end]
+
+        # 未命中：与已缓存区间合并后多取一段，再放回缓存
+        load_start = start - pd.Timedelta(days=BENCHMARK_PREFETCH_DAYS)
+        load_end = min(end + pd.Timedelta(days=BENCHMARK_PREFETCH_DAYS), pd.Timestamp.today().normalize())
+        if entry:
+            load_start, load_end = min(load_start, entry[0]), max(load_end, entry[1])
+        load_end = max(load_end, end)
+        df = self.client.index_daily(
+            ts_code=ts_code, start_date=load_start.strftime("%Y%m%d"), end_date=load_end.strftime("%Y%m%d")
+        )
+        if df is None or df.empty:
+            raise ValueError(f"基准指数 {ts_code} 在 {start.date()} 至 {end.date()} 无行情数据")
+        closes = pd.Series(
+            pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype=float),
+            index=pd.to_datetime(df["trade_date"].astype(str)),
+        ).sort_index()
+        closes = closes[~closes.index.duplicated(keep="last")]
+        with self.lock:
+            # 覆盖区间只到实际返回的最后一根K线，而非请求的结束日
+            self.cache[ts_code] = (load_start, closes.index[-1], closes, time.monotonic())
+            self.cache.move_to_end(ts_code)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        self.logger.info(f"基准指数 {ts_code} 已缓存 {len(closes)} 条收盘价")
+        return closes.loc[start:end]
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_benchmark_provider() -> BenchmarkProvider:
+    """进程内共享的基准缓存"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = BenchmarkProvider()
+        return _provider
+
+
+def compute_benchmark_analytics(
+    equity_curve: List[float],
+    dates: List[str],
+    closes: pd.Series,
+    risk_free_rate: float = RISK_FREE_RATE,
+) -> Dict[str, Any]:
+    """
+    计算相对基准的分析结果
+
+    Args:
+        equity_curve: 策略资金曲线
+        dates: 与资金曲线逐点对应的日期
+        closes: 基准收盘价（DatetimeIndex）
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        {'alpha','beta','tracking_error','information_ratio','excess_return','benchmark_return',
+         'benchmark_equity': 基准换算到初始资金的曲线, 'excess_equity': 超额资金曲线}
+    """
+    equity = np.asarray(equity_curve, dtype=np.float64)
+    index = pd.DatetimeIndex(pd.to_datetime(dates))
+    # 停牌/缺失日沿用前值，首点之前无数据时用首个有效值
+    aligned = closes.reindex(closes.index.union(index)).ffill().reindex(index).bfill().to_numpy(dtype=np.float64)
+    if len(aligned) != len(equity) or not np.isfinite(aligned).all():
+        raise ValueError("基准行情无法与资金曲线对齐")
+
+    strategy_returns = np.diff(equity) / equity[:-1]
+    bench_returns = np.diff(aligned) / aligned[:-1]
+    stats = {k: float(v[0]) for k, v in benchmark_metrics(strategy_returns, bench_returns, risk_free_rate).items()}
+
+    benchmark_equity = equity[0] * aligned / aligned[0]
+    stats["benchmark_return"] = float(aligned[-1] / aligned[0] - 1)
+    stats["benchmark_equity"] = benchmark_equity.tolist()
+    stats["excess_equity"] = (equity[0] * equity / benchmark_equity).tolist()
+    return stats
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测热点路径基准测试
+- 使用 synthetic_data 生成可复现的合成行情面板，完全离线运行（不连接数据库）
+- 计时对象：各内置策略的 generate_signals、simulate_trading、calculate_performance_metrics、
+  批量 compute_metrics、kernels 中的路径依赖内核（单只股票十年序列的单次耗时，微秒），
+  全市场规模（约 5000 只股票 × 5 年）的横截面组合回测及该面板向工作进程的分发（逐任务 pickle 与共享内存），
+  以及 TechnicalIndicatorCalculator 的各个 calculate_* 方法
+- 结果输出为 JSON，可用 --compare 与之前提交的结果对比
+
+用法:
+    python benchmark_suite.py --stocks 20 --days 2500 --repeat 3 --output bench.json
+    python benchmark_suite.py --compare bench_before.json
+"""
+
+import argparse
+import inspect
+import json
+import logging
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import generate_ohlcv, iter_stock_frames
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 被测模块的逐条 INFO 日志会干扰计时
+QUIET_LOGGERS = (
+    "strategy_engine", "backtest_engine", "portfolio_engine", "panel_broker", "index_calculate", "trading_calendar"
+)
+
+SUITE_VERSION = 1
+# 规则策略基准使用的条件（价格高于5日均线1%买入、RSI超买卖出）
+RULE_CONDITIONS = [
+    {"indicator_id": "MA5", "condition_type": "greater", "threshold_min": 1.01, "signal_action": "buy", "condition_order": 1},
+    {"indicator_id": "RSI", "condition_type": "greater", "threshold_min": 70, "signal_action": "sell", "condition_order": 2},
+]
+# 内核基准使用的单只股票序列长度（约十年交易日）
+KERNEL_DAYS = 2520
+# 组合回测基准的面板规模（全市场约 5000 只股票 × 5 年交易日）
+PORTFOLIO_STOCKS = 5000
+PORTFOLIO_DAYS = 1250
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _jit_enabled() -> bool:
+    import kernels
+    return kernels.JIT_ENABLED
+
+
+def time_call(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """重复执行 func，返回耗时统计（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+    }
+
+
+class BenchmarkSuite:
+    """基准测试集合"""
+
+    def __init__(self, n_stocks: int = 10, n_days: int = 2500, repeat: int = 3, seed: int = 0):
+        """
+        Args:
+            n_stocks: 合成股票数量
+            n_days: 每只股票的交易日数量
+            repeat: 每项重复次数（取中位数）
+            seed: 随机种子
+        """
+        self.n_stocks = n_stocks
+        self.n_days = n_days
+        self.repeat = repeat
+        self.seed = seed
+        self.results: List[Dict[str, Any]] = []
+        self.logger = logger
+
+        self.panel = generate_ohlcv(n_stocks, n_days, seed=seed)
+        self.frames = list(iter_stock_frames(self.panel))
+        # 回测引擎标注资金曲线日期时使用内存日历，不访问数据库
+        dates = pd.DatetimeIndex(self.panel["trade_date"].unique())
+        set_trading_calendar(pd.bdate_range(end=dates[0], periods=5).append(dates))
+
+    def record(self, name: str, func: Callable[[], Any], rows: int, calls: int = 1):
+        stats = time_call(func, self.repeat)
+        stats.update({"name": name, "rows": rows, "rows_per_s": rows / stats["median_s"] if stats["median_s"] else None})
+        if calls > 1:
+            stats["per_call_us"] = stats["median_s"] / calls * 1e6
+            self.logger.info(f"{name}: 单次 {stats['per_call_us']:.1f} us（{rows // calls} 行）")
+        else:
+            self.logger.info(f"{name}: 中位数 {stats['median_s'] * 1000:.1f} ms（{rows} 行）")
+        self.results.append(stats)
+
+    def bench_strategies(self):
+        from strategy_engine import StrategyEngine
+
+        engine = StrategyEngine()
+        for name in engine.strategies:
+            kwargs = {"conditions": RULE_CONDITIONS} if name == "rule_based" else {}
+            strategy = engine.create_strategy(name, **kwargs)
+            self.record(
+                f"strategy.{name}.generate_signals",
+                lambda s=strategy: [s.generate_signals(f) for f in self.frames],
+                len(self.panel),
+            )
+
+    def bench_backtest(self):
+        from backtest_engine import BacktestEngine
+        from performance_metrics import compute_metrics
+
+        engine = BacktestEngine()
+        strategy = engine.strategy_engine.create_strategy("moving_average")
+        signals = [strategy.generate_signals(f) for f in self.frames]
+        self.record(
+            "backtest.simulate_trading",
+            lambda: [engine.simulate_trading(s) for s in signals],
+            len(self.panel),
+        )
+
+        results = [engine.simulate_trading(s) for s in signals]
+        self.record(
+            "backtest.calculate_performance_metrics",
+            lambda: [
+                engine.calculate_performance_metrics(r.equity_curve, r.daily_returns, r.initial_capital)
+                for r in results
+            ],
+            sum(len(r.equity_curve) for r in results),
+        )
+
+        length = min(len(r.equity_curve) for r in results)
+        equity = np.array([r.equity_curve[:length] for r in results])
+        batch = np.repeat(equity, max(1, 1000 // len(results)), axis=0)
+        self.record("metrics.compute_metrics_batch", lambda: compute_metrics(batch), batch.size)
+
+    def bench_kernels(self):
+        import kernels
+
+        rng = np.random.default_rng(self.seed)
+        close = 10 * np.cumprod(1 + rng.normal(0, 0.02, KERNEL_DAYS))
+        signal = rng.choice([0, 1, -1], size=KERNEL_DAYS, p=[0.9, 0.06, 0.04]).astype(np.int64)
+        record_return = np.arange(KERNEL_DAYS) > 0
+        calls = 200
+        # 先各调用一次，JIT 编译不计入耗时
+        kernels.carry_positions(signal, 20)
+        kernels.simulate_cash(close, signal, record_return, 100000.0, 0.001)
+        kernels.resolve_exits(close, signal, 0.05, 0.2, 0.1, 60)
+        self.record(
+            "kernel.carry_positions",
+            lambda: [kernels.carry_positions(signal, 20) for _ in range(calls)],
+            KERNEL_DAYS * calls, calls,
+        )
+        self.record(
+            "kernel.simulate_cash",
+            lambda: [kernels.simulate_cash(close, signal, record_return, 100000.0, 0.001) for _ in range(calls)],
+            KERNEL_DAYS * calls, calls,
+        )
+        self.record(
+            "kernel.resolve_exits",
+            lambda: [kernels.resolve_exits(close, signal, 0.05, 0.2, 0.1, 60) for _ in range(calls)],
+            KERNEL_DAYS * calls, calls,
+        )
+
+    def bench_portfolio(self):
+        from portfolio_engine import PORTFOLIO_STRATEGIES, MarketPanel, PortfolioEngine
+
+        rng = np.random.default_rng(self.seed)
+        dates = pd.bdate_range(end=self.panel["trade_date"].max(), periods=PORTFOLIO_DAYS)
+        close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (PORTFOLIO_DAYS, PORTFOLIO_STOCKS)), axis=0)
+        shape = close.shape
+        panel = MarketPanel(dates.values, np.array([f"{i:06d}.SZ" for i in range(PORTFOLIO_STOCKS)], dtype=object), {
+            "close_price": close,
+            "market_cap": close * rng.uniform(1e7, 1e9, PORTFOLIO_STOCKS),
+            "pb_ratio": rng.uniform(0.3, 5, shape),
+            "total_assets": np.full(shape, 100.0),
+            "total_liability": rng.uniform(10, 90, shape),
+            "total_current_assets": rng.uniform(10, 90, shape),
+            "total_current_liability": rng.uniform(10, 60, shape),
+        })
+        set_trading_calendar(pd.bdate_range(end=dates[0], periods=5).append(dates))
+        engine = PortfolioEngine()
+        for strategy_id in PORTFOLIO_STRATEGIES:
+            self.record(
+                f"portfolio.{strategy_id}",
+                lambda s=strategy_id: engine.run(s, str(dates[0].date()), str(dates[-1].date()), panel=panel),
+                panel.fields["close_price"].size,
+            )
+        # 向工作进程分发面板：逐任务 pickle 整个面板，与放入共享内存后只传描述符、按描述符挂载
+        self.record(
+            "panel.pickle_roundtrip",
+            lambda: pickle.loads(pickle.dumps(panel, protocol=pickle.HIGHEST_PROTOCOL)),
+            panel.fields["close_price"].size,
+        )
+        from panel_broker import PanelBroker
+
+        with PanelBroker() as broker:
+            self.record(
+                "panel.shared_memory_publish",
+                lambda: self._publish_panel(broker, panel),
+                panel.fields["close_price"].size,
+            )
+            broker.publish("bench", panel)
+            self.record(
+                "panel.shared_memory_attach",
+                lambda: self._attach_panel(broker.acquire("bench"), broker),
+                panel.fields["close_price"].size,
+            )
+        # 恢复其他基准使用的内存日历
+        panel_dates = pd.DatetimeIndex(self.panel["trade_date"].unique())
+        set_trading_calendar(pd.bdate_range(end=panel_dates[0], periods=5).append(panel_dates))
+
+    @staticmethod
+    def _publish_panel(broker, panel):
+        """一次性开销：复制到共享内存并回收"""
+        broker.publish("bench", panel)
+        broker.release("bench")
+
+    @staticmethod
+    def _attach_panel(descriptor, broker):
+        """单个任务的开销：描述符序列化、挂载与解除挂载"""
+        from panel_broker import attach_panel, detach_panel
+
+        attach_panel(pickle.loads(pickle.dumps(descriptor)))
+        detach_panel(descriptor)
+        broker.release("bench")
+
+    def bench_indicators(self):
+        try:
+            from index_calculate import TechnicalIndicatorCalculator
+        except ImportError as e:
+            # index_calculate 依赖 matplotlib，缺失时跳过指标部分
+            self.logger.warning(f"跳过技术指标基准测试: {e}")
+            return
+        calculator = TechnicalIndicatorCalculator()
+        for name, method in inspect.getmembers(calculator, inspect.ismethod):
+            if not name.startswith("calculate_"):
+                continue
+            self.record(
+                f"indicator.{name}",
+                lambda m=method: [m(f) for f in self.frames],
+                len(self.panel),
+            )
+
+    def run(self) -> Dict[str, Any]:
+        """运行全部基准测试并返回结果"""
+        previous = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        try:
+            self.bench_strategies()
+            self.bench_backtest()
+            self.bench_kernels()
+            self.bench_portfolio()
+            self.bench_indicators()
+        finally:
+            for name, level in previous.items():
+                logging.getLogger(name).setLevel(level)
+        return {
+            "suite_version": SUITE_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "jit": _jit_enabled(),
+                "platform": platform.platform(),
+            },
+            "config": {"stocks": self.n_stocks, "days": self.n_days, "repeat": self.repeat, "seed": self.seed},
+            "results": self.results,
+        }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按名称对比两次结果，ratio < 1 表示变快"""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        if r["name"] in base and base[r["name"]]["median_s"]:
+            rows.append({
+                "name": r["name"],
+                "baseline_s": base[r["name"]]["median_s"],
+                "current_s": r["median_s"],
+                "ratio": r["median_s"] / base[r["name"]]["median_s"],
+            })
+    return rows
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="回测热点路径基准测试（离线）")
+    parser.add_argument("--stocks", type=int, default=10, help="合成股票数量")
+    parser.add_argument("--days", type=int, default=2500, help="每只股票的交易日数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果输出文件")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args()
+
+    report = BenchmarkSuite(args.stocks, args.days, args.repeat, args.seed).run()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"基准测试结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        data_keys = ("stocks", "days", "seed")
+        if any(baseline.get("config", {}).get(k) != report["config"][k] for k in data_keys):
+            logger.warning(f"对比文件的配置不同: {baseline.get('config')}")
+        for row in compare_results(report, baseline):
+            logger.info(
+                f"{row['name']}: {row['baseline_s'] * 1000:.1f} ms -> {row['current_s'] * 1000:.1f} ms "
+                f"(x{row['ratio']:.2f})"
+            )
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
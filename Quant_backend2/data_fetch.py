@@ -15,6 +15,8 @@ import logging
 import traceback
 from typing import List, Dict, Any, Optional, Tuple
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 # 配置日志
@@ -32,6 +34,39 @@ DB_DEFAULTS = {
     "charset": "utf8mb4",
 }
 
+# Tushare 接口默认调用频率上限（次/分钟），按账号积分调整
+TUSHARE_CALLS_PER_MINUTE = 200
+# 并发拉取线程数
+FETCH_WORKERS = 4
+# 流水线批量写入：累计到该行数即写入一次
+INSERT_BATCH_ROWS = 20000
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器，多个拉取线程共享同一个频率上限"""
+
+    def __init__(self, calls_per_minute: int = TUSHARE_CALLS_PER_MINUTE, burst: int = 1):
+        self.interval = 60.0 / max(1, calls_per_minute)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) / self.interval
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
 
 class StockDataManager:
     """股票数据管理类"""
@@ -42,6 +77,7 @@ class StockDataManager:
         tushare_token: str,
         start_date: str,
         end_date: str,
+        calls_per_minute: int = TUSHARE_CALLS_PER_MINUTE,
     ):
         """
         初始化股票数据管理器
@@ -51,6 +87,7 @@ class StockDataManager:
             tushare_token: Tushare API令牌
             start_date: 回测开始日期 (YYYY-MM-DD)
             end_date: 回测结束日期 (YYYY-MM-DD)
+            calls_per_minute: Tushare 接口调用频率上限（次/分钟）
         """
         self.db_password = db_password
         self.connection = None
@@ -66,6 +103,7 @@ class StockDataManager:
         # 初始化Tushare
         ts.set_token(tushare_token)
         self.pro = ts.pro_api()
+        self.rate_limiter = RateLimiter(calls_per_minute)
         self.logger = logger
 
         # 交易日历缓存
@@ -465,10 +503,36 @@ class StockDataManager:
             self.logger.error(f"获取股票基本信息失败: {e}")
             return 0
 
-    def get_historical_stock_valuation(self) -> int:
+    def get_existing_valuation_dates(self) -> set:
+        """获取回测期间 StockValuation 中已存在的交易日（YYYYMMDD）"""
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "SELECT DISTINCT trade_date FROM StockValuation WHERE trade_date BETWEEN %s AND %s",
+                (self.start_date, self.end_date),
+            )
+            return {row[0].strftime("%Y%m%d") for row in cursor.fetchall()}
+        except Exception as e:
+            self.logger.error(f"查询已有估值数据日期失败: {e}")
+            return set()
+        finally:
+            if cursor:
+                cursor.close()
+
+    def get_historical_stock_valuation(
+        self, max_workers: int = FETCH_WORKERS, skip_existing: bool = True
+    ) -> int:
         """
         获取回测期间每个交易日的股票估值数据
 
+        已存在于 StockValuation 的交易日直接跳过；其余交易日由线程池在限速器约束下并发拉取，
+        主线程边接收边按批写入数据库（数据库连接只在主线程使用）。
+
+        Args:
+            max_workers: 并发拉取线程数
+            skip_existing: 是否跳过库中已有数据的交易日
+
         Returns:
             插入/更新的记录数
         """
@@ -485,19 +549,87 @@ class StockDataManager:
             )
             return 0
 
-        total_records = 0
-        # 为每个交易日获取估值数据
-        for trade_date in trade_dates:
-            self.logger.info(f"获取 {trade_date} 的估值数据...")
-            records = self.get_stock_valuation(trade_date)
-            total_records += records
+        if skip_existing:
+            existing = self.get_existing_valuation_dates()
+            trade_dates = [d for d in trade_dates if d not in existing]
+            self.logger.info(
+                f"已有 {len(existing)} 个交易日的估值数据，需拉取 {len(trade_dates)} 个交易日"
+            )
+            if not trade_dates:
+                return 0
 
-            # 添加API调用延迟，避免超过频率限制
-            time.sleep(1)
+        total_records = 0
+        pending = []
+        pending_rows = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.fetch_stock_valuation, d): d for d in trade_dates
+            }
+            for future in as_completed(futures):
+                trade_date = futures[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    self.logger.error(f"获取 {trade_date} 的估值数据失败: {e}")
+                    continue
+                if df.empty:
+                    continue
+                pending.append(df)
+                pending_rows += len(df)
+                if pending_rows >= INSERT_BATCH_ROWS:
+                    total_records += self.insert_data(
+                        pd.concat(pending, ignore_index=True), "StockValuation"
+                    )
+                    pending, pending_rows = [], 0
+        if pending:
+            total_records += self.insert_data(
+                pd.concat(pending, ignore_index=True), "StockValuation"
+            )
 
         self.logger.info(f"成功获取并存储了 {total_records} 条历史估值数据")
         return total_records
 
+    def fetch_stock_valuation(self, trade_date) -> pd.DataFrame:
+        """
+        从 Tushare 拉取特定日期的股票估值数据并整理为 StockValuation 表结构（不写库，可在线程中调用）
+
+        Args:
+            trade_date: 交易日期，格式YYYYMMDD
+
+        Returns:
+            估值数据DataFrame，无数据时为空
+        """
+        self.rate_limiter.acquire()
+        df = self.pro.daily_basic(
+            trade_date=trade_date,
+            fields="ts_code,trade_date,pe,pb,ps,total_mv,circ_mv,turnover_rate",
+        )
+
+        if df is None or df.empty:
+            self.logger.warning(f"未获取到{trade_date}的股票估值数据")
+            return pd.DataFrame()
+
+        # 重命名列
+        df = df.rename(
+            columns={
+                "ts_code": "stock_code",
+                "pe": "pe_ratio",
+                "pb": "pb_ratio",
+                "ps": "ps_ratio",
+                "total_mv": "market_cap",
+                "circ_mv": "circulating_market_cap",
+                "turnover_rate": "turnover_ratio",
+            }
+        )
+
+        # 转换日期格式
+        df["trade_date"] = pd.to_datetime(df["trade_date"]).dt.date
+
+        # 添加数据源和采集时间
+        df["data_source"] = "tushare"
+        df["collect_time"] = datetime.now()
+        return df
+
     def get_stock_valuation(self, trade_date) -> int:
         """
         获取特定日期的股票估值数据
@@ -510,110 +642,184 @@ class StockDataManager:
         """
         try:
             self.logger.info(f"获取{trade_date}的股票估值数据...")
-            df = self.pro.daily_basic(
-                trade_date=trade_date,
-                fields="ts_code,trade_date,pe,pb,ps,total_mv,circ_mv,turnover_rate",
-            )
-
+            df = self.fetch_stock_valuation(trade_date)
             if df.empty:
-                self.logger.warning(f"未获取到{trade_date}的股票估值数据")
                 return 0
 
-            # 重命名列
-            df = df.rename(
-                columns={
-                    "ts_code": "stock_code",
-                    "pe": "pe_ratio",
-                    "pb": "pb_ratio",
-                    "ps": "ps_ratio",
-                    "total_mv": "market_cap",
-                    "circ_mv": "circulating_market_cap",
-                    "turnover_rate": "turnover_ratio",
-                }
-            )
-
-            # 转换日期格式
-            df["trade_date"] = pd.to_datetime(df["trade_date"]).dt.date
-
-            # 添加数据源和采集时间
-            df["data_source"] = "tushare"
-            df["collect_time"] = datetime.now()
-
             # 插入数据库
             return self.insert_data(df, "StockValuation")
         except Exception as e:
             self.logger.error(f"获取股票估值数据失败: {e}")
             return 0
 
-    def get_balance_sheet(self, period=None) -> int:
-        """获取资产负债表数据"""
-        if not period:
-            # 默认获取最近的季度数据
-            today = datetime.now()
-            year = today.year
-            month = today.month
-            if month < 4:
-                period = f"{year-1}1231"
-            elif month < 7:
-                period = f"{year}0331"
-            elif month < 10:
-                period = f"{year}0630"
-            else:
-                period = f"{year}0930"
+    @staticmethod
+    def get_latest_report_period() -> str:
+        """默认获取最近的季度报告期"""
+        today = datetime.now()
+        year = today.year
+        month = today.month
+        if month < 4:
+            return f"{year-1}1231"
+        elif month < 7:
+            return f"{year}0331"
+        elif month < 10:
+            return f"{year}0630"
+        return f"{year}0930"
+
+    @staticmethod
+    def list_report_periods(start_period: str, end_period: str) -> List[str]:
+        """列出区间内的所有季度报告期（YYYYMMDD，含两端）"""
+        start = start_period.replace("-", "")
+        end = end_period.replace("-", "")
+        return [
+            f"{year}{quarter_end}"
+            for year in range(int(start[:4]), int(end[:4]) + 1)
+            for quarter_end in ("0331", "0630", "0930", "1231")
+            if start <= f"{year}{quarter_end}" <= end
+        ]
 
-        try:
-            self.logger.info(f"获取{period}的资产负债表数据...")
-            df = self.pro.balancesheet_vip(
-                period=period,
-                fields="ts_code,ann_date,f_ann_date,end_date,report_type,comp_type,total_assets,total_liab,total_cur_assets,total_cur_liab,fixed_assets,monetary_cap,total_hldr_eqy_inc_min_int",
-            )
+    @staticmethod
+    def key_report_versions(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        同一 (股票, 报告期) 的原始版本与更正/修订版本都保留，各自以实际公告日期 f_ann_date 作为公告日期：
+        时点查询在修订公告之前返回原始数值，之后返回修订数值，避免回测前视偏差。
+        同一公告日期的多条记录按 update_flag 排序后保留更新标记为 1 的那条（即更正后的合并报表）
+        """
+        if "f_ann_date" not in df.columns:
+            return df
+        df = df.copy()
+        df["f_ann_date"] = df["f_ann_date"].fillna(df["ann_date"])
+        sort_cols = ["ts_code", "end_date", "f_ann_date"]
+        if "update_flag" in df.columns:
+            df["update_flag"] = df["update_flag"].fillna("0").astype(str)
+            sort_cols.append("update_flag")
+        df = df.sort_values(sort_cols, kind="mergesort")
+        df = df.drop_duplicates(["ts_code", "end_date", "f_ann_date"], keep="last")
+        df["ann_date"] = df["f_ann_date"]
+        return df
+
+    def fetch_balance_sheet(self, period: str) -> pd.DataFrame:
+        """拉取某一报告期的资产负债表并整理为 BalanceSheet 表结构（不写库，可在线程中调用）"""
+        self.rate_limiter.acquire()
+        df = self.pro.balancesheet_vip(
+            period=period,
+            fields="ts_code,ann_date,f_ann_date,end_date,report_type,comp_type,update_flag,total_assets,total_liab,total_cur_assets,total_cur_liab,fixed_assets,monetary_cap,total_hldr_eqy_inc_min_int",
+        )
 
-            if df.empty:
-                self.logger.warning(f"未获取到{period}的资产负债表数据")
-                return 0
+        if df is None or df.empty:
+            self.logger.warning(f"未获取到{period}的资产负债表数据")
+            return pd.DataFrame()
 
-            # 重命名列
-            df = df.rename(
-                columns={
-                    "ts_code": "stock_code",
-                    "end_date": "report_period",
-                    "ann_date": "announcement_date",
-                    "total_liab": "total_liability",
-                    "total_cur_assets": "total_current_assets",
-                    "total_cur_liab": "total_current_liability",
-                    "monetary_cap": "cash_equivalents",
-                    "total_hldr_eqy_inc_min_int": "total_equity",
-                }
-            )
+        df = self.key_report_versions(df)
 
-            # 转换日期格式
-            df["report_period"] = pd.to_datetime(df["report_period"]).dt.date
-            df["announcement_date"] = pd.to_datetime(df["announcement_date"]).dt.date
+        # 重命名列
+        df = df.rename(
+            columns={
+                "ts_code": "stock_code",
+                "end_date": "report_period",
+                "ann_date": "announcement_date",
+                "total_liab": "total_liability",
+                "total_cur_assets": "total_current_assets",
+                "total_cur_liab": "total_current_liability",
+                "monetary_cap": "cash_equivalents",
+                "total_hldr_eqy_inc_min_int": "total_equity",
+            }
+        )
 
-            # 选择需要的列
-            cols = [
-                "stock_code",
-                "report_period",
-                "announcement_date",
-                "total_assets",
-                "total_liability",
-                "total_current_assets",
-                "total_current_liability",
-                "fixed_assets",
-                "cash_equivalents",
-                "total_equity",
-            ]
+        # 转换日期格式
+        df["report_period"] = pd.to_datetime(df["report_period"]).dt.date
+        df["announcement_date"] = pd.to_datetime(df["announcement_date"]).dt.date
 
-            # 确保所有列都存在
-            for col in cols:
-                if col not in df.columns:
-                    df[col] = None
+        # 选择需要的列
+        cols = [
+            "stock_code",
+            "report_period",
+            "announcement_date",
+            "total_assets",
+            "total_liability",
+            "total_current_assets",
+            "total_current_liability",
+            "fixed_assets",
+            "cash_equivalents",
+            "total_equity",
+        ]
 
-            df = df[cols]
+        # 确保所有列都存在
+        for col in cols:
+            if col not in df.columns:
+                df[col] = None
 
-            # 添加数据源和采集时间
-            df["data_source"] = "tushare"
-            df["collect_time"] = datetime.now()
+        df = df[cols]
+
+        # 添加数据源和采集时间
+        df["data_source"] = "tushare"
+        df["collect_time"] = datetime.now()
+        return df
+
+    def fetch_income_statement(self, period: str) -> pd.DataFrame:
+        """拉取某一报告期的利润表并整理为 IncomeStatement 表结构（不写库，可在线程中调用）"""
+        self.rate_limiter.acquire()
+        df = self.pro.income_vip(
+            period=period,
+            fields="ts_code,ann_date,f_ann_date,end_date,report_type,comp_type,update_flag,total_revenue,operate_profit,total_profit,n_income,basic_eps",
+        )
+
+        if df is None or df.empty:
+            self.logger.warning(f"未获取到{period}的利润表数据")
+            return pd.DataFrame()
+
+        df = self.key_report_versions(df)
+
+        # 重命名列
+        df = df.rename(
+            columns={
+                "ts_code": "stock_code",
+                "end_date": "report_period",
+                "ann_date": "announcement_date",
+                "operate_profit": "operating_profit",
+                "n_income": "net_profit",
+                "basic_eps": "eps_basic",
+            }
+        )
+
+        # 转换日期格式
+        df["report_period"] = pd.to_datetime(df["report_period"]).dt.date
+        df["announcement_date"] = pd.to_datetime(df["announcement_date"]).dt.date
+
+        # 选择需要的列
+        cols = [
+            "stock_code",
+            "report_period",
+            "announcement_date",
+            "total_revenue",
+            "operating_profit",
+            "total_profit",
+            "net_profit",
+            "eps_basic",
+        ]
+
+        # 确保所有列都存在
+        for col in cols:
+            if col not in df.columns:
+                df[col] = None
+
+        df = df[cols]
+
+        # 添加数据源和采集时间
+        df["data_source"] = "tushare"
+        df["collect_time"] = datetime.now()
+        return df
+
+    def get_balance_sheet(self, period=None) -> int:
+        """获取资产负债表数据"""
+        if not period:
+            period = self.get_latest_report_period()
+
+        try:
+            self.logger.info(f"获取{period}的资产负债表数据...")
+            df = self.fetch_balance_sheet(period)
+            if df.empty:
+                return 0
 
             # 插入数据库
             return self.insert_data(df, "BalanceSheet")
@@ -625,73 +831,84 @@ class StockDataManager:
         """获取利润表数据"""
         if not period:
             # 默认获取最近的季度数据，与资产负债表相同
-            today = datetime.now()
-            year = today.year
-            month = today.month
-            if month < 4:
-                period = f"{year-1}1231"
-            elif month < 7:
-                period = f"{year}0331"
-            elif month < 10:
-                period = f"{year}0630"
-            else:
-                period = f"{year}0930"
+            period = self.get_latest_report_period()
 
         try:
             self.logger.info(f"获取{period}的利润表数据...")
-            df = self.pro.income_vip(
-                period=period,
-                fields="ts_code,ann_date,f_ann_date,end_date,report_type,comp_type,total_revenue,operate_profit,total_profit,n_income,basic_eps",
-            )
-
+            df = self.fetch_income_statement(period)
             if df.empty:
-                self.logger.warning(f"未获取到{period}的利润表数据")
                 return 0
 
-            # 重命名列
-            df = df.rename(
-                columns={
-                    "ts_code": "stock_code",
-                    "end_date": "report_period",
-                    "ann_date": "announcement_date",
-                    "operate_profit": "operating_profit",
-                    "n_income": "net_profit",
-                    "basic_eps": "eps_basic",
-                }
-            )
+            # 插入数据库
+            return self.insert_data(df, "IncomeStatement")
+        except Exception as e:
+            self.logger.error(f"获取利润表数据失败: {e}")
+            return 0
 
-            # 转换日期格式
-            df["report_period"] = pd.to_datetime(df["report_period"]).dt.date
-            df["announcement_date"] = pd.to_datetime(df["announcement_date"]).dt.date
+    def backfill_financial_statements(
+        self,
+        start_period: str,
+        end_period: str = None,
+        max_workers: int = FETCH_WORKERS,
+    ) -> Dict[str, int]:
+        """
+        批量回补多个报告期的资产负债表与利润表
 
-            # 选择需要的列
-            cols = [
-                "stock_code",
-                "report_period",
-                "announcement_date",
-                "total_revenue",
-                "operating_profit",
-                "total_profit",
-                "net_profit",
-                "eps_basic",
-            ]
+        各 (报表, 报告期) 在限速器约束下并发拉取，原始与修订版本按各自的公告日期分别保存，
+        主线程按表累计后批量写入（已存在的记录被更新）。
 
-            # 确保所有列都存在
-            for col in cols:
-                if col not in df.columns:
-                    df[col] = None
+        Args:
+            start_period: 起始报告期 (YYYYMMDD 或 YYYY-MM-DD)
+            end_period: 结束报告期，为None时取最近的季度报告期
+            max_workers: 并发拉取线程数
 
-            df = df[cols]
+        Returns:
+            {表名: 插入/更新的记录数}
+        """
+        end_period = end_period or self.get_latest_report_period()
+        periods = self.list_report_periods(start_period, end_period)
+        self.logger.info(
+            f"回补 {len(periods)} 个报告期的财务报表: {periods[0] if periods else '-'} ~ {periods[-1] if periods else '-'}"
+        )
 
-            # 添加数据源和采集时间
-            df["data_source"] = "tushare"
-            df["collect_time"] = datetime.now()
+        fetchers = {
+            "BalanceSheet": self.fetch_balance_sheet,
+            "IncomeStatement": self.fetch_income_statement,
+        }
+        totals = {table: 0 for table in fetchers}
+        pending = {table: [] for table in fetchers}
+        pending_rows = {table: 0 for table in fetchers}
+
+        def flush(table):
+            if pending[table]:
+                df = pd.concat(pending[table], ignore_index=True)
+                totals[table] += self.insert_data(df, table)
+                pending[table], pending_rows[table] = [], 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch, period): (table, period)
+                for table, fetch in fetchers.items()
+                for period in periods
+            }
+            for future in as_completed(futures):
+                table, period = futures[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    self.logger.error(f"获取{period}的{table}数据失败: {e}")
+                    continue
+                if df.empty:
+                    continue
+                pending[table].append(df)
+                pending_rows[table] += len(df)
+                if pending_rows[table] >= INSERT_BATCH_ROWS:
+                    flush(table)
+        for table in fetchers:
+            flush(table)
 
-            # 插入数据库
-            return self.insert_data(df, "IncomeStatement")
-        except Exception as e:
-            self.logger.error(f"获取利润表数据失败: {e}")
-            return 0
+        self.logger.info(f"财务报表回补完成: {totals}")
+        return totals
 
     def get_index_component(self, index_code="000300.SH") -> int:
         """获取指数成分股数据"""
@@ -942,6 +1159,16 @@ def main():
     parser.add_argument(
         "--config", type=str, default="config.json", help="配置文件路径"
     )
+    parser.add_argument(
+        "--scan-signals",
+        action="store_true",
+        help="行情入库后对结束日期运行全市场信号扫描，结果写入 TradingSignal",
+    )
+    parser.add_argument(
+        "--financial-history",
+        action="store_true",
+        help="回补开始日期前一年至今的全部季度财务报表（默认只获取最近一个季度）",
+    )
 
     args = parser.parse_args()
 
@@ -1000,9 +1227,15 @@ def main():
         # 2. 获取回测期间的估值数据（为每个交易日获取）
         stock_manager.get_historical_stock_valuation()
 
-        # 3. 获取最近季度的财务数据
-        stock_manager.get_balance_sheet()
-        stock_manager.get_income_statement()
+        # 3. 获取财务数据（默认最近季度，--financial-history 时回补历史报告期）
+        if args.financial_history:
+            history_start = (
+                datetime.strptime(args.start, "%Y-%m-%d") - timedelta(days=365)
+            ).strftime("%Y%m%d")
+            stock_manager.backfill_financial_statements(history_start)
+        else:
+            stock_manager.get_balance_sheet()
+            stock_manager.get_income_statement()
 
         # 4. 准备股票市场数据
         results = stock_manager.prepare_backtest_data(stock_codes=stock_codes)
@@ -1011,6 +1244,13 @@ def main():
             f"回测数据准备完成 - 成功处理{results['processed_stocks']}/{results['total_stocks']}只股票"
         )
 
+        # 5. 行情入库后扫描结束日期的策略信号
+        if args.scan_signals:
+            from signal_scanner import SignalScanner
+
+            summary = SignalScanner(config["db_password"]).run(args.end)
+            logger.info(f"信号扫描完成 - {summary['trade_date']} 共{summary['signals']}条信号")
+
         # 根据模式显示不同的完成信息
         if args.index:
             logger.info(f"指数 {args.index} 的成分股数据准备完成，可以进行回测了")
@@ -1043,6 +1283,8 @@ def show_usage():
    --stock        : 准备单只股票的回测数据（必须提供--stock或--index）
    --index        : 使用指定指数的成分股，例如：000300.SH (沪深300)
    --config       : 配置文件路径，默认为config.json
+   --financial-history : 回补开始日期前一年至今的季度财务报表
+   --scan-signals : 数据入库后扫描结束日期的策略信号并写入 TradingSignal
    --help         : 显示帮助信息
 
 ⚠️ 注意事项:
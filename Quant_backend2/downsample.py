@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+资金曲线降采样模块
+- lttb_indices：Largest-Triangle-Three-Buckets，保留曲线形状的降采样
+- minmax_indices：每个分桶保留最小值与最大值，保证回撤极值不丢失
+- build_tiers：预先计算若干档 LTTB 降采样下标，随回测报告一起存储
+降采样结果均为原序列的下标数组，日期与数值按下标取出即可保持对应
+"""
+
+from typing import Dict, Iterable
+
+import numpy as np
+
+# 保存报告时预计算的降采样档位（点数）
+DOWNSAMPLE_TIERS = (200, 500, 1000)
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+# 请求点数的上下限
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+
+def _bucket_edges(length: int, buckets: int) -> np.ndarray:
+    """将 [1, length-1) 区间均分为 buckets 个桶，返回 buckets+1 个边界"""
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(values, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样
+
+    Args:
+        values: 等间距的数值序列（横轴取下标）
+        threshold: 目标点数（含首尾两点）
+
+    Returns:
+        升序的下标数组（int64）
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n, dtype=np.int64)
+
+    edges = _bucket_edges(n, threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # 下一个桶的均值点作为三角形的第三个顶点
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x = (next_lo + next_hi - 1) / 2.0
+        avg_y = y[next_lo:next_hi].mean()
+
+        xs = np.arange(lo, hi, dtype=np.float64)
+        areas = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(values, threshold: int) -> np.ndarray:
+    """
+    每个分桶保留最小值与最大值所在下标（按时间顺序），首尾两点始终保留
+
+    Args:
+        values: 数值序列
+        threshold: 目标点数上限（含首尾两点）
+
+    Returns:
+        升序的下标数组（int64）
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < MIN_POINTS + 1:
+        return np.arange(n, dtype=np.int64)
+
+    edges = _bucket_edges(n, (threshold - 2) // 2)
+    picked = [0]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        bucket = y[lo:hi]
+        i_min, i_max = lo + int(np.argmin(bucket)), lo + int(np.argmax(bucket))
+        picked.extend(sorted({i_min, i_max}))
+    picked.append(n - 1)
+    return np.unique(np.asarray(picked, dtype=np.int64))
+
+
+def downsample_indices(values, points: int, method: str = "lttb") -> np.ndarray:
+    """
+    按指定方法计算降采样下标
+
+    Args:
+        values: 数值序列
+        points: 目标点数
+        method: 'lttb' 或 'minmax'
+
+    Returns:
+        升序的下标数组
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    if method == "minmax":
+        return minmax_indices(values, points)
+    return lttb_indices(values, points)
+
+
+def build_tiers(values, tiers: Iterable[int] = DOWNSAMPLE_TIERS) -> Dict[int, np.ndarray]:
+    """
+    预计算各档位的 LTTB 降采样下标，只保留小于原序列长度的档位
+
+    Returns:
+        {点数: int32 下标数组}
+    """
+    n = len(values)
+    return {int(t): lttb_indices(values, t).astype(np.int32) for t in tiers if MIN_POINTS <= t < n}
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+财务数据时点（point-in-time）索引模块
+- PointInTimeFundamentals：一次性读取 BalanceSheet / IncomeStatement，按 (股票, 公告日期) 建立有序索引，
+  之后通过 np.searchsorted 查询“截至某日已公告的最新报告期”数据，
+  回测读取基本面时既无前视偏差，也不需要逐行的 MAX(report_period) 子查询
+- 支持截面（as_of）、单只股票时间序列（align）与 日期×股票 面板（panel）三种查询
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from market_data_reader import SQL_CODE_BATCH
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 可读取的财务报表及其数值列
+STATEMENT_FIELDS = {
+    "BalanceSheet": [
+        "total_assets",
+        "total_liability",
+        "total_current_assets",
+        "total_current_liability",
+        "fixed_assets",
+        "cash_equivalents",
+        "total_equity",
+    ],
+    "IncomeStatement": [
+        "total_revenue",
+        "operating_profit",
+        "total_profit",
+        "net_profit",
+        "eps_basic",
+    ],
+}
+
+# 复合键中股票序号的倍数（需大于任意日期的天数序号）
+_KEY_STRIDE = np.int64(1 << 20)
+
+
+def _to_days(values) -> np.ndarray:
+    """日期转换为自 1970-01-01 起的天数（int64）"""
+    return np.asarray(pd.to_datetime(values).values.astype("datetime64[D]"), dtype=np.int64)
+
+
+class PointInTimeFundamentals:
+    """财务数据时点索引：按公告日期查询每只股票当时已知的最新报告期"""
+
+    def __init__(self, db_password: str = None):
+        """
+        Args:
+            db_password: 数据库密码，如果为None则使用默认密码
+        """
+        self.db_password = db_password if db_password is not None else DB_DEFAULTS.get("password", "")
+        self.logger = logger
+        self.fields: List[str] = []
+        self.stock_codes = np.array([], dtype=object)
+        self._keys = np.array([], dtype=np.int64)
+        self._report_period = np.array([], dtype="datetime64[D]")
+        self._announcement_date = np.array([], dtype="datetime64[D]")
+        self._values = np.empty((0, 0))
+
+    def load(
+        self,
+        table: str = "BalanceSheet",
+        fields: Optional[List[str]] = None,
+        stock_codes: Optional[List[str]] = None,
+        end_date: Optional[str] = None,
+    ) -> "PointInTimeFundamentals":
+        """
+        从数据库读取财务报表并建立时点索引
+
+        Args:
+            table: BalanceSheet 或 IncomeStatement
+            fields: 数值列，默认为该表全部数值列
+            stock_codes: 股票代码列表，为None时读取全部股票
+            end_date: 只读取该日期（含）之前公告的数据
+
+        Returns:
+            self
+        """
+        if table not in STATEMENT_FIELDS:
+            raise ValueError(f"不支持的财务报表: {table}")
+        fields = fields or STATEMENT_FIELDS[table]
+        unknown = [f for f in fields if f not in STATEMENT_FIELDS[table]]
+        if unknown:
+            raise ValueError(f"{table} 不包含列: {unknown}")
+
+        # 股票代码分批放入 IN 列表，避免全市场代码拼成一条超长 SQL
+        code_batches = (
+            [stock_codes[i : i + SQL_CODE_BATCH] for i in range(0, len(stock_codes), SQL_CODE_BATCH)]
+            if stock_codes
+            else [None]
+        )
+
+        conv = pymysql.converters.conversions.copy()
+        conv[pymysql.FIELD_TYPE.DECIMAL] = float
+        conv[pymysql.FIELD_TYPE.NEWDECIMAL] = float
+        connection = pymysql.connect(
+            host=DB_DEFAULTS["host"],
+            port=DB_DEFAULTS["port"],
+            user=DB_DEFAULTS["user"],
+            password=self.db_password,
+            database=DB_DEFAULTS["database"],
+            charset=DB_DEFAULTS["charset"],
+            conv=conv,
+        )
+        rows = []
+        try:
+            cursor = connection.cursor()
+            for batch in code_batches:
+                sql = f"SELECT stock_code, report_period, announcement_date, {', '.join(fields)} FROM {table} WHERE 1=1"
+                params = []
+                if batch:
+                    sql += f" AND stock_code IN ({','.join(['%s'] * len(batch))})"
+                    params.extend(batch)
+                if end_date:
+                    sql += " AND announcement_date <= %s"
+                    params.append(end_date)
+                cursor.execute(sql, params)
+                rows.extend(cursor.fetchall())
+            cursor.close()
+        finally:
+            connection.close()
+
+        df = pd.DataFrame(rows, columns=["stock_code", "report_period", "announcement_date"] + fields)
+        self.logger.info(f"读取{table}共{len(df)}条记录，建立时点索引")
+        return self.build(df, fields)
+
+    def build(self, df: pd.DataFrame, fields: List[str]) -> "PointInTimeFundamentals":
+        """
+        由报表 DataFrame 建立时点索引（load 内部使用，也可直接传入已读取的数据）
+
+        同一股票按公告日期排序后，只保留报告期创新高的记录：
+        晚于新报告期公告的旧报告期（如延迟披露的年报）不会覆盖已知的更新数据；
+        同一报告期的修订版本（公告日期更晚）从其公告日起替换原始版本。
+        """
+        self.fields = list(fields)
+        if df.empty:
+            self.stock_codes = np.array([], dtype=object)
+            self._keys = np.array([], dtype=np.int64)
+            self._report_period = np.array([], dtype="datetime64[D]")
+            self._announcement_date = np.array([], dtype="datetime64[D]")
+            self._values = np.empty((0, len(self.fields)))
+            return self
+
+        df = df.sort_values(["stock_code", "announcement_date", "report_period"], kind="mergesort")
+        codes, stock_idx = np.unique(df["stock_code"].to_numpy(dtype=object), return_inverse=True)
+        ann = _to_days(df["announcement_date"])
+        period = _to_days(df["report_period"])
+
+        # 每只股票内报告期的累计最大值（加上股票偏移后整体累计即可分段），只保留创新高的记录
+        offset = stock_idx.astype(np.int64) * _KEY_STRIDE
+        running_max = np.maximum.accumulate(period + offset) - offset
+        keep = period >= running_max
+
+        # 同一公告日多条记录时保留最后一条（报告期最新）
+        keys = stock_idx[keep].astype(np.int64) * _KEY_STRIDE + ann[keep]
+        last_of_key = np.r_[keys[1:] != keys[:-1], True]
+
+        self.stock_codes = codes
+        self._keys = keys[last_of_key]
+        self._report_period = period[keep][last_of_key].astype("datetime64[D]")
+        self._announcement_date = ann[keep][last_of_key].astype("datetime64[D]")
+        self._values = df[self.fields].to_numpy(dtype=np.float64)[keep][last_of_key]
+        return self
+
+    def _lookup(self, stock_idx: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """返回每个 (股票序号, 日期) 对应的记录位置，无已知数据时为 -1"""
+        if len(self._keys) == 0:
+            return np.full(len(days), -1)
+        query = stock_idx.astype(np.int64) * _KEY_STRIDE + days
+        pos = np.searchsorted(self._keys, query, side="right") - 1
+        valid = pos >= 0
+        valid[valid] = (self._keys[pos[valid]] // _KEY_STRIDE) == stock_idx[valid]
+        return np.where(valid, pos, -1)
+
+    def _stock_index(self, codes: np.ndarray) -> np.ndarray:
+        """股票代码转为序号，未索引的股票为 -1"""
+        if len(self.stock_codes) == 0:
+            return np.full(len(codes), -1)
+        idx = np.minimum(np.searchsorted(self.stock_codes, codes), len(self.stock_codes) - 1)
+        return np.where(self.stock_codes[idx] == codes, idx, -1)
+
+    def _frame(self, pos: np.ndarray) -> Dict[str, np.ndarray]:
+        """按记录位置取出报告期、公告日期与数值列，位置为 -1 的行填充 NaT/NaN"""
+        found = pos >= 0
+        columns = {
+            "report_period": np.full(len(pos), np.datetime64("NaT"), dtype="datetime64[D]"),
+            "announcement_date": np.full(len(pos), np.datetime64("NaT"), dtype="datetime64[D]"),
+        }
+        columns["report_period"][found] = self._report_period[pos[found]]
+        columns["announcement_date"][found] = self._announcement_date[pos[found]]
+        for i, field in enumerate(self.fields):
+            values = np.full(len(pos), np.nan)
+            values[found] = self._values[pos[found], i]
+            columns[field] = values
+        return columns
+
+    def as_of(self, date, stock_codes: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        截面查询：截至 date（含）每只股票已公告的最新报告期数据
+
+        Args:
+            date: 查询日期
+            stock_codes: 股票代码列表，为None时返回全部已索引股票
+
+        Returns:
+            DataFrame，每只股票一行；没有已知数据的股票数值列为 NaN
+        """
+        codes = self.stock_codes if stock_codes is None else np.asarray(stock_codes, dtype=object)
+        stock_idx = self._stock_index(codes)
+        day = _to_days([date])[0]
+        pos = self._lookup(stock_idx, np.full(len(codes), day, dtype=np.int64))
+        pos = np.where(stock_idx >= 0, pos, -1)
+        return pd.DataFrame({"stock_code": codes, **self._frame(pos)})
+
+    def align(self, stock_code: str, trade_dates) -> pd.DataFrame:
+        """
+        时间序列对齐：为单只股票的每个交易日给出当时已知的最新报告期数据（用于回测逐日读取）
+
+        Args:
+            stock_code: 股票代码
+            trade_dates: 交易日序列
+
+        Returns:
+            DataFrame，行与 trade_dates 一一对应
+        """
+        dates = _to_days(trade_dates)
+        idx = self._stock_index(np.asarray([stock_code], dtype=object))[0]
+        if idx < 0:
+            pos = np.full(len(dates), -1)
+        else:
+            pos = self._lookup(np.full(len(dates), idx, dtype=np.int64), dates)
+        frame = pd.DataFrame(self._frame(pos))
+        frame.insert(0, "trade_date", pd.to_datetime(dates.astype("datetime64[D]")))
+        return frame
+
+    def panel(self, dates, stock_codes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        面板查询：一次性给出每个 (日期, 股票) 截至当日已公告的最新报告期数据（用于横截面选股）
+
+        Args:
+            dates: 日期序列（面板的行）
+            stock_codes: 股票代码列表（面板的列）
+
+        Returns:
+            {数值列: 形状为 (日期数, 股票数) 的 float64 数组}，没有已知数据的位置为 NaN
+        """
+        days = _to_days(dates)
+        codes = np.asarray(stock_codes, dtype=object)
+        stock_idx = np.tile(self._stock_index(codes), len(days))
+        pos = self._lookup(stock_idx, np.repeat(days, len(codes)))
+        values = self._frame(np.where(stock_idx >= 0, pos, -1))
+        return {field: values[field].reshape(len(days), len(codes)) for field in self.fields}
@@ -12,6 +12,8 @@ import logging
 import os
 from typing import List, Dict, Any, Optional, Tuple
 
+from market_data_reader import ChunkedMarketDataReader, DEFAULT_CHUNK_ROWS
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -155,6 +157,57 @@ class TechnicalIndicatorCalculator:
             self.logger.error(f"获取股票估值数据失败: {e}")
             return pd.DataFrame()
     
+    def iter_stock_market_data(self, start_date: str, end_date: str, stock_codes: Optional[List[str]] = None,
+                               chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """
+        分块流式获取多只股票（默认全市场）的行情数据
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            stock_codes: 股票代码列表，None则读取全市场
+            chunk_rows: 每个分块的目标行数，同一只股票的数据不会跨分块
+        
+        Returns:
+            DataFrame分块迭代器，列与get_stock_market_data一致
+        """
+        reader = ChunkedMarketDataReader(self.db_password)
+        return reader.iter_chunks(start_date, end_date, stock_codes=stock_codes,
+                                  by='stock', chunk_rows=chunk_rows)
+    
+    def iter_panel_indicators(self, start_date: str, end_date: str, stock_codes: Optional[List[str]] = None,
+                              indicators: List[str] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """
+        全市场面板指标计算：逐分块、逐股票计算指标并按分块产出，内存占用只与分块大小有关
+        
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            stock_codes: 股票代码列表，None则计算全市场
+            indicators: 要计算的指标列表（ma/rsi/macd/bollinger/kdj），None则计算所有指标
+            chunk_rows: 每个分块的目标行数
+        
+        Returns:
+            带指标列的DataFrame分块迭代器
+        """
+        calculators = {
+            'ma': self.calculate_moving_average,
+            'rsi': self.calculate_rsi,
+            'macd': self.calculate_macd,
+            'bollinger': self.calculate_bollinger_bands,
+            'kdj': self.calculate_kdj,
+        }
+        selected = [calculators[name] for name in (indicators or list(calculators)) if name in calculators]
+        for chunk in self.iter_stock_market_data(start_date, end_date, stock_codes, chunk_rows):
+            results = []
+            for _, group in chunk.groupby('stock_code', sort=False):
+                group = group.reset_index(drop=True)
+                for calculate in selected:
+                    group = calculate(group)
+                results.append(group)
+            if results:
+                yield pd.concat(results, ignore_index=True)
+    
     def calculate_moving_average(self, df: pd.DataFrame, periods: List[int] = [5, 10, 20, 60]) -> pd.DataFrame:
         """
         计算移动平均线
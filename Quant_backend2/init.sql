@@ -107,9 +107,11 @@ CREATE TABLE BalanceSheet (
     data_source VARCHAR(20) NOT NULL,
     collect_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
-    PRIMARY KEY (stock_code, report_period),
+    -- 原始与更正/修订版本按各自的公告日期分别保存
+    PRIMARY KEY (stock_code, report_period, announcement_date),
     INDEX idx_stock_code (stock_code),
-    INDEX idx_report_period (report_period)
+    INDEX idx_report_period (report_period),
+    INDEX idx_stock_announcement (stock_code, announcement_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='资产负债表';
 
 -- 4. 利润表
@@ -125,9 +127,11 @@ CREATE TABLE IncomeStatement (
     data_source VARCHAR(20) NOT NULL,
     collect_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
-    PRIMARY KEY (stock_code, report_period),
+    -- 原始与更正/修订版本按各自的公告日期分别保存
+    PRIMARY KEY (stock_code, report_period, announcement_date),
     INDEX idx_stock_code (stock_code),
-    INDEX idx_report_period (report_period)
+    INDEX idx_report_period (report_period),
+    INDEX idx_stock_announcement (stock_code, announcement_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='利润表';
 
 -- 5. 指数成分股表
@@ -245,6 +249,7 @@ CREATE TABLE TradingSignal (
     PRIMARY KEY (signal_id),
     INDEX idx_user_generate_time (user_id, generate_time),
     INDEX idx_stock_trade_date (stock_code, trade_date),
+    INDEX idx_trade_date_strategy (trade_date, strategy_id),
     INDEX idx_strategy_id (strategy_id),
     
     CONSTRAINT fk_signal_user FOREIGN KEY (user_id) REFERENCES User(user_id),
@@ -282,6 +287,7 @@ CREATE TABLE BacktestReport (
     PRIMARY KEY (report_id),
     INDEX idx_strategy_generate_time (strategy_id, report_generate_time),
     INDEX idx_user_id (user_id),
+    INDEX idx_user_generate_time (user_id, report_generate_time, report_id),
     INDEX idx_stock_code (stock_code),
     INDEX idx_backtest_type (backtest_type),
     
@@ -297,6 +303,16 @@ CREATE TABLE BacktestReport (
     CONSTRAINT chk_component_count CHECK (component_count IS NULL OR component_count > 0)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='回测报告表';
 
+-- 回测报告列式数据表：资金曲线、日期偏移与交易记录以二进制负载存储
+CREATE TABLE BacktestReportData (
+    report_id VARCHAR(50) NOT NULL,
+    payload LONGBLOB NOT NULL COMMENT '列式二进制负载（report_storage 编码）',
+    create_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    PRIMARY KEY (report_id),
+    CONSTRAINT fk_report_data_report FOREIGN KEY (report_id) REFERENCES BacktestReport(report_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='回测报告列式数据表';
+
 -- =============================================
 -- 8. 创建系统日志表
 -- =============================================
@@ -454,6 +470,22 @@ INSERT INTO SystemLog (log_id, operator_id, operator_role, operation_type, opera
 VALUES (CONCAT('LOG_', UNIX_TIMESTAMP(), '_', FLOOR(RAND() * 1000)), 'admin_001', 'admin', 'data_sync', '数据库初始化完成', 'success');
 
 
+-- =============================================
+-- 13. Tushare 本地缓存库（tushare_init.TushareCacheClient）
+-- =============================================
+
+CREATE DATABASE IF NOT EXISTS tushare_cache DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- 缺口登记表：记录 Tushare 明确没有数据的 (表, 股票, 交易日)，主要是停牌日，之后的缺口检测视为已齐全
+CREATE TABLE IF NOT EXISTS tushare_cache.daily_gap (
+    table_name VARCHAR(20) NOT NULL,
+    ts_code VARCHAR(20) NOT NULL,
+    trade_date VARCHAR(8) NOT NULL,
+
+    PRIMARY KEY (table_name, ts_code, trade_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Tushare日线缓存缺口登记表';
+
+
 -- =============================================
 -- 初始化完成提示
 -- =============================================
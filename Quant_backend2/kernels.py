@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测路径依赖计算内核
+- carry_positions：策略持仓状态延续（买入置 1、卖出置 0、其余沿用前一日）
+- simulate_cash：simulate_trading 的资金与持仓记账
+- resolve_exits：止损/止盈/移动止损/最长持仓的逐笔离场（与 simulate_cash 共用买入判断，资金不足未成交的买入不开仓）
+- 安装了 numba 时自动使用 JIT 编译的逐元素循环；否则使用纯 NumPy / Python 实现，
+  两者输出逐位一致（同样的浮点运算顺序）。设置环境变量 QUANT_DISABLE_JIT=1 可强制使用后者
+"""
+
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+JIT_ENABLED = NUMBA_AVAILABLE and os.environ.get("QUANT_DISABLE_JIT", "") not in ("1", "true")
+
+# 离场原因编码，与 risk_rules.EXIT_REASONS 的顺序一致（下标 + 1），0 表示非离场K线
+EXIT_SIGNAL = 1
+EXIT_STOP_LOSS = 2
+EXIT_TRAILING_STOP = 3
+EXIT_TAKE_PROFIT = 4
+EXIT_MAX_HOLDING = 5
+# 纯 NumPy 离场查找的首个扫描块长度，之后每块翻倍
+SCAN_BLOCK = 64
+# 模拟交易买入时保留的现金比例
+CASH_RESERVE = 0.95
+
+
+def _jit(func):
+    return njit(cache=True)(func) if JIT_ENABLED else func
+
+
+# ---------------------------------------------------------------------------
+# 持仓延续
+# ---------------------------------------------------------------------------
+
+def _carry_positions_loop(signal, start):
+    n = len(signal)
+    position = np.zeros(n, dtype=np.int64)
+    for i in range(start, n):
+        if signal[i] == 1:
+            position[i] = 1
+        elif signal[i] == -1:
+            position[i] = 0
+        else:
+            position[i] = position[i - 1]
+    return position
+
+
+def _carry_positions_numpy(signal, start):
+    n = len(signal)
+    marks = np.where(signal == 1, 1, np.where(signal == -1, 0, -1)).astype(np.int64)
+    marks[:start] = 0
+    # 前向填充：每个位置取最近一次有标记的下标
+    last = np.maximum.accumulate(np.where(marks >= 0, np.arange(n), 0)) if n else np.zeros(0, dtype=np.int64)
+    position = marks[last]
+    position[position < 0] = 0
+    return position
+
+
+_carry_positions_jit = _jit(_carry_positions_loop)
+
+
+def carry_positions(signal: np.ndarray, start: int) -> np.ndarray:
+    """
+    按信号延续持仓状态（与各内置策略原来的逐行循环一致）
+
+    Args:
+        signal: 信号数组（1 买入，-1 卖出，0 无）
+        start: 开始生效的下标，之前的持仓为 0
+
+    Returns:
+        int64 持仓状态数组
+    """
+    signal = np.ascontiguousarray(signal, dtype=np.int64)
+    start = min(max(int(start), 0), len(signal))
+    if JIT_ENABLED:
+        return _carry_positions_jit(signal, start)
+    return _carry_positions_numpy(signal, start)
+
+
+# ---------------------------------------------------------------------------
+# 资金记账
+# ---------------------------------------------------------------------------
+
+def _buy_order(capital, price, commission_rate):
+    """全仓买入（保留 5% 现金）的股数、手续费与总成本，资金不足以买入时股数为 0"""
+    shares = int(capital * CASH_RESERVE / price)
+    if shares > 0:
+        commission = shares * price * commission_rate
+        total_cost = shares * price + commission
+        if total_cost <= capital:
+            return shares, commission, total_cost
+    return 0, 0.0, 0.0
+
+
+# 记账与离场内核共用同一买入判断（JIT 时编译后供两者调用）
+_buy_order = _jit(_buy_order)
+
+
+def _simulate_cash_loop(close, signal, record_return, initial_capital, commission_rate,
+                        equity, position_values, daily_returns, trade_index, trade_action,
+                        trade_price, trade_shares, trade_commission, trade_return, trade_capital):
+    n = len(close)
+    capital = initial_capital
+    position = 0
+    entry_price = 0.0
+    equity[0] = initial_capital
+    position_values[0] = 0.0
+    daily_returns[0] = 0.0
+    n_returns = 1
+    k = 0
+    for i in range(n):
+        price = close[i]
+        current_value = capital + position * price
+        equity[i + 1] = current_value
+        position_values[i + 1] = position * price
+        if record_return[i]:
+            daily_returns[n_returns] = (current_value - equity[i]) / equity[i]
+            n_returns += 1
+
+        if signal[i] == 1 and position == 0:
+            shares, commission, total_cost = _buy_order(capital, price, commission_rate)
+            if shares > 0:
+                position = shares
+                capital -= total_cost
+                entry_price = price
+                trade_index[k] = i
+                trade_action[k] = 1
+                trade_price[k] = price
+                trade_shares[k] = shares
+                trade_commission[k] = commission
+                trade_return[k] = np.nan
+                trade_capital[k] = capital
+                k += 1
+        elif signal[i] == -1 and position > 0:
+            proceeds = position * price
+            commission = proceeds * commission_rate
+            capital += proceeds - commission
+            trade_index[k] = i
+            trade_action[k] = -1
+            trade_price[k] = price
+            trade_shares[k] = position
+            trade_commission[k] = commission
+            trade_return[k] = (price - entry_price) / entry_price
+            trade_capital[k] = capital
+            k += 1
+            position = 0
+            entry_price = 0.0
+
+    # 最后一天仍有持仓时按收盘价卖出（不计入资金曲线）
+    if position > 0:
+        price = close[n - 1]
+        proceeds = position * price
+        commission = proceeds * commission_rate
+        capital += proceeds - commission
+        trade_index[k] = n - 1
+        trade_action[k] = -1
+        trade_price[k] = price
+        trade_shares[k] = position
+        trade_commission[k] = commission
+        trade_return[k] = (price - entry_price) / entry_price
+        trade_capital[k] = capital
+        k += 1
+    return capital, n_returns, k
+
+
+_simulate_cash_jit = _jit(_simulate_cash_loop)
+
+# simulate_cash 的输出列（顺序与 _simulate_cash_loop 的输出参数一致）
+_LEDGER_COLUMNS = {
+    "equity": np.float64,
+    "position_values": np.float64,
+    "daily_returns": np.float64,
+    "trade_index": np.int64,
+    "trade_action": np.int8,
+    "trade_price": np.float64,
+    "trade_shares": np.int64,
+    "trade_commission": np.float64,
+    "trade_return": np.float64,
+    "trade_capital": np.float64,
+}
+
+
+def simulate_cash(close: np.ndarray, signal: np.ndarray, record_return: np.ndarray,
+                  initial_capital: float, commission_rate: float) -> Dict[str, np.ndarray]:
+    """
+    全仓买入（保留 5% 现金）、信号卖出的资金记账
+
+    Args:
+        close: 收盘价
+        signal: 信号（1 买入，-1 卖出）
+        record_return: 各K线是否记录日收益率（与原实现按行标签 > 0 判断保持一致）
+        initial_capital: 初始资金
+        commission_rate: 手续费率
+
+    Returns:
+        {'final_capital', 'equity', 'position_values', 'daily_returns',
+         'trade_index', 'trade_action', 'trade_price', 'trade_shares',
+         'trade_commission', 'trade_return', 'trade_capital'}，
+        资金曲线比K线多一个初始点；买入记录的 trade_return 为 NaN
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = np.ascontiguousarray(signal, dtype=np.int64)
+    record_return = np.ascontiguousarray(record_return, dtype=np.bool_)
+    n = len(close)
+    if JIT_ENABLED:
+        buffers = [np.empty(n + 1, dtype=dtype) for dtype in _LEDGER_COLUMNS.values()]
+        capital, n_returns, k = _simulate_cash_jit(
+            close, signal, record_return, float(initial_capital), float(commission_rate), *buffers)
+    else:
+        # 纯 Python 循环在 Python 列表与标量上比逐个读写 NumPy 元素快得多，运算结果一致
+        buffers = [[0] * (n + 1) for _ in _LEDGER_COLUMNS]
+        capital, n_returns, k = _simulate_cash_loop(
+            close.tolist(), signal.tolist(), record_return.tolist(),
+            float(initial_capital), float(commission_rate), *buffers)
+    out = {}
+    for (name, dtype), buffer in zip(_LEDGER_COLUMNS.items(), buffers):
+        length = k if name.startswith("trade_") else n_returns if name == "daily_returns" else n + 1
+        out[name] = np.asarray(buffer[:length], dtype=dtype)
+    out["final_capital"] = capital
+    return out
+
+
+# ---------------------------------------------------------------------------
+# 风控离场
+# ---------------------------------------------------------------------------
+
+def _resolve_exits_loop(close, signal, stop_loss, take_profit, trailing_stop, max_holding_days,
+                        initial_capital, commission_rate, out, reasons):
+    n = len(close)
+    holding = False
+    entry = 0
+    entry_price = 0.0
+    peak = 0.0
+    capital = initial_capital
+    shares = 0
+    for i in range(n):
+        if not holding:
+            if signal[i] == 1:
+                if initial_capital > 0:
+                    # 与 simulate_cash 相同：资金不足以买入的信号不开仓
+                    shares, commission, total_cost = _buy_order(capital, close[i], commission_rate)
+                    if shares == 0:
+                        continue
+                    capital -= total_cost
+                holding = True
+                entry = i
+                entry_price = close[i]
+                peak = close[i]
+            continue
+        if close[i] > peak:
+            peak = close[i]
+        reason = 0
+        if stop_loss > 0 and close[i] <= entry_price * (1 - stop_loss):
+            reason = EXIT_STOP_LOSS
+        elif trailing_stop > 0 and close[i] <= peak * (1 - trailing_stop):
+            reason = EXIT_TRAILING_STOP
+        elif take_profit > 0 and close[i] >= entry_price * (1 + take_profit):
+            reason = EXIT_TAKE_PROFIT
+        elif max_holding_days > 0 and i - entry >= max_holding_days:
+            reason = EXIT_MAX_HOLDING
+        if reason > 0:
+            out[i] = -1
+            reasons[i] = reason
+            holding = False
+        elif signal[i] == -1:
+            reasons[i] = EXIT_SIGNAL
+            holding = False
+        if not holding and initial_capital > 0:
+            proceeds = shares * close[i]
+            capital += proceeds - proceeds * commission_rate
+
+
+_resolve_exits_jit = _jit(_resolve_exits_loop)
+
+
+def _first_true(mask: np.ndarray) -> int:
+    """首个 True 的下标，没有时返回 -1"""
+    if len(mask) == 0:
+        return -1
+    index = int(mask.argmax())
+    return index if mask[index] else -1
+
+
+def _find_risk_exit(close, entry, stop, stop_loss, take_profit, trailing_stop, max_holding_days) -> Tuple[int, int]:
+    """
+    在 (entry, stop] 区间内按块递增扫描首个触发风控规则的K线
+
+    Returns:
+        (下标, 离场原因编码)，未触发时为 (-1, 0)
+    """
+    entry_price = close[entry]
+    peak = entry_price
+    lo = entry + 1
+    block = SCAN_BLOCK
+    if max_holding_days > 0:
+        stop = min(stop, entry + max_holding_days)
+    while lo <= stop:
+        hi = min(lo + block, stop + 1)
+        window = close[lo:hi]
+        found = []
+        if stop_loss > 0:
+            found.append((_first_true(window <= entry_price * (1 - stop_loss)), EXIT_STOP_LOSS))
+        if trailing_stop > 0:
+            running_peak = np.maximum(np.maximum.accumulate(window), peak)
+            found.append((_first_true(window <= running_peak * (1 - trailing_stop)), EXIT_TRAILING_STOP))
+            peak = running_peak[-1]
+        if take_profit > 0:
+            found.append((_first_true(window >= entry_price * (1 + take_profit)), EXIT_TAKE_PROFIT))
+        found = [hit for hit in found if hit[0] >= 0]
+        if found:
+            offset, reason = min(found)
+            return lo + offset, reason
+        lo = hi
+        block *= 2
+    if max_holding_days > 0 and entry + max_holding_days < len(close) and entry + max_holding_days == stop:
+        return stop, EXIT_MAX_HOLDING
+    return -1, 0
+
+
+def _resolve_exits_numpy(close, signal, stop_loss, take_profit, trailing_stop, max_holding_days,
+                         initial_capital, commission_rate, out, reasons):
+    """逐笔交易（而非逐根K线）处理，每笔交易用向量化的累计最大值与首次命中搜索确定离场"""
+    buys = np.flatnonzero(signal == 1)
+    sells = np.flatnonzero(signal == -1)
+    last = len(close) - 1
+    enabled = stop_loss > 0 or take_profit > 0 or trailing_stop > 0 or max_holding_days > 0
+    capital = initial_capital
+    shares = 0
+
+    position = 0
+    while True:
+        k = np.searchsorted(buys, position)
+        if initial_capital > 0:
+            # 空仓期间资金不变，跳过资金不足以买入的信号（与 simulate_cash 相同的判断）
+            while k < len(buys):
+                shares, commission, total_cost = _buy_order(capital, close[buys[k]], commission_rate)
+                if shares > 0:
+                    capital -= total_cost
+                    break
+                k += 1
+        if k == len(buys):
+            break
+        entry = int(buys[k])
+        j = np.searchsorted(sells, entry, side="right")
+        signal_exit = int(sells[j]) if j < len(sells) else -1
+
+        exit_index, reason = -1, 0
+        if enabled:
+            exit_index, reason = _find_risk_exit(
+                close, entry, signal_exit if signal_exit >= 0 else last,
+                stop_loss, take_profit, trailing_stop, max_holding_days)
+        if exit_index >= 0:
+            # 入场到离场之间的买入信号在持仓期内本就不生效，离场K线改为卖出
+            out[exit_index] = -1
+            reasons[exit_index] = reason
+        elif signal_exit >= 0:
+            exit_index = signal_exit
+            reasons[exit_index] = EXIT_SIGNAL
+        else:
+            break
+        if initial_capital > 0:
+            proceeds = shares * close[exit_index]
+            capital += proceeds - proceeds * commission_rate
+        position = exit_index + 1
+
+
+def resolve_exits(close: np.ndarray, signal: np.ndarray, stop_loss: float = 0.0, take_profit: float = 0.0,
+                  trailing_stop: float = 0.0, max_holding_days: int = 0, initial_capital: float = 0.0,
+                  commission_rate: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按 simulate_trading 的持仓语义（空仓时 1 买入，持仓时 -1 卖出）确定每笔交易的离场K线，
+    同一根K线多条规则同时触发时依次取止损、移动止损、止盈、最长持仓
+
+    Args:
+        close: 收盘价
+        signal: 策略信号
+        stop_loss / take_profit / trailing_stop: 比例阈值，0 表示不启用
+        max_holding_days: 最长持仓K线数，0 表示不启用
+        initial_capital / commission_rate: 与 simulate_cash 相同的资金与手续费率，
+            用于跳过资金不足而不会成交的买入信号；initial_capital 为 0 时每个买入信号都视为开仓
+
+    Returns:
+        (调整后的 int64 信号, int8 离场原因编码)
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = np.ascontiguousarray(signal, dtype=np.int64)
+    out = signal.copy()
+    reasons = np.zeros(len(close), dtype=np.int8)
+    args = (float(stop_loss), float(take_profit), float(trailing_stop), int(max_holding_days),
+            float(initial_capital), float(commission_rate), out, reasons)
+    if JIT_ENABLED:
+        _resolve_exits_jit(close, signal, *args)
+    else:
+        _resolve_exits_numpy(close, signal, *args)
+    return out, reasons
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+接口压测工具
+- 在本地 MySQL 中建立独立的压测库（默认 quantitative_trading_loadtest），按 init.sql 建表并写入合成股票池
+- 使用 app.py 中的 Flask 应用并注册 strategy_api 路由，压测时所有模块的数据库配置指向压测库
+- 多线程并发发送带 JWT 的请求，统计每个接口的 p50/p95/p99 延迟、吞吐量与错误数，结果输出为 JSON
+
+用法:
+    python load_test.py --seed --stocks 50 --days 750
+    python load_test.py --requests 200 --concurrency 8 --output load_test_results.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pymysql
+
+from synthetic_data import generate_ohlcv, generate_stock_codes
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+PRODUCTION_DATABASE = "quantitative_trading"
+LOADTEST_DATABASE = "quantitative_trading_loadtest"
+LOADTEST_USER = {"user_id": "user_loadtest", "account": "loadtest", "password": "loadtest123", "role": "analyst"}
+INSERT_BATCH_ROWS = 5000
+
+# init.sql 之后的结构补丁（与 add_missing_columns.sql、add_strategy_params_column.py、
+# modify_strategy_table.py 等脚本一致），使压测库与线上结构相同
+SCHEMA_PATCHES = [
+    "ALTER TABLE User ADD COLUMN login_attempts INT DEFAULT 0, "
+    "ADD COLUMN locked_until DATETIME NULL, ADD COLUMN last_failed_login DATETIME NULL",
+    "ALTER TABLE BacktestReport ADD COLUMN equity_curve_data LONGTEXT NULL, "
+    "ADD COLUMN trade_records LONGTEXT NULL, ADD COLUMN strategy_params LONGTEXT NULL",
+    "ALTER TABLE Strategy ADD COLUMN strategy_code LONGTEXT NULL, ADD COLUMN strategy_params LONGTEXT NULL",
+]
+
+
+def split_sql_script(text: str) -> List[str]:
+    """把 SQL 脚本拆分为语句，支持 DELIMITER 切换（存储过程）"""
+    statements, buffer, delimiter = [], [], ";"
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not buffer and (not stripped or stripped.startswith("--")):
+            continue
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = "\n".join(buffer).rstrip()[: -len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+    if "\n".join(buffer).strip():
+        statements.append("\n".join(buffer).strip())
+    return statements
+
+
+def seed_database(
+    database: str = LOADTEST_DATABASE,
+    db_password: str = "123456",
+    n_stocks: int = 50,
+    n_days: int = 750,
+    seed: int = 0,
+    schema_path: str = "init.sql",
+):
+    """
+    重建压测库并写入合成数据
+
+    Args:
+        database: 压测库名（不允许为线上库）
+        db_password: MySQL root 密码
+        n_stocks: 合成股票数量
+        n_days: 每只股票的交易日数量
+        seed: 随机种子
+        schema_path: 建表脚本
+    """
+    if database == PRODUCTION_DATABASE:
+        raise ValueError("压测库不能使用线上库名")
+    with open(schema_path, "r", encoding="utf-8") as f:
+        script = re.sub(rf"\b{PRODUCTION_DATABASE}\b", database, f.read())
+
+    connection = pymysql.connect(host="localhost", port=3306, user="root", password=db_password,
+                                 charset="utf8mb4", autocommit=True)
+    try:
+        with connection.cursor() as cursor:
+            for statement in split_sql_script(script) + SCHEMA_PATCHES:
+                cursor.execute(statement)
+
+            from app import hash_password
+            cursor.execute(
+                "INSERT INTO User (user_id, user_account, user_password, user_role, user_status) "
+                "VALUES (%s, %s, %s, %s, 'active')",
+                (LOADTEST_USER["user_id"], LOADTEST_USER["account"],
+                 hash_password(LOADTEST_USER["password"]), LOADTEST_USER["role"]),
+            )
+
+            codes = generate_stock_codes(n_stocks)
+            panel = generate_ohlcv(n_stocks, n_days, seed=seed, stock_codes=codes)
+            industries = ["银行", "医药", "电子", "食品饮料", "汽车"]
+            cursor.executemany(
+                "INSERT INTO StockBasic (stock_code, stock_name, area, industry, market, list_status, "
+                "list_date, data_source) VALUES (%s, %s, %s, %s, %s, 'L', %s, 'synthetic')",
+                [(c, f"合成股票{i:04d}", "合成", industries[i % len(industries)],
+                  "主板", panel["trade_date"].min().date()) for i, c in enumerate(codes)],
+            )
+
+            dates = sorted(panel["trade_date"].unique())
+            cursor.executemany(
+                "INSERT INTO TradingCalendar (exchange, cal_date, is_open, data_source) VALUES ('SSE', %s, 1, 'synthetic')",
+                [(str(d)[:10],) for d in dates],
+            )
+
+            columns = list(panel.columns)
+            insert_sql = (
+                f"INSERT INTO StockMarketData ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+            )
+            panel["trade_date"] = panel["trade_date"].dt.strftime("%Y-%m-%d")
+            rows = list(panel.itertuples(index=False, name=None))
+            for i in range(0, len(rows), INSERT_BATCH_ROWS):
+                cursor.executemany(insert_sql, rows[i : i + INSERT_BATCH_ROWS])
+        logger.info(f"压测库 {database} 已初始化：{n_stocks} 只股票 × {n_days} 个交易日")
+    finally:
+        connection.close()
+
+
+def use_database(database: str, db_password: Optional[str] = None):
+    """把已加载模块中指向线上库的数据库配置改为压测库（仅影响当前进程）"""
+    for module in list(sys.modules.values()):
+        for attr in ("DB_DEFAULTS", "DB_CONFIG"):
+            config = getattr(module, attr, None)
+            if isinstance(config, dict) and config.get("database") == PRODUCTION_DATABASE:
+                config["database"] = database
+                if db_password is not None:
+                    config["password"] = db_password
+
+
+def build_app(database: str, db_password: str):
+    """使用 app.py 的应用对象并注册 strategy_api 路由"""
+    import app as app_module
+    import strategy_api
+
+    use_database(database, db_password)
+    strategy_api.register_routes(app_module.app)
+    strategy_api.init_engines(db_password=db_password)
+    return app_module.app
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(values.mean())}
+
+
+class LoadTester:
+    """按接口依次施压并汇总延迟"""
+
+    def __init__(self, app, concurrency: int = 8, stock_codes: Optional[List[str]] = None):
+        self.app = app
+        self.concurrency = concurrency
+        self.stock_codes = stock_codes or []
+        self.local = threading.local()
+        self.logger = logger
+        self.token = self._login()
+
+    def _client(self):
+        # Flask 测试客户端不在线程间共享
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def _login(self) -> str:
+        response = self.app.test_client().post(
+            "/auth/login", json={"account": LOADTEST_USER["account"], "password": LOADTEST_USER["password"]}
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"压测用户登录失败: {response.status_code} {response.get_data(as_text=True)}")
+        return response.get_json()["token"]
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def scenarios(self, start_date: str, end_date: str) -> Dict[str, Callable[[], Any]]:
+        """各接口的一次请求"""
+        def login():
+            return self._client().post(
+                "/auth/login", json={"account": LOADTEST_USER["account"], "password": LOADTEST_USER["password"]})
+
+        def filter_stocks():
+            return self._client().post("/stocks/filter", json={}, headers=self._headers())
+
+        def backtest_run():
+            return self._client().post("/backtest/run", headers=self._headers(), json={
+                "strategyId": random.choice(["STRAT_001", "STRAT_002", "STRAT_003"]),
+                "type": "STOCK",
+                "target": random.choice(self.stock_codes),
+                "startDate": f"{start_date}T00:00:00.000Z",
+                "endDate": f"{end_date}T00:00:00.000Z",
+                "initialFund": 100000,
+            })
+
+        def backtest_history():
+            return self._client().get("/backtest/history?limit=20", headers=self._headers())
+
+        return {
+            "POST /auth/login": login,
+            "POST /stocks/filter": filter_stocks,
+            "POST /backtest/run": backtest_run,
+            "GET /backtest/history": backtest_history,
+        }
+
+    def run_endpoint(self, name: str, request: Callable[[], Any], n_requests: int) -> Dict[str, Any]:
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+
+        def one(_):
+            start = time.perf_counter()
+            try:
+                status = request().status_code
+            except Exception as e:
+                self.logger.error(f"{name} 请求异常: {e}")
+                status = "exception"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(one, range(n_requests)))
+        wall = time.perf_counter() - wall_start
+
+        errors = sum(v for k, v in statuses.items() if not k.startswith("2"))
+        stats = {"endpoint": name, "requests": n_requests, "errors": errors, "status_counts": statuses,
+                 "requests_per_s": n_requests / wall if wall else None, "wall_s": wall}
+        stats.update(_percentiles(latencies))
+        self.logger.info(
+            f"{name}: {stats['requests_per_s']:.1f} req/s, p50 {stats['p50_ms']:.1f} ms, "
+            f"p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, 错误 {errors}"
+        )
+        return stats
+
+    def run(self, n_requests: int, start_date: str, end_date: str, endpoints: Optional[List[str]] = None):
+        results = []
+        for name, request in self.scenarios(start_date, end_date).items():
+            if endpoints and name not in endpoints:
+                continue
+            results.append(self.run_endpoint(name, request, n_requests))
+        return results
+
+
+def _universe(database: str, db_password: str):
+    """读取压测库中的股票代码与交易日范围"""
+    connection = pymysql.connect(host="localhost", port=3306, user="root", password=db_password,
+                                 database=database, charset="utf8mb4")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT stock_code FROM StockBasic ORDER BY stock_code")
+            codes = [r[0] for r in cursor.fetchall()]
+            cursor.execute("SELECT MIN(trade_date), MAX(trade_date) FROM StockMarketData")
+            start, end = cursor.fetchone()
+    finally:
+        connection.close()
+    if not codes or start is None:
+        raise RuntimeError(f"压测库 {database} 没有数据，请先使用 --seed 初始化")
+    return codes, str(start), str(end)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="接口压测工具")
+    parser.add_argument("--database", default=LOADTEST_DATABASE, help="压测库名")
+    parser.add_argument("--db-password", default="123456", help="MySQL root 密码")
+    parser.add_argument("--seed", action="store_true", help="重建压测库并写入合成数据")
+    parser.add_argument("--stocks", type=int, default=50, help="合成股票数量")
+    parser.add_argument("--days", type=int, default=750, help="每只股票的交易日数量")
+    parser.add_argument("--requests", type=int, default=100, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数")
+    parser.add_argument("--endpoint", action="append", help="只压测指定接口，如 'POST /backtest/run'，可重复")
+    parser.add_argument("--output", default="load_test_results.json", help="结果输出文件")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_database(args.database, args.db_password, args.stocks, args.days)
+
+    codes, start_date, end_date = _universe(args.database, args.db_password)
+    app = build_app(args.database, args.db_password)
+    # 压测期间关闭逐请求的 INFO 日志
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    tester = LoadTester(app, args.concurrency, codes)
+    results = tester.run(args.requests, start_date, end_date, args.endpoint)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "database": args.database,
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "stocks": len(codes),
+                   "start_date": start_date, "end_date": end_date},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"压测结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
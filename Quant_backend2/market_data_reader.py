@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+行情数据分块流式读取模块
+- ChunkedMarketDataReader：基于 pymysql.cursors.SSCursor 的服务端游标读取，
+  按股票或按交易日分组产出固定规模的 DataFrame / NumPy 分块，分块不会拆开同一组数据
+- iter_group_chunks：把任意有序行流重组为整组分块，供 tushare_init 等模块复用
+- check_market_data_quality：在分块流上累计数据质量统计，内存占用与全表规模无关
+"""
+
+import heapq
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 每个分块的目标行数（按整组截断，实际行数可能略有出入）
+DEFAULT_CHUNK_ROWS = 200000
+# 指定股票列表时每条 SQL 的 IN 列表携带的代码数
+SQL_CODE_BATCH = 500
+
+# 允许流式读取的表及其列（表名、列名只能来自此白名单）
+MARKET_TABLES = {
+    "StockMarketData": [
+        "stock_code",
+        "trade_date",
+        "open_price",
+        "high_price",
+        "low_price",
+        "close_price",
+        "pre_close_price",
+        "change_amount",
+        "change_percent",
+        "volume",
+        "amount",
+    ],
+    "StockValuation": [
+        "stock_code",
+        "trade_date",
+        "pe_ratio",
+        "pb_ratio",
+        "ps_ratio",
+        "market_cap",
+        "circulating_market_cap",
+        "turnover_ratio",
+    ],
+}
+
+GROUP_BY_INDEX = {"stock": 0, "date": 1}
+
+
+def iter_group_chunks(rows: Iterator[tuple], key_index: int, chunk_rows: int) -> Iterator[List[tuple]]:
+    """
+    将按分组键有序的行流重组为分块：累计达到 chunk_rows 行后，在下一个分组边界处切分，
+    保证同一分组（同一只股票或同一交易日）的数据总在同一个分块内。
+
+    Args:
+        rows: 有序行迭代器（元组）
+        key_index: 分组键所在列的位置
+        chunk_rows: 目标分块行数
+
+    Returns:
+        行列表迭代器
+    """
+    buffer = []
+    last_key = object()
+    for row in rows:
+        key = row[key_index]
+        if key != last_key:
+            # 新分组开始时缓冲区内均为完整分组
+            if len(buffer) >= chunk_rows:
+                yield buffer
+                buffer = []
+            last_key = key
+        buffer.append(row)
+    if buffer:
+        yield buffer
+
+
+def _to_float_conv() -> dict:
+    """DECIMAL 直接转换为 float，避免逐元素 Decimal 对象"""
+    conv = pymysql.converters.conversions.copy()
+    conv[pymysql.FIELD_TYPE.DECIMAL] = float
+    conv[pymysql.FIELD_TYPE.NEWDECIMAL] = float
+    return conv
+
+
+class ChunkedMarketDataReader:
+    """行情数据分块读取器（服务端游标，内存占用与分块大小成正比）"""
+
+    def __init__(self, db_password: str = None, database: str = None):
+        """
+        Args:
+            db_password: 数据库密码，如果为None则使用默认密码
+            database: 数据库名，如果为None则使用默认数据库
+        """
+        self.db_password = db_password if db_password is not None else DB_DEFAULTS.get("password", "")
+        self.database = database or DB_DEFAULTS["database"]
+        self.logger = logger
+
+    def _connect(self):
+        """每次读取使用独立连接：未读完的 SSCursor 会占住连接，不能与其他查询共用"""
+        return pymysql.connect(
+            host=DB_DEFAULTS["host"],
+            port=DB_DEFAULTS["port"],
+            user=DB_DEFAULTS["user"],
+            password=self.db_password,
+            database=self.database,
+            charset=DB_DEFAULTS["charset"],
+            cursorclass=pymysql.cursors.SSCursor,
+            conv=_to_float_conv(),
+        )
+
+    def _iter_query(self, table: str, select: str, start_date: str, end_date: str,
+                    batch: Optional[List[str]], order: str) -> Iterator[tuple]:
+        """在独立连接上流式执行一条查询"""
+        sql = f"SELECT {select} FROM {table} WHERE trade_date BETWEEN %s AND %s"
+        params = [start_date, end_date]
+        if batch:
+            sql += f" AND stock_code IN ({','.join(['%s'] * len(batch))})"
+            params.extend(batch)
+        sql += f" ORDER BY {order}"
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, params)
+                for row in cur:
+                    yield row
+            finally:
+                cur.close()
+        finally:
+            conn.close()
+
+    def _iter_rows(
+        self,
+        table: str,
+        columns: List[str],
+        start_date: str,
+        end_date: str,
+        stock_codes: Optional[List[str]],
+        by: str,
+    ) -> Iterator[tuple]:
+        """按分组顺序流式产出原始行"""
+        select = ", ".join(columns)
+        code_batches = (
+            [stock_codes[i : i + SQL_CODE_BATCH] for i in range(0, len(stock_codes), SQL_CODE_BATCH)]
+            if stock_codes
+            else [None]
+        )
+        if by == "stock":
+            # 按股票排序时各代码批次之间互不交叉，逐批依次读取
+            for batch in code_batches:
+                yield from self._iter_query(table, select, start_date, end_date, batch, "stock_code, trade_date")
+            return
+        # 按交易日排序时每个批次都覆盖全部交易日：各批次同时流式读取（每批一个连接），
+        # 按 (trade_date, stock_code) 归并，同一交易日的截面仍连续产出
+        streams = [
+            self._iter_query(table, select, start_date, end_date, batch, "trade_date, stock_code")
+            for batch in code_batches
+        ]
+        if len(streams) == 1:
+            yield from streams[0]
+            return
+        yield from heapq.merge(*streams, key=lambda row: (row[1], row[0]))
+
+    def iter_chunks(
+        self,
+        start_date: str,
+        end_date: str,
+        stock_codes: Optional[List[str]] = None,
+        table: str = "StockMarketData",
+        columns: Optional[List[str]] = None,
+        by: str = "stock",
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        as_numpy: bool = False,
+    ) -> Iterator[Any]:
+        """
+        分块读取行情/估值数据
+
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            stock_codes: 股票代码列表，为None时读取全市场
+            table: 表名，取值见 MARKET_TABLES
+            columns: 读取的列，默认为该表全部列；stock_code 与 trade_date 始终包含
+            by: 'stock' 按股票分组（每只股票的时间序列完整落在一个分块内），
+                'date' 按交易日分组（每个截面完整落在一个分块内）
+            chunk_rows: 目标分块行数
+            as_numpy: True 时产出 {列名: np.ndarray} 字典，否则产出 DataFrame
+
+        Returns:
+            分块迭代器
+        """
+        if table not in MARKET_TABLES:
+            raise ValueError(f"不支持的表: {table}")
+        if by not in GROUP_BY_INDEX:
+            raise ValueError("by 必须为 'stock' 或 'date'")
+        allowed = MARKET_TABLES[table]
+        columns = columns or allowed
+        unknown = [c for c in columns if c not in allowed]
+        if unknown:
+            raise ValueError(f"{table} 不包含列: {unknown}")
+        columns = ["stock_code", "trade_date"] + [c for c in columns if c not in ("stock_code", "trade_date")]
+
+        rows = self._iter_rows(table, columns, start_date, end_date, stock_codes, by)
+        for chunk in iter_group_chunks(rows, GROUP_BY_INDEX[by], chunk_rows):
+            if as_numpy:
+                yield self._to_arrays(chunk, columns)
+            else:
+                df = pd.DataFrame(chunk, columns=columns)
+                df["trade_date"] = pd.to_datetime(df["trade_date"])
+                yield df
+
+    @staticmethod
+    def _to_arrays(chunk: List[tuple], columns: List[str]) -> Dict[str, np.ndarray]:
+        """行列表转为按列的 NumPy 数组：代码为 object，日期为 datetime64[D]，其余为 float64"""
+        cols = list(zip(*chunk))
+        arrays = {
+            "stock_code": np.asarray(cols[0], dtype=object),
+            "trade_date": np.asarray(cols[1], dtype="datetime64[D]"),
+        }
+        for name, values in zip(columns[2:], cols[2:]):
+            arrays[name] = np.asarray(values, dtype=np.float64)
+        return arrays
+
+
+def check_market_data_quality(chunks: Iterator[pd.DataFrame]) -> Dict[str, Any]:
+    """
+    在 StockMarketData 分块流上累计数据质量统计（只保留计数，不保留数据）
+
+    Args:
+        chunks: ChunkedMarketDataReader.iter_chunks 产出的 DataFrame 分块（by='stock'）
+
+    Returns:
+        统计结果字典
+    """
+    price_cols = ["open_price", "high_price", "low_price", "close_price"]
+    stats = {
+        "rows": 0,
+        "stocks": 0,
+        "null_prices": 0,
+        "non_positive_prices": 0,
+        "high_low_violations": 0,
+        "zero_volume_days": 0,
+        "extreme_moves": 0,
+    }
+    for df in chunks:
+        prices = df[price_cols].to_numpy(dtype=np.float64)
+        stats["rows"] += len(df)
+        stats["stocks"] += df["stock_code"].nunique()
+        stats["null_prices"] += int(np.isnan(prices).any(axis=1).sum())
+        stats["non_positive_prices"] += int((prices <= 0).any(axis=1).sum())
+        high, low = prices[:, 1], prices[:, 2]
+        stats["high_low_violations"] += int(
+            ((high < low) | (high < prices[:, 0]) | (high < prices[:, 3]) | (low > prices[:, 0]) | (low > prices[:, 3])).sum()
+        )
+        if "volume" in df:
+            stats["zero_volume_days"] += int((df["volume"].to_numpy() == 0).sum())
+        if "change_percent" in df:
+            stats["extreme_moves"] += int((np.abs(df["change_percent"].to_numpy(dtype=np.float64)) > 20).sum())
+    return stats
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+共享内存面板分发模块
+- PanelBroker：主进程把已加载的 MarketPanel（行情、指标等同形状数组及交易日）一次性复制到一块
+  multiprocessing.shared_memory，向工作进程只传递几百字节的描述符，而不是逐任务 pickle 整个面板
+- 引用计数：publish 持有一个引用，每个提交的任务持有一个引用，全部释放后才关闭并删除共享内存
+- attach_panel：工作进程按描述符在共享内存上建立只读 NumPy 视图（零拷贝），同一进程内按段名缓存
+
+用法:
+    with PanelBroker() as broker:
+        broker.publish("universe", panel)
+        with ProcessPoolExecutor() as pool:
+            futures = [broker.submit(pool, run_job, "universe", params) for params in grid]
+
+    def run_job(descriptor, params):
+        panel = attach_panel(descriptor)
+        ...
+
+工作进程须为主进程的子进程（进程池），共享同一个 resource_tracker；无关进程挂载时会在退出时误删共享内存。
+"""
+
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from portfolio_engine import MarketPanel
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 各数组在共享内存中的起始偏移按 64 字节（缓存行）对齐
+PANEL_ALIGN = 64
+# 工作进程内最多同时挂载的面板数量
+ATTACH_CACHE_SIZE = 4
+
+
+def _layout(arrays: Dict[str, np.ndarray]):
+    """计算各数组在共享内存中的偏移，返回 ({名称: (偏移, 形状, dtype)}, 总字节数)"""
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.shape, array.dtype.str)
+        offset += -(-array.nbytes // PANEL_ALIGN) * PANEL_ALIGN
+    return layout, max(offset, 1)
+
+
+def _view(buf, spec) -> np.ndarray:
+    offset, shape, dtype = spec
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape)) if shape else 1
+    array = np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(shape)
+    array.flags.writeable = False
+    return array
+
+
+class PanelBroker:
+    """把面板放入共享内存并按引用计数回收"""
+
+    def __init__(self):
+        self.segments: Dict[str, Dict[str, Any]] = {}  # key -> {"shm", "descriptor", "refs"}
+        self.lock = threading.Lock()
+        self.logger = logger
+
+    def publish(self, key: str, panel: MarketPanel) -> Dict[str, Any]:
+        """
+        把面板复制到新的共享内存段
+
+        Args:
+            key: 面板名称（同一 broker 内唯一）
+            panel: 要分发的面板
+
+        Returns:
+            描述符（可 pickle，只含段名、各列偏移/形状/类型与股票代码）
+        """
+        arrays = {"__dates__": panel.dates.astype("datetime64[D]").view(np.int64)}
+        arrays.update({name: np.ascontiguousarray(values) for name, values in panel.fields.items()})
+        layout, size = _layout(arrays)
+        with self.lock:
+            if key in self.segments:
+                raise ValueError(f"面板 {key} 已发布")
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            try:
+                for name, array in arrays.items():
+                    offset, shape, dtype = layout[name]
+                    target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+                    target[...] = array
+                    del target
+            except BaseException:
+                shm.close()
+                shm.unlink()
+                raise
+            descriptor = {"name": shm.name, "layout": layout, "codes": panel.codes.tolist()}
+            self.segments[key] = {"shm": shm, "descriptor": descriptor, "refs": 1}
+        self.logger.info(f"面板 {key} 已放入共享内存 {shm.name}（{size / 1024 / 1024:.1f} MB）")
+        return descriptor
+
+    def acquire(self, key: str) -> Dict[str, Any]:
+        """增加一个引用并返回描述符"""
+        with self.lock:
+            segment = self.segments.get(key)
+            if segment is None:
+                raise KeyError(f"面板 {key} 未发布或已回收")
+            segment["refs"] += 1
+            return segment["descriptor"]
+
+    def release(self, key: str):
+        """减少一个引用，归零时关闭并删除共享内存"""
+        with self.lock:
+            segment = self.segments.get(key)
+            if segment is None:
+                return
+            segment["refs"] -= 1
+            if segment["refs"] > 0:
+                return
+            del self.segments[key]
+        segment["shm"].close()
+        segment["shm"].unlink()
+        self.logger.info(f"面板 {key} 的共享内存已回收")
+
+    @contextmanager
+    def lease(self, key: str):
+        """在 with 块内持有一个引用"""
+        descriptor = self.acquire(key)
+        try:
+            yield descriptor
+        finally:
+            self.release(key)
+
+    def submit(self, executor: Executor, fn: Callable, key: str, *args, **kwargs) -> Future:
+        """
+        提交任务 fn(描述符, *args, **kwargs)，任务结束（成功、失败或取消）后自动释放引用
+        """
+        descriptor = self.acquire(key)
+        try:
+            future = executor.submit(fn, descriptor, *args, **kwargs)
+        except BaseException:
+            self.release(key)
+            raise
+        future.add_done_callback(lambda _: self.release(key))
+        return future
+
+    def refs(self, key: str) -> int:
+        with self.lock:
+            segment = self.segments.get(key)
+            return segment["refs"] if segment else 0
+
+    def close(self):
+        """释放 publish 持有的引用；仍有任务持有引用的面板在任务结束后回收"""
+        with self.lock:
+            keys = list(self.segments)
+        for key in keys:
+            self.release(key)
+
+    def __enter__(self) -> "PanelBroker":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# 工作进程内已挂载的面板：段名 -> (SharedMemory, MarketPanel)
+_attached = OrderedDict()
+_attached_lock = threading.Lock()
+
+
+def attach_panel(descriptor: Dict[str, Any]) -> MarketPanel:
+    """
+    按描述符挂载共享内存并返回只读面板（零拷贝视图），同一进程内重复调用复用已挂载的段
+    """
+    name = descriptor["name"]
+    with _attached_lock:
+        _reap()
+        entry = _attached.get(name)
+        if entry is not None:
+            _attached.move_to_end(name)
+            return entry[1]
+        shm = shared_memory.SharedMemory(name=name)
+        layout = dict(descriptor["layout"])
+        dates = _view(shm.buf, layout.pop("__dates__")).view("datetime64[D]")
+        fields = {field: _view(shm.buf, spec) for field, spec in layout.items()}
+        panel = MarketPanel(dates, np.asarray(descriptor["codes"], dtype=object), fields)
+        _attached[name] = (shm, panel)
+        while len(_attached) > ATTACH_CACHE_SIZE:
+            _close(*_attached.popitem(last=False)[1])
+        return panel
+
+
+def detach_panel(descriptor: Dict[str, Any]):
+    """解除本进程对面板的挂载（调用方不应再持有其数组）"""
+    with _attached_lock:
+        entry = _attached.pop(descriptor["name"], None)
+    if entry is not None:
+        _close(*entry)
+
+
+# 关闭时仍被调用方视图引用的段，待视图释放后再关闭
+_orphans = []
+
+
+def _close(shm: shared_memory.SharedMemory, panel: MarketPanel):
+    del panel
+    try:
+        shm.close()
+    except BufferError:
+        # 调用方仍持有数组视图；保留对象，避免 SharedMemory.__del__ 在回收时报错
+        _orphans.append(shm)
+
+
+def _reap():
+    for shm in list(_orphans):
+        try:
+            shm.close()
+            _orphans.remove(shm)
+        except BufferError:
+            pass
+
+
+@atexit.register
+def _detach_all():
+    # 进程退出前先释放视图再关闭映射，避免 SharedMemory.__del__ 在解释器清理阶段报 BufferError
+    with _attached_lock:
+        entries = [_attached.popitem()[1] for _ in range(len(_attached))]
+    while entries:
+        _close(*entries.pop())
+    _reap()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+向量化绩效指标模块
+- compute_metrics：基于 NumPy 数组计算收益、回撤、夏普、索提诺、卡玛、回撤持续期、换手率、仓位暴露及逐笔交易统计
+- 输入可以是单条曲线（一维）或多条等长曲线（二维，每行一条），参数扫描时一次完成全部曲线的计算
+- 收益率中的 NaN/inf 视为缺失值，逐行按有效值计算，与 BacktestEngine 原有口径一致
+- benchmark_metrics：相对基准的阿尔法、贝塔、跟踪误差与信息比率
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.03
+# 标准差小于该值时比率记为 0
+MIN_STD = 1e-8
+# 滚动夏普默认窗口（约一个季度）
+ROLLING_WINDOW = 63
+
+METRIC_NAMES = (
+    "total_return",
+    "annual_return",
+    "max_drawdown",
+    "sharpe_ratio",
+    "win_rate",
+    "profit_loss_ratio",
+    "sortino_ratio",
+    "calmar_ratio",
+    "max_drawdown_duration",
+    "volatility",
+    "turnover",
+    "exposure",
+    "round_trip_count",
+    "trade_win_rate",
+    "avg_trade_return",
+    "avg_win_trade",
+    "avg_loss_trade",
+    "best_trade",
+    "worst_trade",
+)
+
+
+def _as_2d(values) -> np.ndarray:
+    array = np.asarray(values, dtype=np.float64)
+    return array[np.newaxis, :] if array.ndim == 1 else array
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray, count: np.ndarray) -> np.ndarray:
+    total = np.where(mask, values, 0.0).sum(axis=1)
+    return np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+
+def _masked_std(values: np.ndarray, mask: np.ndarray, count: np.ndarray, mean: np.ndarray) -> np.ndarray:
+    """按有效值计算的样本标准差（ddof=1），有效值不足两个时为 NaN"""
+    squared = np.where(mask, (values - mean[:, np.newaxis]) ** 2, 0.0).sum(axis=1)
+    var = np.full_like(squared, np.nan)
+    np.divide(squared, count - 1, out=var, where=count > 1)
+    return np.sqrt(var)
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray, minimum: float = MIN_STD) -> np.ndarray:
+    ok = np.isfinite(denominator) & (denominator >= minimum)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=ok)
+
+
+def drawdown_stats(equity) -> Dict[str, np.ndarray]:
+    """
+    回撤序列、最大回撤与最长回撤持续期（周期数）
+
+    Args:
+        equity: 资金曲线，一维或二维（每行一条）
+
+    Returns:
+        {'drawdown': 与 equity 同形状, 'max_drawdown': (n,), 'max_drawdown_duration': (n,)}
+    """
+    equity = _as_2d(equity)
+    peak = np.maximum.accumulate(equity, axis=1)
+    drawdown = (equity - peak) / peak
+    # 每个时点距最近一次创新高的周期数
+    index = np.arange(equity.shape[1])
+    last_high = np.maximum.accumulate(np.where(drawdown >= 0, index, 0), axis=1)
+    return {
+        "drawdown": drawdown,
+        "max_drawdown": np.abs(drawdown.min(axis=1)),
+        "max_drawdown_duration": (index - last_high).max(axis=1),
+    }
+
+
+def rolling_sharpe(returns, window: int = ROLLING_WINDOW, risk_free_rate: float = RISK_FREE_RATE) -> np.ndarray:
+    """
+    滚动年化夏普比率，前 window-1 个点为 NaN；窗口内有缺失值时结果为 NaN
+
+    Args:
+        returns: 日收益率，一维或二维
+        window: 窗口长度
+
+    Returns:
+        与 returns 同形状（二维）的数组
+    """
+    excess = _as_2d(returns) - risk_free_rate / TRADING_DAYS_PER_YEAR
+    n, length = excess.shape
+    result = np.full((n, length), np.nan)
+    if window < 2 or length < window:
+        return result
+    padded = np.concatenate([np.zeros((n, 1)), np.cumsum(excess, axis=1)], axis=1)
+    padded_sq = np.concatenate([np.zeros((n, 1)), np.cumsum(excess ** 2, axis=1)], axis=1)
+    total = padded[:, window:] - padded[:, :-window]
+    total_sq = padded_sq[:, window:] - padded_sq[:, :-window]
+    mean = total / window
+    var = np.maximum(total_sq - total * mean, 0.0) / (window - 1)
+    std = np.sqrt(var)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(std >= MIN_STD, mean / std * np.sqrt(TRADING_DAYS_PER_YEAR), 0.0)
+    result[:, window - 1:] = ratio
+    return result
+
+
+def trade_stats(trade_returns) -> Dict[str, np.ndarray]:
+    """
+    逐笔交易统计（平仓收益率），二维输入时每行一条曲线、不足部分以 NaN 补齐
+
+    Returns:
+        {'round_trip_count','trade_win_rate','avg_trade_return','avg_win_trade','avg_loss_trade','best_trade','worst_trade'}
+    """
+    r = _as_2d(trade_returns) if np.size(trade_returns) else np.empty((1, 0))
+    valid = np.isfinite(r)
+    count = valid.sum(axis=1).astype(np.float64)
+    wins, losses = valid & (r > 0), valid & (r < 0)
+    n_win, n_loss = wins.sum(axis=1), losses.sum(axis=1)
+    any_trade = count > 0
+    return {
+        "round_trip_count": count,
+        "trade_win_rate": np.divide(n_win, count, out=np.zeros_like(count), where=any_trade),
+        "avg_trade_return": _masked_mean(r, valid, count),
+        "avg_win_trade": _masked_mean(r, wins, n_win),
+        "avg_loss_trade": _masked_mean(r, losses, n_loss),
+        "best_trade": np.where(any_trade, np.where(valid, r, -np.inf).max(axis=1, initial=-np.inf), 0.0),
+        "worst_trade": np.where(any_trade, np.where(valid, r, np.inf).min(axis=1, initial=np.inf), 0.0),
+    }
+
+
+def compute_metrics(
+    equity,
+    returns=None,
+    initial_capital: Union[float, np.ndarray, None] = None,
+    position_values=None,
+    trade_returns=None,
+    risk_free_rate: float = RISK_FREE_RATE,
+) -> Dict[str, np.ndarray]:
+    """
+    批量计算绩效指标
+
+    Args:
+        equity: 资金曲线，形状 (T,) 或 (n, T)
+        returns: 日收益率，形状 (L,) 或 (n, L)；为空时由资金曲线计算
+        initial_capital: 初始资金（标量或 (n,)），为空时取资金曲线首点
+        position_values: 与资金曲线同形状的持仓市值，用于换手率与仓位暴露
+        trade_returns: 逐笔平仓收益率，形状 (k,) 或以 NaN 补齐的 (n, k)
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        {指标名: (n,) 数组}；一维输入时调用方可取 [0]
+    """
+    equity = _as_2d(equity)
+    n, length = equity.shape
+    if returns is None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.diff(equity, axis=1) / equity[:, :-1]
+    returns = _as_2d(returns)
+    capital = equity[:, 0] if initial_capital is None else np.broadcast_to(
+        np.asarray(initial_capital, dtype=np.float64), (n,))
+
+    valid = np.isfinite(returns)
+    count = valid.sum(axis=1).astype(np.float64)
+    years = length / TRADING_DAYS_PER_YEAR
+
+    total_return = (equity[:, -1] - capital) / capital
+    with np.errstate(invalid="ignore"):
+        annual_return = (1 + total_return) ** (1 / years) - 1 if years > 0 else np.zeros(n)
+
+    dd = drawdown_stats(equity)
+
+    # 夏普与索提诺（超额日收益）
+    excess = returns - risk_free_rate / TRADING_DAYS_PER_YEAR
+    mean_excess = _masked_mean(excess, valid, count)
+    std_excess = _masked_std(excess, valid, count, mean_excess)
+    sharpe = _safe_ratio(mean_excess, std_excess) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    downside = np.sqrt(_masked_mean(np.minimum(excess, 0.0) ** 2, valid, count))
+    sortino = _safe_ratio(mean_excess, downside) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    mean_return = _masked_mean(returns, valid, count)
+    volatility = np.nan_to_num(_masked_std(returns, valid, count, mean_return)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    # 日胜率与盈亏比
+    positive, negative = valid & (returns > 0), valid & (returns < 0)
+    n_pos, n_neg = positive.sum(axis=1), negative.sum(axis=1)
+    win_rate = np.divide(n_pos, count, out=np.zeros_like(count), where=count > 0)
+    avg_win = _masked_mean(returns, positive, n_pos)
+    avg_loss = np.abs(_masked_mean(returns, negative, n_neg))
+    profit_loss_ratio = _safe_ratio(avg_win, avg_loss, minimum=np.finfo(float).tiny)
+
+    metrics = {
+        "total_return": total_return,
+        "annual_return": annual_return,
+        "max_drawdown": dd["max_drawdown"],
+        "sharpe_ratio": sharpe,
+        "win_rate": win_rate,
+        "profit_loss_ratio": profit_loss_ratio,
+        "sortino_ratio": sortino,
+        "calmar_ratio": _safe_ratio(annual_return, dd["max_drawdown"], minimum=1e-12),
+        "max_drawdown_duration": dd["max_drawdown_duration"].astype(np.float64),
+        "volatility": volatility,
+        "turnover": np.zeros(n),
+        "exposure": np.zeros(n),
+    }
+
+    if position_values is not None:
+        positions = _as_2d(position_values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weights = np.where(equity > 0, np.abs(positions) / equity, 0.0)
+        metrics["exposure"] = weights.mean(axis=1)
+        # 年化单边换手率：持仓市值变动绝对值之和 / 平均资金 / 2
+        traded = np.abs(np.diff(positions, axis=1)).sum(axis=1)
+        metrics["turnover"] = _safe_ratio(traded / 2, equity.mean(axis=1)) / max(years, 1e-12)
+
+    metrics.update(trade_stats(trade_returns if trade_returns is not None else []))
+    if metrics["round_trip_count"].shape[0] != n:
+        metrics.update({k: np.broadcast_to(v, (n,)).copy() for k, v in trade_stats([]).items()})
+
+    # 没有任何有效收益率的曲线，全部指标记为 0
+    empty = count == 0
+    if empty.any():
+        for name in METRIC_NAMES:
+            metrics[name] = np.where(empty, 0.0, metrics[name])
+    return metrics
+
+
+def compute_single_metrics(equity, returns=None, initial_capital: Optional[float] = None,
+                           position_values=None, trade_returns=None) -> Dict[str, float]:
+    """单条曲线的便捷封装，返回 {指标名: float}"""
+    metrics = compute_metrics(equity, returns, initial_capital, position_values, trade_returns)
+    return {name: float(values[0]) for name, values in metrics.items()}
+
+
+def benchmark_metrics(
+    returns,
+    benchmark_returns,
+    risk_free_rate: float = RISK_FREE_RATE,
+) -> Dict[str, np.ndarray]:
+    """
+    相对基准的指标：阿尔法（年化）、贝塔、跟踪误差（年化）、信息比率
+
+    Args:
+        returns: 策略日收益率，形状 (T,) 或 (n, T)
+        benchmark_returns: 与 returns 逐点对齐的基准日收益率，形状 (T,) 或 (n, T)
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        {'alpha','beta','tracking_error','information_ratio','excess_return'}，均为 (n,) 数组
+    """
+    strategy = _as_2d(returns)
+    benchmark = np.broadcast_to(_as_2d(benchmark_returns), strategy.shape)
+    valid = np.isfinite(strategy) & np.isfinite(benchmark)
+    count = valid.sum(axis=1).astype(np.float64)
+    daily_rf = risk_free_rate / TRADING_DAYS_PER_YEAR
+
+    mean_s = _masked_mean(strategy, valid, count)
+    mean_b = _masked_mean(benchmark, valid, count)
+    dev_s = np.where(valid, strategy - mean_s[:, np.newaxis], 0.0)
+    dev_b = np.where(valid, benchmark - mean_b[:, np.newaxis], 0.0)
+    beta = _safe_ratio((dev_s * dev_b).sum(axis=1), (dev_b ** 2).sum(axis=1), minimum=1e-16)
+    alpha = ((mean_s - daily_rf) - beta * (mean_b - daily_rf)) * TRADING_DAYS_PER_YEAR
+
+    active = strategy - benchmark
+    mean_active = _masked_mean(active, valid, count)
+    tracking_error = np.nan_to_num(_masked_std(active, valid, count, mean_active)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    information_ratio = _safe_ratio(mean_active * TRADING_DAYS_PER_YEAR, tracking_error)
+    return {
+        "alpha": alpha,
+        "beta": beta,
+        "tracking_error": tracking_error,
+        "information_ratio": information_ratio,
+        "excess_return": mean_active * TRADING_DAYS_PER_YEAR,
+    }
@@ -0,0 +1,512 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+横截面组合回测模块
+- 适用于按截面筛选、排序的选股轮动策略（STRAT_001 小市值、STRAT_003 银行股轮动、STRAT_004 低估价值），
+  与 StrategyEngine 的单只股票时间序列策略互补
+- 收盘价与估值数据整理为 日期×股票 的二维面板（MarketPanel），资产负债表数据只在调仓日按时点索引取值
+- 筛选条件与 StrategyCondition 同构，复用 rule_compiler 编译（只支持截面指标）
+- 全部调仓日一次性求值：不满足条件或当日无价格的股票得分置为 +inf，按行 np.argpartition 取前 top_n 只
+- 两次调仓之间持股数不变，区间资金曲线由价格子矩阵与持股向量相乘得到，不逐日逐股循环
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from backtest_engine import BacktestEngine, BacktestResult
+from fundamentals_pit import PointInTimeFundamentals
+from kernels import CASH_RESERVE
+from market_data_reader import ChunkedMarketDataReader
+from rule_compiler import BALANCE_SHEET_COLUMNS, MARKET_CAP_UNIT, VALUATION_COLUMNS, CompiledRules, load_conditions
+from stage_timer import timed_stage
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 调仓频率：every_n_days 每 hold_days 个交易日；weekly / monthly / quarterly 为每周、每月、每季首月的首个交易日
+REBALANCE_RULES = ("every_n_days", "weekly", "monthly", "quarterly")
+# 组合筛选只能使用截面指标（不依赖单只股票的历史窗口）
+CROSS_SECTION_INDICATORS = ("MARKET_CAP", "PB_RATIO", "DEBT_RATIO", "CURRENT_RATIO")
+
+# 内置组合策略；conditions 与 init.sql 中的 StrategyCondition 一致，数据库不可用时使用
+PORTFOLIO_STRATEGIES: Dict[str, Dict[str, Any]] = {
+    "STRAT_001": {
+        "name": "小市值策略",
+        "rank_by": "market_cap",
+        "ascending": True,
+        "top_n": 3,
+        "rebalance": "every_n_days",
+        "hold_days": 5,
+        "universe": {},
+        "conditions": [
+            {"condition_id": "COND_001", "indicator_id": "MARKET_CAP", "condition_type": "between",
+             "threshold_min": 2000000000, "threshold_max": 3000000000, "signal_action": "buy", "condition_order": 1},
+        ],
+    },
+    "STRAT_003": {
+        "name": "银行股轮动策略",
+        "rank_by": "pb_ratio",
+        "ascending": True,
+        "top_n": 1,
+        "rebalance": "weekly",
+        "hold_days": None,
+        "universe": {"index_code": "000300.SH", "industry": "银行"},
+        "conditions": [
+            {"condition_id": "COND_004", "indicator_id": "PB_RATIO", "condition_type": "less",
+             "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+        ],
+    },
+    "STRAT_004": {
+        "name": "低估价值选股策略",
+        "rank_by": "pb_ratio",
+        "ascending": True,
+        "top_n": None,
+        "rebalance": "quarterly",
+        "hold_days": None,
+        "universe": {},
+        "conditions": [
+            {"condition_id": "COND_005", "indicator_id": "PB_RATIO", "condition_type": "less",
+             "threshold_min": None, "threshold_max": 2.0, "signal_action": "buy", "condition_order": 1},
+            {"condition_id": "COND_006", "indicator_id": "DEBT_RATIO", "condition_type": "greater",
+             "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 2},
+            {"condition_id": "COND_007", "indicator_id": "CURRENT_RATIO", "condition_type": "greater",
+             "threshold_min": 1.2, "threshold_max": None, "signal_action": "buy", "condition_order": 3},
+        ],
+    },
+}
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """沿日期（第 0 轴）前向填充 NaN，用于停牌期间的持仓估值"""
+    rows = np.where(np.isfinite(values), np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+class MarketPanel:
+    """日期×股票 面板：dates 为行、codes 为列，fields 为同形状的 float64 数组"""
+
+    def __init__(self, dates, codes, fields: Dict[str, np.ndarray]):
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.codes = np.asarray(codes, dtype=object)
+        self.fields = fields
+        for name, values in fields.items():
+            if values.shape != (len(self.dates), len(self.codes)):
+                raise ValueError(f"面板列 {name} 的形状 {values.shape} 与日期×股票不符")
+
+    @classmethod
+    def from_arrays(cls, stock_code: np.ndarray, trade_date: np.ndarray, values: Dict[str, np.ndarray],
+                    codes=None, dates=None) -> "MarketPanel":
+        """
+        由长表数组构建面板
+
+        Args:
+            stock_code: 股票代码数组
+            trade_date: 交易日数组
+            values: {列名: 数值数组}
+            codes: 面板列（股票代码），默认为出现过的全部代码
+            dates: 面板行（交易日），默认为出现过的全部日期
+
+        Returns:
+            MarketPanel，缺失位置为 NaN；不在 codes/dates 中的行被丢弃
+        """
+        stock_code = np.asarray(stock_code, dtype=object)
+        trade_date = np.asarray(trade_date, dtype="datetime64[D]")
+        codes = np.unique(stock_code) if codes is None else np.sort(np.asarray(codes, dtype=object))
+        dates = np.unique(trade_date) if dates is None else np.unique(np.asarray(dates, dtype="datetime64[D]"))
+        if len(codes) == 0 or len(dates) == 0:
+            return cls(dates, codes, {name: np.empty((len(dates), len(codes))) for name in values})
+
+        col = np.minimum(np.searchsorted(codes, stock_code), len(codes) - 1)
+        row = np.minimum(np.searchsorted(dates, trade_date), len(dates) - 1)
+        keep = (codes[col] == stock_code) & (dates[row] == trade_date)
+        fields = {}
+        for name, column in values.items():
+            panel = np.full((len(dates), len(codes)), np.nan)
+            panel[row[keep], col[keep]] = np.asarray(column, dtype=np.float64)[keep]
+            fields[name] = panel
+        return cls(dates, codes, fields)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: List[str], codes=None, dates=None) -> "MarketPanel":
+        """由含 stock_code、trade_date 的长表 DataFrame 构建面板"""
+        return cls.from_arrays(
+            df["stock_code"].to_numpy(dtype=object),
+            pd.to_datetime(df["trade_date"]).to_numpy().astype("datetime64[D]"),
+            {name: df[name].to_numpy(dtype=np.float64) for name in columns},
+            codes, dates,
+        )
+
+
+def rebalance_indices(dates: np.ndarray, rule: str, hold_days: Optional[int] = None) -> np.ndarray:
+    """
+    调仓日在面板中的行号
+
+    Args:
+        dates: 交易日（datetime64[D]，升序）
+        rule: REBALANCE_RULES 之一
+        hold_days: every_n_days 的间隔
+
+    Returns:
+        int64 行号数组（首个交易日总是调仓日）
+    """
+    if rule not in REBALANCE_RULES:
+        raise ValueError(f"不支持的调仓频率: {rule}，支持: {list(REBALANCE_RULES)}")
+    n = len(dates)
+    if n == 0:
+        return np.array([], dtype=np.int64)
+    if rule == "every_n_days":
+        if not hold_days or int(hold_days) <= 0:
+            raise ValueError("every_n_days 调仓需要正整数 hold_days")
+        return np.arange(0, n, int(hold_days), dtype=np.int64)
+    if rule == "weekly":
+        # 1970-01-01 为周四，加 3 天后整除 7 即为周一开始的周序号
+        key = (dates.astype(np.int64) + 3) // 7
+    else:
+        key = dates.astype("datetime64[M]").astype(np.int64)
+    first = np.r_[True, key[1:] != key[:-1]]
+    if rule == "quarterly":
+        first &= key % 3 == 0  # 1/4/7/10 月
+        first[0] = True
+    return np.flatnonzero(first).astype(np.int64)
+
+
+def select_top(scores: np.ndarray, eligible: np.ndarray, top_n: Optional[int]) -> List[np.ndarray]:
+    """
+    每行（调仓日）选出得分最小的 top_n 只股票
+
+    Args:
+        scores: (调仓日数, 股票数) 得分，越小越优先
+        eligible: 同形状布尔掩码
+        top_n: 每期持股数，None 表示全部符合条件的股票
+
+    Returns:
+        每个调仓日按得分升序的列号数组
+    """
+    scores = np.where(eligible & np.isfinite(scores), scores, np.inf)
+    n = scores.shape[1]
+    if top_n is not None and 0 < top_n < n:
+        candidates = np.argpartition(scores, top_n - 1, axis=1)[:, :top_n]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    picked = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(picked, axis=1, kind="stable")
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    valid = np.isfinite(np.take_along_axis(picked, order, axis=1))
+    return [row[mask] for row, mask in zip(candidates, valid)]
+
+
+def simulate_portfolio(close: np.ndarray, rebalance_rows: np.ndarray, selections: List[np.ndarray],
+                       initial_capital: float, commission_rate: float) -> Dict[str, Any]:
+    """
+    模拟等权轮动组合
+
+    每个调仓日按收盘价卖出不再入选的股票（停牌无价时继续持有），
+    留任的股票不动，可用资金按 CASH_RESERVE 比例平均买入新入选的股票；最后一个交易日全部平仓。
+
+    Args:
+        close: (交易日数, 股票数) 收盘价，停牌为 NaN
+        rebalance_rows: 调仓日行号
+        selections: 每个调仓日入选的列号
+        initial_capital: 初始资金
+        commission_rate: 手续费率
+
+    Returns:
+        {'equity', 'position_values': 逐日数组, 'trades': 交易记录（date 为行号、stock 为列号）, 'final_capital'}
+    """
+    n_days = close.shape[0]
+    price = _forward_fill(close)
+    tradable = np.isfinite(close)
+    equity = np.full(n_days, float(initial_capital))
+    position_values = np.zeros(n_days)
+    cash = float(initial_capital)
+    holdings: Dict[int, List[float]] = {}  # 列号 -> [股数, 买入价]
+    trades = []
+
+    def sell(row: int, col: int, reason: str):
+        nonlocal cash
+        shares, entry_price = holdings.pop(col)
+        fill = price[row, col]
+        proceeds = shares * fill
+        commission = proceeds * commission_rate
+        cash += proceeds - commission
+        trades.append({"row": row, "col": col, "action": "sell", "price": fill, "shares": int(shares),
+                       "commission": commission, "trade_return": (fill - entry_price) / entry_price,
+                       "capital_after": cash, "exit_reason": reason})
+
+    bounds = np.r_[rebalance_rows, n_days]
+    for k, row in enumerate(rebalance_rows.tolist()):
+        target = selections[k]
+        target_set = set(target.tolist())
+        for col in sorted(c for c in holdings if c not in target_set and tradable[row, c]):
+            sell(row, col, "signal")
+
+        entrants = [c for c in target.tolist() if c not in holdings and tradable[row, c]]
+        if entrants:
+            budget = cash * CASH_RESERVE / len(entrants)
+            for col in entrants:
+                fill = close[row, col]
+                shares = int(budget / fill)
+                if shares <= 0:
+                    continue
+                commission = shares * fill * commission_rate
+                if shares * fill + commission > cash:
+                    continue
+                cash -= shares * fill + commission
+                holdings[col] = [shares, fill]
+                trades.append({"row": row, "col": col, "action": "buy", "price": fill, "shares": shares,
+                               "commission": commission, "capital_after": cash})
+
+        end = bounds[k + 1]
+        if holdings:
+            cols = np.fromiter(holdings.keys(), dtype=np.int64, count=len(holdings))
+            shares = np.array([holdings[c][0] for c in cols.tolist()], dtype=np.float64)
+            position_values[row:end] = price[row:end][:, cols] @ shares
+        equity[row:end] = cash + position_values[row:end]
+
+    for col in sorted(holdings):
+        sell(n_days - 1, col, "end_of_data")
+    if n_days:
+        equity[-1] = cash
+        position_values[-1] = 0.0
+    return {"equity": equity, "position_values": position_values, "trades": trades, "final_capital": cash}
+
+
+def load_universe(index_code: Optional[str] = None, industry: Optional[str] = None,
+                  db_password: str = None) -> Optional[List[str]]:
+    """
+    读取股票池：指数成分股（IndexComponent 当前成分）与行业（StockBasic.industry）的交集
+
+    Returns:
+        股票代码列表；未指定任何条件时返回 None（全市场）
+    """
+    if not index_code and not industry:
+        return None
+    sql = "SELECT b.stock_code FROM StockBasic b"
+    params = []
+    if index_code:
+        sql += " JOIN IndexComponent c ON c.stock_code = b.stock_code AND c.index_code = %s AND c.is_current = TRUE"
+        params.append(index_code)
+    if industry:
+        sql += " WHERE b.industry = %s"
+        params.append(industry)
+    connection = pymysql.connect(
+        host=DB_DEFAULTS["host"],
+        port=DB_DEFAULTS["port"],
+        user=DB_DEFAULTS["user"],
+        password=db_password if db_password is not None else DB_DEFAULTS["password"],
+        database=DB_DEFAULTS["database"],
+        charset=DB_DEFAULTS["charset"],
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return sorted(row[0] for row in cursor.fetchall())
+    finally:
+        connection.close()
+
+
+class PortfolioEngine:
+    """横截面组合回测引擎"""
+
+    def __init__(self, db_password: str = None):
+        self.db_password = db_password if db_password is not None else DB_DEFAULTS.get("password", "")
+        self.logger = logger
+        self.backtest_engine = BacktestEngine(self.db_password)
+
+    def resolve_config(self, strategy_id: str, **overrides) -> Dict[str, Any]:
+        """
+        合并内置配置与请求参数（top_n、rebalance、hold_days、conditions 等，值为 None 的参数忽略）
+
+        Raises:
+            ValueError: 策略不是组合策略，或参数不合法
+        """
+        if strategy_id not in PORTFOLIO_STRATEGIES:
+            raise ValueError(f"不支持的组合策略: {strategy_id}，支持: {sorted(PORTFOLIO_STRATEGIES)}")
+        config = {**PORTFOLIO_STRATEGIES[strategy_id], **{k: v for k, v in overrides.items() if v is not None}}
+        if config["top_n"] is not None and int(config["top_n"]) <= 0:
+            raise ValueError("top_n 必须为正整数")
+        if config["rank_by"] not in VALUATION_COLUMNS:
+            raise ValueError(f"rank_by 必须为 {list(VALUATION_COLUMNS)} 之一")
+        unsupported = {c.get("indicator_id") for c in config["conditions"]} - set(CROSS_SECTION_INDICATORS)
+        if unsupported:
+            raise ValueError(f"组合策略只支持截面指标 {list(CROSS_SECTION_INDICATORS)}，不支持: {sorted(unsupported)}")
+        return config
+
+    def load_conditions(self, strategy_id: str) -> Optional[List[Dict[str, Any]]]:
+        """读取 StrategyCondition 中的条件，数据库不可用或没有条件时返回 None（使用内置条件）"""
+        try:
+            return load_conditions(strategy_id, self.db_password) or None
+        except Exception as e:
+            self.logger.warning(f"读取策略{strategy_id}的条件失败，使用内置条件: {e}")
+            return None
+
+    def load_panel(self, start_date: str, end_date: str, columns: List[str],
+                   stock_codes: Optional[List[str]] = None) -> MarketPanel:
+        """
+        读取收盘价与估值数据并整理为面板（服务端游标分块读取，不经过 DataFrame）
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            columns: 需要的估值列（VALUATION_COLUMNS 的子集）
+            stock_codes: 股票池，None 为全市场
+
+        Returns:
+            MarketPanel，含 close_price 与所需估值列；market_cap 换算为元
+        """
+        reader = ChunkedMarketDataReader(self.db_password)
+
+        def collect(table: str, fields: List[str]) -> Dict[str, np.ndarray]:
+            chunks = list(reader.iter_chunks(start_date, end_date, stock_codes, table=table,
+                                             columns=fields, by="date", as_numpy=True))
+            if not chunks:
+                return {name: np.array([]) for name in ["stock_code", "trade_date"] + fields}
+            return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+
+        prices = collect("StockMarketData", ["close_price"])
+        panel = MarketPanel.from_arrays(prices["stock_code"], prices["trade_date"],
+                                        {"close_price": prices["close_price"]})
+        if columns:
+            valuation = collect("StockValuation", list(columns))
+            extra = MarketPanel.from_arrays(valuation["stock_code"], valuation["trade_date"],
+                                            {name: valuation[name] for name in columns},
+                                            codes=panel.codes, dates=panel.dates)
+            panel.fields.update(extra.fields)
+        if "market_cap" in panel.fields:
+            panel.fields["market_cap"] *= MARKET_CAP_UNIT
+        self.logger.info(f"组合回测面板: {len(panel.dates)} 个交易日 × {len(panel.codes)} 只股票")
+        return panel
+
+    def cross_sections(self, panel: MarketPanel, rows: np.ndarray, columns: List[str]) -> pd.DataFrame:
+        """
+        调仓日截面长表（行为 调仓日×股票），缺失的资产负债表列按时点索引补充
+
+        Returns:
+            含 stock_code、trade_date 与所需列的 DataFrame，行序为按调仓日展开的面板
+        """
+        n_codes = len(panel.codes)
+        frame = pd.DataFrame({
+            "stock_code": np.tile(panel.codes, len(rows)),
+            "trade_date": np.repeat(panel.dates[rows], n_codes),
+        })
+        balance = [c for c in columns if c in BALANCE_SHEET_COLUMNS and c not in panel.fields]
+        if balance:
+            pit = PointInTimeFundamentals(self.db_password).load(
+                "BalanceSheet", balance, list(panel.codes), str(panel.dates[rows[-1]]))
+            for name, values in pit.panel(panel.dates[rows], panel.codes).items():
+                frame[name] = values.ravel()
+        for name in columns:
+            if name not in frame.columns:
+                frame[name] = panel.fields[name][rows].ravel()
+        return frame
+
+    def run(self, strategy_id: str, start_date: str, end_date: str, initial_capital: float = 1000000.0,
+            commission_rate: float = 0.001, panel: Optional[MarketPanel] = None, benchmark: str = None,
+            **overrides) -> BacktestResult:
+        """
+        运行组合回测
+
+        Args:
+            strategy_id: 组合策略ID（PORTFOLIO_STRATEGIES 的键）
+            start_date: 开始日期
+            end_date: 结束日期
+            initial_capital: 初始资金
+            commission_rate: 手续费率
+            panel: 已加载的面板（为None时从数据库读取）
+            benchmark: 基准指数代码
+            **overrides: top_n、rebalance、hold_days、conditions、rank_by、ascending
+
+        Returns:
+            BacktestResult，trades 中每条记录带 stock_code
+        """
+        if overrides.get("conditions") is None and panel is None:
+            overrides["conditions"] = self.load_conditions(strategy_id)
+        config = self.resolve_config(strategy_id, **overrides)
+        rules = CompiledRules(config["conditions"])
+        columns = sorted(set(rules.required_columns) | {config["rank_by"]})
+        self.logger.info(f"开始组合回测: {strategy_id} {config['name']} {start_date} 到 {end_date}")
+
+        if panel is None:
+            with timed_stage("load_data"):
+                universe = config["universe"]
+                codes = load_universe(universe.get("index_code"), universe.get("industry"), self.db_password)
+                if codes is not None and not codes:
+                    raise ValueError(f"股票池为空: {universe}")
+                panel = self.load_panel(start_date, end_date,
+                                        [c for c in columns if c in VALUATION_COLUMNS], codes)
+        if len(panel.dates) == 0 or len(panel.codes) == 0:
+            raise ValueError("回测区间内没有行情数据")
+
+        with timed_stage("select"):
+            close = panel.fields["close_price"]
+            rows = rebalance_indices(panel.dates, config["rebalance"], config["hold_days"])
+            frame = self.cross_sections(panel, rows, columns)
+            eligible = rules.evaluate(frame, frame["stock_code"].to_numpy()) == 1
+            eligible = eligible.reshape(len(rows), len(panel.codes)) & np.isfinite(close[rows])
+            scores = panel.fields[config["rank_by"]][rows]
+            selections = select_top(scores if config["ascending"] else -scores, eligible,
+                                    None if config["top_n"] is None else int(config["top_n"]))
+
+        with timed_stage("simulate"):
+            ledger = simulate_portfolio(close, rows, selections, initial_capital, commission_rate)
+            result = self._build_result(panel, ledger, initial_capital)
+        result.rebalance_count = len(rows)
+        if benchmark:
+            self.backtest_engine.apply_benchmark(result, benchmark)
+
+        self.logger.info(f"组合回测完成: {len(rows)} 次调仓, {result.trade_count} 笔交易, "
+                         f"总收益率 {result.total_return:.2%}")
+        return result
+
+    def _build_result(self, panel: MarketPanel, ledger: Dict[str, Any], initial_capital: float) -> BacktestResult:
+        """账本转换为与单只股票回测一致的 BacktestResult（资金曲线首点为初始资金）"""
+        equity = ledger["equity"]
+        trade_dates = pd.to_datetime(panel.dates).strftime("%Y-%m-%d").tolist()
+        trades = []
+        for t in ledger["trades"]:
+            trade = {"date": trade_dates[t["row"]], "stock_code": panel.codes[t["col"]]}
+            trade.update({k: v for k, v in t.items() if k not in ("row", "col")})
+            trades.append(trade)
+
+        result = BacktestResult()
+        result.initial_capital = initial_capital
+        result.final_capital = ledger["final_capital"]
+        result.equity_curve = [float(initial_capital)] + equity.tolist()
+        result.daily_returns = np.r_[0.0, equity[1:] / equity[:-1] - 1].tolist()
+        result.trades = trades
+        result.trade_count = len(trades)
+        with timed_stage("calendar"):
+            result.dates = self.backtest_engine.label_equity_dates(trade_dates)
+
+        with timed_stage("metrics"):
+            metrics = self.backtest_engine.calculate_performance_metrics(
+                result.equity_curve, result.daily_returns, initial_capital,
+                [0.0] + ledger["position_values"].tolist(),
+                [t["trade_return"] for t in trades if "trade_return" in t],
+            )
+        result.metrics = metrics
+        result.total_return = metrics.get("total_return", 0)
+        result.annual_return = metrics.get("annual_return", 0)
+        result.max_drawdown = metrics.get("max_drawdown", 0)
+        result.sharpe_ratio = metrics.get("sharpe_ratio", 0)
+        result.win_rate = metrics.get("win_rate", 0)
+        result.profit_loss_ratio = metrics.get("profit_loss_ratio", 0)
+        return result
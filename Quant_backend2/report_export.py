@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测报告导出模块
+- 直接从解码后的列式数组按块生成 CSV / NDJSON 文本，每次只格式化一块行；
+  文本部分的内存只与块大小有关，解码后的列式数组本身仍与报告大小成正比（负载按整体压缩，无法分块解码）
+- gzip_chunks：对任意文本块流做增量 gzip 压缩，配合 Flask 生成器响应使用
+- accepts_gzip：按 q 值解析 Accept-Encoding，q=0 视为拒绝
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+
+import numpy as np
+
+from report_storage import ACTION_NAMES, TRADE_COLUMNS
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_SECTIONS = ("all", "equity", "trades")
+# 每次格式化的行数
+EXPORT_BLOCK_ROWS = 2000
+# CSV 统一表头：资金曲线行只填 date/value，交易行填交易字段
+CSV_COLUMNS = ["type", "date", "value", "action"] + list(TRADE_COLUMNS)
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson; charset=utf-8"}
+
+
+def _block_dates(dates, lo: int, hi: int):
+    if dates is None:
+        return [""] * (hi - lo)
+    block = dates[lo:hi]
+    return np.where(np.isnat(block), "", np.datetime_as_string(block, unit="D")).tolist()
+
+
+def _clean(value):
+    """NaN 输出为空值"""
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _iter_records(decoded: Dict[str, Any], section: str, block_rows: int) -> Iterator[list]:
+    """按块产生 [(type, date, value, action, 交易字段...)] 行列表"""
+    empty_trade = [None] * len(TRADE_COLUMNS)
+    if section in ("all", "equity"):
+        equity = decoded["equity"]
+        for lo in range(0, len(equity), block_rows):
+            hi = min(lo + block_rows, len(equity))
+            dates = _block_dates(decoded["dates"], lo, hi)
+            values = equity[lo:hi].tolist()
+            yield [["equity", dates[i], values[i], None] + empty_trade for i in range(hi - lo)]
+    if section in ("all", "trades"):
+        trades = decoded["trades"]
+        count = len(trades["price"])
+        for lo in range(0, count, block_rows):
+            hi = min(lo + block_rows, count)
+            dates = _block_dates(trades["date"], lo, hi)
+            actions = [ACTION_NAMES.get(int(a), "") for a in trades["action"][lo:hi]]
+            columns = [trades[name][lo:hi].tolist() for name in TRADE_COLUMNS]
+            yield [
+                ["trade", dates[i], None, actions[i]] + [_clean(col[i]) for col in columns]
+                for i in range(hi - lo)
+            ]
+
+
+def iter_csv(decoded: Dict[str, Any], section: str = "all", block_rows: int = EXPORT_BLOCK_ROWS) -> Iterator[str]:
+    """
+    以 CSV 文本块的形式导出资金曲线与交易记录
+
+    Args:
+        decoded: decode_backtest_payload 的结果
+        section: 'all' / 'equity' / 'trades'
+        block_rows: 每块行数
+
+    Yields:
+        CSV 文本块（首块为表头）
+    """
+    yield ",".join(CSV_COLUMNS) + "\n"
+    for rows in _iter_records(decoded, section, block_rows):
+        yield "".join(
+            ",".join("" if v is None else str(v) for v in row) + "\n" for row in rows
+        )
+
+
+def iter_ndjson(decoded: Dict[str, Any], section: str = "all", block_rows: int = EXPORT_BLOCK_ROWS) -> Iterator[str]:
+    """
+    以 NDJSON（每行一个 JSON 对象）文本块的形式导出，仅输出该行类型相关的字段
+
+    Yields:
+        NDJSON 文本块
+    """
+    equity_keys = CSV_COLUMNS[:3]
+    for rows in _iter_records(decoded, section, block_rows):
+        lines = []
+        for row in rows:
+            if row[0] == "equity":
+                record = dict(zip(equity_keys, row[:3]))
+            else:
+                record = {k: v for k, v in zip(CSV_COLUMNS, row) if k != "value"}
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        yield "".join(lines)
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """对文本块流做增量 gzip 压缩"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    按 Accept-Encoding 的 q 值判断客户端是否接受 gzip
+
+    gzip（或 x-gzip）显式出现时取其 q 值，否则取通配符 * 的 q 值；q=0 表示拒绝，格式错误的项忽略
+    """
+    explicit, wildcard = None, None
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = None
+        if q is None or not 0 <= q <= 1:
+            continue
+        if coding in ("gzip", "x-gzip"):
+            explicit = q if explicit is None else max(explicit, q)
+        elif coding == "*":
+            wildcard = q
+    q = explicit if explicit is not None else wildcard
+    return bool(q)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测报告列式存储模块
+- 资金曲线与交易记录按列编码为紧凑的二进制负载（可选 zlib 压缩），存放于 BacktestReportData 表，按 report_id 关联
+- 日期以相对基准日的 int32 天数偏移存储；数值列为定长 NumPy 数组
+- 解码时通过 np.frombuffer 直接在负载缓冲区上建立数组视图，不逐点构造 Python 对象
+- 可附带预计算的资金曲线降采样下标（按点数分档），图表无需读取全量数据
+- new_report_id：按时间有序、进程内单调递增的 ULID 报告ID，并发与批量回测不会主键冲突
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk_rules import EXIT_REASONS
+
+# 负载格式：1 字节压缩标志 + [4 字节魔数 + 4 字节头长度 + JSON 头 + 8 字节对齐的列数据]
+PAYLOAD_MAGIC = b"BTR1"
+FLAG_RAW = b"R"
+FLAG_ZLIB = b"Z"
+# 小于该字节数的负载不压缩
+COMPRESS_MIN_BYTES = 1024
+
+# ULID 使用的 Crockford Base32 字母表
+ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+REPORT_ID_PREFIX = "RPT_"
+
+# 交易方向编码
+ACTION_CODES = {"buy": 1, "sell": -1}
+ACTION_NAMES = {v: k for k, v in ACTION_CODES.items()}
+# 卖出离场原因编码（0 表示无，如买入记录或旧报告）
+EXIT_REASON_CODES = {name: i + 1 for i, name in enumerate(EXIT_REASONS)}
+EXIT_REASON_NAMES = {v: k for k, v in EXIT_REASON_CODES.items()}
+
+# 交易记录的数值列及其存储类型
+TRADE_COLUMNS = {
+    "price": np.float64,
+    "shares": np.int64,
+    "commission": np.float64,
+    "trade_return": np.float64,
+    "capital_after": np.float64,
+}
+
+
+def pack_columns(columns: Dict[str, np.ndarray], meta: Dict[str, Any] = None, compress: bool = True) -> bytes:
+    """
+    将若干定长 NumPy 数组打包为一个二进制负载
+
+    Args:
+        columns: {列名: 一维数组}，数组必须为数值类型
+        meta: 附加到头部的元数据（可 JSON 序列化）
+        compress: 是否尝试 zlib 压缩
+
+    Returns:
+        负载字节串
+    """
+    layout = []
+    body = bytearray()
+    for name, array in columns.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.kind not in "biuf":
+            raise TypeError(f"列 {name} 不是数值类型: {array.dtype}")
+        # 8 字节对齐，保证 frombuffer 视图对齐
+        body.extend(b"\0" * (-len(body) % 8))
+        layout.append([name, array.dtype.str, len(body), len(array)])
+        body.extend(array.tobytes())
+    header = json.dumps({"meta": meta or {}, "columns": layout}, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(len(header) + 8) % 8)
+    raw = PAYLOAD_MAGIC + struct.pack("<I", len(header)) + header + bytes(body)
+    if compress and len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return FLAG_ZLIB + packed
+    return FLAG_RAW + raw
+
+
+def unpack_columns(payload: bytes) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    解码 pack_columns 产生的负载，数组为负载缓冲区上的只读视图
+
+    Returns:
+        (meta, {列名: 数组})
+    """
+    flag, data = payload[:1], memoryview(payload)[1:]
+    if flag == FLAG_ZLIB:
+        data = memoryview(zlib.decompress(data))
+    elif flag != FLAG_RAW:
+        raise ValueError("未知的回测负载格式")
+    if bytes(data[:4]) != PAYLOAD_MAGIC:
+        raise ValueError("回测负载魔数不匹配")
+    (header_len,) = struct.unpack("<I", data[4:8])
+    header = json.loads(bytes(data[8 : 8 + header_len]).decode("utf-8"))
+    body = data[8 + header_len :]
+    columns = {
+        name: np.frombuffer(body, dtype=np.dtype(dtype), count=length, offset=offset)
+        for name, dtype, offset, length in header["columns"]
+    }
+    return header["meta"], columns
+
+
+def _to_day(value) -> Optional[np.datetime64]:
+    if value is None or value == "":
+        return None
+    return np.datetime64(pd.Timestamp(value).date(), "D")
+
+
+def encode_backtest_payload(
+    equity_curve: List[float],
+    dates: Optional[List[Any]] = None,
+    trades: Optional[List[Dict[str, Any]]] = None,
+    extra: Optional[Dict[str, Any]] = None,
+    compress: bool = True,
+    tiers: Optional[Dict[int, np.ndarray]] = None,
+) -> bytes:
+    """
+    编码回测的资金曲线与交易记录
+
+    Args:
+        equity_curve: 资金曲线
+        dates: 与资金曲线逐点对应的日期（可为空）
+        trades: 交易记录列表（simulate_trading 的格式）
+        extra: 附加元数据（如其他可 JSON 序列化的小字段）
+        compress: 是否压缩
+        tiers: 预计算的降采样下标 {点数: 下标数组}
+
+    Returns:
+        负载字节串
+    """
+    trades = trades or []
+    all_days = [_to_day(d) for d in (dates or [])] + [_to_day(t.get("date")) for t in trades]
+    known = [d for d in all_days if d is not None]
+    base = min(known) if known else np.datetime64("1970-01-01", "D")
+
+    def offsets(values):
+        days = [_to_day(v) for v in values]
+        return np.array([(d - base).astype(np.int64) if d is not None else -1 for d in days], dtype=np.int32)
+
+    columns = {"equity": np.asarray(equity_curve, dtype=np.float64)}
+    if dates:
+        columns["date_offset"] = offsets(dates)
+    columns["trade_date_offset"] = offsets([t.get("date") for t in trades])
+    columns["trade_action"] = np.array([ACTION_CODES.get(t.get("action"), 0) for t in trades], dtype=np.int8)
+    columns["trade_exit_reason"] = np.array(
+        [EXIT_REASON_CODES.get(t.get("exit_reason"), 0) for t in trades], dtype=np.int8
+    )
+    for name, dtype in TRADE_COLUMNS.items():
+        default = 0 if np.dtype(dtype).kind == "i" else np.nan
+        values = [t.get(name) for t in trades]
+        columns[f"trade_{name}"] = np.array(
+            [default if v is None else v for v in values], dtype=dtype
+        )
+
+    # 组合回测的交易记录带股票代码：代码表存入头部，列中存下标（-1 表示无）
+    stock_codes = sorted({t["stock_code"] for t in trades if t.get("stock_code")})
+    if stock_codes:
+        position = {code: i for i, code in enumerate(stock_codes)}
+        columns["trade_stock_index"] = np.array(
+            [position.get(t.get("stock_code"), -1) for t in trades], dtype=np.int32
+        )
+
+    for points, indices in (tiers or {}).items():
+        columns[f"tier_{int(points)}"] = np.asarray(indices, dtype=np.int32)
+
+    meta = {"base_date": str(base), "version": 1, "tiers": sorted(int(p) for p in (tiers or {}))}
+    if stock_codes:
+        meta["stock_codes"] = stock_codes
+    if extra:
+        meta["extra"] = extra
+    return pack_columns(columns, meta, compress)
+
+
+def decode_backtest_payload(payload: bytes) -> Dict[str, Any]:
+    """
+    解码回测负载
+
+    Returns:
+        {
+            'equity': float64 数组,
+            'dates': datetime64[D] 数组或 None,
+            'trades': {'date': datetime64[D], 'action': int8, 'exit_reason': int8, 'price': ..., ...}
+                      （组合回测另有 'stock_code' 对象数组）,
+            'extra': 附加元数据,
+            'tiers': {点数: int32 下标数组}
+        }
+    """
+    meta, columns = unpack_columns(payload)
+    base = np.datetime64(meta["base_date"], "D")
+
+    def to_dates(offsets):
+        dates = base + offsets.astype("timedelta64[D]")
+        return np.where(offsets < 0, np.datetime64("NaT"), dates)
+
+    trades = {"date": to_dates(columns["trade_date_offset"]), "action": columns["trade_action"]}
+    for name in TRADE_COLUMNS:
+        trades[name] = columns[f"trade_{name}"]
+    trades["exit_reason"] = columns.get("trade_exit_reason", np.zeros(len(trades["action"]), dtype=np.int8))
+    if "trade_stock_index" in columns:
+        names = np.array(meta.get("stock_codes", []) + [""], dtype=object)
+        trades["stock_code"] = names[columns["trade_stock_index"]]
+    return {
+        "equity": columns["equity"],
+        "dates": to_dates(columns["date_offset"]) if "date_offset" in columns else None,
+        "trades": trades,
+        "extra": meta.get("extra", {}),
+        "tiers": {p: columns[f"tier_{p}"] for p in meta.get("tiers", [])},
+    }
+
+
+def format_dates(dates: np.ndarray) -> List[str]:
+    """datetime64[D] 数组批量格式化为 YYYY-MM-DD 字符串（NaT 为空串）"""
+    text = np.datetime_as_string(dates, unit="D")
+    return np.where(np.isnat(dates), "", text).tolist()
+
+
+class MonotonicUlid:
+    """
+    ULID 生成器：48 位毫秒时间戳 + 80 位随机数，编码为 26 位 Crockford Base32，字典序即时间序。
+    同一毫秒内（或时钟回拨时）沿用上一个时间戳并把随机部分加一，保证进程内严格递增。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_ms = -1
+        self.last_random = 0
+
+    def __call__(self) -> str:
+        with self.lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self.last_ms:
+                ms = self.last_ms
+                self.last_random += 1
+                if self.last_random >> 80:
+                    # 随机部分溢出（同一毫秒内生成 2^80 个以上）时借用下一毫秒
+                    ms += 1
+                    self.last_random = int.from_bytes(os.urandom(10), "big") >> 1
+            else:
+                self.last_random = int.from_bytes(os.urandom(10), "big")
+            self.last_ms = ms
+            value = (ms << 80) | self.last_random
+        chars = []
+        for _ in range(26):
+            chars.append(ULID_ALPHABET[value & 31])
+            value >>= 5
+        return "".join(reversed(chars))
+
+
+_ulid = MonotonicUlid()
+
+
+def new_report_id() -> str:
+    """新的回测报告ID，如 RPT_01J9ZQ3K5V7W8X9Y0A1B2C3D4E"""
+    return REPORT_ID_PREFIX + _ulid()
+
+
+def save_report_payload(cursor, report_id: str, payload: bytes):
+    """写入（或覆盖）报告的列式负载，调用方负责提交事务"""
+    cursor.execute(
+        "INSERT INTO BacktestReportData (report_id, payload) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE payload = VALUES(payload)",
+        (report_id, payload),
+    )
+
+
+def save_report_payloads(cursor, items: List[Tuple[str, bytes]]):
+    """批量写入（或覆盖）多份报告的列式负载，调用方负责提交事务"""
+    if items:
+        cursor.executemany(
+            "INSERT INTO BacktestReportData (report_id, payload) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE payload = VALUES(payload)",
+            items,
+        )
+
+
+def load_report_payload(cursor, report_id: str) -> Optional[bytes]:
+    """读取报告的列式负载，不存在时返回 None"""
+    cursor.execute("SELECT payload FROM BacktestReportData WHERE report_id = %s", (report_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return row["payload"] if isinstance(row, dict) else row[0]
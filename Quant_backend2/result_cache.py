@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测结果缓存模块
+- request_key：对规范化后的回测输入（用户、策略指纹、股票、区间、资金、手续费、基准、风控）做内容哈希
+- SingleFlight：同一键的并发请求只有一个真正执行，其余等待并共享其结果（或异常）
+- ResultCache：键加数据版本命中时直接返回已保存的回测结果与报告ID，不再重复计算与写入 BacktestReport；
+  股票在区间内的行情、规则策略读取的估值与资产负债表、以及基准指数收盘价任一变化后条目失效
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pymysql
+
+from benchmark import get_benchmark_provider
+from metrics_registry import REGISTRY, MetricsRegistry
+from signal_cache import data_version, fundamentals_version, market_version
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 进程内最多缓存的回测结果数量
+RESULT_CACHE_SIZE = 128
+
+
+def request_key(**inputs) -> str:
+    """规范化回测输入的内容哈希（键顺序无关，数值统一为浮点）"""
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return value
+
+    text = json.dumps(normalize(inputs), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def market_data_version(stock_code: str, start_date, end_date, db_password: str = None,
+                        fundamentals: bool = False, market: bool = False) -> Optional[Tuple]:
+    """
+    查询股票在区间内的行情数据版本（见 signal_cache.data_version）
+
+    Args:
+        fundamentals: 为 True 时（规则策略）附加估值与资产负债表的数据版本
+        market: 为 True 时（与市场平均值比较的规则策略）附加区间内全市场行情的数据版本
+    """
+    connection = pymysql.connect(
+        host=DB_DEFAULTS["host"],
+        port=DB_DEFAULTS["port"],
+        user=DB_DEFAULTS["user"],
+        password=db_password if db_password is not None else DB_DEFAULTS["password"],
+        database=DB_DEFAULTS["database"],
+        charset=DB_DEFAULTS["charset"],
+    )
+    try:
+        version = data_version(connection, stock_code, start_date, end_date)
+        if version is not None and fundamentals:
+            version += fundamentals_version(connection, stock_code, start_date, end_date)
+        if version is not None and market:
+            version += market_version(connection, start_date, end_date)
+        return version
+    finally:
+        connection.close()
+
+
+def benchmark_version(ts_code: str, start_date, end_date, provider=None) -> Tuple:
+    """
+    基准指数在区间内收盘价的数据版本（条数、最后交易日与数值哈希），取自回测本身使用的基准缓存
+
+    Args:
+        provider: 基准数据来源，默认为 benchmark.get_benchmark_provider()
+    """
+    provider = provider or get_benchmark_provider()
+    try:
+        closes = provider.get_closes(ts_code, start_date, end_date)
+    except Exception as e:
+        # 回测同样拿不到基准数据，结果中不含基准指标
+        logger.warning(f"读取基准指数 {ts_code} 失败: {e}")
+        return (ts_code, "unavailable")
+    digest = hashlib.sha256(closes.to_numpy(dtype="float64").tobytes()).hexdigest()
+    last = str(closes.index[-1].date()) if len(closes) else None
+    return (ts_code, len(closes), last, digest)
+
+
+class _Call:
+    """一次进行中的计算"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """相同键的并发调用合并为一次执行"""
+
+    def __init__(self):
+        self.calls: Dict[Any, _Call] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn，若同一键已有调用在执行则等待其完成
+
+        Returns:
+            (结果, 是否共享了其他请求的执行)；执行失败时每个等待者都抛出同一异常
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.value, False
+
+
+class ResultCache:
+    """按行情数据版本失效的回测结果 LRU 缓存，未命中时经 SingleFlight 计算"""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            maxsize: 最多缓存的结果数量，0 表示只合并并发请求、不缓存
+            registry: 指标注册表
+        """
+        self.maxsize = maxsize
+        self.cache = OrderedDict()  # 请求键 -> (数据版本, 结果)
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.requests = registry.counter("result_cache_requests_total", "回测结果缓存查询次数", ("result",))
+        self.logger = logger
+
+    def get_or_compute(self, key: str, version: Optional[Tuple], compute: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Args:
+            key: request_key 的结果
+            version: 行情数据版本，为 None（区间内无数据）时不缓存
+            compute: 计算并保存结果的函数
+
+        Returns:
+            (结果, 来源)，来源为 hit（缓存命中）、shared（与并发的相同请求共享）或 miss（本次计算）
+        """
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] == version and version is not None:
+                self.cache.move_to_end(key)
+                self.requests.inc(result="hit")
+                return entry[1], "hit"
+
+        def compute_and_store():
+            value = compute()
+            # 在释放 SingleFlight 之前放入缓存，之后到达的相同请求直接命中
+            if version is not None and self.maxsize > 0:
+                with self.lock:
+                    self.cache[key] = (version, value)
+                    self.cache.move_to_end(key)
+                    while len(self.cache) > self.maxsize:
+                        self.cache.popitem(last=False)
+            return value
+
+        value, shared = self.flight.do((key, version), compute_and_store)
+        self.requests.inc(result="shared" if shared else "miss")
+        return value, "shared" if shared else "miss"
+
+    def discard(self, predicate: Callable[[Any], bool]) -> int:
+        """丢弃结果满足 predicate 的条目（如报告被删除），返回丢弃数量"""
+        with self.lock:
+            keys = [k for k, (_, value) in self.cache.items() if predicate(value)]
+            for key in keys:
+                del self.cache[key]
+        return len(keys)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """进程内共享的回测结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+风控离场规则模块
+- 支持止损、止盈、移动止损（自入场以来最高收盘价回撤）与最长持仓天数
+- 在模拟交易之前把离场点写回信号序列，路径依赖的离场查找由 kernels.resolve_exits 完成
+- 与 simulate_trading 一致，触发判断与成交均使用收盘价
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import kernels
+
+RISK_RULES = ("stop_loss", "take_profit", "trailing_stop", "max_holding_days")
+# 前端驼峰命名的别名
+RISK_RULE_ALIASES = {
+    "stopLoss": "stop_loss",
+    "takeProfit": "take_profit",
+    "trailingStop": "trailing_stop",
+    "maxHoldingDays": "max_holding_days",
+}
+# 离场原因，同一根K线上多条规则同时触发时按此顺序取第一条（偏保守）
+EXIT_REASONS = ("signal", "stop_loss", "trailing_stop", "take_profit", "max_holding_days", "end_of_data")
+# 离场原因编码（kernels.resolve_exits 的输出）到名称
+_REASON_LOOKUP = np.array(("",) + EXIT_REASONS, dtype=object)
+
+
+def parse_risk_rules(config: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    解析请求中的 risk_management 配置
+
+    Args:
+        config: 如 {'stop_loss': 0.05, 'take_profit': 0.2, 'trailing_stop': 0.08, 'max_holding_days': 20}，
+            比例均为小数；值为空或 0 表示不启用该规则
+
+    Returns:
+        启用的规则 {规则名: 阈值}
+
+    Raises:
+        ValueError: 阈值非法
+    """
+    if not isinstance(config or {}, dict):
+        raise ValueError("risk_management 必须为对象")
+    rules = {}
+    for key, value in (config or {}).items():
+        name = RISK_RULE_ALIASES.get(key, key)
+        if name not in RISK_RULES or value in (None, "", 0, False):
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"风控参数 {key} 必须为数值")
+        if name in ("stop_loss", "trailing_stop") and not 0 < value < 1:
+            raise ValueError(f"风控参数 {key} 必须在 0 到 1 之间")
+        if name == "take_profit" and value <= 0:
+            raise ValueError(f"风控参数 {key} 必须大于 0")
+        if name == "max_holding_days":
+            if value < 1 or value != int(value):
+                raise ValueError(f"风控参数 {key} 必须为正整数")
+            value = int(value)
+        rules[name] = value
+    return rules
+
+
+def resolve_exits(close: np.ndarray, signal: np.ndarray, rules: Dict[str, float],
+                  initial_capital: float = 0.0, commission_rate: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按与 simulate_trading 相同的持仓语义（空仓时 1 买入，持仓时 -1 卖出）逐笔确定离场点
+
+    Args:
+        close: 收盘价
+        signal: 策略信号（1 买入，-1 卖出，0 持有）
+        rules: parse_risk_rules 的结果
+        initial_capital / commission_rate: 模拟交易的初始资金与手续费率，资金不足而不会成交的买入信号不开仓；
+            initial_capital 为 0 时每个买入信号都视为开仓
+
+    Returns:
+        (调整后的信号, 各K线的离场原因，非离场K线为空串)
+    """
+    signal = np.nan_to_num(np.asarray(signal, dtype=np.float64))
+    out, codes = kernels.resolve_exits(
+        close, signal,
+        stop_loss=rules.get("stop_loss", 0.0),
+        take_profit=rules.get("take_profit", 0.0),
+        trailing_stop=rules.get("trailing_stop", 0.0),
+        max_holding_days=rules.get("max_holding_days", 0),
+        initial_capital=initial_capital,
+        commission_rate=commission_rate,
+    )
+    return out, _REASON_LOOKUP[codes]
+
+
+def apply_risk_rules(signals: pd.DataFrame, rules: Optional[Dict[str, float]],
+                     initial_capital: float = 0.0, commission_rate: float = 0.0) -> pd.DataFrame:
+    """
+    将风控离场写回信号表（返回副本），增加 exit_reason 列
+
+    Args:
+        signals: 含 close_price 与 signal 列的信号表
+        rules: parse_risk_rules 的结果，为空时只标注策略信号离场
+        initial_capital / commission_rate: 见 resolve_exits
+
+    Returns:
+        调整后的信号表
+    """
+    signal, reasons = resolve_exits(signals["close_price"].to_numpy(dtype=np.float64),
+                                    signals["signal"].to_numpy(), rules or {}, initial_capital, commission_rate)
+    adjusted = signals.copy()
+    adjusted["signal"] = signal
+    adjusted["exit_reason"] = reasons
+    return adjusted
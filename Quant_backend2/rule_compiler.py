@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+规则策略编译模块
+- 读取 StrategyCondition 中某个策略的条件（指标、比较方式、阈值、信号动作、顺序），
+  编译为在整列数据上运算的布尔掩码，不逐行求值
+- 每个 indicator_id 解析为一个向量化序列，同一次求值中多个条件引用同一指标时只计算一次
+- 同一信号动作的多个条件取“且”；买入优先于卖出，hold 条件成立时不产生信号
+- 既可用于单只股票，也可对按股票分组的全市场面板一次性求值（滚动计算按股票分组）
+- 比较指标：
+    MA5 / MA20 为收盘价与均线之比（阈值 1.01 表示高于均线 1%），VOLUME_MA 为成交量与其均线之比，
+    RSI 与 RSIMeanReversionStrategy 一致，MACD 为柱状值（DIF - DEA），BOLL 为 %B 位置，
+    DUAL_THRUST 为 (收盘 - 开盘) / Range（与 DualThrustStrategy 一致，未设阈值时以 K1 / -K2 为上下轨）；
+    MARKET_CAP / PB_RATIO 取自 StockValuation，DEBT_RATIO / CURRENT_RATIO 由资产负债表时点数据计算
+- greater / less 未设置阈值时与当日截面均值比较（如“负债比例高于市场平均值”），
+  指标自带默认阈值（DUAL_THRUST）时使用默认阈值；截面均值必须来自全市场：面板求值时取面板当日均值，
+  单只股票或分块求值时须通过 references 传入全市场均值（可由 cross_section_totals 跨分块累加得到）
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pymysql
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fundamentals_pit import PointInTimeFundamentals
+from market_data_reader import SQL_CODE_BATCH
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+CONDITION_TYPES = ("greater", "less", "between", "cross_up", "cross_down")
+SIGNAL_ACTIONS = ("buy", "sell", "hold")
+# 估值表与资产负债表提供的列
+VALUATION_COLUMNS = ("market_cap", "pb_ratio")
+# StockValuation.market_cap 为 tushare total_mv（万元），条件阈值按元填写（如 COND_001 的 20-30 亿）
+MARKET_CAP_UNIT = 10000
+BALANCE_SHEET_COLUMNS = ("total_assets", "total_liability", "total_current_assets", "total_current_liability")
+
+
+class MarketMeanRequired(ValueError):
+    """单只股票求值遇到与市场平均值比较的条件，但未提供全市场截面均值"""
+
+
+def _rolling(series: pd.Series, groups, period: int, how: str) -> pd.Series:
+    """滚动统计，面板数据按股票分组计算"""
+    if groups is None:
+        return getattr(series.rolling(window=period), how)()
+    return series.groupby(groups, sort=False).transform(lambda s: getattr(s.rolling(window=period), how)())
+
+
+def _ewm(series: pd.Series, groups, span: int) -> pd.Series:
+    if groups is None:
+        return series.ewm(span=span, adjust=False).mean()
+    return series.groupby(groups, sort=False).transform(lambda s: s.ewm(span=span, adjust=False).mean())
+
+
+def _group_position(groups, n: int) -> np.ndarray:
+    """每行在所属分组（连续行）内的序号，单只股票时即行号"""
+    index = np.arange(n)
+    if groups is None:
+        return index
+    groups = np.asarray(groups)
+    starts = np.r_[True, groups[1:] != groups[:-1]] if n else np.array([], dtype=bool)
+    return index - np.maximum.accumulate(np.where(starts, index, 0))
+
+
+def _window_extreme(values: np.ndarray, groups, period: int, how: str) -> np.ndarray:
+    """前 period 个交易日（不含当日）的最大/最小值；面板数据要求同一股票的行连续"""
+    out = np.full(len(values), np.nan)
+    if len(values) > period:
+        windows = sliding_window_view(values[:-1], period)
+        out[period:] = windows.max(axis=1) if how == "max" else windows.min(axis=1)
+    out[_group_position(groups, len(values)) < period] = np.nan
+    return out
+
+
+def dual_thrust_range(frame: pd.DataFrame, groups, period: int) -> np.ndarray:
+    """
+    Dual Thrust 的 Range = max(HH - LC, HC - LL)，取前 period 个交易日（不含当日）的
+    最高价最高值 HH、收盘价最低值 LC、收盘价最高值 HC、最低价最低值 LL
+
+    Args:
+        frame: 已按 (股票, 日期) 排序的数据
+        groups: 面板数据的分组键，单只股票为 None
+        period: 回看天数 N
+
+    Returns:
+        float64 数组，前 period 行（每只股票）为 NaN
+    """
+    high = frame["high_price"].to_numpy(dtype=np.float64)
+    low = frame["low_price"].to_numpy(dtype=np.float64)
+    close = frame["close_price"].to_numpy(dtype=np.float64)
+    hh, ll = _window_extreme(high, groups, period, "max"), _window_extreme(low, groups, period, "min")
+    hc, lc = _window_extreme(close, groups, period, "max"), _window_extreme(close, groups, period, "min")
+    return np.maximum(hh - lc, hc - ll)
+
+
+def _dual_thrust_position(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    value_range = dual_thrust_range(frame, groups, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position = (frame["close_price"].to_numpy(dtype=np.float64) - frame["open_price"].to_numpy(dtype=np.float64)) / value_range
+    return pd.Series(position, index=frame.index)
+
+
+def _price_to_ma(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    return frame["close_price"] / _rolling(frame["close_price"], groups, period, "mean")
+
+
+def _volume_to_ma(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    volume = frame["volume"].astype(np.float64)
+    return volume / _rolling(volume, groups, period, "mean")
+
+
+def _rsi(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    close = frame["close_price"]
+    delta = close.diff() if groups is None else close.groupby(groups, sort=False).diff()
+    gain = _rolling(delta.where(delta > 0, 0), groups, period, "mean")
+    loss = _rolling(-delta.where(delta < 0, 0), groups, period, "mean")
+    return 100 - (100 / (1 + gain / loss))
+
+
+def _macd_hist(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    close = frame["close_price"]
+    macd_line = _ewm(close, groups, 12) - _ewm(close, groups, 26)
+    return macd_line - _ewm(macd_line, groups, 9)
+
+
+def _boll_percent_b(frame: pd.DataFrame, groups, period: int) -> pd.Series:
+    close = frame["close_price"]
+    mid = _rolling(close, groups, period, "mean")
+    std = _rolling(close, groups, period, "std")
+    return (close - (mid - 2 * std)) / (4 * std)
+
+
+def _column(name: str) -> Callable:
+    return lambda frame, groups, period: frame[name].astype(np.float64)
+
+
+def _ratio(numerator: str, denominator: str) -> Callable:
+    return lambda frame, groups, period: frame[numerator].astype(np.float64) / frame[denominator].astype(np.float64)
+
+
+# Dual Thrust 默认上下轨系数（上轨 = 开盘 + K1 * Range，下轨 = 开盘 - K2 * Range）
+DUAL_THRUST_K1 = 0.5
+DUAL_THRUST_K2 = 0.5
+
+# indicator_id -> 计算方式、依赖列与默认周期（TechnicalIndicator.default_period 可覆盖），
+# thresholds 为 greater / less 未设阈值时使用的默认阈值
+INDICATORS: Dict[str, Dict[str, Any]] = {
+    "MA5": {"func": _price_to_ma, "columns": ("close_price",), "period": 5},
+    "MA20": {"func": _price_to_ma, "columns": ("close_price",), "period": 20},
+    "VOLUME_MA": {"func": _volume_to_ma, "columns": ("volume",), "period": 10},
+    "RSI": {"func": _rsi, "columns": ("close_price",), "period": 14},
+    "MACD": {"func": _macd_hist, "columns": ("close_price",), "period": None},
+    "BOLL": {"func": _boll_percent_b, "columns": ("close_price",), "period": 20},
+    "DUAL_THRUST": {
+        "func": _dual_thrust_position,
+        "columns": ("open_price", "high_price", "low_price", "close_price"),
+        "period": 10,
+        "thresholds": {"greater": DUAL_THRUST_K1, "less": -DUAL_THRUST_K2},
+    },
+    "MARKET_CAP": {"func": _column("market_cap"), "columns": ("market_cap",), "period": None},
+    "PB_RATIO": {"func": _column("pb_ratio"), "columns": ("pb_ratio",), "period": None},
+    "DEBT_RATIO": {
+        "func": _ratio("total_liability", "total_assets"),
+        "columns": ("total_liability", "total_assets"),
+        "period": None,
+    },
+    "CURRENT_RATIO": {
+        "func": _ratio("total_current_assets", "total_current_liability"),
+        "columns": ("total_current_assets", "total_current_liability"),
+        "period": None,
+    },
+}
+
+
+def _threshold(value) -> Optional[float]:
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else float(value)
+
+
+def normalize_conditions(conditions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    校验条件并按 condition_order 排序
+
+    Args:
+        conditions: StrategyCondition 行（字典），可附带 period 覆盖指标默认周期
+
+    Returns:
+        规范化后的条件列表
+
+    Raises:
+        ValueError: 指标、比较方式、信号动作或阈值不合法
+    """
+    normalized = []
+    for cond in conditions:
+        indicator_id = cond.get("indicator_id")
+        condition_type = cond.get("condition_type")
+        action = cond.get("signal_action")
+        if indicator_id not in INDICATORS:
+            raise ValueError(f"不支持的指标: {indicator_id}，支持的指标: {sorted(INDICATORS)}")
+        if condition_type not in CONDITION_TYPES:
+            raise ValueError(f"不支持的条件类型: {condition_type}")
+        if action not in SIGNAL_ACTIONS:
+            raise ValueError(f"不支持的信号动作: {action}")
+        low, high = _threshold(cond.get("threshold_min")), _threshold(cond.get("threshold_max"))
+        if condition_type.startswith("cross") and low is None and high is None:
+            raise ValueError(f"条件 {cond.get('condition_id', indicator_id)} 缺少穿越阈值")
+        if low is not None and high is not None and low > high:
+            raise ValueError(f"条件 {cond.get('condition_id', indicator_id)} 的阈值下限大于上限")
+        period = cond.get("period") or INDICATORS[indicator_id]["period"]
+        normalized.append({
+            "condition_id": cond.get("condition_id"),
+            "indicator_id": indicator_id,
+            "condition_type": condition_type,
+            "threshold_min": low,
+            "threshold_max": high,
+            "signal_action": action,
+            "condition_order": int(cond.get("condition_order") or 0),
+            "period": int(period) if period else None,
+        })
+    return sorted(normalized, key=lambda c: c["condition_order"])
+
+
+class CompiledRules:
+    """编译后的条件集合"""
+
+    def __init__(self, conditions: List[Dict[str, Any]]):
+        self.conditions = normalize_conditions(conditions)
+        self.required_columns = sorted({
+            column for cond in self.conditions for column in INDICATORS[cond["indicator_id"]]["columns"]
+        })
+
+    def indicator_series(self, frame: pd.DataFrame, groups, cache: Dict) -> Callable:
+        """返回按 (indicator_id, period) 缓存的指标取值函数"""
+        def resolve(indicator_id: str, period: Optional[int]) -> np.ndarray:
+            key = (indicator_id, period)
+            if key not in cache:
+                series = INDICATORS[indicator_id]["func"](frame, groups, period)
+                cache[key] = series.to_numpy(dtype=np.float64)
+            return cache[key]
+        return resolve
+
+    @staticmethod
+    def _is_cross_section(cond: Dict[str, Any]) -> bool:
+        """greater / less 未设阈值且指标无默认阈值：与当日全市场均值比较"""
+        return (cond["condition_type"] in ("greater", "less") and cond["threshold_min"] is None
+                and cond["threshold_max"] is None and not INDICATORS[cond["indicator_id"]].get("thresholds"))
+
+    @property
+    def cross_section_keys(self) -> List[Tuple[str, Optional[int]]]:
+        """需要全市场截面均值的 (indicator_id, period)"""
+        keys = []
+        for cond in self.conditions:
+            key = (cond["indicator_id"], cond["period"])
+            if self._is_cross_section(cond) and key not in keys:
+                keys.append(key)
+        return keys
+
+    def cross_section_totals(self, frame: pd.DataFrame, groups=None) -> Dict[Tuple, pd.DataFrame]:
+        """
+        各截面指标按交易日的合计与非空个数，多个分块的结果可用 combine_cross_sections 合并为全市场均值
+
+        Returns:
+            {(indicator_id, period): DataFrame(index=交易日, columns=['sum', 'count'])}
+        """
+        resolve = self.indicator_series(frame, groups, {})
+        dates = frame["trade_date"].to_numpy()
+        totals = {}
+        for key in self.cross_section_keys:
+            values = pd.Series(resolve(*key))
+            present = values.notna()
+            totals[key] = pd.DataFrame({
+                "sum": values.where(present, 0.0).to_numpy(), "count": present.astype(np.int64).to_numpy(),
+            }).groupby(dates).sum()
+        return totals
+
+    def _reference(self, cond: Dict[str, Any], values: np.ndarray, frame: pd.DataFrame, groups,
+                   references: Optional[Dict[Tuple, pd.Series]]) -> np.ndarray:
+        key = (cond["indicator_id"], cond["period"])
+        if references is not None and key in references:
+            mean = references[key]
+            return mean.reindex(pd.DatetimeIndex(frame["trade_date"])).to_numpy(dtype=np.float64)
+        if groups is None:
+            # 单只股票的“当日均值”就是自身取值，比较恒不成立
+            raise MarketMeanRequired(
+                f"条件 {cond.get('condition_id') or cond['indicator_id']} 与市场平均值比较，"
+                f"单只股票求值需要全市场截面均值，请使用组合回测或提供 references"
+            )
+        mean = pd.Series(values, index=frame.index).groupby(frame["trade_date"].to_numpy()).transform("mean")
+        return mean.to_numpy(dtype=np.float64)
+
+    def _mask(self, cond: Dict[str, Any], values: np.ndarray, frame: pd.DataFrame, groups,
+              references: Optional[Dict[Tuple, pd.Series]] = None) -> np.ndarray:
+        low, high = cond["threshold_min"], cond["threshold_max"]
+        kind = cond["condition_type"]
+        with np.errstate(invalid="ignore"):
+            defaults = INDICATORS[cond["indicator_id"]].get("thresholds")
+            if kind in ("greater", "less") and low is None and high is None and defaults:
+                return values > defaults["greater"] if kind == "greater" else values < defaults["less"]
+            if self._is_cross_section(cond):
+                # 未设置阈值：与当日截面均值比较
+                reference = self._reference(cond, values, frame, groups, references)
+                return values > reference if kind == "greater" else values < reference
+            if kind == "greater":
+                return values > (low if low is not None else high)
+            if kind == "less":
+                return values < (high if high is not None else low)
+            if kind == "between":
+                mask = np.isfinite(values)
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+                return mask
+            level = low if low is not None else high
+            series = pd.Series(values)
+            previous = (series.shift(1) if groups is None else series.groupby(groups, sort=False).shift(1)).to_numpy()
+            if kind == "cross_up":
+                return (values >= level) & (previous < level)
+            return (values <= level) & (previous > level)
+
+    def evaluate(self, frame: pd.DataFrame, groups=None,
+                 references: Optional[Dict[Tuple, pd.Series]] = None) -> np.ndarray:
+        """
+        计算信号
+
+        Args:
+            frame: 已按 (股票, 日期) 排序、索引从 0 开始的数据
+            groups: 面板数据的分组键（如 stock_code 列的数组），单只股票为 None
+            references: 全市场截面均值 {(indicator_id, period): 以交易日为索引的序列}，
+                未提供时面板取自身当日均值，单只股票遇到截面条件时报错
+
+        Returns:
+            int64 信号数组（1 买入，-1 卖出，0 无）
+        """
+        missing = [c for c in self.required_columns if c not in frame.columns]
+        if missing:
+            raise ValueError(f"规则策略缺少数据列: {missing}")
+        resolve = self.indicator_series(frame, groups, {})
+        n = len(frame)
+        masks = {action: None for action in SIGNAL_ACTIONS}
+        for cond in self.conditions:
+            mask = self._mask(cond, resolve(cond["indicator_id"], cond["period"]), frame, groups, references)
+            action = cond["signal_action"]
+            masks[action] = mask if masks[action] is None else masks[action] & mask
+        buy = masks["buy"] if masks["buy"] is not None else np.zeros(n, dtype=bool)
+        sell = masks["sell"] if masks["sell"] is not None else np.zeros(n, dtype=bool)
+        signal = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int64)
+        if masks["hold"] is not None:
+            signal[masks["hold"]] = 0
+        return signal
+
+
+def combine_cross_sections(parts: Iterable[Dict[Tuple, pd.DataFrame]]) -> Dict[Tuple, pd.Series]:
+    """合并多个分块的 cross_section_totals，返回各指标按交易日的全市场均值"""
+    merged: Dict[Tuple, List[pd.DataFrame]] = {}
+    for part in parts:
+        for key, totals in part.items():
+            merged.setdefault(key, []).append(totals)
+    means = {}
+    for key, frames in merged.items():
+        totals = pd.concat(frames).groupby(level=0).sum()
+        mean = totals["sum"] / totals["count"].where(totals["count"] > 0)
+        mean.index = pd.DatetimeIndex(mean.index)
+        means[key] = mean
+    return means
+
+
+def load_conditions(strategy_id: str, db_password: str = None) -> List[Dict[str, Any]]:
+    """
+    读取策略的全部条件（按 condition_order），并带上 TechnicalIndicator.default_period
+
+    Args:
+        strategy_id: 策略ID
+        db_password: 数据库密码，如果为None则使用默认密码
+
+    Returns:
+        条件字典列表
+    """
+    connection = pymysql.connect(
+        host=DB_DEFAULTS["host"],
+        port=DB_DEFAULTS["port"],
+        user=DB_DEFAULTS["user"],
+        password=db_password if db_password is not None else DB_DEFAULTS["password"],
+        database=DB_DEFAULTS["database"],
+        charset=DB_DEFAULTS["charset"],
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.condition_id, c.indicator_id, c.condition_type, c.threshold_min, c.threshold_max,
+                       c.signal_action, c.condition_order, i.default_period AS period
+                FROM StrategyCondition c
+                LEFT JOIN TechnicalIndicator i ON i.indicator_id = c.indicator_id
+                WHERE c.strategy_id = %s
+                ORDER BY c.condition_order
+                """,
+                (strategy_id,),
+            )
+            rows = cursor.fetchall()
+    finally:
+        connection.close()
+    return [dict(row) for row in rows]
+
+
+def attach_fundamentals(data: pd.DataFrame, columns: List[str], db_password: str = None) -> pd.DataFrame:
+    """
+    为行情数据补充规则所需的估值（StockValuation）与资产负债表时点数据列
+
+    Args:
+        data: 含 stock_code、trade_date 的行情数据
+        columns: 需要补充的列
+        db_password: 数据库密码
+
+    Returns:
+        补充了列的数据副本（行顺序不变）
+    """
+    data = data.copy()
+    codes = sorted(data["stock_code"].unique())
+    start, end = data["trade_date"].min(), data["trade_date"].max()
+    password = db_password if db_password is not None else DB_DEFAULTS["password"]
+
+    valuation = [c for c in columns if c in VALUATION_COLUMNS and c not in data.columns]
+    if valuation:
+        connection = pymysql.connect(
+            host=DB_DEFAULTS["host"],
+            port=DB_DEFAULTS["port"],
+            user=DB_DEFAULTS["user"],
+            password=password,
+            database=DB_DEFAULTS["database"],
+            charset=DB_DEFAULTS["charset"],
+        )
+        try:
+            # 股票代码分批放入 IN 列表（资产负债表数据由 PointInTimeFundamentals.load 同样分批读取）
+            parts = []
+            for i in range(0, len(codes), SQL_CODE_BATCH):
+                batch = codes[i : i + SQL_CODE_BATCH]
+                query = (
+                    f"SELECT stock_code, trade_date, {', '.join(valuation)} FROM StockValuation "
+                    f"WHERE stock_code IN ({','.join(['%s'] * len(batch))}) AND trade_date BETWEEN %s AND %s"
+                )
+                parts.append(pd.read_sql(query, connection, params=batch + [start, end]))
+            values = pd.concat(parts, ignore_index=True)
+        finally:
+            connection.close()
+        values["trade_date"] = pd.to_datetime(values["trade_date"])
+        merged = data[["stock_code", "trade_date"]].merge(values, on=["stock_code", "trade_date"], how="left")
+        for column in valuation:
+            data[column] = merged[column].to_numpy(dtype=np.float64)
+        if "market_cap" in valuation:
+            data["market_cap"] *= MARKET_CAP_UNIT
+
+    balance = [c for c in columns if c in BALANCE_SHEET_COLUMNS and c not in data.columns]
+    if balance:
+        pit = PointInTimeFundamentals(password).load("BalanceSheet", balance, codes, str(pd.Timestamp(end).date()))
+        for column in balance:
+            data[column] = np.nan
+        for code, index in data.groupby("stock_code", sort=False).groups.items():
+            aligned = pit.align(code, data.loc[index, "trade_date"])
+            for column in balance:
+                data.loc[index, column] = aligned[column].to_numpy()
+    return data
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+策略信号缓存模块
+- 同一策略（类型或代码哈希）、参数、股票、区间的信号与交易模拟无关，只调整初始资金、手续费或风控参数的重复回测
+  可直接复用已生成的信号，跳过行情读取与信号计算
+- 缓存条目附带该股票在区间内的数据版本（行数、最后交易日、最后采集时间），新增或重新采集K线后版本变化，条目自动失效；
+  读取估值或财务数据的规则策略另附 StockValuation / BalanceSheet 的数据版本；
+  与市场平均值比较的规则策略另附区间内全市场行情的数据版本
+- 按条目数做 LRU 淘汰；命中 / 未命中 / 淘汰次数记录到 metrics_registry
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from metrics_registry import REGISTRY, MetricsRegistry
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 进程内最多缓存的信号表数量（单只股票十年日线约 2500 行，一条约 200KB）
+SIGNAL_CACHE_SIZE = 256
+
+# 数据版本：只扫描主键区间，不传输行情
+DATA_VERSION_SQL = """
+SELECT COUNT(*), MAX(trade_date), MAX(collect_time)
+FROM StockMarketData
+WHERE stock_code = %s AND trade_date BETWEEN %s AND %s
+"""
+# 规则策略补充的估值与资产负债表数据版本（资产负债表按时点读取截至结束日已公告的全部报告）
+FUNDAMENTALS_VERSION_SQL = (
+    "SELECT COUNT(*), MAX(trade_date), MAX(collect_time) FROM StockValuation "
+    "WHERE stock_code = %s AND trade_date BETWEEN %s AND %s",
+    "SELECT COUNT(*), MAX(announcement_date), MAX(collect_time) FROM BalanceSheet "
+    "WHERE stock_code = %s AND announcement_date <= %s",
+)
+# 全市场行情在区间内的数据版本（信号依赖全市场截面均值时使用）
+MARKET_VERSION_SQL = """
+SELECT COUNT(*), MAX(trade_date), MAX(collect_time)
+FROM StockMarketData
+WHERE trade_date BETWEEN %s AND %s
+"""
+
+
+def strategy_fingerprint(strategy_type: str, params: Optional[Dict[str, Any]] = None, code: str = None) -> str:
+    """
+    策略指纹：内置策略为类型加参数，自定义策略为代码哈希加参数
+
+    Args:
+        strategy_type: 策略类型
+        params: 策略参数（规则策略包含编译前的条件）
+        code: 自定义策略代码
+    """
+    payload = {"type": strategy_type, "params": params or {}}
+    if code is not None:
+        payload["code"] = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize_date(value) -> str:
+    try:
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def data_version(connection, stock_code: str, start_date, end_date) -> Optional[Tuple]:
+    """股票在区间内的数据版本，无数据时返回 None"""
+    with connection.cursor() as cursor:
+        cursor.execute(DATA_VERSION_SQL, (stock_code, start_date, end_date))
+        row = cursor.fetchone()
+    if not row or not row[0]:
+        return None
+    return tuple(str(v) for v in row)
+
+
+def fundamentals_version(connection, stock_code: str, start_date, end_date) -> Tuple:
+    """股票的估值（区间内）与资产负债表（截至结束日）数据版本"""
+    version = []
+    with connection.cursor() as cursor:
+        cursor.execute(FUNDAMENTALS_VERSION_SQL[0], (stock_code, start_date, end_date))
+        version.extend(cursor.fetchone() or ())
+        cursor.execute(FUNDAMENTALS_VERSION_SQL[1], (stock_code, end_date))
+        version.extend(cursor.fetchone() or ())
+    return tuple(str(v) for v in version)
+
+
+def market_version(connection, start_date, end_date) -> Tuple:
+    """区间内全市场行情的数据版本"""
+    with connection.cursor() as cursor:
+        cursor.execute(MARKET_VERSION_SQL, (start_date, end_date))
+        row = cursor.fetchone() or ()
+    return ("market",) + tuple(str(v) for v in row)
+
+
+class SignalCache:
+    """按数据版本失效的策略信号 LRU 缓存"""
+
+    def __init__(self, maxsize: int = SIGNAL_CACHE_SIZE, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            maxsize: 最多缓存的信号表数量，0 表示不缓存
+            registry: 指标注册表
+        """
+        self.maxsize = maxsize
+        self.cache = OrderedDict()  # (指纹, 股票, 开始, 结束) -> (数据版本, 信号表)
+        self.lock = threading.Lock()
+        self.requests = registry.counter("signal_cache_requests_total", "信号缓存查询次数", ("result",))
+        self.evictions = registry.counter("signal_cache_evictions_total", "信号缓存淘汰次数")
+        self.logger = logger
+
+    @staticmethod
+    def make_key(fingerprint: str, stock_code: str, start_date, end_date) -> Tuple[str, str, str, str]:
+        return fingerprint, stock_code, _normalize_date(start_date), _normalize_date(end_date)
+
+    def get(self, key: Tuple, version: Tuple) -> Optional[pd.DataFrame]:
+        """版本一致时返回缓存的信号表，版本变化的条目直接丢弃"""
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] == version:
+                self.cache.move_to_end(key)
+                self.requests.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                del self.cache[key]
+                self.requests.inc(result="stale")
+            else:
+                self.requests.inc(result="miss")
+        return None
+
+    def put(self, key: Tuple, version: Tuple, signals: pd.DataFrame):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.cache[key] = (version, signals)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+                self.evictions.inc()
+
+    def invalidate(self, stock_code: str = None) -> int:
+        """丢弃某只股票（默认全部）的缓存条目，返回丢弃数量"""
+        with self.lock:
+            keys = [k for k in self.cache if stock_code is None or k[1] == stock_code]
+            for key in keys:
+                del self.cache[key]
+        return len(keys)
+
+    def get_or_compute(self, fingerprint: str, stock_code: str, start_date, end_date, connection,
+                       compute: Callable[[], pd.DataFrame], fundamentals: bool = False,
+                       market: bool = False) -> pd.DataFrame:
+        """
+        命中时直接返回缓存的信号，否则调用 compute 读取行情并生成信号后放入缓存
+
+        Args:
+            fingerprint: strategy_fingerprint 的结果
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            connection: 用于查询数据版本的数据库连接
+            compute: 生成信号的函数
+            fundamentals: 信号依赖估值或财务数据时为 True，数据版本包含这些表
+            market: 信号依赖全市场截面均值时为 True，数据版本包含区间内全市场行情
+
+        Returns:
+            信号表（与其他请求共享，调用方不得原地修改）
+        """
+        key = self.make_key(fingerprint, stock_code, start_date, end_date)
+        version = data_version(connection, stock_code, key[2], key[3])
+        if version is not None and fundamentals:
+            version += fundamentals_version(connection, stock_code, key[2], key[3])
+        if version is not None and market:
+            version += market_version(connection, key[2], key[3])
+        if version is not None:
+            signals = self.get(key, version)
+            if signals is not None:
+                self.logger.info(f"信号缓存命中: {stock_code} {key[2]} 到 {key[3]}")
+                return signals
+        signals = compute()
+        if version is not None and not signals.empty:
+            self.put(key, version, signals)
+        return signals
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            size = len(self.cache)
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.requests.get(result="hit"),
+            "misses": self.requests.get(result="miss") + self.requests.get(result="stale"),
+            "evictions": self.evictions.get(),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_signal_cache() -> SignalCache:
+    """进程内共享的信号缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SignalCache()
+        return _cache
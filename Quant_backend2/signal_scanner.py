@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+全市场信号扫描模块
+- 行情入库后运行：分块读取全市场最近一段行情，每个分块对所有启用的策略各做一次面板求值，
+  只保留扫描日（最新一根K线）的非零信号，批量写入 TradingSignal
+- signal_id 由 (策略, 股票, 交易日) 确定，重复扫描同一天时覆盖而不是重复插入
+- “今天哪些股票触发了信号”由 TradingSignal 上的 (trade_date, strategy_id) 索引直接查询，无需逐只回测
+- 与当日市场平均值比较的条件（阈值为空）先遍历一遍全部分块累计全市场截面均值，再逐块求值，
+  结果与分块大小无关
+- 横截面组合策略（PORTFOLIO_STRATEGIES）按调仓日换仓，不参与逐日扫描
+
+用法:
+    python signal_scanner.py                      # 扫描最新交易日
+    python signal_scanner.py --date 2024-08-30 --dry-run
+"""
+
+import argparse
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from market_data_reader import DEFAULT_CHUNK_ROWS
+from portfolio_engine import PORTFOLIO_STRATEGIES
+from rule_compiler import combine_cross_sections, load_conditions
+from strategy_engine import StrategyEngine
+from trading_calendar import get_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 扫描读取的交易日数（需覆盖各策略指标的最长窗口，如 MACD 的 26+9 日）
+LOOKBACK_BARS = 80
+# 每条 INSERT 语句写入的信号行数
+SIGNAL_INSERT_BATCH = 1000
+# 规则全部满足时的置信度
+DEFAULT_CONFIDENCE = 1.0
+# 有专门策略类的内置策略，其余带条件的策略按 StrategyCondition 编译运行
+SCAN_STRATEGY_TYPES = {
+    "STRAT_005": "dual_thrust",
+}
+SIGNAL_TYPES = {1: "buy", -1: "sell"}
+
+SIGNAL_COLUMNS = (
+    "signal_id", "user_id", "strategy_id", "stock_code", "trade_date",
+    "signal_type", "confidence", "signal_price", "trigger_reason",
+)
+
+
+def make_signal_id(strategy_id: str, stock_code: str, trade_date) -> str:
+    """信号ID：同一策略、股票、交易日只有一条信号"""
+    return f"SIG_{strategy_id}_{stock_code}_{pd.Timestamp(trade_date).strftime('%Y%m%d')}"
+
+
+def describe_conditions(conditions: List[Dict[str, Any]]) -> Dict[str, str]:
+    """按信号动作汇总条件描述，写入 trigger_reason"""
+    parts: Dict[str, List[str]] = {}
+    for cond in conditions:
+        bounds = [str(v) for v in (cond.get("threshold_min"), cond.get("threshold_max")) if v is not None]
+        text = f"{cond['indicator_id']} {cond['condition_type']}" + (f" {'~'.join(bounds)}" if bounds else "")
+        parts.setdefault(cond["signal_action"], []).append(text)
+    return {action: " 且 ".join(texts) for action, texts in parts.items()}
+
+
+def latest_signals(signals: pd.DataFrame, scan_date) -> pd.DataFrame:
+    """取扫描日的非零信号"""
+    day = pd.Timestamp(scan_date)
+    picked = signals[(signals["trade_date"] == day) & (signals["signal"] != 0)]
+    return picked[["stock_code", "trade_date", "close_price", "signal"]]
+
+
+class SignalScanner:
+    """全市场信号扫描器"""
+
+    def __init__(self, db_password: str = None):
+        self.db_password = db_password if db_password is not None else DB_DEFAULTS.get("password", "")
+        self.logger = logger
+        self.strategy_engine = StrategyEngine(self.db_password)
+
+    def _connect(self):
+        return pymysql.connect(
+            host=DB_DEFAULTS["host"],
+            port=DB_DEFAULTS["port"],
+            user=DB_DEFAULTS["user"],
+            password=self.db_password,
+            database=DB_DEFAULTS["database"],
+            charset=DB_DEFAULTS["charset"],
+        )
+
+    def load_active_strategies(self) -> List[Dict[str, Any]]:
+        """
+        启用的可扫描策略：Strategy 中配置了条件的策略（组合策略除外）
+
+        Returns:
+            [{'strategy_id', 'user_id', 'strategy': 策略实例, 'reasons': {动作: 触发原因}}]
+        """
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT s.strategy_id, s.creator_id FROM Strategy s "
+                    "WHERE EXISTS (SELECT 1 FROM StrategyCondition c WHERE c.strategy_id = s.strategy_id) "
+                    "ORDER BY s.strategy_id"
+                )
+                rows = cursor.fetchall()
+        finally:
+            connection.close()
+
+        active = []
+        for strategy_id, creator_id in rows:
+            if strategy_id in PORTFOLIO_STRATEGIES:
+                continue
+            try:
+                active.append(self.build_entry(strategy_id, creator_id, load_conditions(strategy_id, self.db_password)))
+            except ValueError as e:
+                self.logger.warning(f"策略{strategy_id}无法扫描，已跳过: {e}")
+        return active
+
+    def build_entry(self, strategy_id: str, user_id: str, conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """由条件构建扫描项；有专门策略类的使用该类，其余编译为规则策略"""
+        strategy_type = SCAN_STRATEGY_TYPES.get(strategy_id)
+        if strategy_type:
+            strategy = self.strategy_engine.create_strategy(strategy_type)
+        else:
+            strategy = self.strategy_engine.create_strategy("rule_based", strategy_id=strategy_id, conditions=conditions)
+        return {
+            "strategy_id": strategy_id,
+            "user_id": user_id,
+            "strategy": strategy,
+            "reasons": describe_conditions(conditions),
+        }
+
+    def resolve_window(self, scan_date: Optional[str]) -> Tuple[str, str]:
+        """扫描日（默认为行情表中的最新交易日）及向前 LOOKBACK_BARS 个交易日的起始日"""
+        if scan_date is None:
+            connection = self._connect()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT MAX(trade_date) FROM StockMarketData")
+                    latest = cursor.fetchone()[0]
+            finally:
+                connection.close()
+            if latest is None:
+                raise ValueError("StockMarketData 中没有行情数据")
+            scan_date = str(latest)
+        day = pd.Timestamp(scan_date)
+        dates = get_trading_calendar(self.db_password).dates
+        pos = np.searchsorted(dates, np.datetime64(day.date(), "D"), side="right") - 1
+        if pos >= LOOKBACK_BARS:
+            start = pd.Timestamp(dates[pos - LOOKBACK_BARS + 1])
+        else:
+            # 日历不可用或不够长时按自然日粗略回看
+            start = day - pd.Timedelta(days=LOOKBACK_BARS * 2)
+        return start.strftime("%Y-%m-%d"), day.strftime("%Y-%m-%d")
+
+    def scan_panel(self, panel: pd.DataFrame, entries: List[Dict[str, Any]], scan_date) -> List[tuple]:
+        """
+        在一个行情分块（多只股票的完整序列）上运行全部策略
+
+        Args:
+            panel: 含 stock_code、trade_date 与 OHLCV 的分块
+            entries: load_active_strategies / build_entry 的结果（含 references 时按其中的全市场均值求值）
+            scan_date: 扫描日
+
+        Returns:
+            待写入 TradingSignal 的行（列顺序见 SIGNAL_COLUMNS）
+        """
+        rows = []
+        for entry in entries:
+            strategy = entry["strategy"]
+            if hasattr(strategy, "generate_panel_signals"):
+                if entry.get("references") is not None:
+                    signals = strategy.generate_panel_signals(panel, references=entry["references"])
+                else:
+                    signals = strategy.generate_panel_signals(panel)
+            else:
+                signals = pd.concat(
+                    [strategy.generate_signals(group.reset_index(drop=True))
+                     for _, group in panel.groupby("stock_code", sort=False)],
+                    ignore_index=True,
+                )
+            picked = latest_signals(signals, scan_date)
+            for stock_code, trade_date, price, signal in zip(
+                    picked["stock_code"].tolist(), picked["trade_date"].tolist(),
+                    picked["close_price"].tolist(), picked["signal"].tolist()):
+                action = SIGNAL_TYPES[int(signal)]
+                rows.append((
+                    make_signal_id(entry["strategy_id"], stock_code, trade_date),
+                    entry["user_id"],
+                    entry["strategy_id"],
+                    stock_code,
+                    pd.Timestamp(trade_date).strftime("%Y-%m-%d"),
+                    action,
+                    DEFAULT_CONFIDENCE,
+                    round(float(price), 3) if price and np.isfinite(price) and price > 0 else None,
+                    entry["reasons"].get(action, "")[:500],
+                ))
+        return rows
+
+    def prepare_references(self, entries: List[Dict[str, Any]], chunks) -> List[Dict[str, Any]]:
+        """
+        为含“与市场平均值比较”条件的策略计算全市场截面均值，写入扫描项的 references
+
+        Args:
+            entries: 扫描项
+            chunks: 可迭代的行情分块（遍历一次）
+
+        Returns:
+            需要截面均值的扫描项
+        """
+        pending = [e for e in entries if getattr(getattr(e["strategy"], "rules", None), "cross_section_keys", None)]
+        if not pending:
+            return []
+        parts: Dict[str, List[Dict]] = {e["strategy_id"]: [] for e in pending}
+        for chunk in chunks:
+            for entry in pending:
+                parts[entry["strategy_id"]].append(entry["strategy"].cross_section_totals(chunk))
+        for entry in pending:
+            entry["references"] = combine_cross_sections(parts[entry["strategy_id"]])
+        return pending
+
+    def save_signals(self, rows: List[tuple]) -> int:
+        """批量写入 TradingSignal（同一 signal_id 覆盖），返回写入行数"""
+        if not rows:
+            return 0
+        placeholders = ", ".join(["%s"] * len(SIGNAL_COLUMNS))
+        updates = ", ".join(f"{c} = VALUES({c})" for c in SIGNAL_COLUMNS[1:])
+        sql = (
+            f"INSERT INTO TradingSignal ({', '.join(SIGNAL_COLUMNS)}) VALUES ({placeholders}) "
+            f"ON DUPLICATE KEY UPDATE {updates}, generate_time = CURRENT_TIMESTAMP"
+        )
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                for i in range(0, len(rows), SIGNAL_INSERT_BATCH):
+                    cursor.executemany(sql, rows[i : i + SIGNAL_INSERT_BATCH])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        return len(rows)
+
+    def query_signals(self, trade_date: Optional[str] = None, strategy_id: Optional[str] = None,
+                      signal_type: Optional[str] = None, stock_code: Optional[str] = None,
+                      limit: int = 500) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        查询某个交易日（默认为最近有信号的交易日）触发的信号，走 (trade_date, strategy_id) 索引
+
+        Returns:
+            (交易日, 信号字典列表)
+        """
+        if signal_type is not None and signal_type not in SIGNAL_TYPES.values():
+            raise ValueError(f"signal_type 必须为 {list(SIGNAL_TYPES.values())} 之一")
+        connection = self._connect()
+        try:
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                if trade_date is None:
+                    cursor.execute("SELECT MAX(trade_date) AS trade_date FROM TradingSignal")
+                    latest = cursor.fetchone()["trade_date"]
+                    if latest is None:
+                        return None, []
+                    trade_date = str(latest)
+                sql = (
+                    "SELECT signal_id, strategy_id, stock_code, trade_date, signal_type, confidence, "
+                    "signal_price, trigger_reason, generate_time FROM TradingSignal WHERE trade_date = %s"
+                )
+                params: List[Any] = [trade_date]
+                for column, value in (("strategy_id", strategy_id), ("signal_type", signal_type),
+                                      ("stock_code", stock_code)):
+                    if value:
+                        sql += f" AND {column} = %s"
+                        params.append(value)
+                sql += " ORDER BY strategy_id, stock_code LIMIT %s"
+                params.append(int(limit))
+                cursor.execute(sql, params)
+                return trade_date, list(cursor.fetchall())
+        finally:
+            connection.close()
+
+    def run(self, scan_date: Optional[str] = None, stock_codes: Optional[List[str]] = None,
+            chunk_rows: int = DEFAULT_CHUNK_ROWS, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        扫描一个交易日并写入信号
+
+        Args:
+            scan_date: 扫描日，默认为最新交易日
+            stock_codes: 股票列表，默认为全市场
+            chunk_rows: 行情分块行数
+            dry_run: 只统计不写库
+
+        Returns:
+            {'trade_date', 'strategies', 'signals', 'saved', 'by_strategy'}
+        """
+        entries = self.load_active_strategies()
+        start_date, end_date = self.resolve_window(scan_date)
+        self.logger.info(f"开始信号扫描: {end_date}，{len(entries)} 个策略，行情区间 {start_date} 至 {end_date}")
+
+        pending = self.prepare_references(
+            entries, self.strategy_engine.iter_stock_data(start_date, end_date, stock_codes, chunk_rows))
+        if pending:
+            self.logger.info(f"已计算 {len(pending)} 个策略的全市场截面均值")
+
+        rows = []
+        for chunk in self.strategy_engine.iter_stock_data(start_date, end_date, stock_codes, chunk_rows):
+            rows.extend(self.scan_panel(chunk, entries, end_date))
+        saved = 0 if dry_run else self.save_signals(rows)
+
+        by_strategy: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts = by_strategy.setdefault(row[2], {"buy": 0, "sell": 0})
+            counts[row[5]] += 1
+        self.logger.info(f"信号扫描完成: {len(rows)} 条信号，写入 {saved} 条")
+        return {
+            "trade_date": end_date,
+            "strategies": [e["strategy_id"] for e in entries],
+            "signals": len(rows),
+            "saved": saved,
+            "by_strategy": by_strategy,
+        }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="全市场信号扫描（行情入库后运行）")
+    parser.add_argument("--date", type=str, help="扫描日 (YYYY-MM-DD)，默认为最新交易日")
+    parser.add_argument("--config", type=str, default="config.json", help="配置文件路径（读取 db_password）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计信号，不写入数据库")
+    args = parser.parse_args()
+
+    db_password = None
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            db_password = json.load(f).get("db_password")
+    summary = SignalScanner(db_password).run(args.date, dry_run=args.dry_run)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
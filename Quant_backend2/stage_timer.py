@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回测流水线分阶段计时
+- StageTimer：记录各阶段耗时（含子阶段的总耗时与扣除子阶段后的自身耗时），可选 tracemalloc 峰值内存
+- timed_stage：在当前线程的活动计时器上记录阶段，没有活动计时器时不做任何事，
+  因此引擎内部可以直接埋点而不需要层层传递计时器
+- 计时结束后各阶段自身耗时写入 metrics_registry 的直方图，由 /metrics 接口导出
+"""
+
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from metrics_registry import DEFAULT_BYTES_BUCKETS, REGISTRY, MetricsRegistry
+
+_local = threading.local()
+
+
+def current_timer() -> Optional["StageTimer"]:
+    """当前线程的活动计时器"""
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def timed_stage(name: str):
+    """在当前线程的活动计时器上记录一个阶段"""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+class StageTimer:
+    """单次请求的分阶段计时器"""
+
+    def __init__(self, pipeline: str = "backtest", trace_memory: bool = False,
+                 registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            pipeline: 流水线名称（指标标签）
+            trace_memory: 是否用 tracemalloc 记录各阶段峰值内存（进程级统计，开销较大，仅调试时开启）
+            registry: 指标注册表
+        """
+        self.pipeline = pipeline
+        self.trace_memory = trace_memory
+        self.registry = registry
+        self.stages: List[Dict[str, Any]] = []
+        self.stack: List[Dict[str, Any]] = []
+        self.started_at = None
+        self.total_seconds = None
+        self.status = "ok"
+        self._started_tracing = False
+        self._previous = None
+
+    def start(self) -> "StageTimer":
+        """开始计时并设为当前线程的活动计时器"""
+        self.started_at = time.perf_counter()
+        self._previous = current_timer()
+        _local.timer = self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def begin(self, name: str):
+        """开始一个阶段（可嵌套）"""
+        entry = {"name": name, "start": time.perf_counter(), "child_seconds": 0.0}
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1].get("peak", 0), peak)
+            entry["memory_start"] = current
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        self.stack.append(entry)
+
+    def end(self):
+        """结束最近开始的阶段"""
+        if not self.stack:
+            return
+        entry = self.stack.pop()
+        seconds = time.perf_counter() - entry["start"]
+        record = {
+            "name": entry["name"],
+            "depth": len(self.stack),
+            "ms": seconds * 1000,
+            "self_ms": (seconds - entry["child_seconds"]) * 1000,
+        }
+        if "memory_start" in entry:
+            peak = max(entry.get("peak", 0), tracemalloc.get_traced_memory()[1])
+            record["peak_kb"] = max(peak - entry["memory_start"], 0) / 1024
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1].get("peak", 0), peak)
+        if self.stack:
+            self.stack[-1]["child_seconds"] += seconds
+        self.stages.append(record)
+
+    @contextmanager
+    def stage(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def finish(self, status: Optional[str] = None) -> "StageTimer":
+        """结束计时，关闭未结束的阶段并写入直方图；重复调用无副作用"""
+        if self.total_seconds is not None:
+            return self
+        while self.stack:
+            self.end()
+        self.total_seconds = time.perf_counter() - self.started_at
+        if status:
+            self.status = status
+        if self._started_tracing:
+            tracemalloc.stop()
+        _local.timer = self._previous
+
+        stage_seconds = self.registry.histogram(
+            "backtest_stage_seconds", "各阶段自身耗时（秒）", ("pipeline", "stage"))
+        for record in self.stages:
+            stage_seconds.observe(record["self_ms"] / 1000, pipeline=self.pipeline, stage=record["name"])
+            if "peak_kb" in record:
+                self.registry.histogram(
+                    "backtest_stage_peak_bytes", "各阶段 tracemalloc 峰值内存增量（字节）",
+                    ("pipeline", "stage"), DEFAULT_BYTES_BUCKETS,
+                ).observe(record["peak_kb"] * 1024, pipeline=self.pipeline, stage=record["name"])
+        self.registry.histogram(
+            "backtest_request_seconds", "整个请求耗时（秒）", ("pipeline",)
+        ).observe(self.total_seconds, pipeline=self.pipeline)
+        self.registry.counter(
+            "backtest_requests_total", "请求数", ("pipeline", "status")
+        ).inc(pipeline=self.pipeline, status=self.status)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """计时结果（未结束时总耗时为截至目前的耗时）"""
+        total = self.total_seconds
+        if total is None and self.started_at is not None:
+            total = time.perf_counter() - self.started_at
+        return {
+            "total_ms": round((total or 0.0) * 1000, 3),
+            "memory_traced": self.trace_memory,
+            "stages": [
+                {k: round(v, 3) if isinstance(v, float) else v for k, v in record.items()}
+                for record in self.stages
+            ],
+        }
@@ -11,10 +11,25 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 import uuid
 import pymysql
+import numpy as np
 
 from strategy_engine import StrategyEngine
 from backtest_engine import BacktestEngine, BacktestResult
 from strategy_editor import StrategyEditor
+from portfolio_engine import PORTFOLIO_STRATEGIES, PortfolioEngine
+from signal_scanner import SignalScanner
+from report_storage import ACTION_NAMES, EXIT_REASON_NAMES, decode_backtest_payload, encode_backtest_payload, format_dates
+from risk_rules import parse_risk_rules
+from report_export import (CONTENT_TYPES, EXPORT_FORMATS, EXPORT_SECTIONS, accepts_gzip, gzip_chunks, iter_csv,
+                           iter_ndjson)
+from trading_calendar import get_trading_calendar, stock_trade_dates
+from benchmark import DEFAULT_BENCHMARK, get_benchmark_provider
+from downsample import DOWNSAMPLE_METHODS, MAX_POINTS, MIN_POINTS, downsample_indices
+from metrics_registry import REGISTRY
+from result_cache import benchmark_version, get_result_cache, market_data_version, request_key
+from rule_compiler import CompiledRules, MarketMeanRequired, load_conditions
+from signal_cache import strategy_fingerprint
+from stage_timer import StageTimer, timed_stage
 # 导入认证装饰器
 from app import token_required
 
@@ -28,15 +43,126 @@ logger = logging.getLogger(__name__)
 strategy_engine = None
 backtest_engine = None
 strategy_editor = None
+portfolio_engine = None
+signal_scanner = None
 
 def init_engines(db_password: str = None):
     """初始化策略引擎和回测引擎"""
-    global strategy_engine, backtest_engine, strategy_editor
+    global strategy_engine, backtest_engine, strategy_editor, portfolio_engine, signal_scanner
     strategy_engine = StrategyEngine(db_password)
     backtest_engine = BacktestEngine(db_password)
     strategy_editor = StrategyEditor(db_password)
+    portfolio_engine = PortfolioEngine(db_password)
+    signal_scanner = SignalScanner(db_password)
     logger.info("策略引擎、回测引擎和策略编辑器初始化完成")
 
+def _format_payload_trades(trades: Dict[str, Any], stock_code: str) -> List[Dict[str, Any]]:
+    """将列式交易记录批量格式化为前端期望的结构"""
+    count = len(trades['price'])
+    if count == 0:
+        return []
+    dates = format_dates(trades['date'])
+    actions = [ACTION_NAMES.get(int(a), '') for a in trades['action']]
+    exit_reasons = [EXIT_REASON_NAMES.get(int(r), '') for r in trades['exit_reason']]
+    prices = np.round(trades['price'], 2).tolist()
+    quantities = trades['shares'].tolist()
+    amounts = np.round(trades['price'] * trades['shares'], 2).tolist()
+    commissions = np.round(trades['commission'], 2).tolist()
+    returns = np.round(np.nan_to_num(trades['trade_return']), 2).tolist()
+    capital_after = np.round(np.nan_to_num(trades['capital_after']), 2).tolist()
+    stock_codes = trades['stock_code'].tolist() if 'stock_code' in trades else None  # 组合回测逐笔股票代码
+    return [
+        {
+            'date': dates[i],
+            'type': actions[i],
+            'stockCode': stock_codes[i] if stock_codes is not None and stock_codes[i] else stock_code,
+            'price': prices[i],
+            'quantity': quantities[i],
+            'amount': amounts[i],
+            'commission': commissions[i],
+            'return': returns[i],
+            'capitalAfter': capital_after[i],
+            'exitReason': exit_reasons[i],
+            'status': 'completed'
+        }
+        for i in range(count)
+    ]
+
+def _parse_downsample_args(points, method) -> Optional[tuple]:
+    """解析资金曲线降采样参数，points 为空时返回 None（不降采样）"""
+    if points in (None, ''):
+        return None
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        raise ValueError('points 必须为整数')
+    if not MIN_POINTS <= points <= MAX_POINTS:
+        raise ValueError(f'points 必须在 {MIN_POINTS} 到 {MAX_POINTS} 之间')
+    method = method or 'lttb'
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method 必须为 {'/'.join(DOWNSAMPLE_METHODS)} 之一")
+    return points, method
+
+def _build_equity_curve(dates: List[str], values: List[float], downsample: Optional[tuple] = None,
+                        tiers: Optional[Dict[int, np.ndarray]] = None) -> List[Dict[str, Any]]:
+    """
+    组装前端资金曲线 [{'date','value'}]，可选降采样
+
+    Args:
+        dates: 日期字符串列表
+        values: 资金数值列表
+        downsample: _parse_downsample_args 的结果
+        tiers: 报告中预计算的 LTTB 下标，命中请求点数时直接使用
+    """
+    length = min(len(dates), len(values))
+    if downsample and downsample[0] < length:
+        points, method = downsample
+        indices = (tiers or {}).get(points) if method == 'lttb' else None
+        if indices is None or (len(indices) and indices[-1] >= length):
+            indices = downsample_indices(values[:length], points, method)
+        return [{'date': dates[i], 'value': values[i]} for i in indices.tolist()]
+    return [{'date': dates[i], 'value': values[i]} for i in range(length)]
+
+def _stock_curve_dates(stock_code: str, start_date: str, end_date: str, length: int,
+                       db_password: str = None) -> List[str]:
+    """
+    为未携带日期的单只股票资金曲线补齐日期：优先使用股票自身有行情的交易日（停牌日不产生资金点），
+    条数对不上或查询失败时再按内存交易日历补齐
+    """
+    try:
+        dates = stock_trade_dates(stock_code, start_date, end_date, db_password)
+        if len(dates) == length:
+            return dates
+    except Exception as e:
+        logger.warning(f"查询股票{stock_code}交易日失败: {e}")
+    return get_trading_calendar(db_password).format_between(start_date, end_date)
+
+def _format_benchmark(benchmark: Dict[str, Any], dates: Optional[List[str]] = None,
+                      picked: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    组装前端基准相对指标，超额收益与基准收益乘以100转换为百分比
+
+    Args:
+        benchmark: 回测结果的 benchmark 字典或报告中保存的基准摘要
+        dates: 资金曲线日期，与 picked 同时提供时附带基准与超额曲线
+        picked: 资金曲线中返回给前端的点的下标
+    """
+    formatted = {
+        'code': benchmark['ts_code'],
+        'alpha': round(float(benchmark['alpha']), 4),
+        'beta': round(float(benchmark['beta']), 4),
+        'trackingError': round(float(benchmark['tracking_error']), 4),
+        'informationRatio': round(float(benchmark['information_ratio']), 4),
+        'excessReturn': round(float(benchmark['excess_return']) * 100, 4),
+        'benchmarkReturn': round(float(benchmark['benchmark_return']) * 100, 4)
+    }
+    if dates is not None and picked is not None and benchmark.get('benchmark_equity') is not None:
+        benchmark_equity = benchmark['benchmark_equity']
+        excess_equity = benchmark['excess_equity']
+        formatted['benchmarkCurve'] = [{'date': dates[i], 'value': round(benchmark_equity[i], 2)} for i in picked]
+        formatted['excessCurve'] = [{'date': dates[i], 'value': round(excess_equity[i], 2)} for i in picked]
+    return formatted
+
 def register_routes(app):
     """注册所有API路由"""
     from flask import request, jsonify
@@ -55,11 +181,12 @@ def register_routes(app):
             strategy_names = {
                 'moving_average': '双均线策略',
                 'breakout': '突破策略',
-                'rsi_mean_reversion': 'RSI均值回归策略'
+                'rsi_mean_reversion': 'RSI均值回归策略',
+                'dual_thrust': 'Dual Thrust策略'
             }
             
             # 返回策略引擎支持的策略
-            for i, strategy_type in enumerate(['moving_average', 'breakout', 'rsi_mean_reversion'], 1):
+            for i, strategy_type in enumerate(['moving_average', 'breakout', 'rsi_mean_reversion', 'dual_thrust'], 1):
                 # 查找对应策略的详细信息
                 strategy_detail = next((s for s in available_strategies if s['name'] == strategy_type), None)
                 
@@ -181,10 +308,48 @@ def register_routes(app):
             logger.error(f"运行策略失败: {e}")
             return jsonify({'message': '运行策略失败', 'error': str(e)}), 500
 
+    @app.route('/signals', methods=['GET'])
+    @token_required
+    def get_signals(current_user_id):
+        """查询全市场扫描写入的交易信号（默认最近一个扫描日），可按策略、方向、股票过滤"""
+        try:
+            limit = max(1, min(request.args.get('limit', default=500, type=int), 5000))
+            trade_date, rows = signal_scanner.query_signals(
+                trade_date=request.args.get('date') or None,
+                strategy_id=request.args.get('strategyId') or None,
+                signal_type=request.args.get('signalType') or None,
+                stock_code=request.args.get('stockCode') or None,
+                limit=limit
+            )
+            signals = [
+                {
+                    'id': row['signal_id'],
+                    'strategyId': row['strategy_id'],
+                    'stockCode': row['stock_code'],
+                    'date': row['trade_date'].strftime('%Y-%m-%d') if hasattr(row['trade_date'], 'strftime') else str(row['trade_date']),
+                    'type': row['signal_type'],
+                    'confidence': round(float(row['confidence']), 4),
+                    'price': round(float(row['signal_price']), 3) if row['signal_price'] is not None else None,
+                    'reason': row['trigger_reason'] or '',
+                    'generateTime': row['generate_time'].strftime('%Y-%m-%d %H:%M:%S') if hasattr(row['generate_time'], 'strftime') else str(row['generate_time'])
+                }
+                for row in rows
+            ]
+            return jsonify({'success': True, 'date': trade_date, 'count': len(signals), 'signals': signals}), 200
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"查询交易信号失败: {e}")
+            return jsonify({'message': '查询交易信号失败', 'error': str(e)}), 500
+
     @app.route('/backtest/run', methods=['POST'])
     @token_required
     def run_backtest(current_user_id):
         """运行回测"""
+        # 分阶段计时：?debug=1 时在响应的 debug 字段返回各阶段耗时，?debug=memory 时额外记录峰值内存
+        debug_mode = str(request.args.get('debug', '')).lower()
+        timer = StageTimer(trace_memory=debug_mode == 'memory').start()
+        succeeded = False
         try:
             # 获取请求数据
             data = request.get_json()
@@ -205,6 +370,12 @@ def register_routes(app):
             initial_capital = data['initialFund']
             front_end_type = data['type']
             commission_rate = data.get('commissionRate', 0.0003)  # 默认手续费率
+            benchmark = data.get('benchmark') or None  # 基准指数代码，如 000300.SH
+            # 资金曲线降采样参数（查询参数优先，其次请求体）
+            downsample = _parse_downsample_args(
+                request.args.get('points', data.get('points')),
+                request.args.get('method', data.get('method'))
+            )
             
             # 添加日志记录
             logger.info(f"接收到回测请求 - 策略ID: {strategy_id}, 前端类型: {front_end_type}")
@@ -214,16 +385,20 @@ def register_routes(app):
                 'strategy_1': 'moving_average',  # 双均线策略
                 'strategy_2': 'breakout',        # 突破策略
                 'strategy_3': 'rsi_mean_reversion',  # RSI均值回归策略
+                'strategy_4': 'dual_thrust',     # Dual Thrust策略
                 'STRAT_001': 'moving_average',   # 双均线策略（新格式）
                 'STRAT_002': 'breakout',         # 突破策略（新格式）
-                'STRAT_003': 'rsi_mean_reversion'  # RSI均值回归策略（新格式）
+                'STRAT_003': 'rsi_mean_reversion',  # RSI均值回归策略（新格式）
+                'STRAT_005': 'dual_thrust'  # Dual Thrust策略
             }
             
             # 设置策略参数
             strategy_params = data.get('strategy_params', {})
-            risk_management = data.get('risk_management', {})
+            # 风控离场规则（止损、止盈、移动止损、最长持仓天数），参数非法时返回400
+            risk_rules = parse_risk_rules(data.get('risk_management') or {})
             
             # 检查是否为自定义策略
+            timer.begin('strategy_lookup')
             is_custom_strategy = False
             custom_strategy_data = None
             
@@ -295,6 +470,10 @@ def register_routes(app):
             # 根据策略ID获取对应的策略类型
             if not is_custom_strategy:
                 strategy_type = strategy_mapping.get(strategy_id)
+                # 声明式规则策略：engine=rules 时按 StrategyCondition 中该策略的条件编译运行
+                if data.get('engine') == 'rules':
+                    strategy_type = 'rule_based'
+                    strategy_params = {**strategy_params, 'strategy_id': strategy_id}
                 
                 if not strategy_type:
                     # 首先检查数据库中是否存在该策略ID
@@ -344,32 +523,50 @@ def register_routes(app):
                 
                 if strategy_type:
                     logger.info(f"使用的策略类型: {strategy_type}")
+            timer.end()
 
             # 添加日志记录
             logger.info(f"准备运行回测 - 股票代码: {stock_code}, 策略类型: {'custom' if is_custom_strategy else strategy_type}")
             
-            # 运行回测 - 确保参数类型正确
+            # 保存回测结果到数据库
+            # 现在使用从JWT token中获取的实际用户ID
+            user_id = current_user_id  # 从装饰器中获取的登录用户ID
+            
+            # 处理日期格式 - 将ISO格式的日期字符串转换为数据库可接受的格式
+            # 从 '2024-09-15T07:50:04.063Z' 转换为 '2024-09-15 07:50:04'
             try:
-                # 将initial_capital转换为浮点数
-                initial_capital_float = float(initial_capital)
-                commission_rate_float = float(commission_rate)
+                # 解析ISO格式的日期字符串
+                parsed_start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+                parsed_end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
                 
+                # 转换为数据库可接受的格式
+                formatted_start_date = parsed_start_date.strftime('%Y-%m-%d %H:%M:%S')
+                formatted_end_date = parsed_end_date.strftime('%Y-%m-%d %H:%M:%S')
+            except:
+                # 如果解析失败，使用简化的日期格式
+                formatted_start_date = start_date.split('T')[0] + ' ' + start_date.split('T')[1].split('.')[0]
+                formatted_end_date = end_date.split('T')[0] + ' ' + end_date.split('T')[1].split('.')[0]
+            
+            def compute_and_save():
+                """运行回测并保存报告，返回 (回测结果, 报告ID)"""
                 if is_custom_strategy and custom_strategy_data:
                     # 运行自定义策略
                     logger.info(f"运行自定义策略回测")
-                    result = strategy_editor.run_custom_strategy(
-                        stock_code=stock_code,
-                        start_date=start_date,
-                        end_date=end_date,
-                        code=custom_strategy_data['code'],
-                        parameters=custom_strategy_data['parameters'],
-                        initial_capital=initial_capital_float,
-                        commission_rate=commission_rate_float
-                    )
+                    with timed_stage('custom_strategy'):
+                        result = strategy_editor.run_custom_strategy(
+                            stock_code=stock_code,
+                            start_date=start_date,
+                            end_date=end_date,
+                            code=custom_strategy_data['code'],
+                            parameters=custom_strategy_data['parameters'],
+                            initial_capital=initial_capital_float,
+                            commission_rate=commission_rate_float,
+                            risk_rules=risk_rules
+                        )
                     
                     if not result['success']:
                         logger.error(f"自定义策略回测失败: {result.get('message')}")
-                        return jsonify({'message': f'回测失败: {result.get('message')}'}), 500
+                        raise RuntimeError(f"自定义策略回测失败: {result.get('message')}")
                     
                     # 将结果转换为BacktestResult对象格式
                     backtest_result = BacktestResult()
@@ -384,9 +581,10 @@ def register_routes(app):
                     backtest_result.trade_count = result['data'].get('trade_count', 0)
                     backtest_result.trades = result['data'].get('trades', [])
                     backtest_result.equity_curve = result['data'].get('equity_curve', [])
+                    backtest_result.dates = result['data'].get('dates', [])
                     backtest_result.daily_returns = result['data'].get('daily_returns', [])
                     
-                    result = backtest_result
+                    result = backtest_engine.apply_benchmark(backtest_result, benchmark)
                 else:
                     # 将strategy_params作为单独的参数传递，而不是展开
                     result = backtest_engine.run_backtest(
@@ -396,42 +594,70 @@ def register_routes(app):
                         initial_capital=initial_capital_float,
                         strategy_type=strategy_type,
                         commission_rate=commission_rate_float,
-                        strategy_params=strategy_params  # 作为单独的字典参数传递
+                        strategy_params=strategy_params,  # 作为单独的字典参数传递
+                        benchmark=benchmark,
+                        risk_rules=risk_rules
                     )
-            except ValueError as e:
-                logger.error(f"参数类型转换失败: {e}")
-                return jsonify({'message': f'参数格式错误: {str(e)}'}), 400
-
-            # 保存回测结果到数据库
-            # 现在使用从JWT token中获取的实际用户ID
-            user_id = current_user_id  # 从装饰器中获取的登录用户ID
+                
+                # 调用save_backtest_result方法，提供所有必要的参数
+                with timed_stage('save_result'):
+                    report_id = backtest_engine.save_backtest_result(
+                        result=result,            # 回测结果对象
+                        strategy_id=strategy_id,  # 策略ID
+                        user_id=user_id,          # 用户ID
+                        stock_code=stock_code,    # 股票代码
+                        start_date=formatted_start_date,    # 格式化后的开始日期
+                        end_date=formatted_end_date,        # 格式化后的结束日期
+                        backtest_type=front_end_type,  # 回测类型
+                        strategy_params=strategy_params  # 策略参数
+                    )
+                return result, report_id
             
-            # 处理日期格式 - 将ISO格式的日期字符串转换为数据库可接受的格式
-            # 从 '2024-09-15T07:50:04.063Z' 转换为 '2024-09-15 07:50:04'
+            # 运行回测 - 确保参数类型正确
             try:
-                # 解析ISO格式的日期字符串
-                parsed_start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                parsed_end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+                # 将initial_capital转换为浮点数
+                initial_capital_float = float(initial_capital)
+                commission_rate_float = float(commission_rate)
                 
-                # 转换为数据库可接受的格式
-                formatted_start_date = parsed_start_date.strftime('%Y-%m-%d %H:%M:%S')
-                formatted_end_date = parsed_end_date.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                # 如果解析失败，使用简化的日期格式
-                formatted_start_date = start_date.split('T')[0] + ' ' + start_date.split('T')[1].split('.')[0]
-                formatted_end_date = end_date.split('T')[0] + ' ' + end_date.split('T')[1].split('.')[0]
-            
-            # 调用save_backtest_result方法，提供所有必要的参数
-            report_id = backtest_engine.save_backtest_result(
-                result=result,            # 回测结果对象
-                strategy_id=strategy_id,  # 策略ID
-                user_id=user_id,          # 用户ID
-                stock_code=stock_code,    # 股票代码
-                start_date=formatted_start_date,    # 格式化后的开始日期
-                end_date=formatted_end_date,        # 格式化后的结束日期
-                backtest_type=front_end_type,  # 回测类型
-                strategy_params=strategy_params  # 策略参数
-            )
+                # 相同输入（含策略代码或条件）且行情未更新时复用已保存的报告，并发的相同请求只计算一次
+                uses_market_mean = False
+                with timed_stage('result_cache'):
+                    if is_custom_strategy and custom_strategy_data:
+                        fingerprint = strategy_fingerprint('custom', custom_strategy_data['parameters'],
+                                                           custom_strategy_data['code'])
+                    elif strategy_type == 'rule_based':
+                        conditions = load_conditions(strategy_id, backtest_engine.db_password)
+                        fingerprint = strategy_fingerprint(strategy_type, {**strategy_params, 'conditions': conditions})
+                        # 与市场平均值比较的条件依赖全市场行情
+                        uses_market_mean = bool(conditions) and bool(CompiledRules(conditions).cross_section_keys)
+                    else:
+                        fingerprint = strategy_fingerprint(strategy_type, strategy_params)
+                    cache_key = request_key(
+                        user_id=user_id, strategy_id=strategy_id, fingerprint=fingerprint, stock_code=stock_code,
+                        start_date=formatted_start_date, end_date=formatted_end_date, backtest_type=front_end_type,
+                        initial_capital=initial_capital_float, commission_rate=commission_rate_float,
+                        benchmark=benchmark, risk_rules=risk_rules
+                    )
+                    # 数据版本：行情；规则策略另含估值与资产负债表；指定基准时另含基准指数收盘价
+                    version = market_data_version(
+                        stock_code, formatted_start_date.split(' ')[0], formatted_end_date.split(' ')[0],
+                        backtest_engine.db_password,
+                        fundamentals=strategy_type == 'rule_based' and not is_custom_strategy,
+                        market=uses_market_mean)
+                    if version is not None and benchmark:
+                        version += benchmark_version(benchmark, formatted_start_date.split(' ')[0],
+                                                     formatted_end_date.split(' ')[0])
+                (result, report_id), cache_status = get_result_cache().get_or_compute(
+                    cache_key, version, compute_and_save)
+                if cache_status != 'miss':
+                    logger.info(f"复用回测结果({cache_status}): {report_id}")
+            except MarketMeanRequired as e:
+                logger.error(f"规则策略缺少全市场截面均值: {e}")
+                return jsonify({'message': f'该策略需要全市场截面均值，请使用组合回测: {str(e)}',
+                                'portfolio_endpoint': '/backtest/portfolio/run'}), 400
+            except ValueError as e:
+                logger.error(f"参数类型转换失败: {e}")
+                return jsonify({'message': f'参数格式错误: {str(e)}'}), 400
 
             # 构造响应数据 - 格式与前端Backtest.vue组件期望的格式匹配
             # 格式化性能指标，保留四位小数，将百分比指标乘以100
@@ -444,120 +670,34 @@ def register_routes(app):
                 'winRate': round(float(result.win_rate) * 100, 4),  # 保留四位小数，乘以100转换为百分比
                 'tradeCount': result.trade_count if hasattr(result, 'trade_count') else 0,
                 'equityCurve': [],  # 初始化资金曲线数据
-                'trades': []  # 初始化交易记录列表
+                'trades': [],  # 初始化交易记录列表
+                # 扩展绩效指标（索提诺、卡玛、回撤持续期、换手率、仓位暴露、逐笔统计等）
+                'metrics': {k: round(float(v), 4) for k, v in (getattr(result, 'metrics', None) or {}).items()}
             }
             
-            # 处理资金曲线数据，确保格式适合前端图表渲染
+            # 处理资金曲线数据，日期直接取自回测结果，与资金曲线逐点对应
+            equity_dates = getattr(result, 'dates', None) or []
             if hasattr(result, 'equity_curve') and result.equity_curve:
-                try:
-                    import pandas as pd
-                    import pymysql
-                    from strategy_engine import DB_DEFAULTS
-                    
-                    # 直接使用pandas的to_datetime函数解析日期
-                    start_date_str = formatted_start_date.split(' ')[0]
-                    end_date_str = formatted_end_date.split(' ')[0]
-                    
-                    # 连接数据库获取实际的交易日历数据
-                    connection = pymysql.connect(
-                        host=DB_DEFAULTS["host"],
-                        port=DB_DEFAULTS["port"],
-                        user=DB_DEFAULTS["user"],
-                        password=backtest_engine.db_password if hasattr(backtest_engine, 'db_password') else DB_DEFAULTS["password"],
-                        database=DB_DEFAULTS["database"],
-                        charset=DB_DEFAULTS["charset"]
-                    )
-                    
-                    try:
-                        # 查询实际的交易日历数据
-                        query = """
-                        SELECT DISTINCT trade_date 
-                        FROM StockMarketData 
-                        WHERE stock_code = %s AND trade_date BETWEEN %s AND %s
-                        ORDER BY trade_date ASC
-                        """
-                        
-                        # 执行查询，获取实际的交易日历
-                        calendar_df = pd.read_sql(query, connection, params=(stock_code, start_date_str, end_date_str))
-                        
-                        if not calendar_df.empty:
-                            # 将trade_date转换为datetime
-                            calendar_df['trade_date'] = pd.to_datetime(calendar_df['trade_date'])
-                            
-                            # 获取实际的日期列表
-                            actual_dates = calendar_df['trade_date'].tolist()
-                            
-                            # 确保日期列表长度与equity_curve长度匹配
-                            min_length = min(len(actual_dates), len(result.equity_curve))
-                            
-                            # 构建资金曲线数据，使用实际的交易日历
-                            for i in range(min_length):
-                                date_str = actual_dates[i].strftime('%Y-%m-%d')
-                                
-                                response['equityCurve'].append({
-                                    'date': date_str,
-                                    'value': round(float(result.equity_curve[i]), 2)
-                                })
-                        else:
-                            # 如果没有实际的交易日历数据，使用简化的日期格式
-                            for i, value in enumerate(result.equity_curve):
-                                date_str = f"{start_date_str}+{i}"
-                                
-                                response['equityCurve'].append({
-                                    'date': date_str,
-                                    'value': round(float(value), 2)
-                                })
-                    finally:
-                        if connection:
-                            connection.close()
-                except Exception as e:
-                    logger.error(f"处理资金曲线数据失败: {e}")
-                    # 使用简化的日期格式作为备选
-                    for i, value in enumerate(result.equity_curve):
-                        date_str = f"{start_date_str}+{i}"
-                        
-                        response['equityCurve'].append({
-                            'date': date_str,
-                            'value': round(float(value), 2)
-                        })
-                    # 使用简化格式作为备选，只包含实际有数据的日期
-                    start_date_str = formatted_start_date.split(' ')[0]
-                    end_date_str = formatted_end_date.split(' ')[0]
-                    
-                    start_date_parts = list(map(int, start_date_str.split('-')))
-                    end_date_parts = list(map(int, end_date_str.split('-')))
-                    
-                    start_date_obj = datetime(start_date_parts[0], start_date_parts[1], start_date_parts[2])
-                    end_date_obj = datetime(end_date_parts[0], end_date_parts[1], end_date_parts[2])
-                    
-                    # 只添加实际有数据的日期点
-                    for i, value in enumerate(result.equity_curve):
-                        current_date = start_date_obj + timedelta(days=i)
-                        
-                        # 确保生成的日期不会超过用户指定的end_date
-                        if current_date > end_date_obj:
-                            break
-                        
-                        date_str = current_date.strftime('%Y-%m-%d')
-                        
-                        response['equityCurve'].append({
-                            'date': date_str,
-                            'value': round(float(value), 2)
-                        })
+                if len(equity_dates) != len(result.equity_curve):
+                    # 结果未携带日期时，按股票自身的交易日补齐
+                    equity_dates = _stock_curve_dates(stock_code, formatted_start_date, formatted_end_date,
+                                                      len(result.equity_curve), backtest_engine.db_password)
+                equity_values = np.round(np.asarray(result.equity_curve, dtype=float), 2).tolist()
+                response['equityCurve'] = _build_equity_curve(equity_dates, equity_values, downsample)
+                response['equityCurvePoints'] = min(len(equity_dates), len(equity_values))
+            
+            # 基准相对指标，基准与超额曲线取与资金曲线相同的点
+            benchmark_result = getattr(result, 'benchmark', None)
+            if benchmark_result and response['equityCurve']:
+                position = {d: i for i, d in enumerate(equity_dates)}
+                picked = [position[p['date']] for p in response['equityCurve'] if p['date'] in position]
+                response['benchmark'] = _format_benchmark(benchmark_result, equity_dates, picked)
             
             # 在返回的结果中添加标记，指示数据的实际结束日期
-            if hasattr(result, 'equity_curve') and result.equity_curve:
-                # 计算实际数据的结束日期
-                try:
-                    start_date = formatted_start_date.split(' ')[0]
-                    start_date_parts = list(map(int, start_date.split('-')))
-                    start_date_obj = datetime(start_date_parts[0], start_date_parts[1], start_date_parts[2])
-                    actual_end_date = start_date_obj + timedelta(days=len(result.equity_curve) - 1)
-                    response['actualEndDate'] = actual_end_date.strftime('%Y-%m-%d')
-                except Exception as e:
-                    logger.error(f"计算实际结束日期失败: {e}")
-                    # 如果计算失败，使用默认值
-                    response['actualEndDate'] = formatted_end_date.split(' ')[0]
+            if response['equityCurve']:
+                response['actualEndDate'] = response['equityCurve'][-1]['date']
+            elif hasattr(result, 'equity_curve') and result.equity_curve:
+                response['actualEndDate'] = formatted_end_date.split(' ')[0]
             
             # 处理交易记录，确保所有字段都有值
             if hasattr(result, 'trades') and result.trades:
@@ -578,10 +718,15 @@ def register_routes(app):
                         'commission': round(float(trade.get('commission', 0)), 2),
                         'return': round(float(trade.get('trade_return', 0)), 2),
                         'capitalAfter': round(float(trade.get('capital_after', 0)), 2),
+                        'exitReason': trade.get('exit_reason', ''),  # 卖出原因：signal/stop_loss/take_profit等
                         'status': 'completed'  # 添加状态字段，确保不为空
                     }
                     response['trades'].append(formatted_trade)
 
+            succeeded = True
+            if debug_mode in ('1', 'true', 'memory'):
+                response['debug'] = {'timings': timer.to_dict(), 'resultCache': cache_status}
+
             # 为了兼容前端，直接返回response对象
             return jsonify(response), 200
         except ValueError as e:
@@ -590,7 +735,138 @@ def register_routes(app):
         except Exception as e:
             logger.error(f"回测失败: {e}")
             return jsonify({'message': '回测失败', 'error': str(e)}), 500
+        finally:
+            timer.finish('ok' if succeeded else 'error')
 
+    @app.route('/backtest/portfolio/run', methods=['POST'])
+    @token_required
+    def run_portfolio_backtest(current_user_id):
+        """运行横截面组合策略回测（STRAT_001 小市值、STRAT_003 银行股轮动、STRAT_004 低估价值）"""
+        debug_mode = str(request.args.get('debug', '')).lower()
+        timer = StageTimer(pipeline='portfolio', trace_memory=debug_mode == 'memory').start()
+        succeeded = False
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({'message': '请求数据不能为空'}), 400
+
+            required_fields = ['strategyId', 'startDate', 'endDate', 'initialFund']
+            for field in required_fields:
+                if field not in data:
+                    return jsonify({'message': f'缺少必要参数: {field}'}), 400
+
+            strategy_id = data['strategyId']
+            if strategy_id not in PORTFOLIO_STRATEGIES:
+                return jsonify({'message': f'不支持的组合策略: {strategy_id}',
+                                'supported_strategies': sorted(PORTFOLIO_STRATEGIES)}), 400
+            start_date = str(data['startDate']).split('T')[0]
+            end_date = str(data['endDate']).split('T')[0]
+            initial_capital = float(data['initialFund'])
+            commission_rate = float(data.get('commissionRate', 0.0003))
+            benchmark = data.get('benchmark') or None
+            downsample = _parse_downsample_args(
+                request.args.get('points', data.get('points')),
+                request.args.get('method', data.get('method'))
+            )
+            # 可覆盖的组合参数（未提供时使用策略默认值）
+            overrides = {
+                'top_n': data.get('topN'),
+                'rebalance': data.get('rebalance'),
+                'hold_days': data.get('holdDays'),
+            }
+
+            result = portfolio_engine.run(
+                strategy_id, start_date, end_date,
+                initial_capital=initial_capital,
+                commission_rate=commission_rate,
+                benchmark=benchmark,
+                **overrides
+            )
+
+            # 组合回测以股票池（指数代码或全市场）作为报告标的
+            universe = PORTFOLIO_STRATEGIES[strategy_id]['universe']
+            target = universe.get('index_code') or 'ALL'
+            with timed_stage('save_result'):
+                report_id = backtest_engine.save_backtest_result(
+                    result=result,
+                    strategy_id=strategy_id,
+                    user_id=current_user_id,
+                    stock_code=target,
+                    start_date=start_date,
+                    end_date=end_date,
+                    backtest_type='INDEX',
+                    strategy_params={k: v for k, v in overrides.items() if v is not None}
+                )
+
+            equity_values = np.round(np.asarray(result.equity_curve, dtype=float), 2).tolist()
+            response = {
+                'id': report_id,
+                'strategyId': strategy_id,
+                'target': target,
+                'totalReturn': round(float(result.total_return) * 100, 4),
+                'annualReturn': round(float(result.annual_return) * 100, 4),
+                'maxDrawdown': round(float(result.max_drawdown) * 100, 4),
+                'sharpeRatio': round(float(result.sharpe_ratio), 4),
+                'winRate': round(float(result.win_rate) * 100, 4),
+                'tradeCount': result.trade_count,
+                'rebalanceCount': getattr(result, 'rebalance_count', 0),
+                'equityCurve': _build_equity_curve(result.dates, equity_values, downsample),
+                'equityCurvePoints': len(equity_values),
+                'metrics': {k: round(float(v), 4) for k, v in (result.metrics or {}).items()},
+                'trades': [
+                    {
+                        'date': trade['date'],
+                        'type': trade['action'],
+                        'stockCode': trade['stock_code'],
+                        'price': round(float(trade['price']), 2),
+                        'quantity': int(trade['shares']),
+                        'amount': round(float(trade['price']) * int(trade['shares']), 2),
+                        'commission': round(float(trade['commission']), 2),
+                        'return': round(float(trade.get('trade_return', 0)), 2),
+                        'capitalAfter': round(float(trade['capital_after']), 2),
+                        'exitReason': trade.get('exit_reason', ''),
+                        'status': 'completed'
+                    }
+                    for trade in result.trades
+                ]
+            }
+            if result.benchmark:
+                position = {d: i for i, d in enumerate(result.dates)}
+                picked = [position[p['date']] for p in response['equityCurve'] if p['date'] in position]
+                response['benchmark'] = _format_benchmark(result.benchmark, result.dates, picked)
+
+            succeeded = True
+            if debug_mode in ('1', 'true', 'memory'):
+                response['debug'] = {'timings': timer.to_dict()}
+            return jsonify(response), 200
+        except ValueError as e:
+            logger.error(f"组合回测参数验证失败: {e}")
+            return jsonify({'message': '组合回测参数验证失败', 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"组合回测失败: {e}")
+            return jsonify({'message': '组合回测失败', 'error': str(e)}), 500
+        finally:
+            timer.finish('ok' if succeeded else 'error')
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """进程内指标（Prometheus 文本格式），包括回测各阶段耗时直方图"""
+        from flask import Response
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route('/backtest/benchmarks', methods=['GET'])
+    def get_benchmarks():
+        """可选的基准指数列表（本地 index_basic）"""
+        try:
+            return jsonify({
+                'success': True,
+                'default': DEFAULT_BENCHMARK,
+                'benchmarks': get_benchmark_provider().list_benchmarks()
+            }), 200
+        except Exception as e:
+            logger.error(f"获取基准指数列表失败: {e}")
+            return jsonify({'message': '获取基准指数列表失败', 'error': str(e)}), 500
+    
     @app.route('/backtest/compare', methods=['POST'])
     def compare_strategies():
         """比较多个策略"""
@@ -647,8 +923,13 @@ def register_routes(app):
     @app.route('/backtest/results/<report_id>', methods=['GET'])
     @token_required
     def get_backtest_detail(current_user_id, report_id):
-        """获取回测结果详情"""
+        """获取回测结果详情，支持 points/method 参数对资金曲线降采样"""
         try:
+            try:
+                downsample = _parse_downsample_args(request.args.get('points'), request.args.get('method'))
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            
             # 直接连接数据库查询回测结果详情，并验证用户权限
             import pymysql
             import json
@@ -671,8 +952,9 @@ def register_routes(app):
                        start_date, end_date, initial_fund, final_fund, total_return,
                        annual_return, max_drawdown, sharpe_ratio, win_rate,
                        profit_loss_ratio, trade_count, report_generate_time, report_status,
-                       equity_curve_data, trade_records, strategy_params
-                FROM BacktestReport
+                       equity_curve_data, trade_records, strategy_params,
+                       (SELECT d.payload FROM BacktestReportData d WHERE d.report_id = r.report_id) AS payload
+                FROM BacktestReport r
                 WHERE report_id = %s AND user_id = %s
                 """
                 cursor.execute(query, (report_id, current_user_id))
@@ -705,56 +987,40 @@ def register_routes(app):
                 }
                 
                 try:
-                    # 从数据库中读取并解析equity_curve_data
-                    if result.get('equity_curve_data'):
+                    # 优先读取列式负载（BacktestReportData），旧报告回退到JSON字段
+                    payload = result.get('payload')
+                    equity_curve = None
+                    curve_dates = None
+                    tiers = None
+                    if payload:
+                        decoded = decode_backtest_payload(payload)
+                        equity_curve = np.round(decoded['equity'], 4).tolist()
+                        if decoded['dates'] is not None:
+                            curve_dates = format_dates(decoded['dates'])
+                        response['trades'] = _format_payload_trades(decoded['trades'], result['stock_code'])
+                        tiers = decoded['tiers']
+                        if decoded['extra'].get('benchmark'):
+                            response['benchmark'] = _format_benchmark(decoded['extra']['benchmark'])
+                    elif result.get('equity_curve_data'):
                         try:
-                            equity_curve = json.loads(result['equity_curve_data'])
-                            
-                            # 连接数据库获取实际的交易日历数据，确保日期与equity_curve匹配
-                            calendar_conn = pymysql.connect(
-                                host=DB_DEFAULTS["host"],
-                                port=DB_DEFAULTS["port"],
-                                user=DB_DEFAULTS["user"],
-                                password=DB_DEFAULTS["password"],
-                                database=DB_DEFAULTS["database"],
-                                charset=DB_DEFAULTS["charset"]
-                            )
-                            
-                            try:
-                                # 查询实际的交易日历数据
-                                calendar_query = """
-                                SELECT DISTINCT trade_date 
-                                FROM StockMarketData 
-                                WHERE stock_code = %s AND trade_date BETWEEN %s AND %s
-                                ORDER BY trade_date ASC
-                                """
-                                
-                                start_date_str = result['start_date'].split(' ')[0] if isinstance(result['start_date'], str) else str(result['start_date']).split(' ')[0]
-                                end_date_str = result['end_date'].split(' ')[0] if isinstance(result['end_date'], str) else str(result['end_date']).split(' ')[0]
-                                
-                                # 执行查询，获取实际的交易日历
-                                cursor_calendar = calendar_conn.cursor()
-                                cursor_calendar.execute(calendar_query, (result['stock_code'], start_date_str, end_date_str))
-                                dates_result = cursor_calendar.fetchall()
-                                
-                                if dates_result:
-                                    # 构建日期列表
-                                    dates = [date[0].strftime('%Y-%m-%d') for date in dates_result]
-                                    
-                                    # 确保equity_curve长度与dates匹配
-                                    min_length = min(len(dates), len(equity_curve))
-                                    
-                                    # 构建资金曲线数据，使用实际的交易日历
-                                    response['equityCurve'] = [{'date': dates[i], 'value': round(float(equity_curve[i]), 4)} for i in range(min_length)]
-                                
-                            finally:
-                                if calendar_conn:
-                                    calendar_conn.close()
+                            equity_curve = [round(float(v), 4) for v in json.loads(result['equity_curve_data'])]
                         except json.JSONDecodeError as e:
                             logger.error(f"解析equity_curve_data失败: {e}")
+                    
+                    if equity_curve:
+                        if curve_dates is None:
+                            # 旧报告没有保存日期，按股票自身的交易日补齐
+                            start_date_str = str(result['start_date']).split(' ')[0]
+                            end_date_str = str(result['end_date']).split(' ')[0]
+                            curve_dates = _stock_curve_dates(result['stock_code'], start_date_str, end_date_str,
+                                                             len(equity_curve))
                         
-                    # 从数据库中读取并解析trade_records
-                    if result.get('trade_records'):
+                        # 确保equity_curve长度与dates匹配，按需降采样
+                        response['equityCurve'] = _build_equity_curve(curve_dates, equity_curve, downsample, tiers)
+                        response['equityCurvePoints'] = min(len(curve_dates), len(equity_curve))
+                        
+                    # 从数据库中读取并解析trade_records（旧报告）
+                    if not payload and result.get('trade_records'):
                         try:
                             trades = json.loads(result['trade_records'])
                             
@@ -776,6 +1042,7 @@ def register_routes(app):
                                     'commission': round(float(trade.get('commission', 0)), 2),
                                     'return': round(float(trade.get('trade_return', 0)), 2),
                                     'capitalAfter': round(float(trade.get('capital_after', 0)), 2),
+                                    'exitReason': trade.get('exit_reason', ''),
                                     'status': 'completed'  # 添加状态字段，确保不为空
                                 }
                                 formatted_trades.append(formatted_trade)
@@ -811,107 +1078,134 @@ def register_routes(app):
             logger.error(f"获取回测结果详情失败: {e}")
             return jsonify({'message': '获取回测结果详情失败', 'error': str(e)}), 500
     
+    @app.route('/backtest/results/<report_id>/export', methods=['GET'])
+    @token_required
+    def export_backtest_result(current_user_id, report_id):
+        """流式导出回测资金曲线与交易记录，format=csv|ndjson，section=all|equity|trades"""
+        from flask import Response, stream_with_context
+        export_format = request.args.get('format', 'csv').lower()
+        section = request.args.get('section', 'all').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'message': f"format 必须为 {'/'.join(EXPORT_FORMATS)} 之一"}), 400
+        if section not in EXPORT_SECTIONS:
+            return jsonify({'message': f"section 必须为 {'/'.join(EXPORT_SECTIONS)} 之一"}), 400
+        
+        connection = None
+        try:
+            from strategy_engine import DB_DEFAULTS
+            connection = pymysql.connect(
+                host=DB_DEFAULTS["host"],
+                port=DB_DEFAULTS["port"],
+                user=DB_DEFAULTS["user"],
+                password=DB_DEFAULTS["password"],
+                database=DB_DEFAULTS["database"],
+                charset=DB_DEFAULTS["charset"]
+            )
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            cursor.execute("""
+                SELECT r.stock_code, r.start_date, r.end_date, r.equity_curve_data, r.trade_records,
+                       (SELECT d.payload FROM BacktestReportData d WHERE d.report_id = r.report_id) AS payload
+                FROM BacktestReport r
+                WHERE r.report_id = %s AND r.user_id = %s
+            """, (report_id, current_user_id))
+            result = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"查询导出数据失败: {e}")
+            return jsonify({'message': '导出回测结果失败', 'error': str(e)}), 500
+        finally:
+            if connection:
+                connection.close()
+        
+        if not result:
+            return jsonify({'message': '回测结果不存在或无权访问'}), 404
+        
+        try:
+            payload = result.get('payload')
+            if not payload:
+                # 旧报告：把JSON字段转换为同样的列式结构，日期按股票自身的交易日补齐
+                equity_curve = json.loads(result.get('equity_curve_data') or '[]')
+                trades = json.loads(result.get('trade_records') or '[]')
+                dates = _stock_curve_dates(result['stock_code'], str(result['start_date']).split(' ')[0],
+                                           str(result['end_date']).split(' ')[0], len(equity_curve))
+                payload = encode_backtest_payload(
+                    equity_curve,
+                    dates=dates if len(dates) == len(equity_curve) else None,
+                    trades=trades,
+                    compress=False
+                )
+            decoded = decode_backtest_payload(payload)
+        except Exception as e:
+            logger.error(f"解析导出数据失败: {e}")
+            return jsonify({'message': '导出回测结果失败', 'error': str(e)}), 500
+        
+        chunks = iter_csv(decoded, section) if export_format == 'csv' else iter_ndjson(decoded, section)
+        headers = {
+            'Content-Disposition': f'attachment; filename="{report_id}.{export_format}"',
+            'Vary': 'Accept-Encoding'
+        }
+        if accepts_gzip(request.headers.get('Accept-Encoding', '')):
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        return Response(stream_with_context(chunks), content_type=CONTENT_TYPES[export_format],
+                        headers=headers)
+    
     @app.route('/backtest/history', methods=['GET'])
     @token_required
     def get_backtest_history(current_user_id):
-        """获取历史回测记录（为前端提供兼容接口）"""
+        """获取历史回测记录（为前端提供兼容接口），支持 limit 与 cursor 游标分页"""
         try:
             logger.info(f"用户 {current_user_id} 请求获取历史回测记录")
             
-            # 调用现有接口获取数据
-            results = backtest_engine.get_backtest_results(
-                user_id=current_user_id,
-                limit=20  # 返回最近20条记录
-            )
+            limit = request.args.get('limit', default=20, type=int)
+            limit = max(1, min(limit, 100))
+            cursor = request.args.get('cursor') or None
+            
+            # 单条联表查询同时取得策略名称
+            try:
+                results, next_cursor = backtest_engine.get_backtest_history(
+                    user_id=current_user_id,
+                    limit=limit,
+                    cursor=cursor
+                )
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
             
             logger.info(f"获取到 {len(results)} 条历史回测记录")
             
             # 转换数据格式为前端期望的结构
             formatted_records = []
-            import pymysql
-            from strategy_engine import DB_DEFAULTS
-            connection = None
-            
-            try:
-                connection = pymysql.connect(
-                    host=DB_DEFAULTS["host"],
-                    port=DB_DEFAULTS["port"],
-                    user=DB_DEFAULTS["user"],
-                    password=DB_DEFAULTS["password"],
-                    database=DB_DEFAULTS["database"],
-                    charset=DB_DEFAULTS["charset"]
-                )
+            for record in results:
+                # 格式化日期为前端需要的格式
+                start_date_str = record.get('start_date', '')
+                end_date_str = record.get('end_date', '')
+                if hasattr(start_date_str, 'strftime'):
+                    start_date_str = start_date_str.strftime('%Y-%m-%d')
+                elif isinstance(start_date_str, str) and ' ' in start_date_str:
+                    start_date_str = start_date_str.split(' ')[0]
+                if hasattr(end_date_str, 'strftime'):
+                    end_date_str = end_date_str.strftime('%Y-%m-%d')
+                elif isinstance(end_date_str, str) and ' ' in end_date_str:
+                    end_date_str = end_date_str.split(' ')[0]
                 
-                with connection.cursor() as cursor:
-                    for record in results:
-                        # 查询策略名称
-                        cursor.execute("SELECT strategy_name FROM Strategy WHERE strategy_id = %s", (record.get('strategy_id'),))
-                        strategy_result = cursor.fetchone()
-                        strategy_name = strategy_result[0] if strategy_result else '未知策略'
-                        
-                        # 格式化日期为前端需要的格式
-                        start_date_str = record.get('start_date', '')
-                        end_date_str = record.get('end_date', '')
-                        
-                        # 转换格式，确保正确显示
-                        from datetime import datetime as dt_type
-                        if isinstance(start_date_str, dt_type):
-                            start_date_str = start_date_str.strftime('%Y-%m-%d')
-                        elif isinstance(start_date_str, str) and ' ' in start_date_str:
-                            start_date_str = start_date_str.split(' ')[0]
-                            
-                        if isinstance(end_date_str, dt_type):
-                            end_date_str = end_date_str.strftime('%Y-%m-%d')
-                        elif isinstance(end_date_str, str) and ' ' in end_date_str:
-                            end_date_str = end_date_str.split(' ')[0]
-                            
-                        # 转换创建时间格式
-                        create_time_str = record.get('report_generate_time', '')
-                        if isinstance(create_time_str, dt_type):
-                            create_time_str = create_time_str.strftime('%Y-%m-%d %H:%M:%S')
-                        elif isinstance(create_time_str, str):
-                            # 尝试格式化
-                            try:
-                                dt = datetime.strptime(create_time_str, '%Y-%m-%d %H:%M:%S')
-                                create_time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-                            except:
-                                pass
-                            
-                        # 构建前端需要的记录格式
-                        formatted_record = {
-                            'id': record.get('report_id'),
-                            'strategyName': strategy_name,
-                            'target': record.get('stock_code'),
-                            'period': f"{start_date_str} 至 {end_date_str}",
-                            'totalReturn': round(float(record.get('total_return', 0)), 4),
-                            'maxDrawdown': round(float(record.get('max_drawdown', 0)), 4),
-                            'sharpeRatio': round(float(record.get('sharpe_ratio', 0)), 4),
-                            'createTime': create_time_str
-                        }
-                        
-                        formatted_records.append(formatted_record)
-            except Exception as e:
-                logger.error(f"格式化回测历史记录失败: {e}")
-                # 使用简化的记录格式作为备选方案
-                formatted_records = []
-                for record in results:
-                    formatted_record = {
-                        'id': record.get('report_id'),
-                        'strategyName': '未知策略',
-                        'target': record.get('stock_code'),
-                        'period': '未知期间',
-                        'totalReturn': round(float(record.get('total_return', 0)), 4),
-                        'maxDrawdown': round(float(record.get('max_drawdown', 0)), 4),
-                        'sharpeRatio': round(float(record.get('sharpe_ratio', 0)), 4),
-                        'createTime': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    formatted_records.append(formatted_record)
-            finally:
-                if connection:
-                    connection.close()
+                # 转换创建时间格式
+                create_time_str = record.get('report_generate_time', '')
+                if hasattr(create_time_str, 'strftime'):
+                    create_time_str = create_time_str.strftime('%Y-%m-%d %H:%M:%S')
+                
+                # 构建前端需要的记录格式
+                formatted_records.append({
+                    'id': record.get('report_id'),
+                    'strategyName': record.get('strategy_name') or '未知策略',
+                    'target': record.get('stock_code'),
+                    'period': f"{start_date_str} 至 {end_date_str}",
+                    'totalReturn': round(float(record.get('total_return') or 0), 4),
+                    'maxDrawdown': round(float(record.get('max_drawdown') or 0), 4),
+                    'sharpeRatio': round(float(record.get('sharpe_ratio') or 0), 4),
+                    'createTime': create_time_str
+                })
             
             # 返回格式化后的数据
-            return jsonify({'success': True, 'records': formatted_records}), 200
+            return jsonify({'success': True, 'records': formatted_records, 'nextCursor': next_cursor}), 200
         except Exception as e:
             logger.error(f"获取历史回测记录失败: {e}")
             return jsonify({'message': '获取历史回测记录失败', 'error': str(e)}), 500
@@ -952,6 +1246,8 @@ def register_routes(app):
                     delete_sql = "DELETE FROM BacktestReport WHERE report_id = %s AND user_id = %s"
                     cursor.execute(delete_sql, (report_id, current_user_id))
                     connection.commit()
+                    # 已删除的报告不能再被缓存的相同请求复用
+                    get_result_cache().discard(lambda cached: cached[1] == report_id)
                     
                     logger.info(f"成功删除回测记录 {report_id}")
                     return jsonify({'success': True, 'message': '删除成功'}), 200
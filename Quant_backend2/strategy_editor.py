@@ -17,6 +17,7 @@ import pymysql
 
 from strategy_engine import BaseStrategy, StrategyEngine
 from backtest_engine import BacktestEngine
+from signal_cache import get_signal_cache, strategy_fingerprint
 
 # 配置日志
 logging.basicConfig(
@@ -479,7 +480,8 @@ class StrategyEditor:
     def run_custom_strategy(self, stock_code: str, start_date: str, end_date: str,
                            code: str, parameters: Dict[str, Any] = None,
                            initial_capital: float = 100000.0,
-                           commission_rate: float = 0.001) -> Dict[str, Any]:
+                           commission_rate: float = 0.001,
+                           risk_rules: Dict[str, float] = None) -> Dict[str, Any]:
         """
         运行自定义策略
         
@@ -491,6 +493,7 @@ class StrategyEditor:
             parameters: 策略参数
             initial_capital: 初始资金
             commission_rate: 手续费率
+            risk_rules: 风控离场规则（risk_rules.parse_risk_rules 的结果）
             
         Returns:
             回测结果
@@ -502,16 +505,23 @@ class StrategyEditor:
             # 连接数据库（修复问题：确保在调用get_stock_data之前连接数据库）
             self.strategy_engine.connect_database()
             
-            # 获取数据
-            data = self.strategy_engine.get_stock_data(stock_code, start_date, end_date)
-            if data.empty:
-                raise ValueError(f"未获取到股票{stock_code}的数据")
+            def compute():
+                # 获取数据
+                data = self.strategy_engine.get_stock_data(stock_code, start_date, end_date)
+                if data.empty:
+                    raise ValueError(f"未获取到股票{stock_code}的数据")
+                
+                # 生成信号
+                return strategy.generate_signals(data)
             
-            # 生成信号
-            signals = strategy.generate_signals(data)
+            # 同一份代码与参数在数据未更新时复用信号
+            signals = get_signal_cache().get_or_compute(
+                strategy_fingerprint("custom", strategy.params, code), stock_code, start_date, end_date,
+                self.strategy_engine.connection, compute
+            )
             
             # 模拟交易
-            result = self.backtest_engine.simulate_trading(signals, initial_capital, commission_rate)
+            result = self.backtest_engine.simulate_trading(signals, initial_capital, commission_rate, risk_rules)
             
             return {
                 "success": True,
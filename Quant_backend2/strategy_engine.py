@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 策略引擎模块
-实现各种量化交易策略，包括双均线策略、突破策略等
+实现各种量化交易策略，包括双均线策略、突破策略、Dual Thrust策略等
 """
 
 import pandas as pd
@@ -13,6 +13,15 @@ from typing import Dict, List, Tuple, Optional, Any
 from abc import ABC, abstractmethod
 import pymysql
 
+from market_data_reader import ChunkedMarketDataReader, DEFAULT_CHUNK_ROWS
+from stage_timer import timed_stage
+from signal_cache import get_signal_cache, strategy_fingerprint
+from kernels import carry_positions
+from rule_compiler import (
+    BALANCE_SHEET_COLUMNS, DUAL_THRUST_K1, DUAL_THRUST_K2, VALUATION_COLUMNS, CompiledRules,
+    attach_fundamentals, combine_cross_sections, dual_thrust_range, load_conditions
+)
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -30,6 +39,13 @@ DB_DEFAULTS = {
 }
 
 
+def _combine_signals(buy: np.ndarray, sell: np.ndarray, start: int) -> np.ndarray:
+    """合并买卖条件为信号数组（买入优先），start 之前的信号为 0"""
+    signal = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int64)
+    signal[:start] = 0
+    return signal
+
+
 class BaseStrategy(ABC):
     """策略基类"""
     
@@ -72,25 +88,13 @@ class BreakoutStrategy(BaseStrategy):
         df['upper_threshold'] = df['high_max'] * (1 + self.breakout_threshold)
         df['lower_threshold'] = df['low_min'] * (1 - self.breakout_threshold)
         
-        # 初始化信号
-        df['signal'] = 0
-        df['position'] = 0
-        
-        # 生成交易信号
-        for i in range(self.lookback_period, len(df)):
-            # 向上突破买入 - 修改条件，使突破更容易触发
-            if df.loc[i, 'close_price'] >= df.loc[i, 'high_max'] * (1 + self.breakout_threshold - 0.01):
-                df.loc[i, 'signal'] = 1  # 买入
-                df.loc[i, 'position'] = 1
-            
-            # 向下突破卖出
-            elif df.loc[i, 'close_price'] <= df.loc[i, 'low_min'] * (1 - self.breakout_threshold + 0.01):
-                df.loc[i, 'signal'] = -1  # 卖出
-                df.loc[i, 'position'] = 0
-            
-            # 保持仓位
-            else:
-                df.loc[i, 'position'] = df.loc[i-1, 'position']
+        # 生成交易信号：向上突破买入（放宽1%使突破更容易触发），向下突破卖出
+        close = df['close_price'].to_numpy(dtype=np.float64)
+        buy = close >= df['high_max'].to_numpy() * (1 + self.breakout_threshold - 0.01)
+        sell = close <= df['low_min'].to_numpy() * (1 - self.breakout_threshold + 0.01)
+        df['signal'] = _combine_signals(buy, sell, self.lookback_period)
+        # 持仓状态延续
+        df['position'] = carry_positions(df['signal'].to_numpy(), self.lookback_period)
         
         return df
 
@@ -123,25 +127,14 @@ class MovingAverageStrategy(BaseStrategy):
         df['short_ma'] = df['close_price'].rolling(window=self.short_period).mean()
         df['long_ma'] = df['close_price'].rolling(window=self.long_period).mean()
         
-        # 初始化信号
-        df['signal'] = 0
-        df['position'] = 0
-        
-        # 生成交易信号
-        for i in range(self.long_period, len(df)):
-            # 短期均线上穿长期均线且达到买入阈值，买入
-            if (df.loc[i, 'short_ma'] / df.loc[i, 'long_ma'] >= self.buy_threshold and 
-                df.loc[i-1, 'short_ma'] / df.loc[i-1, 'long_ma'] < self.buy_threshold):
-                df.loc[i, 'signal'] = 1  # 买入
-                df.loc[i, 'position'] = 1
-            # 短期均线下穿长期均线且达到卖出阈值，卖出
-            elif (df.loc[i, 'short_ma'] / df.loc[i, 'long_ma'] <= self.sell_threshold and 
-                  df.loc[i-1, 'short_ma'] / df.loc[i-1, 'long_ma'] > self.sell_threshold):
-                df.loc[i, 'signal'] = -1  # 卖出
-                df.loc[i, 'position'] = 0
-            # 保持仓位
-            else:
-                df.loc[i, 'position'] = df.loc[i-1, 'position']
+        # 生成交易信号：短期均线上穿长期均线且达到买入阈值买入，下穿且达到卖出阈值卖出
+        ratio = df['short_ma'].to_numpy() / df['long_ma'].to_numpy()
+        prev_ratio = np.concatenate(([np.nan], ratio[:-1]))
+        buy = (ratio >= self.buy_threshold) & (prev_ratio < self.buy_threshold)
+        sell = (ratio <= self.sell_threshold) & (prev_ratio > self.sell_threshold)
+        df['signal'] = _combine_signals(buy, sell, self.long_period)
+        # 持仓状态延续
+        df['position'] = carry_positions(df['signal'].to_numpy(), self.long_period)
         
         return df
 
@@ -179,26 +172,154 @@ class RSIMeanReversionStrategy(BaseStrategy):
         # 计算RSI
         df['rsi'] = self.calculate_rsi(df['close_price'], self.rsi_period)
         
-        # 初始化信号
-        df['signal'] = 0
-        df['position'] = 0
+        # 生成交易信号：超卖买入，超买卖出
+        rsi = df['rsi'].to_numpy()
+        df['signal'] = _combine_signals(rsi < self.oversold_threshold, rsi > self.overbought_threshold,
+                                        self.rsi_period)
+        # 持仓状态延续
+        df['position'] = carry_positions(df['signal'].to_numpy(), self.rsi_period)
         
-        # 生成交易信号
-        for i in range(self.rsi_period, len(df)):
-            # 超卖买入
-            if df.loc[i, 'rsi'] < self.oversold_threshold:
-                df.loc[i, 'signal'] = 1  # 买入
-                df.loc[i, 'position'] = 1
-            
-            # 超买卖出
-            elif df.loc[i, 'rsi'] > self.overbought_threshold:
-                df.loc[i, 'signal'] = -1  # 卖出
-                df.loc[i, 'position'] = 0
-            
-            # 保持仓位
-            else:
-                df.loc[i, 'position'] = df.loc[i-1, 'position']
+        return df
+
+
+class DualThrustStrategy(BaseStrategy):
+    """Dual Thrust策略"""
+    
+    def __init__(self, period: int = 10, k1: float = DUAL_THRUST_K1, k2: float = DUAL_THRUST_K2, **kwargs):
+        super().__init__("Dual Thrust策略", {
+            'period': period,
+            'k1': k1,
+            'k2': k2
+        })
+        self.period = period
+        self.k1 = k1
+        self.k2 = k2
+    
+    def _apply(self, df: pd.DataFrame, groups=None) -> pd.DataFrame:
+        # Range = max(HH-LC, HC-LL)，取前N日的滚动窗口；上下轨以当日开盘价为基准
+        value_range = dual_thrust_range(df, groups, self.period)
+        open_price = df['open_price'].to_numpy(dtype=np.float64)
+        df['range'] = value_range
+        df['upper_track'] = open_price + self.k1 * value_range
+        df['lower_track'] = open_price - self.k2 * value_range
+        
+        # 生成交易信号：收盘价向上突破上轨买入，向下突破下轨卖出
+        close = df['close_price'].to_numpy(dtype=np.float64)
+        df['signal'] = _combine_signals(close > df['upper_track'].to_numpy(),
+                                        close < df['lower_track'].to_numpy(), self.period)
+        if groups is not None:
+            # 每只股票的前N行没有完整窗口，range 为 NaN，不会产生信号
+            return df
+        # 持仓状态延续
+        df['position'] = carry_positions(df['signal'].to_numpy(), self.period)
+        return df
+    
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        """生成Dual Thrust策略信号"""
+        if not self.validate_data(data):
+            raise ValueError("数据格式不正确")
+        
+        df = data.copy()
+        df = df.sort_values('trade_date').reset_index(drop=True)
+        return self._apply(df)
+    
+    def generate_panel_signals(self, panel: pd.DataFrame) -> pd.DataFrame:
+        """对多只股票的面板一次性求值，返回按 (股票, 日期) 排序的信号"""
+        if not self.validate_data(panel):
+            raise ValueError("数据格式不正确")
+        
+        df = panel.sort_values(['stock_code', 'trade_date'], kind='mergesort').reset_index(drop=True)
+        groups = df['stock_code'].to_numpy()
+        df = self._apply(df, groups)
+        # 持仓状态按股票分组前向延续
+        marks = pd.Series(np.where(df['signal'] == 1, 1.0, np.where(df['signal'] == -1, 0.0, np.nan)))
+        df['position'] = marks.groupby(groups, sort=False).ffill().fillna(0).astype(np.int64).to_numpy()
+        return df
+
+
+class RuleBasedStrategy(BaseStrategy):
+    """规则策略：由 StrategyCondition 中声明的条件编译而成"""
+    
+    def __init__(self, strategy_id: str = None, conditions: List[Dict[str, Any]] = None,
+                 db_password: str = None, **kwargs):
+        """
+        Args:
+            strategy_id: 策略ID，未提供 conditions 时从 StrategyCondition 读取其条件
+            conditions: 条件列表（字段同 StrategyCondition）
+            db_password: 数据库密码
+        """
+        if conditions is None:
+            if not strategy_id:
+                raise ValueError("规则策略需要提供 strategy_id 或 conditions")
+            conditions = load_conditions(strategy_id, db_password)
+            if not conditions:
+                raise ValueError(f"策略{strategy_id}没有配置条件")
+        super().__init__("规则策略", {'strategy_id': strategy_id, 'conditions': conditions})
+        self.rules = CompiledRules(conditions)
+        self.db_password = db_password
+    
+    @property
+    def uses_fundamentals(self) -> bool:
+        """条件是否读取估值或财务数据（信号随这些表更新而变化）"""
+        return any(c in VALUATION_COLUMNS + BALANCE_SHEET_COLUMNS for c in self.rules.required_columns)
+    
+    @property
+    def uses_market_mean(self) -> bool:
+        """是否含与市场平均值比较的条件（单只股票求值需要全市场截面均值）"""
+        return bool(self.rules.cross_section_keys)
+    
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """缺少估值或财务数据列时从数据库补充"""
+        fundamentals = [c for c in self.rules.required_columns
+                        if c in VALUATION_COLUMNS + BALANCE_SHEET_COLUMNS and c not in df.columns]
+        if fundamentals:
+            df = attach_fundamentals(df, fundamentals, self.db_password)
+        return df
+    
+    def generate_signals(self, data: pd.DataFrame, references: Dict = None) -> pd.DataFrame:
+        """
+        生成单只股票的规则策略信号
+        
+        Args:
+            data: 单只股票的行情
+            references: 与市场平均值比较的条件所需的全市场截面均值（见 CompiledRules.evaluate），
+                策略含此类条件而未提供时抛出 ValueError
+        """
+        if not self.validate_data(data):
+            raise ValueError("数据格式不正确")
         
+        df = data.copy()
+        df = df.sort_values('trade_date').reset_index(drop=True)
+        df = self._prepare(df)
+        df['signal'] = self.rules.evaluate(df, references=references)
+        df['position'] = carry_positions(df['signal'].to_numpy(), 0)
+        return df
+    
+    def _prepare_panel(self, panel: pd.DataFrame) -> pd.DataFrame:
+        if not self.validate_data(panel):
+            raise ValueError("数据格式不正确")
+        df = panel.sort_values(['stock_code', 'trade_date'], kind='mergesort').reset_index(drop=True)
+        return self._prepare(df)
+    
+    def cross_section_totals(self, panel: pd.DataFrame) -> Dict:
+        """面板上各截面指标按交易日的合计与个数，用于跨分块计算全市场均值"""
+        df = self._prepare_panel(panel)
+        return self.rules.cross_section_totals(df, df['stock_code'].to_numpy())
+    
+    def generate_panel_signals(self, panel: pd.DataFrame, references: Dict = None) -> pd.DataFrame:
+        """
+        对多只股票的面板一次性求值（滚动指标按股票分组），返回按 (股票, 日期) 排序的信号
+        
+        Args:
+            panel: 多只股票的行情
+            references: 全市场截面均值，面板只是市场的一部分（如分块）时必须提供，否则取面板自身的当日均值
+        """
+        df = self._prepare_panel(panel)
+        groups = df['stock_code'].to_numpy()
+        df['signal'] = self.rules.evaluate(df, groups, references)
+        # 持仓状态按股票分组前向延续
+        marks = pd.Series(np.where(df['signal'] == 1, 1.0, np.where(df['signal'] == -1, 0.0, np.nan)))
+        df['position'] = marks.groupby(groups, sort=False).ffill().fillna(0).astype(np.int64).to_numpy()
         return df
 
 
@@ -212,7 +333,9 @@ class StrategyEngine:
         self.strategies = {
             'moving_average': MovingAverageStrategy,
             'breakout': BreakoutStrategy,
-            'rsi_mean_reversion': RSIMeanReversionStrategy
+            'rsi_mean_reversion': RSIMeanReversionStrategy,
+            'dual_thrust': DualThrustStrategy,
+            'rule_based': RuleBasedStrategy
         }
     
     def connect_database(self):
@@ -265,31 +388,92 @@ class StrategyEngine:
             self.logger.error(f"获取股票数据失败: {e}")
             return pd.DataFrame()
     
+    def iter_stock_data(self, start_date: str, end_date: str, stock_codes: Optional[List[str]] = None,
+                        chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        """
+        分块流式获取多只股票（默认全市场）的行情数据，每个分块包含若干只股票的完整序列，
+        列与 get_stock_data 一致。
+        """
+        reader = ChunkedMarketDataReader(self.db_password)
+        columns = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        return reader.iter_chunks(start_date, end_date, stock_codes=stock_codes,
+                                  columns=columns, by='stock', chunk_rows=chunk_rows)
+
+    def market_references(self, strategy: BaseStrategy, start_date: str, end_date: str,
+                          chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Optional[Dict]:
+        """
+        分块遍历区间内全市场行情，计算策略中与市场平均值比较的条件所需的截面均值
+
+        Returns:
+            {(indicator_id, period): 按交易日的全市场均值}，策略不含此类条件时返回 None
+        """
+        if not getattr(strategy, 'uses_market_mean', False):
+            return None
+        parts = [strategy.cross_section_totals(chunk)
+                 for chunk in self.iter_stock_data(start_date, end_date, chunk_rows=chunk_rows)]
+        return combine_cross_sections(parts)
+
+    def iter_strategy_signals(self, start_date: str, end_date: str, strategy_type: str,
+                              stock_codes: Optional[List[str]] = None,
+                              chunk_rows: int = DEFAULT_CHUNK_ROWS, **strategy_params):
+        """在分块数据上逐股票运行策略，按分块产出信号，用于全市场筛选"""
+        strategy = self.create_strategy(strategy_type, **strategy_params)
+        for chunk in self.iter_stock_data(start_date, end_date, stock_codes, chunk_rows):
+            if hasattr(strategy, 'generate_panel_signals'):
+                # 支持面板求值的策略对整个分块一次性计算
+                yield strategy.generate_panel_signals(chunk)
+                continue
+            signals = [
+                strategy.generate_signals(group.reset_index(drop=True))
+                for _, group in chunk.groupby('stock_code', sort=False)
+            ]
+            if signals:
+                yield pd.concat(signals, ignore_index=True)
+
     def create_strategy(self, strategy_type: str, **kwargs) -> BaseStrategy:
         """创建策略实例"""
         if strategy_type not in self.strategies:
             raise ValueError(f"不支持的策略类型: {strategy_type}")
         
         strategy_class = self.strategies[strategy_type]
+        if strategy_type == 'rule_based':
+            kwargs.setdefault('db_password', self.db_password)
         return strategy_class(**kwargs)
     
     def run_strategy(self, stock_code: str, start_date: str, end_date: str, 
                     strategy_type: str, **strategy_params) -> pd.DataFrame:
         """运行策略"""
         try:
-            # 连接数据库
-            self.connect_database()
-            
-            # 获取数据
-            data = self.get_stock_data(stock_code, start_date, end_date)
-            if data.empty:
-                raise ValueError(f"未获取到股票{stock_code}的数据")
-            
             # 创建策略
             strategy = self.create_strategy(strategy_type, **strategy_params)
             
-            # 生成信号
-            signals = strategy.generate_signals(data)
+            def compute():
+                # 连接数据库并获取数据
+                with timed_stage('load_data'):
+                    data = self.get_stock_data(stock_code, start_date, end_date)
+                if data.empty:
+                    raise ValueError(f"未获取到股票{stock_code}的数据")
+                
+                # 含与市场平均值比较的条件时先计算全市场截面均值
+                if getattr(strategy, 'uses_market_mean', False):
+                    with timed_stage('market_references'):
+                        references = self.market_references(strategy, start_date, end_date)
+                    with timed_stage('generate_signals'):
+                        return strategy.generate_signals(data, references=references)
+                
+                # 生成信号
+                with timed_stage('generate_signals'):
+                    return strategy.generate_signals(data)
+            
+            # 数据版本未变时复用已生成的信号，只重新模拟交易
+            self.connect_database()
+            with timed_stage('signal_cache'):
+                signals = get_signal_cache().get_or_compute(
+                    strategy_fingerprint(strategy_type, strategy.params),
+                    stock_code, start_date, end_date, self.connection, compute,
+                    fundamentals=getattr(strategy, 'uses_fundamentals', False),
+                    market=getattr(strategy, 'uses_market_mean', False)
+                )
             
             self.logger.info(f"策略{strategy_type}运行完成，生成{len(signals)}条信号")
             return signals
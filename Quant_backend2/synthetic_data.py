@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+合成行情数据生成模块
+- 以几何布朗运动生成可复现的多股票 OHLCV 面板，列名与 StockMarketData 表一致，
+  满足表上的价格约束（最高价不低于开盘/收盘价、最低价不高于开盘/收盘价、价格为正）
+- 供基准测试、压测与离线测试使用，不依赖数据库和网络
+"""
+
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_START_DATE = "2015-01-05"
+SYNTHETIC_SOURCE = "synthetic"
+
+MARKET_COLUMNS = [
+    "stock_code",
+    "trade_date",
+    "open_price",
+    "high_price",
+    "low_price",
+    "close_price",
+    "pre_close_price",
+    "change_amount",
+    "change_percent",
+    "volume",
+    "amount",
+    "data_source",
+]
+
+
+def generate_stock_codes(n_stocks: int) -> List[str]:
+    """生成形如 600000.SH / 000001.SZ 的合成股票代码"""
+    codes = []
+    for i in range(n_stocks):
+        if i % 2 == 0:
+            codes.append(f"{600000 + i // 2:06d}.SH")
+        else:
+            codes.append(f"{1 + i // 2:06d}.SZ")
+    return codes
+
+
+def generate_trade_dates(n_days: int, start_date: str = DEFAULT_START_DATE) -> pd.DatetimeIndex:
+    """以工作日近似交易日"""
+    return pd.bdate_range(start_date, periods=n_days)
+
+
+def generate_ohlcv(
+    n_stocks: int = 10,
+    n_days: int = 2500,
+    start_date: str = DEFAULT_START_DATE,
+    seed: int = 0,
+    stock_codes: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    生成多股票日线面板
+
+    Args:
+        n_stocks: 股票数量（提供 stock_codes 时以其长度为准）
+        n_days: 交易日数量
+        start_date: 首个交易日
+        seed: 随机种子，相同参数生成相同数据
+        stock_codes: 指定股票代码
+
+    Returns:
+        按 (stock_code, trade_date) 排序的 DataFrame，列见 MARKET_COLUMNS
+    """
+    codes = stock_codes or generate_stock_codes(n_stocks)
+    n_stocks = len(codes)
+    dates = generate_trade_dates(n_days, start_date)
+    rng = np.random.default_rng(seed)
+
+    drift = rng.normal(0.0003, 0.0002, (n_stocks, 1))
+    vol = rng.uniform(0.01, 0.03, (n_stocks, 1))
+    log_returns = drift - 0.5 * vol ** 2 + vol * rng.standard_normal((n_stocks, n_days))
+    # A股涨跌停近似：单日涨跌幅限制在 ±10%
+    log_returns = np.clip(log_returns, np.log(0.9), np.log(1.1))
+    start_price = rng.uniform(5, 200, (n_stocks, 1))
+    close = np.round(start_price * np.exp(np.cumsum(log_returns, axis=1)), 3)
+    close = np.maximum(close, 0.01)
+    pre_close = np.concatenate([np.round(start_price, 3), close[:, :-1]], axis=1)
+
+    gap = rng.normal(0, 0.3, (n_stocks, n_days)) * vol
+    open_ = np.maximum(np.round(pre_close * np.exp(gap), 3), 0.01)
+    spread = np.abs(rng.normal(0, 0.5, (n_stocks, n_days, 2))) * vol[..., np.newaxis]
+    high = np.round(np.maximum(open_, close) * (1 + spread[..., 0]), 3)
+    low = np.maximum(np.round(np.minimum(open_, close) * (1 - spread[..., 1]), 3), 0.01)
+    volume = np.round(rng.lognormal(13, 0.6, (n_stocks, n_days))).astype(np.int64)
+    amount = np.round(volume * (high + low + close) / 3, 3)
+
+    return pd.DataFrame(
+        {
+            "stock_code": np.repeat(codes, n_days),
+            "trade_date": np.tile(dates.values, n_stocks),
+            "open_price": open_.ravel(),
+            "high_price": high.ravel(),
+            "low_price": low.ravel(),
+            "close_price": close.ravel(),
+            "pre_close_price": pre_close.ravel(),
+            "change_amount": np.round(close - pre_close, 3).ravel(),
+            "change_percent": np.round((close / pre_close - 1) * 100, 4).ravel(),
+            "volume": volume.ravel(),
+            "amount": amount.ravel(),
+            "data_source": SYNTHETIC_SOURCE,
+        },
+        columns=MARKET_COLUMNS,
+    )
+
+
+def iter_stock_frames(panel: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    """按股票拆分面板，每只股票的数据按日期升序、索引从 0 开始（与 get_stock_data 返回格式一致）"""
+    for _, group in panel.groupby("stock_code", sort=False):
+        yield group.reset_index(drop=True)
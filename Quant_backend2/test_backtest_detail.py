@@ -1,6 +1,7 @@
 import json
 import pymysql
 from strategy_engine import DB_DEFAULTS
+from report_storage import decode_backtest_payload
 from flask import Flask, jsonify
 import logging
 
@@ -33,8 +34,9 @@ def test_get_backtest_detail():
                start_date, end_date, initial_fund, final_fund, total_return,
                annual_return, max_drawdown, sharpe_ratio, win_rate,
                profit_loss_ratio, trade_count, report_generate_time, report_status,
-               equity_curve_data, trade_records
-        FROM BacktestReport
+               equity_curve_data, trade_records,
+               (SELECT d.payload FROM BacktestReportData d WHERE d.report_id = r.report_id) AS payload
+        FROM BacktestReport r
         WHERE report_id = %s AND user_id = %s
         """
         cursor.execute(query, (report_id, current_user_id))
@@ -79,7 +81,13 @@ def test_get_backtest_detail():
         print(f"winRate: {response['winRate']}")
         print(f"tradeCount: {response['tradeCount']}")
         
-        # 处理资金曲线数据 - 简化版
+        # 新报告的资金曲线和交易记录在 BacktestReportData 负载中，旧JSON字段为 NULL
+        if result.get('payload'):
+            decoded = decode_backtest_payload(result['payload'])
+            print(f"\n资金曲线数据长度: {len(decoded['equity'])}")
+            print(f"交易记录数量: {len(decoded['trades']['price'])}")
+        
+        # 处理资金曲线数据 - 简化版（旧报告）
         if result.get('equity_curve_data'):
             try:
                 equity_curve_data = json.loads(result['equity_curve_data'])
@@ -87,7 +95,7 @@ def test_get_backtest_detail():
             except Exception as e:
                 print(f"解析资金曲线数据出错: {e}")
         
-        # 处理交易记录 - 简化版
+        # 处理交易记录 - 简化版（旧报告）
         if result.get('trade_records'):
             try:
                 trade_records = json.loads(result['trade_records'])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark 离线测试（以内存中的假客户端代替 Tushare 缓存库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+from benchmark import BenchmarkProvider, compute_benchmark_analytics
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DATES = pd.bdate_range("2020-01-01", "2024-12-31")
+CLOSES = 4000.0 * np.cumprod(1 + np.random.default_rng(3).normal(0.0003, 0.012, len(DATES)))
+
+
+class FakeIndexClient:
+    """按 YYYYMMDD 区间返回指数日线，记录调用次数"""
+
+    def __init__(self, published=None):
+        self.calls = 0
+        self.published = pd.Timestamp(published) if published else DATES[-1]  # 已发布的最后交易日
+
+    def index_daily(self, ts_code, start_date, end_date):
+        self.calls += 1
+        mask = (DATES >= pd.Timestamp(start_date)) & (DATES <= min(pd.Timestamp(end_date), self.published))
+        return pd.DataFrame({"ts_code": ts_code, "trade_date": DATES[mask].strftime("%Y%m%d"), "close": CLOSES[mask]})
+
+
+def test_cache_hits():
+    """相近区间与重复请求命中内存缓存"""
+    client = FakeIndexClient()
+    provider = BenchmarkProvider(client=client)
+    first = provider.get_closes("000300.SH", "2022-03-01", "2022-09-30")
+    provider.get_closes("000300.SH", "2022-01-04", "2022-12-30")
+    provider.get_closes("000300.SH", "2022-03-01", "2022-09-30")
+    assert client.calls == 1
+    assert first.index[0] == pd.Timestamp("2022-03-01") and first.index[-1] == pd.Timestamp("2022-09-30")
+    provider.get_closes("000300.SH", "2020-01-02", "2020-06-30")
+    assert client.calls == 2
+
+
+def test_new_bars_refetched():
+    """请求晚于已缓存的最后一根K线时，超过刷新间隔后重新读取，新发布的行情进入缓存"""
+    client = FakeIndexClient(published="2024-06-13")
+    provider = BenchmarkProvider(client=client)
+    closes = provider.get_closes("000300.SH", "2024-01-02", "2024-06-14")
+    assert closes.index[-1] == pd.Timestamp("2024-06-13")
+    # 刷新间隔内不重复访问
+    provider.get_closes("000300.SH", "2024-01-02", "2024-06-14")
+    assert client.calls == 1
+    client.published = pd.Timestamp("2024-06-14")
+    provider.refresh_seconds = 0
+    closes = provider.get_closes("000300.SH", "2024-01-02", "2024-06-14")
+    assert client.calls == 2 and closes.index[-1] == pd.Timestamp("2024-06-14")
+    # 已覆盖的区间继续命中
+    provider.get_closes("000300.SH", "2024-02-01", "2024-06-14")
+    assert client.calls == 2
+
+
+def test_beta_and_alpha():
+    """策略为基准 1.5 倍杠杆时，贝塔为 1.5、跟踪误差为正"""
+    dates = DATES[100:400]
+    bench = pd.Series(CLOSES[100:400], index=dates)
+    bench_returns = np.diff(bench.to_numpy()) / bench.to_numpy()[:-1]
+    equity = 100000.0 * np.cumprod(np.concatenate([[1.0], 1 + 1.5 * bench_returns]))
+    stats = compute_benchmark_analytics(equity.tolist(), dates.strftime("%Y-%m-%d").tolist(), bench)
+    assert np.isclose(stats["beta"], 1.5)
+    assert stats["tracking_error"] > 0
+    assert np.isclose(stats["benchmark_equity"][-1], 100000.0 * CLOSES[399] / CLOSES[100])
+    assert len(stats["excess_equity"]) == len(equity)
+    same = compute_benchmark_analytics((100000.0 * bench / bench.iloc[0]).tolist(), dates.tolist(), bench)
+    assert np.isclose(same["beta"], 1.0) and abs(same["alpha"]) < 1e-9 and same["information_ratio"] == 0.0
+
+
+def main():
+    """主函数"""
+    tests = [test_cache_hits, test_new_bars_refetched, test_beta_and_alpha]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
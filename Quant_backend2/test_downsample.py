@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+downsample 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+
+from downsample import build_tiers, lttb_indices, minmax_indices
+from report_storage import decode_backtest_payload, encode_backtest_payload
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _curve(n=2500):
+    return 100000.0 * np.cumprod(1 + np.random.default_rng(1).normal(0, 0.01, n))
+
+
+def test_lttb():
+    """LTTB 保留首尾、点数准确、下标严格递增"""
+    curve = _curve()
+    idx = lttb_indices(curve, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(curve) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert lttb_indices(curve[:100], 500).tolist() == list(range(100))
+
+
+def test_minmax_keeps_extremes():
+    """min/max 分桶保留全局最高点与最低点"""
+    curve = _curve()
+    idx = minmax_indices(curve, 200)
+    assert len(idx) <= 200
+    assert int(np.argmax(curve)) in idx and int(np.argmin(curve)) in idx
+    assert idx[0] == 0 and idx[-1] == len(curve) - 1
+
+
+def test_tiers_roundtrip():
+    """预计算档位随负载存取"""
+    curve = _curve(800)
+    tiers = build_tiers(curve)
+    assert sorted(tiers) == [200, 500]
+    decoded = decode_backtest_payload(encode_backtest_payload(curve.tolist(), tiers=tiers))
+    assert sorted(decoded["tiers"]) == [200, 500]
+    assert np.array_equal(decoded["tiers"][500], lttb_indices(curve, 500))
+
+
+def main():
+    """主函数"""
+    tests = [test_lttb, test_minmax_keeps_extremes, test_tiers_roundtrip]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
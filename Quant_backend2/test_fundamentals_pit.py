@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+fundamentals_pit 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+import fundamentals_pit
+from fundamentals_pit import PointInTimeFundamentals
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _index():
+    df = pd.DataFrame(
+        {
+            "stock_code": ["600000.SH", "600000.SH", "600000.SH", "000001.SZ", "000001.SZ"],
+            "report_period": ["2023-09-30", "2023-12-31", "2024-03-31", "2023-12-31", "2024-03-31"],
+            "announcement_date": ["2023-10-28", "2024-04-25", "2024-04-20", "2024-03-15", "2024-04-20"],
+            "total_assets": [100.0, 120.0, 130.0, 50.0, 55.0],
+        }
+    )
+    return PointInTimeFundamentals().build(df, ["total_assets"])
+
+
+def test_as_of_no_look_ahead():
+    """只返回查询日之前已公告的数据"""
+    pit = _index()
+    snap = pit.as_of("2024-03-01").set_index("stock_code")
+    assert snap.loc["600000.SH", "total_assets"] == 100.0
+    assert np.isnan(snap.loc["000001.SZ", "total_assets"])
+    snap = pit.as_of("2024-03-15").set_index("stock_code")
+    assert snap.loc["000001.SZ", "total_assets"] == 50.0
+
+
+def test_late_old_period_does_not_override():
+    """新报告期先公告时，之后才公告的旧报告期不会覆盖"""
+    pit = _index()
+    snap = pit.as_of("2024-04-30").set_index("stock_code")
+    assert snap.loc["600000.SH", "total_assets"] == 130.0
+    assert snap.loc["600000.SH", "report_period"] == pd.Timestamp("2024-03-31")
+
+
+def test_align_and_unknown_stock():
+    """时间序列对齐与未知股票"""
+    pit = _index()
+    dates = pd.to_datetime(["2023-10-27", "2023-10-30", "2024-04-22"])
+    aligned = pit.align("600000.SH", dates)
+    assert np.isnan(aligned["total_assets"].iloc[0])
+    assert aligned["total_assets"].tolist()[1:] == [100.0, 130.0]
+    missing = pit.align("300750.SZ", dates)
+    assert missing["total_assets"].isna().all()
+
+
+def test_panel_matches_as_of():
+    """面板查询与逐日截面查询一致"""
+    pit = _index()
+    dates = pd.to_datetime(["2023-10-27", "2024-03-15", "2024-04-22", "2024-04-30"])
+    codes = ["000001.SZ", "300750.SZ", "600000.SH"]
+    panel = pit.panel(dates, codes)["total_assets"]
+    assert panel.shape == (len(dates), len(codes))
+    for row, date in enumerate(dates):
+        expected = pit.as_of(date, codes)["total_assets"].to_numpy()
+        assert np.array_equal(panel[row], expected, equal_nan=True), date
+    snap = pit.as_of("2024-04-30", ["300750.SZ", "000001.SZ"])
+    assert np.isnan(snap["total_assets"].iloc[0]) and snap["total_assets"].iloc[1] == 55.0
+
+
+def test_amended_report_versions():
+    """同一报告期的原始与修订版本按各自公告日期保存：修订公告之前返回原始数值"""
+    df = pd.DataFrame(
+        {
+            "stock_code": ["600000.SH"] * 3,
+            "report_period": ["2023-12-31", "2023-12-31", "2024-03-31"],
+            "announcement_date": ["2024-03-15", "2024-04-10", "2024-04-25"],
+            "total_assets": [120.0, 118.0, 130.0],
+        }
+    )
+    pit = PointInTimeFundamentals().build(df, ["total_assets"])
+    dates = pd.to_datetime(["2024-03-14", "2024-03-15", "2024-04-09", "2024-04-10", "2024-04-25"])
+    aligned = pit.align("600000.SH", dates)
+    assert np.isnan(aligned["total_assets"].iloc[0])
+    assert aligned["total_assets"].tolist()[1:] == [120.0, 120.0, 118.0, 130.0]
+
+
+class FakeConnection:
+    """按 IN 列表返回报表行的数据库连接，记录每次查询的代码数"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.batches = []
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        codes = [p for p in params if p.endswith((".SH", ".SZ"))]
+        self.batches.append(len(codes))
+        self.result = [r for r in self.rows if r[0] in codes]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def test_load_batches_codes():
+    """指定股票列表时按批查询，各批结果合并后建立同一个索引"""
+    codes = [f"{600000 + i}.SH" for i in range(7)]
+    rows = [(code, "2023-12-31", "2024-03-15", float(i)) for i, code in enumerate(codes)]
+    fake = FakeConnection(rows)
+    connect, batch = fundamentals_pit.pymysql.connect, fundamentals_pit.SQL_CODE_BATCH
+    fundamentals_pit.pymysql.connect = lambda **kwargs: fake
+    fundamentals_pit.SQL_CODE_BATCH = 3
+    try:
+        pit = PointInTimeFundamentals().load("BalanceSheet", ["total_assets"], stock_codes=codes, end_date="2024-12-31")
+    finally:
+        fundamentals_pit.pymysql.connect, fundamentals_pit.SQL_CODE_BATCH = connect, batch
+    assert fake.batches == [3, 3, 1]
+    assert pit.as_of("2024-03-15", codes)["total_assets"].tolist() == [float(i) for i in range(7)]
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_as_of_no_look_ahead,
+        test_late_old_period_does_not_override,
+        test_align_and_unknown_stock,
+        test_panel_matches_as_of,
+        test_amended_report_versions,
+        test_load_batches_codes,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
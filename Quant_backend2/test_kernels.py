@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+kernels 离线测试（不依赖数据库）
+- 向量化/内核实现与原逐行循环实现逐位一致
+- 纯 NumPy/Python 实现与逐元素循环（numba 编译的同一份代码）逐位一致
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from synthetic_data import generate_ohlcv, iter_stock_frames
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BUILTIN_STRATEGIES = ("moving_average", "breakout", "rsi_mean_reversion")
+
+
+def _frames(n_stocks=4, n_days=2520):
+    panel = generate_ohlcv(n_stocks, n_days, seed=11)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"].unique()))
+    return list(iter_stock_frames(panel))
+
+
+def _legacy_signals(strategy, df):
+    """原 generate_signals 中的逐行循环"""
+    df = df.copy()
+    df["signal"] = 0
+    df["position"] = 0
+    for i in range(_start(strategy), len(df)):
+        buy, sell = _conditions(strategy, df, i)
+        if buy:
+            df.loc[i, "signal"] = 1
+            df.loc[i, "position"] = 1
+        elif sell:
+            df.loc[i, "signal"] = -1
+            df.loc[i, "position"] = 0
+        else:
+            df.loc[i, "position"] = df.loc[i - 1, "position"]
+    return df
+
+
+def _start(strategy):
+    return getattr(strategy, "long_period", None) or getattr(strategy, "lookback_period", None) or strategy.rsi_period
+
+
+def _conditions(strategy, df, i):
+    name = type(strategy).__name__
+    if name == "MovingAverageStrategy":
+        ratio = df.loc[i, "short_ma"] / df.loc[i, "long_ma"]
+        prev = df.loc[i - 1, "short_ma"] / df.loc[i - 1, "long_ma"]
+        return (ratio >= strategy.buy_threshold and prev < strategy.buy_threshold,
+                ratio <= strategy.sell_threshold and prev > strategy.sell_threshold)
+    if name == "BreakoutStrategy":
+        close = df.loc[i, "close_price"]
+        return (close >= df.loc[i, "high_max"] * (1 + strategy.breakout_threshold - 0.01),
+                close <= df.loc[i, "low_min"] * (1 - strategy.breakout_threshold + 0.01))
+    return (df.loc[i, "rsi"] < strategy.oversold_threshold, df.loc[i, "rsi"] > strategy.overbought_threshold)
+
+
+def _legacy_simulate(signals, initial_capital=100000.0, commission_rate=0.001):
+    """原 simulate_trading 的逐行记账"""
+    capital, position, entry_price = initial_capital, 0, 0.0
+    trades, equity_curve, position_values, daily_returns = [], [initial_capital], [0.0], [0.0]
+    for i, row in signals.iterrows():
+        price, signal = row["close_price"], row["signal"]
+        current_value = capital + position * price
+        equity_curve.append(current_value)
+        position_values.append(position * price)
+        if i > 0:
+            daily_returns.append((current_value - equity_curve[-2]) / equity_curve[-2])
+        if signal == 1 and position == 0:
+            shares = int(capital * 0.95 / price)
+            if shares > 0:
+                commission = shares * price * commission_rate
+                total_cost = shares * price + commission
+                if total_cost <= capital:
+                    position, entry_price = shares, price
+                    capital -= total_cost
+                    trades.append(("buy", price, shares, commission, capital))
+        elif signal == -1 and position > 0:
+            proceeds = position * price
+            commission = proceeds * commission_rate
+            capital += proceeds - commission
+            trades.append(("sell", price, position, commission, capital, (price - entry_price) / entry_price))
+            position, entry_price = 0, 0.0
+    if position > 0:
+        price = signals.iloc[-1]["close_price"]
+        proceeds = position * price
+        commission = proceeds * commission_rate
+        capital += proceeds - commission
+        trades.append(("sell", price, position, commission, capital, (price - entry_price) / entry_price))
+    return capital, equity_curve, position_values, daily_returns, trades
+
+
+def test_strategy_parity():
+    """内置策略向量化信号与原逐行循环逐位一致"""
+    from strategy_engine import StrategyEngine
+
+    engine = StrategyEngine()
+    for frame in _frames(2, 800):
+        for name in BUILTIN_STRATEGIES:
+            strategy = engine.create_strategy(name)
+            signals = strategy.generate_signals(frame)
+            indicators = signals.drop(columns=["signal", "position"])
+            expected = _legacy_signals(strategy, indicators)
+            pd.testing.assert_frame_equal(signals, expected)
+
+
+def test_simulate_parity():
+    """simulate_trading 的内核记账与原逐行实现逐位一致"""
+    from backtest_engine import BacktestEngine
+    from strategy_engine import StrategyEngine
+
+    engine = BacktestEngine()
+    strategies = StrategyEngine()
+    for frame in _frames(3):
+        for name in BUILTIN_STRATEGIES:
+            signals = strategies.create_strategy(name).generate_signals(frame)
+            result = engine.simulate_trading(signals, 100000.0, 0.001)
+            capital, equity, positions, returns, trades = _legacy_simulate(signals)
+            assert result.final_capital == capital
+            assert result.equity_curve == equity
+            assert result.daily_returns == returns
+            got = [
+                (t["action"], t["price"], t["shares"], t["commission"], t["capital_after"])
+                + ((t["trade_return"],) if t["action"] == "sell" else ())
+                for t in result.trades
+            ]
+            assert got == trades, name
+
+
+def test_fallback_matches_loop():
+    """纯 NumPy 实现与逐元素循环（numba 编译的同一份代码）逐位一致"""
+    rng = np.random.default_rng(5)
+    for _ in range(3):
+        signal = rng.choice([0, 1, -1], size=5000, p=[0.9, 0.06, 0.04]).astype(np.int64)
+        close = 10 * np.cumprod(1 + rng.normal(0, 0.02, 5000))
+        for start in (0, 1, 20):
+            assert np.array_equal(kernels._carry_positions_numpy(signal, start),
+                                  kernels._carry_positions_loop(signal, start))
+        # 后两组带资金：低资金时部分买入信号因资金不足而不开仓
+        for args in ((0.05, 0.0, 0.0, 0, 0.0, 0.0), (0.0, 0.2, 0.1, 0, 0.0, 0.0),
+                     (0.08, 0.25, 0.12, 90, 0.0, 0.0), (0.08, 0.25, 0.12, 90, 100000.0, 0.001),
+                     (0.05, 0.2, 0.1, 60, 10.0, 0.001)):
+            loop_out, loop_reasons = signal.copy(), np.zeros(len(signal), dtype=np.int8)
+            kernels._resolve_exits_loop(close, signal, *args, loop_out, loop_reasons)
+            out, reasons = signal.copy(), np.zeros(len(signal), dtype=np.int8)
+            kernels._resolve_exits_numpy(close, signal, *args, out, reasons)
+            assert np.array_equal(out, loop_out) and np.array_equal(reasons, loop_reasons), args
+
+
+def test_unaffordable_buy_not_anchored():
+    """资金不足未成交的买入不作为离场起点，之后实际成交的买入照常按风控离场"""
+    from backtest_engine import BacktestEngine
+
+    close = np.array([1100.0, 1100.0, 1000.0, 600.0, 580.0, 530.0, 520.0])
+    signal = np.array([0, 1, 0, 1, 0, 0, 0], dtype=np.int64)
+    # 1000 元买不起 1100 元的一股，第一个买入信号不成交；600 元时买入一股，跌破 540 止损
+    for implementation in (kernels._resolve_exits_loop, kernels._resolve_exits_numpy):
+        out, reasons = signal.copy(), np.zeros(len(signal), dtype=np.int8)
+        implementation(close, signal, 0.1, 0.0, 0.0, 0, 1000.0, 0.001, out, reasons)
+        assert out.tolist() == [0, 1, 0, 1, 0, -1, 0], implementation.__name__
+        assert reasons[5] == kernels.EXIT_STOP_LOSS
+
+    dates = pd.bdate_range("2024-01-02", periods=len(close))
+    set_trading_calendar(dates)
+    signals = pd.DataFrame({"trade_date": dates, "close_price": close, "signal": signal})
+    result = BacktestEngine().simulate_trading(signals, 1000.0, 0.001, {"stop_loss": 0.1})
+    assert [(t["action"], t["price"]) for t in result.trades] == [("buy", 600.0), ("sell", 530.0)]
+    assert result.trades[1]["exit_reason"] == "stop_loss"
+
+
+def test_jit_matches_fallback():
+    """安装了 numba 时，JIT 内核与纯 NumPy/Python 实现逐位一致"""
+    if not kernels.JIT_ENABLED:
+        logger.info("未安装 numba，跳过 JIT 对比")
+        return
+    rng = np.random.default_rng(8)
+    signal = rng.choice([0, 1, -1], size=3000, p=[0.9, 0.06, 0.04]).astype(np.int64)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, 3000))
+    assert np.array_equal(kernels._carry_positions_jit(signal, 10), kernels._carry_positions_numpy(signal, 10))
+
+    jit = kernels.simulate_cash(close, signal, np.arange(3000) > 0, 100000.0, 0.001)
+    kernels.JIT_ENABLED = False
+    try:
+        fallback = kernels.simulate_cash(close, signal, np.arange(3000) > 0, 100000.0, 0.001)
+        fallback_exits = kernels.resolve_exits(close, signal, 0.05, 0.2, 0.1, 60, 30.0, 0.001)
+    finally:
+        kernels.JIT_ENABLED = True
+    for name, value in fallback.items():
+        assert np.array_equal(jit[name], value, equal_nan=name == "trade_return"), name
+    jit_exits = kernels.resolve_exits(close, signal, 0.05, 0.2, 0.1, 60, 30.0, 0.001)
+    assert all(np.array_equal(a, b) for a, b in zip(jit_exits, fallback_exits))
+
+
+def main():
+    """主函数"""
+    tests = [test_strategy_parity, test_simulate_parity, test_fallback_matches_loop, test_unaffordable_buy_not_anchored,
+             test_jit_matches_fallback]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
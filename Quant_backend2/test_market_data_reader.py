@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+market_data_reader 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import market_data_reader
+from market_data_reader import ChunkedMarketDataReader, check_market_data_quality, iter_group_chunks
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _rows():
+    """3只股票，分别有 4/2/5 条记录，按 (stock_code, trade_date) 排序"""
+    rows = []
+    for code, n in (("000001.SZ", 4), ("000002.SZ", 2), ("600000.SH", 5)):
+        for d in range(1, n + 1):
+            rows.append((code, date(2024, 1, d), 10.0 + d))
+    return rows
+
+
+def test_group_chunks_keep_groups_whole():
+    """分块只在股票边界处切分"""
+    chunks = list(iter_group_chunks(iter(_rows()), 0, 3))
+    assert [len(c) for c in chunks] == [4, 7]
+    seen = [{r[0] for r in chunk} for chunk in chunks]
+    assert seen == [{"000001.SZ"}, {"000002.SZ", "600000.SH"}]
+    chunks = list(iter_group_chunks(iter(_rows()), 0, 1))
+    assert [len(c) for c in chunks] == [4, 2, 5]
+
+
+def test_group_chunks_pack_small_groups():
+    """分块规模足够时多只股票合并在同一分块"""
+    chunks = list(iter_group_chunks(iter(_rows()), 0, 6))
+    assert [len(c) for c in chunks] == [6, 5]
+    chunks = list(iter_group_chunks(iter(_rows()), 0, 100))
+    assert [len(c) for c in chunks] == [11]
+    assert list(iter_group_chunks(iter([]), 0, 10)) == []
+
+
+def test_numpy_chunk():
+    """NumPy 分块按列转换类型"""
+    arrays = ChunkedMarketDataReader._to_arrays(_rows()[:4], ["stock_code", "trade_date", "close_price"])
+    assert arrays["trade_date"].dtype == np.dtype("datetime64[D]")
+    assert arrays["close_price"].dtype == np.float64
+    assert arrays["close_price"].tolist() == [11.0, 12.0, 13.0, 14.0]
+
+
+def test_data_quality():
+    """数据质量统计跨分块累计"""
+    base = {
+        "stock_code": ["A", "A", "B"],
+        "trade_date": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-01"]),
+        "open_price": [10.0, 10.0, 5.0],
+        "high_price": [11.0, 9.0, 5.5],
+        "low_price": [9.0, 9.5, 4.5],
+        "close_price": [10.5, np.nan, 5.0],
+        "volume": [100, 0, 200],
+        "change_percent": [1.0, 25.0, 0.0],
+    }
+    stats = check_market_data_quality([pd.DataFrame(base), pd.DataFrame(base)])
+    assert stats["rows"] == 6
+    assert stats["stocks"] == 4
+    assert stats["null_prices"] == 2
+    assert stats["high_low_violations"] == 2
+    assert stats["zero_volume_days"] == 2
+    assert stats["extreme_moves"] == 2
+
+
+class FakeConnection:
+    """按 IN 列表与 ORDER BY 返回行的数据库连接，记录执行的查询"""
+
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        self.queries.append(sql)
+        codes = set(params[2:])
+        rows = [r for r in self.rows if not codes or r[0] in codes]
+        by_date = "ORDER BY trade_date" in sql
+        self.result = sorted(rows, key=lambda r: (r[1], r[0]) if by_date else (r[0], r[1]))
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self):
+        pass
+
+
+def test_date_order_batches_codes():
+    """按交易日读取指定股票时，代码分批查询后按交易日归并，每个截面完整且有序"""
+    codes = [f"{i:06d}.SZ" for i in range(7)]
+    rows = [(code, date(2024, 1, d), float(d)) for code in codes for d in range(1, 6)]
+    queries = []
+    reader = ChunkedMarketDataReader()
+    reader._connect = lambda: FakeConnection(rows, queries)
+    batch = market_data_reader.SQL_CODE_BATCH
+    market_data_reader.SQL_CODE_BATCH = 3
+    try:
+        chunks = list(reader.iter_chunks("2024-01-01", "2024-01-05", stock_codes=codes,
+                                         columns=["close_price"], by="date", chunk_rows=10))
+    finally:
+        market_data_reader.SQL_CODE_BATCH = batch
+    assert len(queries) == 3 and all("IN (" in q for q in queries)
+    merged = pd.concat(chunks, ignore_index=True)
+    assert list(zip(merged["trade_date"].dt.day, merged["stock_code"])) == [
+        (d, code) for d in range(1, 6) for code in codes]
+    for chunk in chunks:
+        # 每个交易日的截面只出现在一个分块中
+        assert chunk.groupby("trade_date").size().eq(len(codes)).all()
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_group_chunks_keep_groups_whole,
+        test_group_chunks_pack_small_groups,
+        test_numpy_chunk,
+        test_data_quality,
+        test_date_order_batches_codes,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+panel_broker 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from panel_broker import PanelBroker, attach_panel, detach_panel
+from portfolio_engine import MarketPanel
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _panel(n_days=300, n_stocks=40):
+    rng = np.random.default_rng(8)
+    dates = pd.bdate_range("2023-01-02", periods=n_days)
+    codes = np.array([f"{600000 + i}.SH" for i in range(n_stocks)], dtype=object)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (n_days, n_stocks)), axis=0)
+    close[rng.random(close.shape) < 0.05] = np.nan
+    return MarketPanel(dates.values, codes, {"close_price": close, "volume": rng.integers(0, 10 ** 6, close.shape)})
+
+
+def _column_sum(descriptor, col):
+    """工作进程中的任务：只读取共享内存中的一列"""
+    panel = attach_panel(descriptor)
+    return panel.codes[col], float(np.nansum(panel.fields["close_price"][:, col])), str(panel.dates[-1])
+
+
+def _failing(descriptor):
+    raise ValueError("任务失败")
+
+
+def test_attach_is_readonly_view():
+    """挂载得到的面板与原面板一致、只读，重复挂载复用同一段内存；引用归零后共享内存被删除"""
+    panel = _panel()
+    broker = PanelBroker()
+    descriptor = broker.publish("universe", panel)
+    attached = attach_panel(descriptor)
+    assert np.array_equal(attached.dates, panel.dates) and attached.codes.tolist() == panel.codes.tolist()
+    for name, values in panel.fields.items():
+        assert np.array_equal(attached.fields[name], values, equal_nan=True) and attached.fields[name].dtype == values.dtype
+        assert not attached.fields[name].flags.writeable
+    assert attach_panel(descriptor) is attached
+    try:
+        broker.publish("universe", panel)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未拒绝重复发布")
+    detach_panel(descriptor)
+    del attached
+    broker.close()
+    assert broker.refs("universe") == 0
+    try:
+        shared_memory.SharedMemory(name=descriptor["name"])
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("引用归零后共享内存未删除")
+
+
+def test_process_pool():
+    """进程池任务只接收描述符，结果与主进程计算一致；任务结束（含失败）后引用被释放"""
+    panel = _panel()
+    with PanelBroker() as broker:
+        broker.publish("universe", panel)
+        with ProcessPoolExecutor(2) as pool:
+            futures = [broker.submit(pool, _column_sum, "universe", col) for col in range(len(panel.codes))]
+            failed = broker.submit(pool, _failing, "universe")
+            results = [f.result() for f in futures]
+            try:
+                failed.result()
+            except ValueError:
+                pass
+        assert broker.refs("universe") == 1
+    assert broker.refs("universe") == 0
+    last = str(panel.dates[-1])
+    for col, (code, total, last_date) in enumerate(results):
+        assert code == panel.codes[col] and last_date == last
+        assert abs(total - np.nansum(panel.fields["close_price"][:, col])) < 1e-9
+
+
+def main():
+    """主函数"""
+    tests = [test_attach_is_readonly_view, test_process_pool]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+performance_metrics 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+from performance_metrics import compute_metrics, compute_single_metrics, rolling_sharpe
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _legacy_metrics(equity_curve, daily_returns, initial_capital):
+    """原 BacktestEngine.calculate_performance_metrics 的 pandas 实现，作为对照"""
+    equity_series = pd.Series(equity_curve).astype(float)
+    returns_series = pd.Series(daily_returns).astype(float).replace([np.inf, -np.inf], np.nan).dropna()
+    total_return = (equity_series.iloc[-1] - initial_capital) / initial_capital
+    years = len(equity_curve) / 252
+    annual_return = (1 + total_return) ** (1 / years) - 1
+    peak = equity_series.expanding().max()
+    max_drawdown = abs(((equity_series - peak) / peak).min())
+    excess = returns_series - 0.03 / 252
+    std = excess.std()
+    sharpe = 0.0 if np.isnan(std) or std < 1e-8 else excess.mean() / std * np.sqrt(252)
+    positive = returns_series[returns_series > 0]
+    negative = returns_series[returns_series < 0]
+    avg_win = positive.mean() if len(positive) else 0
+    avg_loss = abs(negative.mean()) if len(negative) else 0
+    return {
+        "total_return": total_return,
+        "annual_return": annual_return,
+        "max_drawdown": max_drawdown,
+        "sharpe_ratio": sharpe,
+        "win_rate": len(positive) / len(returns_series),
+        "profit_loss_ratio": avg_win / avg_loss if avg_loss > 0 else 0,
+    }
+
+
+def _curves(n=8, length=600):
+    returns = np.random.default_rng(7).normal(0.0004, 0.012, (n, length))
+    equity = 100000.0 * np.cumprod(np.concatenate([np.ones((n, 1)), 1 + returns], axis=1), axis=1)
+    return equity, returns
+
+
+def test_matches_legacy():
+    """与原实现结果一致（含 inf 清理）"""
+    equity, returns = _curves(1)
+    daily = [0.0] + returns[0].tolist()
+    daily[5] = np.inf
+    new = compute_single_metrics(equity[0], daily, 100000.0)
+    old = _legacy_metrics(equity[0].tolist(), daily, 100000.0)
+    for name, value in old.items():
+        assert np.isclose(new[name], value, rtol=1e-12, atol=1e-15), name
+
+
+def test_batch_equals_single():
+    """二维批量计算与逐条计算一致"""
+    equity, returns = _curves()
+    batch = compute_metrics(equity, returns)
+    for i in range(equity.shape[0]):
+        single = compute_single_metrics(equity[i], returns[i])
+        for name, value in single.items():
+            assert np.isclose(batch[name][i], value, equal_nan=True), name
+
+
+def test_drawdown_duration_exposure_trades():
+    """回撤持续期、仓位暴露、换手率与逐笔交易统计"""
+    equity = [100.0, 110.0, 99.0, 105.0, 108.0, 111.0, 100.0]
+    positions = [0.0, 110.0, 99.0, 0.0, 0.0, 111.0, 100.0]
+    m = compute_single_metrics(equity, initial_capital=100.0, position_values=positions,
+                               trade_returns=[0.05, -0.02, 0.01])
+    assert m["max_drawdown_duration"] == 3
+    assert np.isclose(m["exposure"], 4 / 7)
+    assert m["turnover"] > 0
+    assert m["round_trip_count"] == 3 and np.isclose(m["trade_win_rate"], 2 / 3)
+    assert m["best_trade"] == 0.05 and m["worst_trade"] == -0.02
+    assert compute_single_metrics([100.0, 100.0], [np.nan])["sharpe_ratio"] == 0.0
+
+
+def test_rolling_sharpe():
+    """滚动夏普与逐窗口计算一致"""
+    _, returns = _curves(2, 200)
+    rolling = rolling_sharpe(returns, window=20)
+    assert np.isnan(rolling[:, :19]).all()
+    window = returns[1, 30:50] - 0.03 / 252
+    expected = window.mean() / window.std(ddof=1) * np.sqrt(252)
+    assert np.isclose(rolling[1, 49], expected)
+
+
+def main():
+    """主函数"""
+    tests = [test_matches_legacy, test_batch_equals_single, test_drawdown_duration_exposure_trades, test_rolling_sharpe]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+portfolio_engine 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+from portfolio_engine import (
+    MarketPanel, PortfolioEngine, rebalance_indices, select_top, simulate_portfolio
+)
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _panel(n_days=260, n_stocks=40, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2023-01-02", periods=n_days)
+    set_trading_calendar(pd.bdate_range(end=dates[0], periods=3).append(dates))
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (n_days, n_stocks)), axis=0)
+    close[rng.random(close.shape) < 0.02] = np.nan
+    fields = {
+        "close_price": close,
+        "market_cap": close * rng.uniform(1e8, 5e8, n_stocks),
+        "pb_ratio": rng.uniform(0.5, 4, (n_days, n_stocks)),
+        "total_assets": np.full(close.shape, 100.0),
+        "total_liability": rng.uniform(10, 90, close.shape),
+        "total_current_assets": rng.uniform(10, 90, close.shape),
+        "total_current_liability": rng.uniform(10, 60, close.shape),
+    }
+    codes = np.array([f"{600000 + i}.SH" for i in range(n_stocks)], dtype=object)
+    return MarketPanel(dates.values, codes, fields)
+
+
+def test_rebalance_indices():
+    """每 N 日、每周首日、每季首月首日调仓"""
+    dates = pd.bdate_range("2024-01-01", "2024-12-31").values.astype("datetime64[D]")
+    assert rebalance_indices(dates, "every_n_days", 5).tolist() == list(range(0, len(dates), 5))
+    weekly = pd.DatetimeIndex(dates[rebalance_indices(dates, "weekly")])
+    assert (weekly.dayofweek == 0).all() and len(weekly) == 53
+    quarterly = pd.DatetimeIndex(dates[rebalance_indices(dates, "quarterly")])
+    assert quarterly.strftime("%Y-%m-%d").tolist() == ["2024-01-01", "2024-04-01", "2024-07-01", "2024-10-01"]
+    for rule, hold_days in (("daily", None), ("every_n_days", 0)):
+        try:
+            rebalance_indices(dates, rule, hold_days)
+        except ValueError:
+            continue
+        raise AssertionError(f"未拒绝非法调仓参数: {rule}")
+
+
+def test_select_top_matches_sort():
+    """argpartition 选股与整行排序结果一致"""
+    rng = np.random.default_rng(1)
+    scores = rng.normal(size=(30, 200))
+    eligible = rng.random(scores.shape) < 0.3
+    for top_n in (1, 3, 10, None):
+        picked = select_top(scores, eligible, top_n)
+        for row in range(len(scores)):
+            candidates = np.flatnonzero(eligible[row])
+            expected = candidates[np.argsort(scores[row, candidates], kind="stable")][:top_n]
+            assert picked[row].tolist() == expected.tolist(), (top_n, row)
+
+
+def test_simulate_accounting():
+    """换仓记账：留任不动、停牌不卖、最后一日平仓，资金曲线等于现金加持仓市值"""
+    close = np.array([
+        [10.0, 20.0, 5.0],
+        [11.0, 21.0, 5.5],
+        [12.0, np.nan, 6.0],
+        [12.5, 22.0, 6.5],
+    ])
+    rows = np.array([0, 2])
+    selections = [np.array([0, 1]), np.array([0, 2])]
+    ledger = simulate_portfolio(close, rows, selections, 10000.0, 0.0)
+    actions = [(t["row"], t["col"], t["action"], t.get("exit_reason")) for t in ledger["trades"]]
+    # 第 2 行股票 1 停牌无法卖出，可用资金全部买入股票 2
+    assert actions == [
+        (0, 0, "buy", None), (0, 1, "buy", None), (2, 2, "buy", None),
+        (3, 0, "sell", "end_of_data"), (3, 1, "sell", "end_of_data"), (3, 2, "sell", "end_of_data"),
+    ]
+    a, b = int(10000 * 0.95 / 2 / 10), int(10000 * 0.95 / 2 / 20)
+    cash = 10000 - a * 10 - b * 20
+    assert ledger["equity"][1] == cash + a * 11 + b * 21
+    c = int(cash * 0.95 / 6)
+    assert ledger["equity"][2] == cash - c * 6 + a * 12 + b * 21 + c * 6
+    assert ledger["final_capital"] == cash - c * 6 + a * 12.5 + b * 22 + c * 6.5 == ledger["equity"][-1]
+
+
+def test_small_cap_run():
+    """小市值策略：每期买入的是市值区间内最小的股票，结果与单只股票回测结构一致"""
+    panel = _panel()
+    result = PortfolioEngine().run("STRAT_001", "2023-01-02", "2023-12-29", initial_capital=1000000.0,
+                                   panel=panel, conditions=[{
+                                       "indicator_id": "MARKET_CAP", "condition_type": "between",
+                                       "threshold_min": 1e9, "threshold_max": 3e9, "signal_action": "buy",
+                                       "condition_order": 1,
+                                   }])
+    assert len(result.equity_curve) == len(result.dates) == len(panel.dates) + 1
+    assert result.equity_curve[-1] == result.final_capital
+    column = {code: i for i, code in enumerate(panel.codes)}
+    row = {d: i for i, d in enumerate(pd.to_datetime(panel.dates).strftime("%Y-%m-%d"))}
+    buys = [t for t in result.trades if t["action"] == "buy"]
+    assert buys
+    for trade in buys:
+        r = row[trade["date"]]
+        cap = panel.fields["market_cap"][r]
+        eligible = np.isfinite(panel.fields["close_price"][r]) & (cap >= 1e9) & (cap <= 3e9)
+        smallest = np.sort(cap[eligible])[:3]
+        assert cap[column[trade["stock_code"]]] in smallest
+    assert {t["exit_reason"] for t in result.trades if t["action"] == "sell"} <= {"signal", "end_of_data"}
+
+
+def test_value_run_uses_cross_section_mean():
+    """低估价值策略：入选股票负债率高于当日截面均值，且满足市净率与流动比率条件"""
+    panel = _panel()
+    result = PortfolioEngine().run("STRAT_004", "2023-01-02", "2023-12-29", panel=panel)
+    column = {code: i for i, code in enumerate(panel.codes)}
+    row = {d: i for i, d in enumerate(pd.to_datetime(panel.dates).strftime("%Y-%m-%d"))}
+    debt = panel.fields["total_liability"] / panel.fields["total_assets"]
+    current = panel.fields["total_current_assets"] / panel.fields["total_current_liability"]
+    buys = [t for t in result.trades if t["action"] == "buy"]
+    assert buys and {pd.Timestamp(t["date"]).month for t in buys} <= {1, 4, 7, 10}
+    for trade in buys:
+        r, c = row[trade["date"]], column[trade["stock_code"]]
+        assert debt[r, c] > np.nanmean(debt[r]) and current[r, c] > 1.2 and panel.fields["pb_ratio"][r, c] < 2
+
+
+def test_panel_from_frame_and_validation():
+    """长表转面板与参数校验"""
+    df = pd.DataFrame({
+        "stock_code": ["000002.SZ", "000001.SZ", "000001.SZ"],
+        "trade_date": ["2024-01-03", "2024-01-02", "2024-01-03"],
+        "close_price": [8.0, 10.0, 10.5],
+    })
+    panel = MarketPanel.from_frame(df, ["close_price"])
+    assert panel.codes.tolist() == ["000001.SZ", "000002.SZ"]
+    assert np.array_equal(panel.fields["close_price"], [[10.0, np.nan], [10.5, 8.0]], equal_nan=True)
+    engine = PortfolioEngine()
+    for strategy_id, overrides in (("STRAT_002", {}), ("STRAT_001", {"top_n": 0}), ("STRAT_001", {
+        "conditions": [{"indicator_id": "MA5", "condition_type": "greater", "threshold_min": 1.0,
+                        "signal_action": "buy", "condition_order": 1}]})):
+        try:
+            engine.resolve_config(strategy_id, **overrides)
+        except ValueError:
+            continue
+        raise AssertionError(f"未拒绝非法配置: {strategy_id} {overrides}")
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_rebalance_indices,
+        test_select_top_matches_sort,
+        test_simulate_accounting,
+        test_small_cap_run,
+        test_value_run_uses_cross_section_mean,
+        test_panel_from_frame_and_validation,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+report_export 离线测试（不依赖数据库）
+"""
+
+import sys
+import csv
+import gzip
+import io
+import json
+import logging
+
+import pandas as pd
+
+from report_export import accepts_gzip, gzip_chunks, iter_csv, iter_ndjson
+from report_storage import decode_backtest_payload, encode_backtest_payload
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _decoded(n=5000):
+    dates = pd.bdate_range("2010-01-01", periods=n)
+    trades = [
+        {"date": dates[3], "action": "buy", "price": 10.5, "shares": 900, "commission": 5.0, "capital_after": 550.0},
+        {"date": dates[9], "action": "sell", "price": 11.0, "shares": 900, "commission": 5.0,
+         "trade_return": 0.047, "capital_after": 10440.0},
+    ]
+    equity = [10000.0 + i for i in range(n)]
+    return decode_backtest_payload(encode_backtest_payload(equity, list(dates), trades))
+
+
+def test_csv_rows():
+    """CSV 按块输出，行数与内容正确"""
+    chunks = list(iter_csv(_decoded(), block_rows=1000))
+    assert len(chunks) == 1 + 5 + 1
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(rows) == 5002
+    assert rows[0]["type"] == "equity" and rows[0]["date"] == "2010-01-01" and rows[0]["value"] == "10000.0"
+    assert rows[-1]["action"] == "sell" and rows[-1]["trade_return"] == "0.047"
+    assert rows[-2]["trade_return"] == ""
+
+
+def test_ndjson_gzip():
+    """NDJSON 经 gzip 增量压缩后可还原，且只输出交易部分"""
+    body = gzip.decompress(b"".join(gzip_chunks(iter_ndjson(_decoded(), section="trades"))))
+    records = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert [r["action"] for r in records] == ["buy", "sell"]
+    assert records[0]["trade_return"] is None and "value" not in records[0]
+
+
+def test_accepts_gzip():
+    """Accept-Encoding 按 q 值解析，q=0 视为拒绝，显式项优先于通配符"""
+    assert accepts_gzip("gzip, deflate, br") and accepts_gzip("br;q=1.0, GZIP;q=0.5")
+    assert accepts_gzip("*") and accepts_gzip("x-gzip")
+    assert not accepts_gzip("gzip;q=0") and not accepts_gzip("gzip; q=0.000, deflate")
+    assert not accepts_gzip("*;q=1, gzip;q=0") and accepts_gzip("*;q=0, gzip")
+    assert not accepts_gzip("") and not accepts_gzip(None) and not accepts_gzip("identity, deflate")
+    assert not accepts_gzip("ungzip") and not accepts_gzip("gzip;q=abc")
+
+
+def main():
+    """主函数"""
+    tests = [test_csv_rows, test_ndjson_gzip, test_accepts_gzip]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
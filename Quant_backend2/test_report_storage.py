@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+report_storage 离线测试（不依赖数据库）
+"""
+
+import sys
+import json
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from report_storage import decode_backtest_payload, encode_backtest_payload, format_dates, new_report_id
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _sample(n=1000):
+    dates = pd.bdate_range("2020-01-01", periods=n)
+    equity = 100000.0 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, n))
+    trades = [
+        {"date": dates[10], "action": "buy", "price": 12.34, "shares": 7600, "commission": 28.14, "capital_after": 6213.5},
+        {"date": dates[50].strftime("%Y-%m-%d"), "action": "sell", "price": 13.01, "shares": 7600,
+         "commission": 29.66, "trade_return": 0.0543, "capital_after": 105034.2},
+    ]
+    return dates, equity, trades
+
+
+def test_roundtrip():
+    """编码后解码数值与日期一致"""
+    dates, equity, trades = _sample()
+    decoded = decode_backtest_payload(encode_backtest_payload(equity.tolist(), list(dates), trades))
+    assert np.array_equal(decoded["equity"], equity)
+    assert format_dates(decoded["dates"]) == [d.strftime("%Y-%m-%d") for d in dates]
+    t = decoded["trades"]
+    assert format_dates(t["date"]) == [dates[10].strftime("%Y-%m-%d"), dates[50].strftime("%Y-%m-%d")]
+    assert t["action"].tolist() == [1, -1]
+    assert t["shares"].tolist() == [7600, 7600]
+    assert np.isnan(t["trade_return"][0]) and t["trade_return"][1] == 0.0543
+
+
+def test_smaller_than_json():
+    """列式负载明显小于原先的JSON文本"""
+    dates, equity, trades = _sample()
+    payload = encode_backtest_payload(equity.tolist(), list(dates), trades)
+    legacy = json.dumps(equity.tolist()) + json.dumps(trades, default=str)
+    assert len(payload) < len(legacy) / 2
+
+
+def test_empty_and_without_dates():
+    """无日期、无交易的负载"""
+    decoded = decode_backtest_payload(encode_backtest_payload([100000.0, 100100.0]))
+    assert decoded["dates"] is None
+    assert decoded["equity"].tolist() == [100000.0, 100100.0]
+    assert len(decoded["trades"]["price"]) == 0
+
+
+def test_trade_stock_codes():
+    """组合回测交易记录的股票代码随负载存取，单只股票回测的负载不含该列"""
+    dates, equity, trades = _sample()
+    assert "stock_code" not in decode_backtest_payload(encode_backtest_payload(equity.tolist(), list(dates), trades))["trades"]
+    trades = [dict(trades[0], stock_code="600000.SH"), dict(trades[1], stock_code="000001.SZ"), dict(trades[1])]
+    decoded = decode_backtest_payload(encode_backtest_payload(equity.tolist(), list(dates), trades))
+    assert decoded["trades"]["stock_code"].tolist() == ["600000.SH", "000001.SZ", ""]
+
+
+def test_report_ids():
+    """报告ID在多线程下唯一、按生成顺序递增，且不超过 report_id 列宽"""
+    ids = []
+    lock = threading.Lock()
+
+    def worker():
+        batch = [new_report_id() for _ in range(5000)]
+        assert batch == sorted(batch)
+        with lock:
+            ids.extend(batch)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == len(ids) == 20000
+    assert all(i.startswith("RPT_") and len(i) == 30 for i in ids)
+    assert new_report_id() > max(ids)
+
+
+class FakeConnection:
+    """记录 executemany 调用的数据库连接"""
+
+    def __init__(self):
+        self.batches = []
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def executemany(self, sql, rows):
+        self.batches.append((sql.split("(")[0].split()[-1], list(rows)))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_bulk_save():
+    """批量保存在一个事务内按批写入报告与负载，返回与输入顺序一致的ID"""
+    import backtest_engine
+    from backtest_engine import BacktestEngine, BacktestResult
+
+    engine = BacktestEngine()
+    fake = FakeConnection()
+
+    def connect():
+        engine.connection = fake
+
+    engine.connect_database = connect
+    dates, equity, trades = _sample(60)
+    reports = []
+    for i in range(250):
+        result = BacktestResult()
+        result.initial_capital, result.final_capital = 100000.0, float(equity[-1])
+        result.equity_curve, result.dates, result.trades = equity.tolist(), format_dates(dates.values), trades
+        reports.append({"result": result, "strategy_id": "STRAT_002", "user_id": "admin_001",
+                        "stock_code": f"{600000 + i}.SH", "start_date": "2020-01-01", "end_date": "2020-03-24",
+                        "strategy_params": {"short_window": i}})
+    report_ids = engine.save_backtest_results(reports)
+    assert len(set(report_ids)) == 250 and report_ids == sorted(report_ids) and fake.committed
+    batch = backtest_engine.REPORT_INSERT_BATCH
+    sizes = [(table, len(rows)) for table, rows in fake.batches]
+    expected = []
+    for start in range(0, 250, batch):
+        n = min(batch, 250 - start)
+        expected += [("BacktestReport", n), ("BacktestReportData", n)]
+    assert sizes == expected
+    rows = [row for table, batch_rows in fake.batches if table == "BacktestReport" for row in batch_rows]
+    assert [row[0] for row in rows] == report_ids and rows[7][4] == "600007.SH"
+    # 旧 JSON 字段（equity_curve_data、trade_records）写入 NULL，数据只在负载中
+    assert rows[0][17] is None and rows[0][18] is None
+    payloads = dict(row for table, batch_rows in fake.batches if table == "BacktestReportData" for row in batch_rows)
+    assert len(decode_backtest_payload(payloads[report_ids[0]])["trades"]["price"]) == 2
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_roundtrip,
+        test_smaller_than_json,
+        test_empty_and_without_dates,
+        test_trade_stock_codes,
+        test_report_ids,
+        test_bulk_save,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
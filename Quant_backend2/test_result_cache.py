@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+result_cache 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from metrics_registry import MetricsRegistry
+from result_cache import ResultCache, SingleFlight, benchmark_version, request_key
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+VERSION = (250, "2024-12-31", "2025-01-01 18:00:00")
+
+
+def test_request_key():
+    """请求键与字段顺序、整数与浮点写法无关，任一输入变化则不同"""
+    base = dict(user_id="u1", fingerprint="abc", stock_code="600519.SH", initial_capital=100000,
+                commission_rate=0.0003, risk_rules={"stop_loss": 0.05, "take_profit": 0.1})
+    same = dict(reversed(list(base.items())), initial_capital=100000.0,
+                risk_rules={"take_profit": 0.1, "stop_loss": 0.05})
+    assert request_key(**base) == request_key(**same)
+    for field, value in (("user_id", "u2"), ("initial_capital", 200000), ("risk_rules", {})):
+        assert request_key(**base) != request_key(**{**base, field: value}), field
+
+
+def test_concurrent_requests_compute_once():
+    """并发的相同请求只计算一次，其余共享结果；之后命中缓存，数据版本变化后重新计算"""
+    cache = ResultCache(registry=MetricsRegistry())
+    calls, statuses = [], []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return ("result", f"RPT_{len(calls)}")
+
+    def worker():
+        statuses.append(cache.get_or_compute("k", VERSION, compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert {value for value, _ in statuses} == {("result", "RPT_1")}
+    assert sorted(status for _, status in statuses) == ["miss"] + ["shared"] * 7
+    assert cache.get_or_compute("k", VERSION, compute) == (("result", "RPT_1"), "hit")
+    newer = VERSION[:2] + ("2025-01-02 18:00:00",)
+    assert cache.get_or_compute("k", newer, compute) == (("result", "RPT_2"), "miss")
+    assert cache.discard(lambda cached: cached[1] == "RPT_2") == 1 and not cache.cache
+
+
+def test_errors_are_shared_not_cached():
+    """执行失败时等待者收到同一异常，且失败不进入缓存"""
+    flight = SingleFlight()
+    gate = threading.Event()
+    errors = []
+
+    def failing():
+        gate.wait(5)
+        raise ValueError("未生成任何交易信号")
+
+    def worker():
+        try:
+            flight.do("k", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 4 and len({id(e) for e in errors}) == 1 and not flight.calls
+
+    cache = ResultCache(registry=MetricsRegistry())
+    try:
+        cache.get_or_compute("k", VERSION, failing)
+    except ValueError:
+        pass
+    assert not cache.cache
+    # 区间内无行情（版本为空）时不缓存
+    cache.get_or_compute("k", None, lambda: "value")
+    assert not cache.cache
+
+
+class FakeProvider:
+    """按指数返回收盘价的基准数据来源"""
+
+    def __init__(self):
+        self.closes = {}
+
+    def get_closes(self, ts_code, start_date, end_date):
+        if ts_code not in self.closes:
+            raise ValueError(f"基准指数 {ts_code} 无行情数据")
+        return self.closes[ts_code].loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+
+
+def test_benchmark_version():
+    """基准指数收盘价新增或修正后版本变化，区间外的变化不影响"""
+    provider = FakeProvider()
+    dates = pd.bdate_range("2024-01-01", periods=10)
+    provider.closes["000300.SH"] = pd.Series([3500.0 + i for i in range(10)], index=dates)
+    base = benchmark_version("000300.SH", "2024-01-01", "2024-01-10", provider)
+    assert base == benchmark_version("000300.SH", "2024-01-01", "2024-01-10", provider)
+    assert base[1:3] == (8, "2024-01-10")
+    provider.closes["000300.SH"].iloc[2] = 3400.0
+    assert benchmark_version("000300.SH", "2024-01-01", "2024-01-10", provider) != base
+    changed = benchmark_version("000300.SH", "2024-01-01", "2024-01-10", provider)
+    provider.closes["000300.SH"].iloc[-1] = 3000.0
+    assert benchmark_version("000300.SH", "2024-01-01", "2024-01-10", provider) == changed
+    assert benchmark_version("000905.SH", "2024-01-01", "2024-01-10", provider) == ("000905.SH", "unavailable")
+
+
+def main():
+    """主函数"""
+    tests = [test_request_key, test_concurrent_requests_compute_once, test_errors_are_shared_not_cached,
+             test_benchmark_version]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
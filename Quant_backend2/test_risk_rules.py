@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+risk_rules 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+from kernels import SCAN_BLOCK
+from risk_rules import EXIT_REASONS, parse_risk_rules, resolve_exits
+from report_storage import EXIT_REASON_NAMES, decode_backtest_payload, encode_backtest_payload
+from synthetic_data import generate_ohlcv
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _reference_exits(close, signal, rules):
+    """逐根K线的参考实现"""
+    out = np.asarray(signal, dtype=np.int64).copy()
+    reasons = [""] * len(close)
+    holding, entry, peak = False, 0, 0.0
+    for i in range(len(close)):
+        if not holding:
+            if signal[i] == 1:
+                holding, entry, peak = True, i, close[i]
+            continue
+        peak = max(peak, close[i])
+        hit = []
+        if "stop_loss" in rules and close[i] <= close[entry] * (1 - rules["stop_loss"]):
+            hit.append("stop_loss")
+        if "trailing_stop" in rules and close[i] <= peak * (1 - rules["trailing_stop"]):
+            hit.append("trailing_stop")
+        if "take_profit" in rules and close[i] >= close[entry] * (1 + rules["take_profit"]):
+            hit.append("take_profit")
+        if "max_holding_days" in rules and i - entry >= rules["max_holding_days"]:
+            hit.append("max_holding_days")
+        if hit:
+            out[i] = -1
+            reasons[i] = min(hit, key=EXIT_REASONS.index)
+            holding = False
+        elif signal[i] == -1:
+            reasons[i] = "signal"
+            holding = False
+    return out, reasons
+
+
+def _random_case(seed, n=3000):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    signal = rng.choice([0, 1, -1], size=n, p=[0.96, 0.03, 0.01])
+    return close, signal
+
+
+def test_matches_reference():
+    """与逐根K线的参考实现结果一致（含跨多个扫描块的长持仓）"""
+    configs = [
+        {"stop_loss": 0.05},
+        {"take_profit": 0.1},
+        {"trailing_stop": 0.08},
+        {"max_holding_days": SCAN_BLOCK + 7},
+        {"stop_loss": 0.1, "take_profit": 0.3, "trailing_stop": 0.15, "max_holding_days": 300},
+    ]
+    for seed in range(5):
+        close, signal = _random_case(seed)
+        for rules in configs:
+            out, reasons = resolve_exits(close, signal, rules)
+            ref_out, ref_reasons = _reference_exits(close, signal, rules)
+            assert np.array_equal(out, ref_out), (seed, rules)
+            assert list(reasons) == ref_reasons, (seed, rules)
+
+
+def test_no_rules_keeps_signals():
+    """未启用规则时信号不变，只标注策略离场"""
+    close, signal = _random_case(9)
+    out, reasons = resolve_exits(close, signal, {})
+    assert np.array_equal(out, signal)
+    assert set(reasons) <= {"", "signal"}
+
+
+def test_parse_risk_rules():
+    """解析与校验 risk_management"""
+    rules = parse_risk_rules({"stopLoss": 0.05, "take_profit": "0.2", "trailing_stop": 0, "max_holding_days": 10})
+    assert rules == {"stop_loss": 0.05, "take_profit": 0.2, "max_holding_days": 10}
+    assert parse_risk_rules(None) == {}
+    for bad in ({"stop_loss": 5}, {"max_holding_days": 2.5}, {"take_profit": "abc"}, [0.05]):
+        try:
+            parse_risk_rules(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"未拒绝非法参数: {bad}")
+
+
+def test_simulate_with_stop_loss():
+    """simulate_trading 按风控离场并记录 exit_reason，随负载存取"""
+    from backtest_engine import BacktestEngine
+
+    panel = generate_ohlcv(1, 400, seed=5)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"]))
+    signals = panel.copy()
+    signals["signal"] = 0
+    signals.loc[::50, "signal"] = 1
+
+    engine = BacktestEngine()
+    plain = engine.simulate_trading(signals)
+    guarded = engine.simulate_trading(signals, risk_rules={"stop_loss": 0.03, "max_holding_days": 20})
+    plain_sells = [t for t in plain.trades if t["action"] == "sell"]
+    sells = [t for t in guarded.trades if t["action"] == "sell"]
+    assert [t["exit_reason"] for t in plain_sells] == ["end_of_data"]
+    assert len(sells) > len(plain_sells)
+    assert {t["exit_reason"] for t in sells} <= {"stop_loss", "max_holding_days", "end_of_data"}
+    assert all(t["trade_return"] <= -0.03 for t in sells if t["exit_reason"] == "stop_loss")
+
+    decoded = decode_backtest_payload(encode_backtest_payload(guarded.equity_curve, trades=guarded.trades))
+    names = [EXIT_REASON_NAMES.get(int(r), "") for r in decoded["trades"]["exit_reason"]]
+    assert names == [t.get("exit_reason", "") for t in guarded.trades]
+
+
+def main():
+    """主函数"""
+    tests = [test_matches_reference, test_no_rules_keeps_signals, test_parse_risk_rules, test_simulate_with_stop_loss]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+rule_compiler 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+import rule_compiler
+from rule_compiler import CompiledRules, MarketMeanRequired, combine_cross_sections, normalize_conditions
+from strategy_engine import RuleBasedStrategy, StrategyEngine
+from synthetic_data import generate_ohlcv, iter_stock_frames
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 与 init.sql 中 STRAT_002 的条件一致
+MA5_CONDITIONS = [
+    {"condition_id": "COND_002", "indicator_id": "MA5", "condition_type": "greater",
+     "threshold_min": 1.01, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+    {"condition_id": "COND_003", "indicator_id": "MA5", "condition_type": "less",
+     "threshold_min": None, "threshold_max": 1.0, "signal_action": "sell", "condition_order": 2},
+]
+
+
+def _panel(n_stocks=3, n_days=300):
+    panel = generate_ohlcv(n_stocks, n_days, seed=21)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"].unique()))
+    return panel
+
+
+def test_ma5_rule_matches_manual():
+    """MA5 规则与手工计算的信号一致"""
+    from strategy_engine import RuleBasedStrategy
+
+    for frame in iter_stock_frames(_panel()):
+        signals = RuleBasedStrategy(conditions=MA5_CONDITIONS).generate_signals(frame)
+        ratio = signals["close_price"] / signals["close_price"].rolling(5).mean()
+        expected = np.where(ratio > 1.01, 1, np.where(ratio < 1.0, -1, 0))
+        assert np.array_equal(signals["signal"].to_numpy(), expected)
+        position = pd.Series(np.where(expected == 1, 1.0, np.where(expected == -1, 0.0, np.nan)))
+        assert np.array_equal(signals["position"].to_numpy(), position.ffill().fillna(0).to_numpy())
+
+
+def test_panel_matches_single():
+    """面板一次性求值与逐只股票求值一致"""
+    from strategy_engine import RuleBasedStrategy
+
+    conditions = MA5_CONDITIONS + [
+        {"indicator_id": "RSI", "condition_type": "cross_down", "threshold_min": 70, "signal_action": "sell",
+         "condition_order": 3},
+        {"indicator_id": "BOLL", "condition_type": "between", "threshold_min": 0.0, "threshold_max": 1.0,
+         "signal_action": "buy", "condition_order": 4},
+    ]
+    strategy = RuleBasedStrategy(conditions=conditions)
+    panel = _panel(4)
+    batch = strategy.generate_panel_signals(panel)
+    single = pd.concat(
+        [strategy.generate_signals(frame) for frame in iter_stock_frames(panel)], ignore_index=True
+    )
+    single = single.sort_values(["stock_code", "trade_date"], kind="mergesort").reset_index(drop=True)
+    for column in ("signal", "position"):
+        assert np.array_equal(batch[column].to_numpy(), single[column].to_numpy()), column
+
+
+def test_null_threshold_uses_cross_section_mean():
+    """阈值为空时与当日截面均值比较"""
+    frame = pd.DataFrame({
+        "stock_code": ["A", "B", "C", "A", "B", "C"],
+        "trade_date": pd.to_datetime(["2024-01-02"] * 3 + ["2024-01-03"] * 3),
+        "pb_ratio": [1.0, 2.0, 6.0, 3.0, 2.0, 1.0],
+    })
+    rules = CompiledRules([
+        {"indicator_id": "PB_RATIO", "condition_type": "less", "signal_action": "buy", "condition_order": 1},
+        {"indicator_id": "PB_RATIO", "condition_type": "greater", "signal_action": "sell", "condition_order": 2},
+    ])
+    assert rules.required_columns == ["pb_ratio"]
+    assert list(rules.evaluate(frame, frame["stock_code"].to_numpy())) == [1, 1, -1, -1, 0, 1]
+
+
+# 与 init.sql 中 STRAT_004 的条件一致（COND_006 与市场平均负债比例比较）
+VALUE_CONDITIONS = [
+    {"condition_id": "COND_005", "indicator_id": "PB_RATIO", "condition_type": "less",
+     "threshold_min": None, "threshold_max": 2.0, "signal_action": "buy", "condition_order": 1},
+    {"condition_id": "COND_006", "indicator_id": "DEBT_RATIO", "condition_type": "greater",
+     "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 2},
+    {"condition_id": "COND_007", "indicator_id": "CURRENT_RATIO", "condition_type": "greater",
+     "threshold_min": 1.2, "threshold_max": None, "signal_action": "buy", "condition_order": 3},
+]
+
+
+def _value_panel(n_stocks=6, n_days=40):
+    rng = np.random.default_rng(5)
+    dates = pd.bdate_range("2024-01-02", periods=n_days)
+    frame = pd.DataFrame({
+        "stock_code": np.repeat([f"{600000 + i}.SH" for i in range(n_stocks)], n_days),
+        "trade_date": np.tile(dates, n_stocks),
+        "pb_ratio": rng.uniform(0.5, 3, n_stocks * n_days),
+        "total_assets": 100.0,
+        "total_liability": rng.uniform(10, 90, n_stocks * n_days),
+        "total_current_assets": rng.uniform(10, 90, n_stocks * n_days),
+        "total_current_liability": rng.uniform(10, 60, n_stocks * n_days),
+    })
+    # 第一只股票始终满足全部条件
+    first = frame["stock_code"] == "600000.SH"
+    frame.loc[first, ["pb_ratio", "total_liability", "total_current_assets"]] = [1.0, 95.0, 80.0]
+    return frame
+
+
+def test_market_mean_single_stock():
+    """与市场平均值比较的条件：单只股票未提供全市场均值时报错，提供后与面板求值一致，分块累加的均值与整体一致"""
+    panel = _value_panel()
+    rules = CompiledRules(VALUE_CONDITIONS)
+    assert rules.cross_section_keys == [("DEBT_RATIO", None)]
+    groups = panel["stock_code"].to_numpy()
+    expected = rules.evaluate(panel, groups)
+    first = panel[panel["stock_code"] == "600000.SH"].reset_index(drop=True)
+    assert (expected[: len(first)] == 1).all()
+    try:
+        rules.evaluate(first)
+    except MarketMeanRequired:
+        pass
+    else:
+        raise AssertionError("单只股票未提供市场均值时未报错")
+
+    chunks = [panel.iloc[:80].reset_index(drop=True), panel.iloc[80:].reset_index(drop=True)]
+    references = combine_cross_sections(rules.cross_section_totals(c, c["stock_code"].to_numpy()) for c in chunks)
+    whole = combine_cross_sections([rules.cross_section_totals(panel, groups)])
+    assert np.allclose(references[("DEBT_RATIO", None)], whole[("DEBT_RATIO", None)])
+    assert np.array_equal(rules.evaluate(first, references=references), expected[: len(first)])
+    for chunk in chunks:
+        start = panel.index[panel["stock_code"] == chunk["stock_code"].iloc[0]][0]
+        got = rules.evaluate(chunk, chunk["stock_code"].to_numpy(), references)
+        assert np.array_equal(got, expected[start : start + len(chunk)])
+
+
+class ChunkedEngine(StrategyEngine):
+    """从给定分块读取全市场行情的策略引擎"""
+
+    def __init__(self, chunks):
+        super().__init__("")
+        self.chunks = chunks
+
+    def iter_stock_data(self, start_date, end_date, stock_codes=None, chunk_rows=None):
+        return iter(self.chunks)
+
+
+def test_engine_market_references():
+    """单只股票回测时由引擎分块计算全市场均值，信号与面板求值一致"""
+    panel = _value_panel()
+    for column in ("open_price", "high_price", "low_price", "close_price"):
+        panel[column] = 10.0
+    strategy = RuleBasedStrategy(conditions=VALUE_CONDITIONS)
+    assert strategy.uses_market_mean
+    expected = strategy.generate_panel_signals(panel)
+    engine = ChunkedEngine([panel.iloc[:80].reset_index(drop=True), panel.iloc[80:].reset_index(drop=True)])
+    references = engine.market_references(strategy, "2024-01-02", "2024-02-26")
+    for code, group in panel.groupby("stock_code", sort=False):
+        got = strategy.generate_signals(group.reset_index(drop=True), references=references)
+        assert np.array_equal(got["signal"].to_numpy(), expected.loc[expected["stock_code"] == code, "signal"].to_numpy())
+    assert engine.market_references(RuleBasedStrategy(conditions=MA5_CONDITIONS), "2024-01-02", "2024-02-26") is None
+
+
+def test_indicator_computed_once():
+    """同一指标与周期在多个条件间只计算一次"""
+    calls = []
+    original = rule_compiler.INDICATORS["MA5"]["func"]
+
+    def counting(frame, groups, period):
+        calls.append(period)
+        return original(frame, groups, period)
+
+    rule_compiler.INDICATORS["MA5"]["func"] = counting
+    try:
+        CompiledRules(MA5_CONDITIONS).evaluate(next(iter_stock_frames(_panel(1))))
+    finally:
+        rule_compiler.INDICATORS["MA5"]["func"] = original
+    assert calls == [5]
+
+
+def _reference_dual_thrust(frame, period=10, k1=0.5, k2=0.5):
+    """逐行计算的 Dual Thrust 信号"""
+    high, low = frame["high_price"].to_numpy(), frame["low_price"].to_numpy()
+    close, open_price = frame["close_price"].to_numpy(), frame["open_price"].to_numpy()
+    signal = np.zeros(len(frame), dtype=np.int64)
+    for i in range(period, len(frame)):
+        window = slice(i - period, i)
+        value_range = max(high[window].max() - close[window].min(), close[window].max() - low[window].min())
+        if close[i] > open_price[i] + k1 * value_range:
+            signal[i] = 1
+        elif close[i] < open_price[i] - k2 * value_range:
+            signal[i] = -1
+    return signal
+
+
+def test_attach_valuation_in_batches():
+    """补充估值列时股票代码分批查询，按 (股票, 日期) 对齐且行顺序不变"""
+    panel = generate_ohlcv(7, 5, seed=2).iloc[::-1].reset_index(drop=True)
+    codes = sorted(panel["stock_code"].unique())
+    queries = []
+
+    def read_sql(query, connection, params):
+        batch = params[:-2]
+        queries.append(len(batch))
+        rows = panel[panel["stock_code"].isin(batch)]
+        return pd.DataFrame({"stock_code": rows["stock_code"], "trade_date": rows["trade_date"].dt.date,
+                             "pb_ratio": [codes.index(c) + 0.5 for c in rows["stock_code"]]})
+
+    class Connection:
+        def close(self):
+            pass
+
+    connect, original, batch = rule_compiler.pymysql.connect, pd.read_sql, rule_compiler.SQL_CODE_BATCH
+    rule_compiler.pymysql.connect = lambda **kwargs: Connection()
+    rule_compiler.pd.read_sql = read_sql
+    rule_compiler.SQL_CODE_BATCH = 3
+    try:
+        attached = rule_compiler.attach_fundamentals(panel, ["pb_ratio"])
+    finally:
+        rule_compiler.pymysql.connect, rule_compiler.pd.read_sql, rule_compiler.SQL_CODE_BATCH = connect, original, batch
+    assert queries == [3, 3, 1]
+    assert attached["stock_code"].tolist() == panel["stock_code"].tolist()
+    assert attached["pb_ratio"].tolist() == [codes.index(c) + 0.5 for c in panel["stock_code"]]
+
+
+def test_dual_thrust():
+    """DualThrustStrategy 与逐行实现一致，面板求值与逐只求值一致，STRAT_005 的条件编译结果相同"""
+    from strategy_engine import StrategyEngine
+
+    panel = _panel(3)
+    strategy = StrategyEngine().create_strategy("dual_thrust", period=8, k1=0.4, k2=0.6)
+    frames = list(iter_stock_frames(panel))
+    single = [strategy.generate_signals(frame) for frame in frames]
+    for frame, signals in zip(frames, single):
+        assert np.array_equal(signals["signal"].to_numpy(), _reference_dual_thrust(frame, 8, 0.4, 0.6))
+        assert signals["signal"].abs().sum() > 0
+
+    batch = strategy.generate_panel_signals(panel)
+    merged = pd.concat(single, ignore_index=True).sort_values(["stock_code", "trade_date"], kind="mergesort")
+    for column in ("signal", "position"):
+        assert np.array_equal(batch[column].to_numpy(), merged[column].to_numpy()), column
+
+    # init.sql 中 STRAT_005 的条件：阈值为空时使用默认的 K1 / K2
+    rules = CompiledRules([
+        {"condition_id": "COND_008", "indicator_id": "DUAL_THRUST", "condition_type": "greater",
+         "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+        {"condition_id": "COND_009", "indicator_id": "DUAL_THRUST", "condition_type": "less",
+         "threshold_min": None, "threshold_max": None, "signal_action": "sell", "condition_order": 2},
+    ])
+    for frame in frames:
+        assert np.array_equal(rules.evaluate(frame), _reference_dual_thrust(frame))
+
+
+def test_invalid_conditions():
+    """拒绝未知指标、缺少穿越阈值与上下限颠倒的条件"""
+    bad = [
+        {"indicator_id": "UNKNOWN", "condition_type": "greater", "threshold_min": 1, "signal_action": "buy"},
+        {"indicator_id": "RSI", "condition_type": "cross_up", "signal_action": "buy"},
+        {"indicator_id": "RSI", "condition_type": "between", "threshold_min": 70, "threshold_max": 30,
+         "signal_action": "sell"},
+        {"indicator_id": "RSI", "condition_type": "greater", "threshold_min": 70, "signal_action": "close"},
+    ]
+    for cond in bad:
+        try:
+            normalize_conditions([cond])
+        except ValueError:
+            continue
+        raise AssertionError(f"未拒绝非法条件: {cond}")
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_ma5_rule_matches_manual,
+        test_panel_matches_single,
+        test_null_threshold_uses_cross_section_mean,
+        test_market_mean_single_stock,
+        test_engine_market_references,
+        test_indicator_computed_once,
+        test_attach_valuation_in_batches,
+        test_dual_thrust,
+        test_invalid_conditions,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
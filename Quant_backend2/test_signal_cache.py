@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+signal_cache 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+from metrics_registry import MetricsRegistry
+from signal_cache import SignalCache, strategy_fingerprint
+from synthetic_data import generate_ohlcv
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeConnection:
+    """按股票返回数据版本（行数、最后交易日、最后采集时间）的数据库连接"""
+
+    def __init__(self):
+        self.versions = {}
+        self.fundamentals = {}  # (表名, 股票) -> 数据版本
+        self.market = (0, None, None)  # 全市场行情的数据版本
+        self.row = None
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params):
+        for table in ("StockValuation", "BalanceSheet"):
+            if table in sql:
+                self.row = self.fundamentals.get((table, params[0]), (0, None, None))
+                return
+        if "stock_code" not in sql:
+            self.row = self.market
+            return
+        self.row = self.versions.get(params[0], (0, None, None))
+
+    def fetchone(self):
+        return self.row
+
+
+def _compute(frame, calls):
+    def compute():
+        calls.append(1)
+        return frame
+    return compute
+
+
+def test_hit_and_new_bar_invalidation():
+    """数据版本不变时命中，新增K线后重新计算"""
+    registry = MetricsRegistry()
+    cache = SignalCache(registry=registry)
+    conn = FakeConnection()
+    conn.versions["600519.SH"] = (240, "2024-12-31", "2025-01-01 18:00:00")
+    frame, calls = generate_ohlcv(1, 240, seed=5), []
+    key = strategy_fingerprint("moving_average", {"short_window": 5, "long_window": 20})
+    for _ in range(3):
+        result = cache.get_or_compute(key, "600519.SH", "2024-01-01", "2024-12-31T00:00:00Z", conn,
+                                      _compute(frame, calls))
+        assert result is frame
+    assert len(calls) == 1
+    conn.versions["600519.SH"] = (240, "2024-12-31", "2025-01-02 18:00:00")
+    cache.get_or_compute(key, "600519.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls))
+    assert len(calls) == 2
+    assert cache.stats() == {"size": 1, "maxsize": 256, "hits": 2, "misses": 2, "evictions": 0}
+    assert 'signal_cache_requests_total{result="stale"} 1.0' in registry.render()
+
+    # 区间内无数据时不缓存
+    cache.get_or_compute(key, "000001.SZ", "2024-01-01", "2024-12-31", conn, _compute(frame, calls))
+    assert len(calls) == 3 and cache.stats()["size"] == 1
+
+
+def test_lru_eviction_and_invalidate():
+    """超过容量时淘汰最久未用的条目，invalidate 按股票丢弃"""
+    cache = SignalCache(maxsize=2, registry=MetricsRegistry())
+    conn = FakeConnection()
+    frame, calls = generate_ohlcv(1, 30, seed=1), []
+    codes = ["000001.SZ", "000002.SZ", "000003.SZ"]
+    for code in codes:
+        conn.versions[code] = (30, "2024-02-09", "2024-02-10 18:00:00")
+    key = strategy_fingerprint("breakout")
+    for code in codes[:2] + codes[:1] + codes[2:]:
+        cache.get_or_compute(key, code, "2024-01-01", "2024-02-09", conn, _compute(frame, calls))
+    assert len(calls) == 3
+    assert [k[1] for k in cache.cache] == ["000001.SZ", "000003.SZ"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.invalidate("000001.SZ") == 1 and cache.invalidate() == 1
+
+
+def test_fundamentals_invalidation():
+    """依赖估值或财务数据的信号在这些表更新后失效，不依赖的信号不受影响"""
+    cache = SignalCache(registry=MetricsRegistry())
+    conn = FakeConnection()
+    conn.versions["600036.SH"] = (240, "2024-12-31", "2025-01-01 18:00:00")
+    conn.fundamentals[("BalanceSheet", "600036.SH")] = (8, "2024-10-30", "2024-11-01 18:00:00")
+    frame, calls = generate_ohlcv(1, 240, seed=6), []
+    rules, plain = strategy_fingerprint("rule_based", {"strategy_id": "STRAT_004"}), strategy_fingerprint("breakout")
+    for _ in range(2):
+        cache.get_or_compute(rules, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls),
+                             fundamentals=True)
+        cache.get_or_compute(plain, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls))
+    assert len(calls) == 2
+    # 新公告的年报
+    conn.fundamentals[("BalanceSheet", "600036.SH")] = (9, "2025-03-28", "2025-03-29 18:00:00")
+    cache.get_or_compute(rules, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls),
+                         fundamentals=True)
+    cache.get_or_compute(plain, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls))
+    assert len(calls) == 3
+
+
+def test_market_invalidation():
+    """依赖全市场截面均值的信号在其他股票的行情更新后失效"""
+    cache = SignalCache(registry=MetricsRegistry())
+    conn = FakeConnection()
+    conn.versions["600036.SH"] = (240, "2024-12-31", "2025-01-01 18:00:00")
+    conn.market = (480, "2024-12-31", "2025-01-01 18:00:00")
+    frame, calls = generate_ohlcv(1, 240, seed=7), []
+    rules = strategy_fingerprint("rule_based", {"strategy_id": "STRAT_003"})
+    for _ in range(2):
+        cache.get_or_compute(rules, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls),
+                             market=True)
+    assert len(calls) == 1
+    # 另一只股票补采了区间内的K线，本股票的版本不变
+    conn.market = (481, "2024-12-31", "2025-01-02 18:00:00")
+    cache.get_or_compute(rules, "600036.SH", "2024-01-01", "2024-12-31", conn, _compute(frame, calls),
+                         market=True)
+    assert len(calls) == 2
+
+
+def test_fingerprint():
+    """指纹区分策略类型、参数与自定义代码，与参数顺序无关"""
+    base = strategy_fingerprint("custom", {"a": 1, "b": 2}, "signal = 1")
+    assert base == strategy_fingerprint("custom", {"b": 2, "a": 1}, "signal = 1")
+    assert base != strategy_fingerprint("custom", {"a": 1, "b": 3}, "signal = 1")
+    assert base != strategy_fingerprint("custom", {"a": 1, "b": 2}, "signal = -1")
+    assert strategy_fingerprint("breakout") != strategy_fingerprint("dual_thrust")
+
+
+def main():
+    """主函数"""
+    tests = [test_hit_and_new_bar_invalidation, test_lru_eviction_and_invalidate, test_fundamentals_invalidation,
+             test_market_invalidation, test_fingerprint]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+signal_scanner 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+
+import pandas as pd
+
+from signal_scanner import SIGNAL_COLUMNS, SIGNAL_INSERT_BATCH, SignalScanner, make_signal_id
+from synthetic_data import generate_ohlcv, iter_stock_frames
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 与 init.sql 中 STRAT_002、STRAT_005 的条件一致
+CONDITIONS = {
+    "STRAT_002": [
+        {"condition_id": "COND_002", "indicator_id": "MA5", "condition_type": "greater",
+         "threshold_min": 1.01, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+        {"condition_id": "COND_003", "indicator_id": "MA5", "condition_type": "less",
+         "threshold_min": None, "threshold_max": 1.0, "signal_action": "sell", "condition_order": 2},
+    ],
+    "STRAT_005": [
+        {"condition_id": "COND_008", "indicator_id": "DUAL_THRUST", "condition_type": "greater",
+         "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+        {"condition_id": "COND_009", "indicator_id": "DUAL_THRUST", "condition_type": "less",
+         "threshold_min": None, "threshold_max": None, "signal_action": "sell", "condition_order": 2},
+    ],
+}
+
+
+class FakeConnection:
+    """记录 executemany 调用的数据库连接"""
+
+    def __init__(self):
+        self.batches = []
+        self.committed = False
+
+    def cursor(self, *args):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def executemany(self, sql, rows):
+        self.batches.append((sql, list(rows)))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _scanner_and_entries():
+    scanner = SignalScanner()
+    entries = [scanner.build_entry(sid, "admin_001", conds) for sid, conds in CONDITIONS.items()]
+    return scanner, entries
+
+
+def test_scan_matches_single_stock():
+    """面板扫描结果与逐只股票运行策略后取最后一根K线一致"""
+    panel = generate_ohlcv(30, 120, seed=4)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"].unique()))
+    scan_date = panel["trade_date"].max()
+    scanner, entries = _scanner_and_entries()
+    rows = scanner.scan_panel(panel, entries, scan_date)
+
+    expected = set()
+    for entry in entries:
+        for frame in iter_stock_frames(panel):
+            last = entry["strategy"].generate_signals(frame).iloc[-1]
+            if last["signal"] != 0:
+                expected.add((entry["strategy_id"], last["stock_code"], "buy" if last["signal"] == 1 else "sell"))
+    assert expected, "合成数据在扫描日没有任何信号"
+    assert {(r[2], r[3], r[5]) for r in rows} == expected
+    for row in rows:
+        record = dict(zip(SIGNAL_COLUMNS, row))
+        assert record["signal_id"] == make_signal_id(record["strategy_id"], record["stock_code"], scan_date)
+        assert record["trade_date"] == scan_date.strftime("%Y-%m-%d") and record["signal_price"] > 0
+        assert record["trigger_reason"]
+
+
+# 收盘价相对 MA5 的比值高于当日全市场均值时买入（阈值为空）
+MARKET_MEAN_CONDITIONS = [
+    {"condition_id": "COND_T01", "indicator_id": "MA5", "condition_type": "greater",
+     "threshold_min": None, "threshold_max": None, "signal_action": "buy", "condition_order": 1},
+]
+
+
+def test_market_mean_independent_of_chunks():
+    """与市场平均值比较的条件：分块扫描的结果与整体面板一致，不随分块大小变化"""
+    panel = generate_ohlcv(24, 120, seed=9)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"].unique()))
+    scan_date = panel["trade_date"].max()
+    scanner = SignalScanner()
+    entry = scanner.build_entry("STRAT_T01", "admin_001", MARKET_MEAN_CONDITIONS)
+    expected = scanner.scan_panel(panel, [entry], scan_date)
+    assert expected, "合成数据在扫描日没有任何信号"
+
+    frames = list(iter_stock_frames(panel))
+    for size in (1, 5, 11):
+        chunks = [pd.concat(frames[i : i + size], ignore_index=True) for i in range(0, len(frames), size)]
+        entry = scanner.build_entry("STRAT_T01", "admin_001", MARKET_MEAN_CONDITIONS)
+        assert scanner.prepare_references([entry], chunks) == [entry]
+        rows = [row for chunk in chunks for row in scanner.scan_panel(chunk, [entry], scan_date)]
+        assert sorted(rows) == sorted(expected), size
+    # 无截面条件的策略不需要额外遍历
+    _, entries = _scanner_and_entries()
+    assert scanner.prepare_references(entries, []) == []
+
+
+def test_save_in_batches():
+    """信号按批写入，同一 signal_id 覆盖"""
+    scanner, _ = _scanner_and_entries()
+    fake = FakeConnection()
+    scanner._connect = lambda: fake
+    rows = [(f"SIG_{i}", "admin_001", "STRAT_002", f"{i:06d}.SZ", "2024-08-30", "buy", 1.0, 10.0, "")
+            for i in range(2500)]
+    assert scanner.save_signals(rows) == 2500
+    batch = SIGNAL_INSERT_BATCH
+    assert [len(rows) for _, rows in fake.batches] == [batch, batch, 2500 - 2 * batch]
+    assert "ON DUPLICATE KEY UPDATE" in fake.batches[0][0] and fake.committed
+    assert scanner.save_signals([]) == 0
+
+
+def main():
+    """主函数"""
+    tests = [test_scan_matches_single_stock, test_market_mean_independent_of_chunks, test_save_in_batches]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+stage_timer / metrics_registry 离线测试（不依赖数据库）
+"""
+
+import sys
+import time
+import logging
+
+import pandas as pd
+
+from metrics_registry import MetricsRegistry
+from stage_timer import StageTimer, current_timer, timed_stage
+from synthetic_data import generate_ohlcv
+from trading_calendar import set_trading_calendar
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_nested_stages():
+    """嵌套阶段：外层总耗时包含子阶段，自身耗时扣除子阶段"""
+    registry = MetricsRegistry()
+    timer = StageTimer(registry=registry).start()
+    with timed_stage("outer"):
+        time.sleep(0.01)
+        with timed_stage("inner"):
+            time.sleep(0.02)
+    timer.finish()
+    stages = {s["name"]: s for s in timer.to_dict()["stages"]}
+    assert stages["inner"]["depth"] == 1 and stages["outer"]["depth"] == 0
+    assert stages["outer"]["ms"] >= stages["inner"]["ms"] >= 20
+    assert abs(stages["outer"]["self_ms"] - (stages["outer"]["ms"] - stages["inner"]["ms"])) < 0.01
+    assert current_timer() is None
+
+
+def test_no_active_timer():
+    """没有活动计时器时 timed_stage 不做任何事"""
+    with timed_stage("noop"):
+        pass
+    assert current_timer() is None
+
+
+def test_finish_closes_and_records():
+    """finish 关闭未结束的阶段、只记录一次，并写入直方图与计数器"""
+    registry = MetricsRegistry()
+    timer = StageTimer(registry=registry).start()
+    timer.begin("strategy_lookup")
+    timer.finish("error")
+    timer.finish("ok")
+    assert [s["name"] for s in timer.stages] == ["strategy_lookup"]
+    assert registry.histogram("backtest_stage_seconds", "").count(pipeline="backtest", stage="strategy_lookup") == 1
+    assert registry.counter("backtest_requests_total", "").get(pipeline="backtest", status="error") == 1
+    text = registry.render()
+    assert "# TYPE backtest_stage_seconds histogram" in text
+    assert 'backtest_stage_seconds_bucket{pipeline="backtest",stage="strategy_lookup",le="+Inf"} 1' in text
+    assert 'backtest_requests_total{pipeline="backtest",status="error"} 1.0' in text
+
+
+def test_memory_trace():
+    """开启 tracemalloc 时记录各阶段峰值内存"""
+    registry = MetricsRegistry()
+    timer = StageTimer(trace_memory=True, registry=registry).start()
+    with timed_stage("alloc"):
+        block = bytearray(4 * 1024 * 1024)
+        del block
+    timer.finish()
+    stage = timer.to_dict()["stages"][0]
+    assert stage["peak_kb"] >= 4 * 1024 - 64
+    assert registry.histogram("backtest_stage_peak_bytes", "").count(pipeline="backtest", stage="alloc") == 1
+
+
+def test_backtest_stages():
+    """回测引擎内部埋点：simulate 下包含 calendar 与 metrics"""
+    from backtest_engine import BacktestEngine
+    from strategy_engine import StrategyEngine
+
+    panel = generate_ohlcv(1, 300, seed=3)
+    set_trading_calendar(pd.DatetimeIndex(panel["trade_date"]))
+    signals = StrategyEngine().create_strategy("moving_average").generate_signals(panel)
+
+    timer = StageTimer(registry=MetricsRegistry()).start()
+    with timed_stage("simulate"):
+        BacktestEngine().simulate_trading(signals)
+    timer.finish()
+    names = [(s["name"], s["depth"]) for s in timer.stages]
+    assert ("calendar", 1) in names and ("metrics", 1) in names and ("simulate", 0) in names
+
+
+def main():
+    """主函数"""
+    tests = [
+        test_nested_stages,
+        test_no_active_timer,
+        test_finish_closes_and_records,
+        test_memory_trace,
+        test_backtest_stages,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
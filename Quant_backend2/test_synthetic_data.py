@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+synthetic_data 离线测试
+"""
+
+import sys
+import logging
+
+import numpy as np
+
+from synthetic_data import MARKET_COLUMNS, generate_ohlcv, iter_stock_frames
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_shape_and_reproducible():
+    """面板形状、列名与可复现性"""
+    panel = generate_ohlcv(4, 300, seed=5)
+    assert list(panel.columns) == MARKET_COLUMNS
+    assert len(panel) == 1200 and panel["stock_code"].nunique() == 4
+    assert panel.equals(generate_ohlcv(4, 300, seed=5))
+    frames = list(iter_stock_frames(panel))
+    assert len(frames) == 4 and frames[1].index[0] == 0
+    assert frames[1]["trade_date"].is_monotonic_increasing
+
+
+def test_price_constraints():
+    """满足 StockMarketData 表的价格约束"""
+    panel = generate_ohlcv(20, 1000, seed=1)
+    o, h, l, c = (panel[k].to_numpy() for k in ("open_price", "high_price", "low_price", "close_price"))
+    assert (l > 0).all() and (panel["pre_close_price"] > 0).all()
+    assert (h >= np.maximum(o, c)).all() and (l <= np.minimum(o, c)).all()
+    assert (panel["volume"] >= 0).all() and (panel["amount"] >= 0).all()
+    assert np.abs(panel["change_percent"]).max() <= 10.01
+
+
+def main():
+    """主函数"""
+    tests = [test_shape_and_reproducible, test_price_constraints]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+trading_calendar 离线测试（不依赖数据库）
+"""
+
+import sys
+import logging
+from datetime import date
+
+import trading_calendar
+from trading_calendar import TradingCalendar, stock_trade_dates
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DATES = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-08"]
+
+
+def test_between():
+    """区间查询包含两端，接受带时间的日期字符串"""
+    calendar = TradingCalendar(DATES)
+    assert calendar.format_between("2024-01-03", "2024-01-08") == DATES[1:]
+    assert calendar.format_between("2024-01-06 00:00:00", "2024-01-07T00:00:00") == []
+    assert calendar.format_between("2023-12-01", "2024-01-02") == DATES[:1]
+
+
+def test_previous_and_membership():
+    """前一交易日与是否交易日"""
+    calendar = TradingCalendar(DATES)
+    assert str(calendar.previous("2024-01-08")) == "2024-01-05"
+    assert str(calendar.previous("2024-01-06")) == "2024-01-05"
+    assert calendar.previous("2024-01-02") is None
+    assert calendar.is_trading_day("2024-01-04")
+    assert not calendar.is_trading_day("2024-01-06")
+    assert TradingCalendar().previous("2024-01-02") is None
+
+
+class FakeConnection:
+    """TradingCalendar 表只覆盖部分日期、StockMarketData 另有更早与更晚交易日的数据库连接"""
+
+    def __init__(self, calendar, market):
+        self.calendar = [date.fromisoformat(d) for d in calendar]
+        self.market = [date.fromisoformat(d) for d in market]
+        self.rows = []
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.queries.append((sql, params))
+        if "FROM TradingCalendar" in sql:
+            self.rows = [(d,) for d in self.calendar]
+        elif "stock_code" in sql:
+            lo, hi = date.fromisoformat(params[1]), date.fromisoformat(params[2])
+            self.rows = [(d,) for d in self.market if lo <= d <= hi]
+        elif params:
+            lo, hi = date.fromisoformat(params[0]), date.fromisoformat(params[1])
+            self.rows = [(d,) for d in sorted(set(self.market)) if d < lo or d > hi]
+        else:
+            self.rows = [(d,) for d in sorted(set(self.market))]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def _with_connection(fake, fn):
+    connect = trading_calendar.pymysql.connect
+    trading_calendar.pymysql.connect = lambda **kwargs: fake
+    try:
+        return fn()
+    finally:
+        trading_calendar.pymysql.connect = connect
+
+
+def test_load_merges_market_dates():
+    """日历表未覆盖的有行情交易日被合并；日历表为空时使用全部行情交易日"""
+    market = ["2023-12-28", "2023-12-29"] + DATES[1:4] + ["2024-01-09", "2024-01-10"]
+    fake = FakeConnection(DATES, market)
+    calendar = _with_connection(fake, lambda: TradingCalendar().load())
+    assert calendar.format_between("2023-12-01", "2024-01-31") == market[:2] + DATES + market[-2:]
+    assert fake.queries[1][1] == ("2024-01-02", "2024-01-08")
+    empty = _with_connection(FakeConnection([], market), lambda: TradingCalendar().load())
+    assert empty.format_between("2023-12-01", "2024-01-31") == market
+
+
+def test_stock_trade_dates():
+    """单只股票的交易日不含停牌日"""
+    suspended = [d for d in DATES if d != "2024-01-04"]
+    fake = FakeConnection(DATES, suspended)
+    dates = _with_connection(fake, lambda: stock_trade_dates("600519.SH", "2024-01-03 00:00:00", "2024-01-08"))
+    assert dates == ["2024-01-03", "2024-01-05", "2024-01-08"]
+    assert fake.queries[0][1][0] == "600519.SH"
+
+
+def main():
+    """主函数"""
+    tests = [test_between, test_previous_and_membership, test_load_merges_market_dates, test_stock_trade_dates]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
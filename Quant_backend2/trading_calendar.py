@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+交易日历内存索引模块
+- TradingCalendar：一次性读取 TradingCalendar 表为有序 datetime64 数组，并合并 StockMarketData 中超出日历覆盖范围的
+  交易日（表为空时即全部使用行情交易日），区间、前一交易日等查询均为 np.searchsorted，不再逐请求访问数据库
+- stock_trade_dates：单只股票实际有行情的交易日（不含停牌日），用于补齐旧报告逐K线资金曲线的日期
+- get_trading_calendar：进程内共享的日历实例，按 TTL 自动刷新
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 数据库默认设置
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": 3306,
+    "user": "root",
+    "password": "123456",
+    "database": "quantitative_trading",
+    "charset": "utf8mb4",
+}
+
+# 日历缓存有效期（秒）
+CALENDAR_TTL_SECONDS = 6 * 3600
+# 加载失败后重试的间隔（秒）
+CALENDAR_RETRY_SECONDS = 60
+DEFAULT_EXCHANGE = "SSE"
+
+
+def _connect(db_password: str = None):
+    return pymysql.connect(
+        host=DB_DEFAULTS["host"],
+        port=DB_DEFAULTS["port"],
+        user=DB_DEFAULTS["user"],
+        password=db_password if db_password is not None else DB_DEFAULTS["password"],
+        database=DB_DEFAULTS["database"],
+        charset=DB_DEFAULTS["charset"],
+    )
+
+
+def _to_day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(str(value).split(" ")[0].split("T")[0]).date(), "D")
+
+
+class TradingCalendar:
+    """交易日历（仅开市日）的内存索引"""
+
+    def __init__(self, dates=None):
+        """
+        Args:
+            dates: 交易日序列，为None时为空日历，需调用 load 从数据库加载
+        """
+        self.dates = np.array([], dtype="datetime64[D]")
+        self.loaded_at = 0.0
+        self.logger = logger
+        if dates is not None:
+            self.dates = np.unique(np.asarray([_to_day(d) for d in dates], dtype="datetime64[D]"))
+            self.loaded_at = time.time()
+
+    def load(self, db_password: str = None, exchange: str = DEFAULT_EXCHANGE) -> "TradingCalendar":
+        """
+        从 TradingCalendar 表加载开市日，并合并 StockMarketData 中早于或晚于日历覆盖范围的交易日
+        （日历表只同步了部分年份、或行情先于日历入库时，区间查询不会漏掉有行情的日子）；表为空时全部使用行情交易日
+        """
+        connection = _connect(db_password)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT cal_date FROM TradingCalendar WHERE exchange = %s AND is_open = 1 ORDER BY cal_date",
+                    (exchange,),
+                )
+                dates = np.asarray([r[0] for r in cursor.fetchall()], dtype="datetime64[D]")
+                if len(dates):
+                    cursor.execute(
+                        "SELECT DISTINCT trade_date FROM StockMarketData WHERE trade_date < %s OR trade_date > %s",
+                        (str(dates[0]), str(dates[-1])),
+                    )
+                else:
+                    cursor.execute("SELECT DISTINCT trade_date FROM StockMarketData")
+                extra = np.asarray([r[0] for r in cursor.fetchall()], dtype="datetime64[D]")
+        finally:
+            connection.close()
+        if len(extra):
+            self.logger.info(f"交易日历未覆盖{len(extra)}个有行情的交易日，已从 StockMarketData 补充")
+        self.dates = np.union1d(dates, extra)
+        self.loaded_at = time.time()
+        self.logger.info(f"交易日历加载完成，共{len(self.dates)}个交易日")
+        return self
+
+    def between(self, start_date, end_date) -> np.ndarray:
+        """区间内（含两端）的交易日"""
+        lo = np.searchsorted(self.dates, _to_day(start_date), side="left")
+        hi = np.searchsorted(self.dates, _to_day(end_date), side="right")
+        return self.dates[lo:hi]
+
+    def previous(self, date) -> Optional[np.datetime64]:
+        """严格早于 date 的最近一个交易日，不存在时返回 None"""
+        pos = np.searchsorted(self.dates, _to_day(date), side="left") - 1
+        return self.dates[pos] if pos >= 0 else None
+
+    def is_trading_day(self, date) -> bool:
+        day = _to_day(date)
+        pos = np.searchsorted(self.dates, day)
+        return bool(pos < len(self.dates) and self.dates[pos] == day)
+
+    def format_between(self, start_date, end_date) -> List[str]:
+        """区间内交易日的 YYYY-MM-DD 字符串列表"""
+        return np.datetime_as_string(self.between(start_date, end_date), unit="D").tolist()
+
+
+def stock_trade_dates(stock_code: str, start_date, end_date, db_password: str = None) -> List[str]:
+    """
+    股票在区间内实际有行情的交易日（YYYY-MM-DD），停牌日不在其中
+
+    单只股票的回测按自身K线逐根推进，资金曲线与这些日期一一对应，而不是与交易所日历对应
+    """
+    connection = _connect(db_password)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT trade_date FROM StockMarketData WHERE stock_code = %s AND trade_date BETWEEN %s AND %s "
+                "ORDER BY trade_date",
+                (stock_code, str(_to_day(start_date)), str(_to_day(end_date))),
+            )
+            rows = cursor.fetchall()
+    finally:
+        connection.close()
+    return [str(_to_day(r[0])) for r in rows]
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar(db_password: str = None, ttl: float = CALENDAR_TTL_SECONDS) -> TradingCalendar:
+    """获取进程内共享的交易日历，超过 TTL 后重新加载；加载失败时沿用已有日历并在稍后重试"""
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None or time.time() - _calendar.loaded_at > ttl:
+            try:
+                _calendar = TradingCalendar().load(db_password)
+            except Exception as e:
+                logger.error(f"加载交易日历失败: {e}")
+                # 保留旧日历（或空日历），稍后重试
+                if _calendar is None:
+                    _calendar = TradingCalendar()
+                _calendar.loaded_at = time.time() - ttl + CALENDAR_RETRY_SECONDS
+        return _calendar
+
+
+def set_trading_calendar(dates) -> TradingCalendar:
+    """直接设置进程内共享的日历（离线场景如基准测试、压测使用），之后不再访问数据库"""
+    global _calendar
+    with _calendar_lock:
+        _calendar = TradingCalendar(dates)
+        _calendar.loaded_at = float("inf")
+        return _calendar
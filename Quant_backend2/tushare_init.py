@@ -10,17 +10,43 @@ Tushare 本地缓存客户端（tushare_cache）
 import os
 import json
 import logging
-from typing import Optional
+from datetime import datetime
+from typing import Iterator, Optional, Union
 import pandas as pd
 import pymysql
 import tushare as ts
 
+from market_data_reader import iter_group_chunks
+
 # logger 仅用于记录与 Tushare 交互的行为（init_all_from_tushare 会使用）
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# Tushare daily / daily_basic 单次请求返回行数上限
+TUSHARE_ROW_LIMIT = 6000
+# 按股票代码查询时每条 SQL 携带的代码数（日期一律用 BETWEEN 区间）
+SQL_CODE_BATCH = 500
+# 流式读取时每个 DataFrame 分块的默认行数
+READ_CHUNK_ROWS = 100000
+
+DAILY_TABLE_FIELDS = {
+    "daily": [
+        "ts_code", "trade_date", "open", "high", "low", "close",
+        "pre_close", "change", "pct_chg", "vol", "amount",
+    ],
+    "daily_basic": [
+        "ts_code", "trade_date", "close", "turnover_rate", "turnover_rate_f",
+        "volume_ratio", "pe", "pe_ttm", "pb", "ps", "ps_ttm", "dv_ratio",
+        "dv_ttm", "total_share", "float_share", "free_share", "total_mv", "circ_mv",
+    ],
+    "index_daily": [
+        "ts_code", "trade_date", "close", "open", "high", "low",
+        "pre_close", "change", "pct_chg", "vol", "amount",
+    ],
+}
+
 
 class TushareCacheClient:
     def __init__(self, config_path: str = "config.json"):
@@ -42,11 +68,8 @@ class TushareCacheClient:
             raise ValueError("config.json missing required keys")
         return cfg
 
-    def connect(self):
-        """建立数据库连接"""
-        if self.db_conn:
-            return
-        cfg = {
+    def _db_config(self) -> dict:
+        return {
             "host": "localhost",
             "port": 3306,
             "user": "root",
@@ -55,7 +78,12 @@ class TushareCacheClient:
             "charset": "utf8mb4",
             "autocommit": False,
         }
-        self.db_conn = pymysql.connect(**cfg)
+
+    def connect(self):
+        """建立数据库连接"""
+        if self.db_conn:
+            return
+        self.db_conn = pymysql.connect(**self._db_config())
 
     def close(self):
         if self.db_conn:
@@ -243,43 +271,191 @@ class TushareCacheClient:
         self.connect()
         cur = self.db_conn.cursor()
         try:
-            format_strings = ",".join(["%s"] * len(ts_codes))
-            cur.execute(
-                f"SELECT ts_code FROM stock_basic WHERE ts_code IN ({format_strings})",
-                tuple(ts_codes),
-            )
-            rows = cur.fetchall()
-            return [r[0] for r in rows]
+            valid = []
+            for i in range(0, len(ts_codes), SQL_CODE_BATCH):
+                batch_codes = ts_codes[i : i + SQL_CODE_BATCH]
+                format_strings = ",".join(["%s"] * len(batch_codes))
+                cur.execute(
+                    f"SELECT ts_code FROM stock_basic WHERE ts_code IN ({format_strings})",
+                    tuple(batch_codes),
+                )
+                valid.extend(r[0] for r in cur.fetchall())
+            return valid
         finally:
             cur.close()
 
-    def _read_daily_count(self, ts_codes: list, trade_dates: list, table: str) -> int:
-        """查询数据库中指定股票和日期范围的总数据行数"""
-        if not ts_codes or not trade_dates:
-            return 0
+    @staticmethod
+    def _norm_date(value) -> str:
+        """统一日期为 YYYYMMDD 字符串（兼容 DATE 列与字符串列）"""
+        if hasattr(value, "strftime"):
+            return value.strftime("%Y%m%d")
+        return str(value).replace("-", "")
+
+    def _read_listing_ranges(self, ts_codes: list) -> dict:
+        """读取股票的上市/退市日期，用于排除上市前与退市后的交易日"""
+        if not ts_codes:
+            return {}
         self.connect()
         cur = self.db_conn.cursor()
         try:
-            format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"SELECT COUNT(*) FROM {table} WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
-            return cur.fetchone()[0]
+            ranges = {}
+            for i in range(0, len(ts_codes), SQL_CODE_BATCH):
+                batch_codes = ts_codes[i : i + SQL_CODE_BATCH]
+                format_codes = ",".join(["%s"] * len(batch_codes))
+                cur.execute(
+                    f"SELECT ts_code, list_date, delist_date FROM stock_basic WHERE ts_code IN ({format_codes})",
+                    tuple(batch_codes),
+                )
+                for r in cur.fetchall():
+                    ranges[r[0]] = (
+                        self._norm_date(r[1]) if r[1] else None,
+                        self._norm_date(r[2]) if r[2] else None,
+                    )
+            return ranges
         finally:
             cur.close()
 
-    def _delete_daily(self, ts_codes: list, trade_dates: list, table: str):
-        """删除数据库中指定股票和日期范围的数据"""
-        if not ts_codes or not trade_dates:
-            return
+    def _read_daily_keys(
+        self, ts_codes: list, start_date: str, end_date: str, table: str
+    ) -> set:
+        """读取本地已有的 (ts_code, trade_date) 单元格，包括已登记为停牌缺口的单元格"""
+        if not ts_codes:
+            return set()
         self.connect()
         cur = self.db_conn.cursor()
         try:
             format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"DELETE FROM {table} WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
+            cur.execute(
+                f"SELECT ts_code, trade_date FROM {table} WHERE ts_code IN ({format_codes}) AND trade_date BETWEEN %s AND %s",
+                tuple(ts_codes) + (start_date, end_date),
+            )
+            keys = {(r[0], self._norm_date(r[1])) for r in cur.fetchall()}
+            cur.execute(
+                f"SELECT ts_code, trade_date FROM daily_gap WHERE table_name = %s AND ts_code IN ({format_codes}) AND trade_date BETWEEN %s AND %s",
+                (table,) + tuple(ts_codes) + (start_date, end_date),
+            )
+            keys.update((r[0], r[1]) for r in cur.fetchall())
+            return keys
+        finally:
+            cur.close()
+
+    def _find_missing_cells(self, ts_codes: list, trade_dates: list, table: str) -> dict:
+        """
+        逐 (股票, 交易日) 检测缺口，返回 {ts_code: [缺失的交易日, ...]}。
+        上市前、退市后的交易日以及登记在 daily_gap（由 add_daily_gap.sql 创建）中的停牌日不计入缺口。
+        """
+        trade_dates = [self._norm_date(d) for d in trade_dates]
+        listing = self._read_listing_ranges(ts_codes)
+        missing = {}
+        for i in range(0, len(ts_codes), SQL_CODE_BATCH):
+            batch_codes = ts_codes[i : i + SQL_CODE_BATCH]
+            existing = self._read_daily_keys(
+                batch_codes, trade_dates[0], trade_dates[-1], table
+            )
+            for code in batch_codes:
+                list_date, delist_date = listing.get(code, (None, None))
+                dates = [
+                    d
+                    for d in trade_dates
+                    if (code, d) not in existing
+                    and (not list_date or d >= list_date)
+                    and (not delist_date or d < delist_date)
+                ]
+                if dates:
+                    missing[code] = dates
+        return missing
+
+    @staticmethod
+    def _plan_code_batches(missing: dict, trade_dates: list) -> list:
+        """
+        按股票分批：每批的请求区间为批内缺失日期的并集跨度，
+        保证 批内股票数 × 区间交易日数 不超过单次返回上限。
+        返回 [(codes, start_date, end_date), ...]
+        """
+        pos = {d: i for i, d in enumerate(trade_dates)}
+        spans = sorted(
+            (pos[dates[0]], pos[dates[-1]], code) for code, dates in missing.items()
+        )
+        batches = []
+        codes, lo, hi = [], None, None
+        for first, last, code in spans:
+            new_lo = first if lo is None else min(lo, first)
+            new_hi = last if hi is None else max(hi, last)
+            if codes and (len(codes) + 1) * (new_hi - new_lo + 1) > TUSHARE_ROW_LIMIT:
+                batches.append((codes, trade_dates[lo], trade_dates[hi]))
+                codes, new_lo, new_hi = [], first, last
+            codes.append(code)
+            lo, hi = new_lo, new_hi
+        if codes:
+            batches.append((codes, trade_dates[lo], trade_dates[hi]))
+        return batches
+
+    def _fetch_missing_cells(self, table: str, missing: dict, trade_dates: list) -> pd.DataFrame:
+        """
+        只拉取缺失的单元格。两种拉取方式取调用次数较少者：
+        - 按股票分批（ts_code 列表 + 日期区间），适合少量股票的长区间补齐；
+        - 按交易日（trade_date 单日全市场），适合大批股票只缺最近几天的增量刷新。
+        """
+        fetcher = getattr(self.pro, table)
+        trade_dates = [self._norm_date(d) for d in trade_dates]
+        missing_dates = sorted({d for dates in missing.values() for d in dates})
+        code_batches = self._plan_code_batches(missing, trade_dates)
+
+        frames = []
+        if len(missing_dates) < len(code_batches):
+            for d in missing_dates:
+                df = fetcher(trade_date=d)
+                if df is not None and not df.empty:
+                    frames.append(df)
+        else:
+            for codes, start, end in code_batches:
+                df = fetcher(ts_code=",".join(codes), start_date=start, end_date=end)
+                if df is not None and not df.empty:
+                    frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        df["trade_date"] = df["trade_date"].map(self._norm_date)
+        wanted = pd.MultiIndex.from_tuples(
+            [(code, d) for code, dates in missing.items() for d in dates]
+        )
+        keys = pd.MultiIndex.from_arrays([df["ts_code"], df["trade_date"]])
+        return df[keys.isin(wanted)].drop_duplicates(["ts_code", "trade_date"])
+
+    def _record_gaps(self, table: str, missing: dict, fetched: pd.DataFrame) -> int:
+        """
+        将请求过但 Tushare 未返回的单元格登记为停牌缺口。
+        缺失日期均取自交易日历：今天之前的交易日行情已发布，未返回即为停牌，
+        即使本次一条都未返回（如单只股票的批次恰逢停牌）也登记；
+        今天则仅当该股票在更晚的日期有数据、或其他股票在同一天有数据时才登记，
+        避免把当天尚未发布的行情误记为停牌。
+        """
+        if fetched.empty:
+            returned, market_dates, last_date = set(), set(), {}
+        else:
+            returned = set(zip(fetched["ts_code"], fetched["trade_date"]))
+            market_dates = set(fetched["trade_date"])
+            last_date = fetched.groupby("ts_code")["trade_date"].max().to_dict()
+        today = datetime.now().strftime("%Y%m%d")
+        gaps = [
+            (table, code, d)
+            for code, dates in missing.items()
+            for d in dates
+            if (code, d) not in returned
+            and (d < today or d in market_dates or d < last_date.get(code, ""))
+        ]
+        if not gaps:
+            return 0
+        self.connect()
+        cur = self.db_conn.cursor()
+        try:
+            cur.executemany(
+                "INSERT IGNORE INTO daily_gap (table_name, ts_code, trade_date) VALUES (%s,%s,%s)",
+                gaps,
+            )
             self.db_conn.commit()
+            return len(gaps)
         except Exception:
             if self.db_conn:
                 self.db_conn.rollback()
@@ -287,65 +463,26 @@ class TushareCacheClient:
         finally:
             cur.close()
 
-    def _insert_daily(self, df: pd.DataFrame, table: str):
-        """插入日线或每日指标数据"""
+    def _upsert_daily(self, df: pd.DataFrame, table: str):
+        """按 (ts_code, trade_date) 原地写入日线或每日指标数据（已存在则更新）"""
         if df.empty:
             return 0
+        if table not in ("daily", "daily_basic"):
+            raise ValueError("table must be 'daily' or 'daily_basic'")
+        fields = DAILY_TABLE_FIELDS[table]
+        df = df.reindex(columns=fields)
+        df = df.astype(object).where(pd.notnull(df), None)
         self.connect()
         cur = self.db_conn.cursor()
         try:
-            if table == "daily":
-                insert_sql = (
-                    "INSERT INTO daily (ts_code, trade_date, `open`, high, low, `close`, pre_close, `change`, pct_chg, vol, amount) "
-                    "VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
-                )
-                data = [
-                    (
-                        r.ts_code,
-                        r.trade_date,
-                        r.open,
-                        r.high,
-                        r.low,
-                        r.close,
-                        r.pre_close,
-                        r.change,
-                        r.pct_chg,
-                        r.vol,
-                        r.amount,
-                    )
-                    for _, r in df.iterrows()
-                ]
-            elif table == "daily_basic":
-                insert_sql = (
-                    "INSERT INTO daily_basic (ts_code, trade_date, `close`, turnover_rate, turnover_rate_f, volume_ratio, pe, pe_ttm, pb, ps, ps_ttm, dv_ratio, dv_ttm, total_share, float_share, free_share, total_mv, circ_mv) "
-                    "VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
-                )
-                data = [
-                    (
-                        r.ts_code,
-                        r.trade_date,
-                        r.close,
-                        r.turnover_rate,
-                        r.turnover_rate_f,
-                        r.volume_ratio,
-                        r.pe,
-                        r.pe_ttm,
-                        r.pb,
-                        r.ps,
-                        r.ps_ttm,
-                        r.dv_ratio,
-                        r.dv_ttm,
-                        r.total_share,
-                        r.float_share,
-                        r.free_share,
-                        r.total_mv,
-                        r.circ_mv,
-                    )
-                    for _, r in df.iterrows()
-                ]
-            else:
-                raise ValueError("table must be 'daily' or 'daily_basic'")
-            cur.executemany(insert_sql, data)
+            columns = ", ".join(f"`{c}`" for c in fields)
+            placeholders = ",".join(["%s"] * len(fields))
+            updates = ", ".join(f"`{c}`=VALUES(`{c}`)" for c in fields[2:])
+            insert_sql = (
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+                f"ON DUPLICATE KEY UPDATE {updates}"
+            )
+            cur.executemany(insert_sql, [tuple(r) for r in df.itertuples(index=False)])
             self.db_conn.commit()
             return cur.rowcount
         except Exception:
@@ -355,14 +492,96 @@ class TushareCacheClient:
         finally:
             cur.close()
 
+    def _sync_daily_table(self, table: str, ts_codes: list, trade_dates: list):
+        """按单元格补齐本地缓存：检测缺口 -> 只拉缺失部分 -> 原地写入 -> 登记停牌缺口"""
+        missing = self._find_missing_cells(ts_codes, trade_dates, table)
+        if not missing:
+            return
+        df = self._fetch_missing_cells(table, missing, trade_dates)
+        self._upsert_daily(df, table)
+        self._record_gaps(table, missing, df)
+
+    def _iter_local_rows(
+        self,
+        table: str,
+        ts_codes: list,
+        start_date: str,
+        end_date: str,
+        chunksize: int = READ_CHUNK_ROWS,
+    ):
+        """
+        流式读取本地日线类表：股票代码分批 IN + 交易日 BETWEEN 区间，
+        使用独立连接上的服务端游标（SSCursor），按约 chunksize 行（整只股票）产出 DataFrame。
+        """
+        fields = DAILY_TABLE_FIELDS[table]
+        columns = ", ".join(f"`{c}`" for c in fields)
+        conn = pymysql.connect(
+            cursorclass=pymysql.cursors.SSCursor, **self._db_config()
+        )
+        try:
+            for i in range(0, len(ts_codes), SQL_CODE_BATCH):
+                batch_codes = ts_codes[i : i + SQL_CODE_BATCH]
+                format_codes = ",".join(["%s"] * len(batch_codes))
+                sql = (
+                    f"SELECT {columns} FROM {table} "
+                    f"WHERE ts_code IN ({format_codes}) AND trade_date BETWEEN %s AND %s "
+                    f"ORDER BY ts_code, trade_date"
+                )
+                cur = conn.cursor()
+                try:
+                    cur.execute(sql, tuple(batch_codes) + (start_date, end_date))
+                    # 分块在股票边界处切分，同一只股票的序列不会被拆开
+                    for rows in iter_group_chunks(cur, 0, chunksize):
+                        yield pd.DataFrame(rows, columns=fields)
+                finally:
+                    cur.close()
+        finally:
+            conn.close()
+
+    def _read_local(
+        self,
+        table: str,
+        ts_codes: list,
+        trade_dates: list,
+        chunksize: Optional[int] = None,
+    ):
+        """chunksize 为空时返回完整 DataFrame，否则返回 DataFrame 分块迭代器（与 pd.read_sql 一致）"""
+        start_date = self._norm_date(trade_dates[0])
+        end_date = self._norm_date(trade_dates[-1])
+        if chunksize:
+            return self._iter_local_rows(table, ts_codes, start_date, end_date, chunksize)
+        chunks = list(self._iter_local_rows(table, ts_codes, start_date, end_date))
+        if not chunks:
+            return pd.DataFrame(columns=DAILY_TABLE_FIELDS[table])
+        return pd.concat(chunks, ignore_index=True)
+
+    def _resolve_daily_request(self, ts_code: str, start_date: str, end_date: str):
+        """解析股票代码与交易日，返回 (ts_codes, trade_dates)"""
+        ts_codes = (
+            [c.strip() for c in ts_code.split(",") if c.strip()]
+            if ts_code
+            else self.stock_basic()["ts_code"].tolist()
+        )
+        ts_codes = self._read_ts_codes(ts_codes)
+        if not ts_codes:
+            raise ValueError("未找到有效的 ts_code")
+        trade_dates = self._read_trade_dates(start_date, end_date)
+        if not trade_dates:
+            raise ValueError("指定区间无交易日")
+        return ts_codes, trade_dates
+
     def daily(
         self,
         ts_code: str = "",
         start_date: str = None,
         end_date: str = None,
-    ) -> pd.DataFrame:
+        chunksize: Optional[int] = None,
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """
-        获取日线行情数据，自动分批补全本地缓存，API与Tushare一致。
+        获取日线行情数据，按 (股票, 交易日) 检测缺口并只补齐缺失部分，API与Tushare一致。
+        停牌日不会导致报错或整批重拉，而是登记到 daily_gap。
+        chunksize 不为空时返回按 chunksize 行分块的 DataFrame 迭代器（服务端游标流式读取），
+        用于全市场长区间拉取时控制内存。
 
         返回DataFrame字段说明：
             ts_code      : 股票代码
@@ -379,72 +598,22 @@ class TushareCacheClient:
         """
         if not start_date or not end_date:
             raise ValueError("daily: 必须提供 start_date 和 end_date")
-        # 股票代码列表
-        ts_codes = (
-            [c.strip() for c in ts_code.split(",") if c.strip()]
-            if ts_code
-            else self.stock_basic()["ts_code"].tolist()
-        )
-        ts_codes = self._read_ts_codes(ts_codes)
-        if not ts_codes:
-            raise ValueError("未找到有效的 ts_code")
-        # 交易日列表
-        trade_dates = self._read_trade_dates(start_date, end_date)
-        if not trade_dates:
-            raise ValueError("指定区间无交易日")
-        n_dates = len(trade_dates)
-        batch_size = max(1, 6000 // n_dates)
-        for i in range(0, len(ts_codes), batch_size):
-            batch_codes = ts_codes[i : i + batch_size]
-            expected = len(batch_codes) * n_dates
-            actual = self._read_daily_count(batch_codes, trade_dates, "daily")
-            if actual == expected:
-                continue
-            # 拉取数据
-            code_str = ",".join(batch_codes)
-            df = self.pro.daily(
-                ts_code=code_str, start_date=start_date, end_date=end_date
-            )
-            if df is None or len(df) != expected:
-                raise RuntimeError(
-                    f"Tushare daily 拉取数据不完整: 期望{expected}条，实际{len(df) if df is not None else 0}条"
-                )
-            self._delete_daily(batch_codes, trade_dates, "daily")
-            self._insert_daily(df, "daily")
+        ts_codes, trade_dates = self._resolve_daily_request(ts_code, start_date, end_date)
+        self._sync_daily_table("daily", ts_codes, trade_dates)
         # 最终返回本地数据
-        self.connect()
-        cur = self.db_conn.cursor()
-        try:
-            format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"SELECT ts_code, trade_date, `open`, high, low, `close`, pre_close, `change`, pct_chg, vol, amount FROM daily WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
-            rows = cur.fetchall()
-            cols = [
-                "ts_code",
-                "trade_date",
-                "open",
-                "high",
-                "low",
-                "close",
-                "pre_close",
-                "change",
-                "pct_chg",
-                "vol",
-                "amount",
-            ]
-            return pd.DataFrame(rows, columns=cols)
-        finally:
-            cur.close()
+        return self._read_local("daily", ts_codes, trade_dates, chunksize)
 
     def daily_basic(
         self,
         ts_code: str = "",
         start_date: str = None,
         end_date: str = None,
-    ) -> pd.DataFrame:
+        chunksize: Optional[int] = None,
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """
-        获取每日指标数据，自动分批补全本地缓存，API与Tushare一致。
+        获取每日指标数据，按 (股票, 交易日) 检测缺口并只补齐缺失部分，API与Tushare一致。
+        chunksize 不为空时返回按 chunksize 行分块的 DataFrame 迭代器（服务端游标流式读取），
+        用于全市场长区间拉取时控制内存。
 
         返回DataFrame字段说明：
             ts_code          : TS股票代码
@@ -468,67 +637,10 @@ class TushareCacheClient:
         """
         if not start_date or not end_date:
             raise ValueError("daily_basic: 必须提供 start_date 和 end_date")
-        ts_codes = (
-            [c.strip() for c in ts_code.split(",") if c.strip()]
-            if ts_code
-            else self.stock_basic()["ts_code"].tolist()
-        )
-        ts_codes = self._read_ts_codes(ts_codes)
-        if not ts_codes:
-            raise ValueError("未找到有效的 ts_code")
-        trade_dates = self._read_trade_dates(start_date, end_date)
-        if not trade_dates:
-            raise ValueError("指定区间无交易日")
-        n_dates = len(trade_dates)
-        batch_size = max(1, 6000 // n_dates)
-        for i in range(0, len(ts_codes), batch_size):
-            batch_codes = ts_codes[i : i + batch_size]
-            expected = len(batch_codes) * n_dates
-            actual = self._read_daily_count(batch_codes, trade_dates, "daily_basic")
-            if actual == expected:
-                continue
-            code_str = ",".join(batch_codes)
-            df = self.pro.daily_basic(
-                ts_code=code_str, start_date=start_date, end_date=end_date
-            )
-            if df is None or len(df) != expected:
-                raise RuntimeError(
-                    f"Tushare daily_basic 拉取数据不完整: 期望{expected}条，实际{len(df) if df is not None else 0}条"
-                )
-            self._delete_daily(batch_codes, trade_dates, "daily_basic")
-            self._insert_daily(df, "daily_basic")
+        ts_codes, trade_dates = self._resolve_daily_request(ts_code, start_date, end_date)
+        self._sync_daily_table("daily_basic", ts_codes, trade_dates)
         # 最终返回本地数据
-        self.connect()
-        cur = self.db_conn.cursor()
-        try:
-            format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"SELECT ts_code, trade_date, close, turnover_rate, turnover_rate_f, volume_ratio, pe, pe_ttm, pb, ps, ps_ttm, dv_ratio, dv_ttm, total_share, float_share, free_share, total_mv, circ_mv FROM daily_basic WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
-            rows = cur.fetchall()
-            cols = [
-                "ts_code",
-                "trade_date",
-                "close",
-                "turnover_rate",
-                "turnover_rate_f",
-                "volume_ratio",
-                "pe",
-                "pe_ttm",
-                "pb",
-                "ps",
-                "ps_ttm",
-                "dv_ratio",
-                "dv_ttm",
-                "total_share",
-                "float_share",
-                "free_share",
-                "total_mv",
-                "circ_mv",
-            ]
-            return pd.DataFrame(rows, columns=cols)
-        finally:
-            cur.close()
+        return self._read_local("daily_basic", ts_codes, trade_dates, chunksize)
 
     # ========== 指数基本信息 ==========
     def _read_index_basic_from_db(self):
@@ -620,9 +732,8 @@ class TushareCacheClient:
         cur = self.db_conn.cursor()
         try:
             format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"SELECT COUNT(*) FROM index_daily WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
+            sql = f"SELECT COUNT(*) FROM index_daily WHERE ts_code IN ({format_codes}) AND trade_date BETWEEN %s AND %s"
+            cur.execute(sql, tuple(ts_codes) + (trade_dates[0], trade_dates[-1]))
             return cur.fetchone()[0]
         finally:
             cur.close()
@@ -634,9 +745,8 @@ class TushareCacheClient:
         cur = self.db_conn.cursor()
         try:
             format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"DELETE FROM index_daily WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
+            sql = f"DELETE FROM index_daily WHERE ts_code IN ({format_codes}) AND trade_date BETWEEN %s AND %s"
+            cur.execute(sql, tuple(ts_codes) + (trade_dates[0], trade_dates[-1]))
             self.db_conn.commit()
         except Exception:
             if self.db_conn:
@@ -686,9 +796,12 @@ class TushareCacheClient:
         ts_code: str = "",
         start_date: str = None,
         end_date: str = None,
-    ) -> pd.DataFrame:
+        chunksize: Optional[int] = None,
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """
         获取指数日线行情数据，自动分批补全本地缓存，API与Tushare一致。
+        chunksize 不为空时返回按 chunksize 行分块的 DataFrame 迭代器（服务端游标流式读取），
+        用于全市场长区间拉取时控制内存。
         """
         if not ts_code or not start_date or not end_date:
             raise ValueError("index_daily: 必须提供 ts_code, start_date 和 end_date")
@@ -715,30 +828,7 @@ class TushareCacheClient:
             self._delete_index_daily(batch_codes, trade_dates)
             self._insert_index_daily(df)
         # 最终返回本地数据
-        self.connect()
-        cur = self.db_conn.cursor()
-        try:
-            format_codes = ",".join(["%s"] * len(ts_codes))
-            format_dates = ",".join(["%s"] * len(trade_dates))
-            sql = f"SELECT ts_code, trade_date, `close`, `open`, high, low, pre_close, `change`, pct_chg, vol, amount FROM index_daily WHERE ts_code IN ({format_codes}) AND trade_date IN ({format_dates})"
-            cur.execute(sql, tuple(ts_codes) + tuple(trade_dates))
-            rows = cur.fetchall()
-            cols = [
-                "ts_code",
-                "trade_date",
-                "close",
-                "open",
-                "high",
-                "low",
-                "pre_close",
-                "change",
-                "pct_chg",
-                "vol",
-                "amount",
-            ]
-            return pd.DataFrame(rows, columns=cols)
-        finally:
-            cur.close()
+        return self._read_local("index_daily", ts_codes, trade_dates, chunksize)
 
     # 一次性全量初始化（会产生日志并与 Tushare 交互），仅在需要时调用或由 __main__ 使用
     def init_all_from_tushare(self):